@@ -0,0 +1,471 @@
+"""
+Receiver core for pythonCatch.py: MQTT on an asyncio loop, UI updates
+coalesced into one periodic Tk callback.
+
+The old receiver called root.after(0, ...) twice for every chunk (progress
+and stats) from paho's network thread, so a burst of chunks queued up
+thousands of Tk callbacks that all redraw the same two widgets, and the
+frame itself waited behind them. Here
+
+- AsyncioMqtt drives paho through its socket hooks (on_socket_open /
+  register_write / ...) from an asyncio loop on one thread: no loop_forever
+  thread, reads and writes happen when the socket is ready.
+- ReceiverCore is the protocol state machine (text and binary chunks, the
+  frame session table) with no Tk in it. Finished frames go to a small
+  thread pool instead of a new thread per frame.
+- UiBridge holds the latest value per UI key (status, progress, chunk,
+  frame...). Any thread may set() a key, newer values overwrite older ones,
+  and a single root.after tick applies what changed, so the Tk queue never
+  holds more than one bridge callback whatever the message rate.
+- With a Retransmitter (retransmit.py) the core NACKs missing chunks on
+  the command topic instead of decoding a frame with holes; AsyncReceiver
+  drives its retry timers from the same loop.
+"""
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from chunk_assembler import parse_chunk
+from frame_sessions import FrameSessions
+
+# Shared helpers live in pythonCommon/ at the repo root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pythonCommon"))
+import binary_frames
+
+# Network modules, imported by load_network() when an AsyncReceiver is made:
+# a replay or a --daemon viewer uses ReceiverCore/UiBridge without them
+asyncio = mqtt = None
+
+
+def load_network():
+    global asyncio, mqtt
+    import asyncio
+    import paho.mqtt.client as mqtt
+
+
+class UiBridge:
+    """Latest-value UI state from any thread, applied on the Tk thread.
+
+    handlers is an ordered list of (key, function(value)); a tick applies the
+    changed keys in that order, so e.g. "frame" can come after "status".
+    """
+
+    def __init__(self, handlers=(), interval_ms=33):
+        self.handlers = list(handlers)
+        self.interval_ms = interval_ms
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.root = None
+
+        # Counters
+        self.posted = 0
+        self.applied = 0
+        self.ticks = 0
+        self.frames_skipped = 0
+
+    def set(self, key, value):
+        """Replace the pending value of key (any thread, never blocks on Tk)"""
+        with self.lock:
+            if key == "frame" and "frame" in self.pending:
+                self.frames_skipped += 1
+            self.pending[key] = value
+            self.posted += 1
+
+    def take(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        return pending
+
+    def apply(self):
+        """Run the handlers for everything that changed since the last tick"""
+        pending = self.take()
+        for key, handler in self.handlers:
+            if key in pending:
+                try:
+                    handler(pending[key])
+                except Exception as e:
+                    print(f"❌ UI update '{key}' failed: {e}")
+                self.applied += 1
+        self.ticks += 1
+
+    def attach(self, root):
+        """Start ticking on root (a Tk widget), one after() pending at a time"""
+        self.root = root
+        root.after(self.interval_ms, self.tick)
+
+    def tick(self):
+        self.apply()
+        self.root.after(self.interval_ms, self.tick)
+
+
+class ImmediateUi:
+    """The old behaviour behind the UiBridge interface: every set() is its
+    own root.after(0, ...). Kept for receiverBench/bench_ui_bridge.py"""
+
+    def __init__(self, root, handlers=()):
+        self.root = root
+        self.handlers = dict(handlers)
+        self.posted = 0
+        self.frames_skipped = 0
+
+    def set(self, key, value):
+        self.posted += 1
+        self.root.after(0, self.handlers[key], value)
+
+
+class ReceiverCore:
+    """Chunk protocol state machine, UI-free.
+
+    on_frame(image_bytes, device, complete_at) runs on the worker pool for
+    every finished frame; ui gets "status", "progress" and "chunk" updates.
+    decode_histogram (pythonCommon/metrics.py) gets the time to finish a
+    frame's decode after its last chunk. retransmit (retransmit.Retransmitter)
+    turns on NACKs; poll_retransmits() must then run every few tens of ms on
+    the thread that calls on_message.
+    """
+
+    def __init__(self, topic, ui, on_frame, workers=2, decode_histogram=None, retransmit=None):
+        self.topic = topic
+        self.ui = ui
+        self.on_frame = on_frame
+        self.decode_histogram = decode_histogram
+        self.retransmit = retransmit
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="frame")
+        self.pending = 0
+        self.pending_lock = threading.Lock()
+
+        # In-flight frames from every camera, keyed by (device, seq)
+        self.sessions = FrameSessions()
+        self.binary_chunks = 0
+        self.crc_errors = 0
+        self.messages = 0
+        self.frames_completed = 0
+
+    def device_from_topic(self, topic):
+        """test/esp32_to_python/<device> -> <device>, bare topic -> default"""
+        suffix = topic[len(self.topic) + 1:]
+        return suffix or "default"
+
+    def on_message(self, client, userdata, message):
+        self.messages += 1
+        try:
+            # Work on the raw bytes, only the short markers are ever decoded
+            payload = message.payload
+            device = self.device_from_topic(message.topic)
+
+            if binary_frames.is_binary(payload):
+                # Binary chunk: header + raw JPEG bytes, no START/END markers
+                try:
+                    chunk = binary_frames.parse(payload)
+                except binary_frames.FrameError as e:
+                    self.crc_errors += 1
+                    print(f"❌ Bad binary chunk on {message.topic}: {e}")
+                    return
+                self.binary_chunks += 1
+                device = chunk.device
+                session = self.sessions.add_binary_chunk(chunk)
+                if session is None:
+                    # Resent chunk of a frame that is already done
+                    return
+                assembler = session.assembler
+                if session.nacks:
+                    self.retransmit.chunk_arrived(session, len(chunk.payload), session.last_added)
+                self.announce_dimensions(session, device)
+                self.ui.set("progress", assembler.progress())
+
+                if assembler.is_complete():
+                    complete_at = time.perf_counter()
+                    self.sessions.finish(device, chunk.seq)
+                    if session.nacks:
+                        self.retransmit.recovered_frame(session, time.monotonic())
+                    self.complete_frame(assembler, device, complete_at)
+
+            elif payload.startswith(b"IMG_START:"):
+                # IMG_START:<size>:<chunks>[:<seq>]
+                parts = payload.split(b":")
+                if len(parts) < 3:
+                    print(f"❌ Malformed start marker from {device}")
+                    return
+                image_size = int(parts[1])
+                total_chunks = int(parts[2])
+                seq = int(parts[3]) if len(parts) > 3 else None
+
+                # Preallocate the whole frame up front
+                self.sessions.start(device, seq, image_size, total_chunks)
+                print(f"📨 [{device}] Starting to receive image {seq}. Expected chunks: {total_chunks}")
+
+                self.ui.set("status", (f"Receiving image from {device}...", "orange"))
+                self.ui.set("progress", 0)
+
+            elif payload.startswith(b"IMG_CHUNK:"):
+                # Receive image chunk straight into its slot in the frame buffer
+                seq, chunk_index, chunk_data = parse_chunk(payload)
+                session = self.sessions.add_chunk(device, seq, chunk_index, chunk_data)
+                if session is None:
+                    return
+                assembler = session.assembler
+                if session.nacks:
+                    # A resent chunk; the frame is done once the last hole is filled
+                    self.retransmit.chunk_arrived(session, len(chunk_data), session.last_added)
+                    if session.ended and assembler.is_complete():
+                        complete_at = time.perf_counter()
+                        self.sessions.finish(device, seq)
+                        self.retransmit.recovered_frame(session, time.monotonic())
+                        self.complete_frame(assembler, device, complete_at)
+                        return
+
+                self.announce_dimensions(session, device)
+
+                # Only the latest chunk is shown, the text is built on the Tk side
+                self.ui.set("progress", assembler.progress())
+                self.ui.set("chunk", (device, assembler.received, assembler.total_chunks,
+                                      chunk_index, len(chunk_data)))
+
+            elif payload.startswith(b"IMG_END"):
+                # IMG_END[:<seq>] - chunks are already decoded, only the tail is left
+                complete_at = time.perf_counter()
+                seq = int(payload[8:]) if len(payload) > 8 else None
+                session = self.sessions.get(device, seq)
+                if session is None:
+                    return
+                session.ended = True
+                if self.retransmit and not session.assembler.is_complete():
+                    if session.nacks:
+                        # Already asked (the frame stalled), the retry timer carries on
+                        return
+                    if self.retransmit.wanted(session, time.monotonic()):
+                        # Ask for the holes, the frame completes when they arrive
+                        self.retransmit.request(session, time.monotonic())
+                        return
+                self.sessions.finish(device, seq)
+                if session.nacks:
+                    self.retransmit.recovered_frame(session, time.monotonic())
+                self.complete_frame(session.assembler, device, complete_at)
+
+        except Exception as e:
+            print(f"❌ Error processing MQTT message: {e}")
+
+    def announce_dimensions(self, session, device):
+        """The JPEG header is decoded early, report the size once"""
+        if session.announced:
+            return
+        assembler = session.assembler
+        dimensions = assembler.dimensions()
+        if dimensions:
+            session.announced = True
+            print(f"📐 [{device}] Incoming JPEG {dimensions[0]}x{dimensions[1]}")
+        elif assembler.probe.soi_ok is False:
+            session.announced = True
+            print(f"⚠️ [{device}] Frame does not start with a JPEG SOI marker")
+
+    def complete_frame(self, assembler, device, complete_at):
+        """Hand a finished frame (text or binary) to the worker pool"""
+        for i in assembler.missing_chunks():
+            print(f"⚠️ [{device}] Missing chunk {i}")
+
+        start = time.perf_counter()
+        image_data = assembler.finish()
+        if self.decode_histogram:
+            self.decode_histogram.observe(time.perf_counter() - start)
+        print(f"📨 [{device}] Image complete. Decoded size: {len(image_data)} bytes")
+
+        if assembler.received > 0:
+            self.frames_completed += 1
+            with self.pending_lock:
+                self.pending += 1
+            self.executor.submit(self.run_frame, image_data, device, complete_at)
+            self.ui.set("progress", 100)
+            self.ui.set("status", ("Processing image...", "blue"))
+        else:
+            print("❌ No image data received")
+            self.ui.set("status", ("No image data", "red"))
+
+    def poll_retransmits(self, now=None):
+        """NACK frames that stalled or still miss chunks, give up on the
+        ones out of retries"""
+        now = time.monotonic() if now is None else now
+        for session in list(self.sessions.sessions.values()):
+            if session.assembler.is_complete():
+                if not session.ended and now - session.last_seen >= self.retransmit.idle_s:
+                    # Every chunk is here but the IMG_END was lost
+                    self.sessions.finish(session.device, session.seq)
+                    if session.nacks:
+                        self.retransmit.recovered_frame(session, now)
+                    self.complete_frame(session.assembler, session.device, time.perf_counter())
+                continue
+            if not self.retransmit.wanted(session, now):
+                continue
+            if not self.retransmit.exhausted(session):
+                self.retransmit.request(session, now)
+                continue
+            self.sessions.finish(session.device, session.seq)
+            self.retransmit.gave_up_on(session, now)
+            if session.ended:
+                # As without NACKs: decode what arrived
+                self.complete_frame(session.assembler, session.device, time.perf_counter())
+            else:
+                print(f"❌ [{session.device}] Frame {session.seq} dropped, "
+                      f"{len(session.assembler.missing_chunks())} chunks never arrived")
+
+    def run_frame(self, image_data, device, complete_at):
+        try:
+            self.on_frame(image_data, device, complete_at)
+        finally:
+            with self.pending_lock:
+                self.pending -= 1
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+class AsyncioMqtt:
+    """Run a paho client from an asyncio loop through its socket hooks
+    (the pattern of paho's loop_asyncio example). Must be created, and the
+    client connected, on the loop's thread."""
+
+    def __init__(self, loop, client):
+        self.loop = loop
+        self.client = client
+        self.misc = None
+        self.disconnected = loop.create_future()
+        client.on_socket_open = self.on_socket_open
+        client.on_socket_close = self.on_socket_close
+        client.on_socket_register_write = self.on_socket_register_write
+        client.on_socket_unregister_write = self.on_socket_unregister_write
+
+    def on_socket_open(self, client, userdata, sock):
+        self.loop.add_reader(sock, client.loop_read)
+        self.misc = self.loop.create_task(self.misc_loop())
+
+    def on_socket_close(self, client, userdata, sock):
+        self.loop.remove_reader(sock)
+        self.loop.remove_writer(sock)
+        if not self.disconnected.done():
+            self.disconnected.set_result(None)
+
+    def on_socket_register_write(self, client, userdata, sock):
+        self.loop.add_writer(sock, client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self.loop.remove_writer(sock)
+
+    async def misc_loop(self):
+        # Keepalive pings and timeouts, what loop_forever does between reads
+        while self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                break
+
+    def stop(self):
+        if self.misc is not None:
+            self.misc.cancel()
+
+
+class AsyncReceiver:
+    """ReceiverCore on a paho client driven by an asyncio loop thread.
+
+    Connects, subscribes to topic/#, publishes the wanted chunk format and
+    reconnects with backoff until stop(). NACKs of the core's Retransmitter
+    go out on this client, its timers are checked every poll_ms.
+    """
+
+    def __init__(self, broker, port, core, command_topic, binary_frames=True,
+                 client_id="", keepalive=60, poll_ms=50):
+        self.broker = broker
+        self.port = port
+        self.core = core
+        self.command_topic = command_topic
+        self.binary_frames = binary_frames
+        self.keepalive = keepalive
+        load_network()
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
+        self.client.on_connect = self.on_connect
+        self.client.on_message = core.on_message
+        if core.retransmit is not None:
+            core.retransmit.publish = self.client.publish
+        self.poll_ms = poll_ms
+        self.loop = None
+        self.task = None
+        self.thread = None
+        self.running = False
+        self.connected = False
+
+    def on_connect(self, client, userdata, flags, reason_code, properties):
+        if reason_code == 0:
+            print("✅ Connected to MQTT Broker!")
+            self.connected = True
+            # "#" also matches the bare topic used by single-camera senders
+            client.subscribe(self.core.topic + "/#")
+            client.publish(self.command_topic,
+                           "PROTO:BIN1" if self.binary_frames else "PROTO:TEXT", retain=True)
+            self.core.ui.set("status", ("Connected to MQTT", "green"))
+        else:
+            print(f"❌ Failed to connect, return code {reason_code}")
+            self.core.ui.set("status", (f"Connection failed: {reason_code}", "red"))
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.task = self.loop.create_task(self.main())
+        if self.core.retransmit is not None:
+            self.loop.call_soon(self.poll_retransmits)
+        try:
+            self.loop.run_until_complete(self.task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.loop.close()
+
+    def poll_retransmits(self):
+        if self.connected:
+            try:
+                self.core.poll_retransmits()
+            except Exception as e:
+                print(f"❌ Retransmit check failed: {e}")
+        if self.running:
+            self.loop.call_later(self.poll_ms / 1000, self.poll_retransmits)
+
+    async def main(self):
+        delay = 1.0
+        while self.running:
+            hooks = AsyncioMqtt(self.loop, self.client)
+            try:
+                self.core.ui.set("status", ("Connecting...", "orange"))
+                print(f"🔗 Connecting to {self.broker}:{self.port}...")
+                # Blocks only this loop's thread (DNS + TCP), never Tk
+                self.client.connect(self.broker, self.port, self.keepalive)
+                delay = 1.0
+                await hooks.disconnected
+            except Exception as e:
+                print(f"❌ Connection error: {e}")
+                self.core.ui.set("status", (f"Error: {str(e)}", "red"))
+            finally:
+                hooks.stop()
+                self.connected = False
+            if self.running:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+
+    def shutdown(self):
+        # On the loop thread: close the socket, then wake main() even if it
+        # is sleeping before a reconnect
+        self.client.disconnect()
+        self.task.cancel()
+
+    def stop(self):
+        """Disconnect and end the loop thread"""
+        self.running = False
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.shutdown)
+        if self.thread:
+            self.thread.join(timeout=5)
+        self.connected = False
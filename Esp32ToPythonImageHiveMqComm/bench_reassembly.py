@@ -0,0 +1,134 @@
+"""
+Microbenchmark: old string reassembly vs ChunkAssembler
+run using python Esp32ToPythonImageHiveMqComm/bench_reassembly.py
+
+The second table is the latency left after IMG_END: the old path joins and
+decodes everything then, the streaming path only decodes the tail.
+"""
+
+import base64
+import os
+import time
+
+from chunk_assembler import ChunkAssembler, parse_chunk
+
+CHUNK_SIZE = 1000  # same as chunkSize in sketch.ino
+FRAME_SIZES = [100 * 1024, 1024 * 1024, 5 * 1024 * 1024]
+REPEATS = 3
+
+
+def make_messages(image_bytes):
+    """Build the same MQTT payloads the ESP32 publishes"""
+    encoded = base64.b64encode(image_bytes)
+    total = (len(encoded) + CHUNK_SIZE - 1) // CHUNK_SIZE
+    messages = [b"IMG_START:%d:%d" % (len(image_bytes), total)]
+    for i in range(total):
+        messages.append(b"IMG_CHUNK:%d:" % i + encoded[i * CHUNK_SIZE:(i + 1) * CHUNK_SIZE])
+    messages.append(b"IMG_END")
+    return messages
+
+
+def string_path(messages):
+    """The original pythonCatch.py logic: decode, dict of str, += join"""
+    chunks_received = {}
+    total_chunks = 0
+    for raw in messages:
+        payload = raw.decode('utf-8')
+        if payload.startswith("IMG_START:"):
+            total_chunks = int(payload.split(":")[2])
+            chunks_received = {}
+        elif payload.startswith("IMG_CHUNK:"):
+            parts = payload.split(":", 2)
+            chunks_received[int(parts[1])] = parts[2]
+        elif payload == "IMG_END":
+            image_data = ""
+            for i in range(total_chunks):
+                if i in chunks_received:
+                    image_data += chunks_received[i]
+            clean_data = image_data.replace('\n', '').replace('\r', '').replace(' ', '')
+            return base64.b64decode(clean_data)
+
+
+def assembler_path(messages):
+    """The new path: bytes parsing and streaming decode into a preallocated buffer"""
+    assembler = None
+    for payload in messages:
+        if payload.startswith(b"IMG_START:"):
+            parts = payload.split(b":")
+            assembler = ChunkAssembler(int(parts[1]), int(parts[2]))
+        elif payload.startswith(b"IMG_CHUNK:"):
+            _, index, data = parse_chunk(payload)
+            assembler.add_chunk(index, data)
+        elif payload == b"IMG_END":
+            return bytes(assembler.finish())
+
+
+def end_latency_string(messages):
+    """Time spent on IMG_END in the old path"""
+    chunks = {}
+    for raw in messages[1:-1]:
+        parts = raw.decode('utf-8').split(":", 2)
+        chunks[int(parts[1])] = parts[2]
+    start = time.perf_counter()
+    image_data = ""
+    for i in range(len(chunks)):
+        image_data += chunks[i]
+    clean_data = image_data.replace('\n', '').replace('\r', '').replace(' ', '')
+    base64.b64decode(clean_data)
+    return time.perf_counter() - start
+
+
+def end_latency_streaming(messages):
+    """Time spent on IMG_END with the streaming decoder"""
+    parts = messages[0].split(b":")
+    assembler = ChunkAssembler(int(parts[1]), int(parts[2]))
+    for payload in messages[1:-1]:
+        _, index, data = parse_chunk(payload)
+        assembler.add_chunk(index, data)
+    start = time.perf_counter()
+    assembler.finish()
+    return time.perf_counter() - start
+
+
+def best_of(func, messages):
+    return min(func(messages) for _ in range(REPEATS))
+
+
+def best_time(func, messages):
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func(messages)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    print(f"{'frame':>8} {'chunks':>7} {'string ms':>10} {'buffer ms':>10} {'speedup':>8}")
+    corpus = {}
+    for size in FRAME_SIZES:
+        image_bytes = os.urandom(size)
+        messages = make_messages(image_bytes)
+        corpus[size] = messages
+
+        # Both paths must produce the original image
+        assert string_path(messages) == image_bytes
+        assert assembler_path(messages) == image_bytes
+
+        old = best_time(string_path, messages)
+        new = best_time(assembler_path, messages)
+        print(f"{size // 1024:>6}KB {len(messages) - 2:>7} {old * 1000:>10.2f} "
+              f"{new * 1000:>10.2f} {old / new:>7.1f}x")
+
+
+    print()
+    print(f"{'frame':>8} {'IMG_END->bytes old ms':>22} {'streaming ms':>13}")
+    for size, messages in corpus.items():
+        old = best_of(end_latency_string, messages)
+        new = best_of(end_latency_streaming, messages)
+        print(f"{size // 1024:>6}KB {old * 1000:>22.3f} {new * 1000:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Zero-copy chunk reassembly for the IMG_START / IMG_CHUNK / IMG_END protocol
+(see sketch.ino). Chunks are base64-decoded as soon as they are next in
+line, straight into one preallocated buffer of the JPEG size, so there is
+no big join or decode left to do when IMG_END arrives.
+
+Binary chunks (see binary_frames.py) are already raw bytes; with
+encoding="raw" each one is copied straight to its offset, in any order.
+"""
+
+import binascii
+
+from stream_decoder import Base64StreamDecoder, JpegProbe
+
+
+def parse_chunk(payload):
+    """Split an IMG_CHUNK payload into (seq, idx, memoryview of data) without decoding
+
+    Legacy senders publish b'IMG_CHUNK:<idx>:<data>' (seq is None), newer ones
+    b'IMG_CHUNK:<seq>:<idx>:<data>'. Base64 never contains ':' so the number
+    of separators tells the two apart.
+    """
+    view = memoryview(payload)
+    first = payload.index(b":", 10)
+    second = payload.find(b":", first + 1)
+    if second == -1:
+        return None, int(payload[10:first]), view[first + 1:]
+    return int(payload[10:first]), int(payload[first + 1:second]), view[second + 1:]
+
+
+class ChunkAssembler:
+    """Reassembles and decodes one base64 (or raw) frame into a preallocated bytearray"""
+
+    def __init__(self, image_size, total_chunks, encoding="base64"):
+        self.image_size = image_size
+        self.total_chunks = total_chunks
+        self.raw = encoding == "raw"
+
+        # Holds the decoded JPEG, the size comes from IMG_START
+        self.buffer = bytearray(image_size)
+        self.view = memoryview(self.buffer)
+        self.decoder = Base64StreamDecoder(self.view)
+        self.probe = JpegProbe()
+
+        # One bit per chunk, set when the chunk has arrived
+        self.bitmap = bytearray((total_chunks + 7) // 8)
+        self.received = 0
+
+        # Chunks that arrived ahead of a gap wait here until it is filled
+        self.next_index = 0
+        self.waiting = {}
+        self.chunk_length = None
+
+    def has_chunk(self, index):
+        return bool(self.bitmap[index >> 3] & (1 << (index & 7)))
+
+    def add_chunk(self, index, data):
+        """Take a chunk, decoding it now if it is next in line.
+        Returns False for duplicates or bad indexes"""
+        if index < 0 or index >= self.total_chunks or self.has_chunk(index):
+            return False
+
+        self.bitmap[index >> 3] |= 1 << (index & 7)
+        self.received += 1
+        if index < self.total_chunks - 1:
+            # All chunks but the last have the same length
+            self.chunk_length = len(data)
+
+        if self.raw:
+            return self._place_raw(index, data)
+
+        if index != self.next_index:
+            self.waiting[index] = data
+            return True
+
+        self.decoder.feed(data)
+        self.next_index += 1
+        while self.next_index in self.waiting:
+            self.decoder.feed(self.waiting.pop(self.next_index))
+            self.next_index += 1
+        self.probe.feed(self.buffer, self.decoder.pos)
+        return True
+
+    def _place_raw(self, index, data):
+        # The last chunk is the only short one, so it ends at image_size
+        if index == self.total_chunks - 1:
+            pos = max(0, self.image_size - len(data))
+        else:
+            pos = index * len(data)
+        self.decoder.write(data, pos)
+
+        while self.next_index < self.total_chunks and self.has_chunk(self.next_index):
+            self.next_index += 1
+        if self.chunk_length:
+            contiguous = min(self.next_index * self.chunk_length, self.image_size)
+        else:
+            contiguous = self.image_size if self.next_index else 0
+        self.probe.feed(self.buffer, contiguous)
+        return True
+
+    def finish(self):
+        """Decode the tail on IMG_END and return the frame as a memoryview (no copy)"""
+        if self.raw:
+            self.probe.feed(self.buffer, self.image_size)
+            return self.view[:self.image_size]
+        length = self.decoder.finish()
+        self.probe.feed(self.buffer, length)
+
+        # Chunks stuck behind a missing one can still be placed when their
+        # base64 offset falls on a 4-char group
+        if self.waiting and self.chunk_length and self.chunk_length % 4 == 0:
+            for index, data in self.waiting.items():
+                pos = index * self.chunk_length // 4 * 3
+                if index == self.total_chunks - 1:
+                    data = bytes(data) + b"=" * (-len(data) % 4)
+                try:
+                    end = self.decoder.write(binascii.a2b_base64(data), pos)
+                except binascii.Error:
+                    continue
+                length = max(length, end)
+            self.waiting = {}
+        return self.view[:length]
+
+    def missing_chunks(self):
+        """Indexes of chunks that have not arrived yet"""
+        return [i for i in range(self.total_chunks) if not self.has_chunk(i)]
+
+    def is_complete(self):
+        return self.received == self.total_chunks
+
+    def progress(self):
+        if self.total_chunks == 0:
+            return 0
+        return (self.received / self.total_chunks) * 100
+
+    def dimensions(self):
+        """(width, height) once the JPEG header has been decoded, else None"""
+        if self.probe.width is None:
+            return None
+        return self.probe.width, self.probe.height
@@ -0,0 +1,172 @@
+"""
+Session table for frames that are still being received, so several
+ESP32-CAMs can publish at the same time without corrupting each other.
+
+A session is keyed by (device, seq). The device comes from the topic
+suffix (test/esp32_to_python/<device>), the seq from the IMG_START marker.
+Legacy senders have no seq, so their key is (device, None). Binary chunks
+carry device and seq in their header and open their session themselves;
+the keys of recently finished frames are remembered so a late resent chunk
+(the answer to a second NACK) is dropped instead of opening a new session
+that would NACK the whole frame again.
+"""
+
+import time
+from collections import OrderedDict
+
+from chunk_assembler import ChunkAssembler
+
+
+class FrameSession:
+    def __init__(self, device, seq, assembler, now):
+        self.device = device
+        self.seq = seq
+        self.assembler = assembler
+        self.started = now
+        self.last_seen = now
+        self.announced = False
+        self.last_added = False
+
+        # Retransmission state (retransmit.py): IMG_END seen, NACKs sent,
+        # when to ask again, whether any chunk came back
+        self.ended = False
+        self.nacks = 0
+        self.retry_at = None
+        self.first_nack = None
+        self.answered = False
+
+
+class FrameSessions:
+    """Tracks in-flight frames with timeouts and an LRU memory cap"""
+
+    def __init__(self, timeout=10.0, max_sessions=512, max_bytes=128 * 1024 * 1024,
+                 max_finished=1024):
+        self.timeout = timeout
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.max_finished = max_finished
+
+        # Least recently active session first
+        self.sessions = OrderedDict()
+        self.bytes_in_use = 0
+
+        # (device, seq) -> (image_size, total_chunks, finished at) of the
+        # last max_finished frames, oldest first
+        self.finished = OrderedDict()
+
+        # Counters
+        self.started = 0
+        self.completed = 0
+        self.replaced = 0
+        self.timed_out = 0
+        self.evicted = 0
+        self.orphan_chunks = 0
+        self.late_chunks = 0
+
+    def start(self, device, seq, image_size, total_chunks, now=None, encoding="base64"):
+        """Open a session for a new IMG_START"""
+        now = time.monotonic() if now is None else now
+        key = (device, seq)
+
+        # A repeated IMG_START for the same key replaces the partial frame,
+        # but it is counted instead of being thrown away silently
+        if key in self.sessions:
+            self._remove(key)
+            self.replaced += 1
+
+        self.expire(now)
+
+        assembler = ChunkAssembler(image_size, total_chunks, encoding)
+        size = len(assembler.buffer)
+        while self.sessions and (len(self.sessions) >= self.max_sessions
+                                 or self.bytes_in_use + size > self.max_bytes):
+            self._remove(next(iter(self.sessions)))
+            self.evicted += 1
+
+        session = FrameSession(device, seq, assembler, now)
+        self.sessions[key] = session
+        self.bytes_in_use += size
+        self.started += 1
+        return session
+
+    def add_chunk(self, device, seq, index, data, now=None):
+        """Write a chunk into its session. Returns the session or None"""
+        session = self.sessions.get((device, seq))
+        if session is None:
+            self.orphan_chunks += 1
+            return None
+
+        session.last_added = session.assembler.add_chunk(index, data)
+        session.last_seen = time.monotonic() if now is None else now
+        self.sessions.move_to_end((device, seq))
+        return session
+
+    def add_binary_chunk(self, chunk, now=None):
+        """Write a parsed binary chunk, opening its session on first sight.
+        Returns the session, or None for a late chunk of a finished frame"""
+        now = time.monotonic() if now is None else now
+        key = (chunk.device, chunk.seq)
+        session = self.sessions.get(key)
+        if session is None:
+            finished = self.finished.get(key)
+            # Same shape within the timeout: a late resend, not a new frame
+            # from a camera that restarted its counter
+            if (finished is not None and finished[:2] == (chunk.image_size, chunk.total)
+                    and now - finished[2] < self.timeout):
+                self.late_chunks += 1
+                return None
+        if session is not None and (session.assembler.image_size != chunk.image_size
+                                    or session.assembler.total_chunks != chunk.total):
+            # Same seq with a different shape: the camera restarted its counter
+            self._remove(key)
+            self.replaced += 1
+            session = None
+        if session is None:
+            session = self.start(chunk.device, chunk.seq, chunk.image_size,
+                                 chunk.total, now, encoding="raw")
+        return self.add_chunk(chunk.device, chunk.seq, chunk.index, chunk.payload, now)
+
+    def get(self, device, seq):
+        return self.sessions.get((device, seq))
+
+    def finish(self, device, seq):
+        """Close a session on IMG_END and hand it back, or None if unknown"""
+        key = (device, seq)
+        if key not in self.sessions:
+            return None
+        session = self._remove(key)
+        self.completed += 1
+        self.finished[key] = (session.assembler.image_size, session.assembler.total_chunks,
+                              time.monotonic())
+        self.finished.move_to_end(key)
+        if len(self.finished) > self.max_finished:
+            self.finished.popitem(last=False)
+        return session
+
+    def expire(self, now=None):
+        """Drop sessions that have not seen a chunk within the timeout"""
+        now = time.monotonic() if now is None else now
+        while self.sessions:
+            key, session = next(iter(self.sessions.items()))
+            if now - session.last_seen < self.timeout:
+                break
+            self._remove(key)
+            self.timed_out += 1
+
+    def _remove(self, key):
+        session = self.sessions.pop(key)
+        self.bytes_in_use -= len(session.assembler.buffer)
+        return session
+
+    def stats(self):
+        return {
+            "in_flight": len(self.sessions),
+            "bytes_in_use": self.bytes_in_use,
+            "started": self.started,
+            "completed": self.completed,
+            "replaced": self.replaced,
+            "timed_out": self.timed_out,
+            "evicted": self.evicted,
+            "orphan_chunks": self.orphan_chunks,
+            "late_chunks": self.late_chunks,
+        }
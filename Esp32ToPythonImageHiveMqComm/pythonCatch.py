@@ -1,35 +1,116 @@
-import paho.mqtt.client as mqtt
-import base64
-import tkinter as tk
-from tkinter import ttk
-from PIL import Image, ImageTk
-import threading
-import queue
+import argparse
 import time
-import io
+import os
+import sys
+
+# Shared helpers live in pythonCommon/ at the repo root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pythonCommon"))
+from async_receiver import AsyncReceiver, ReceiverCore, UiBridge
+from frame_dedup import DuplicateFilter, add_dedup_arguments
+from mjpeg_recorder import MjpegRecorder
+from retransmit import Retransmitter
+from traffic_log import TrafficRecorder, add_replay_arguments, open_replay
+
+# Display modules, imported by load_display() only when a window is wanted
+tk = ttk = ImageTk = None
+fit_to_canvas = prepare_for_canvas = None
+
+def load_display():
+    global tk, ttk, ImageTk, fit_to_canvas, prepare_for_canvas
+    import tkinter as tk
+    from tkinter import ttk
+    from PIL import ImageTk
+    from image_prep import fit_to_canvas, prepare_for_canvas
 
 class MQTTImageReceiver:
-    def __init__(self):
+    def __init__(self, use_daemon=False, headless=False, metrics_port=None, nack_retries=3,
+                 record_path=None, replay_args=None, video_root=None, dedup_bits=None, dedup_refresh=10.0,
+                 archive_root=None):
         # MQTT Configuration
         self.broker = "broker.hivemq.com"
         self.port = 1883
         self.topic = "test/esp32_to_python"
+        self.command_topic = "test/python_to_esp32"
+        
+        # Ask cameras for binary chunks (retained, so late joiners see it too);
+        # text chunks are still accepted either way
+        self.binary_frames = True
+        
+        # --archive keeps every received frame, by content hash, in an image
+        # archive (pythonCommon/image_archive.py); off by default, it grows
+        # without limit
+        self.archive = None
+        if archive_root:
+            from image_archive import ImageArchive
+            self.archive = ImageArchive(archive_root)
+        
+        # --record-video also appends them, as received, to per-camera MJPEG
+        # AVI segments with a time index (pythonCommon/mjpeg_recorder.py)
+        self.video = MjpegRecorder(video_root) if video_root else None
+        
+        # With dedup_bits, a frame that looks like the last one kept from its
+        # camera (perceptual hash, pythonCommon/frame_dedup.py) is not
+        # archived, classified or displayed; the video still gets every frame
+        self.dedup = DuplicateFilter(dedup_bits, refresh_s=dedup_refresh) if dedup_bits is not None else None
+        
+        # Optional bottle/clipBox classification on the PC, enabled when a model
+        # exists (python pythonCommon/host_classifier.py train --out host_model.npz)
+        self.host_model_path = "host_model.npz"
+        self.host_classifier = None
+        if os.path.exists(self.host_model_path):
+            # NumPy is only loaded when there is a model
+            from host_classifier import BatchClassifier, LinearClassifier
+            model = LinearClassifier.load(self.host_model_path)
+            self.host_classifier = BatchClassifier(model, self.on_host_result)
+            print(f"🧠 Host classifier loaded: {model.labels}")
         
-        # Image processing variables
-        self.image_data = ""
-        self.image_size = 0
-        self.received_chunks = 0
-        self.total_chunks = 0
-        self.is_receiving = False
-        self.chunks_received = {}
+        # With use_daemon, decoded frames come from ingestDaemon/ingest_daemon.py
+        # (shared memory) instead of this process' own broker connection
+        self.use_daemon = use_daemon
+        self.ingest_client = None
         
-        # Queue for thread-safe communication
-        self.image_queue = queue.Queue()
+        # --record appends the raw broker traffic to a traffic log, --replay
+        # reads one instead of the broker (pythonCommon/traffic_log.py)
+        self.recorder = TrafficRecorder(record_path) if record_path else None
+        self.replay_args = replay_args
+        self.replayer = None
         
-        # MQTT Client
-        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
-        self.client.on_connect = self.on_connect
-        self.client.on_message = self.on_message
+        # Images counter
+        self.images_received = 0
+        self.display_latency_ms = 0.0
+        self.last_received_time = "Never"
+        
+        # Every thread only sets the latest value of a UI key; one Tk tick
+        # (UiBridge) applies them, instead of root.after(0, ...) per chunk
+        self.ui = UiBridge([("status", self.apply_status),
+                            ("progress", self.update_progress),
+                            ("chunk", self.apply_chunk),
+                            ("frame", self.display_image)], interval_ms=33)
+        
+        # Protocol state machine on an asyncio loop thread (paho socket hooks),
+        # finished frames go to process_image on a small worker pool.
+        # Missing chunks are asked for again with a NACK on the command topic
+        # (retransmit.py), nack_retries=0 decodes/drops them like before
+        self.retransmit = None
+        if not use_daemon and not replay_args and nack_retries > 0:
+            self.retransmit = Retransmitter(None, self.command_topic, max_retries=nack_retries)
+        self.core = ReceiverCore(self.topic, self.ui, self.process_image, retransmit=self.retransmit)
+        self.receiver = None
+        
+        # Prometheus-style /metrics endpoint (pythonCommon/metrics.py)
+        self.frame_histogram = None
+        self.count_frame = None
+        self.metrics_server = None
+        if metrics_port is not None:
+            self.setup_metrics(metrics_port)
+        
+        # Without a window the UI keys are set but never applied, and frames
+        # are archived/classified without being decoded for display
+        self.headless = headless
+        self.root = None
+        if headless:
+            return
+        load_display()
         
         # Tkinter window
         self.root = tk.Tk()
@@ -38,8 +119,13 @@ class MQTTImageReceiver:
         
         # Store current displayed image
         self.current_image = None
+        self.canvas_image_item = None
+        self.canvas_width = 600
+        self.canvas_height = 400
+        self.resample_quality = "fast"   # "best" = LANCZOS, slower
         
         self.setup_ui()
+        self.ui.attach(self.root)
         
     def setup_ui(self):
         # Configure grid weights
@@ -62,7 +148,7 @@ class MQTTImageReceiver:
         img_frame.rowconfigure(0, weight=1)
         
         # Create a canvas for image display
-        self.canvas = tk.Canvas(img_frame, width=600, height=400, bg="lightgray", 
+        self.canvas = tk.Canvas(img_frame, width=self.canvas_width, height=self.canvas_height, bg="lightgray", 
                                highlightthickness=1, highlightbackground="black")
         self.canvas.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         
@@ -102,209 +188,137 @@ class MQTTImageReceiver:
                                       command=self.clear_image)
         self.clear_button.grid(row=0, column=1, padx=5)
         
-        # Images counter
-        self.images_received = 0
-        self.last_received_time = "Never"
-        
-    def on_connect(self, client, userdata, flags, reason_code, properties):
-        if reason_code == 0:
-            print("✅ Connected to MQTT Broker!")
-            client.subscribe(self.topic)
-            self.root.after(0, self.update_status, "Connected to MQTT", "green")
-        else:
-            print(f"❌ Failed to connect, return code {reason_code}")
-            self.root.after(0, self.update_status, f"Connection failed: {reason_code}", "red")
+    def on_host_result(self, device, seq, label, confidence, latency_ms):
+        # Called on the classifier thread, frames from all cameras share batches
+        print(f"🧠 [{device}] Host classifier: {label} ({confidence:.1%}) in {latency_ms:.1f} ms")
+        self.ui.set("status", (f"[{device}] {label} ({confidence:.1%})", "green"))
     
-    def on_message(self, client, userdata, message):
-        try:
-            payload = message.payload.decode('utf-8')
-            
-            if payload.startswith("IMG_START:"):
-                # Start receiving new image
-                self.is_receiving = True
-                self.image_data = ""
-                self.chunks_received = {}
-                
-                parts = payload.split(":")
-                if len(parts) >= 3:
-                    self.image_size = int(parts[1])
-                    self.total_chunks = int(parts[2])
-                else:
-                    self.image_size = 0
-                    self.total_chunks = 0
-                    
-                self.received_chunks = 0
-                print(f"📨 Starting to receive image. Expected chunks: {self.total_chunks}")
-                
-                self.root.after(0, self.update_status, "Receiving image...", "orange")
-                self.root.after(0, self.update_progress, 0)
-                
-            elif payload.startswith("IMG_CHUNK:") and self.is_receiving:
-                # Receive image chunk
-                parts = payload.split(":", 2)
-                if len(parts) == 3:
-                    chunk_index = int(parts[1])
-                    chunk_data = parts[2]
-                    
-                    # Store chunk by index (in case they arrive out of order)
-                    self.chunks_received[chunk_index] = chunk_data
-                    self.received_chunks = len(self.chunks_received)
-                    
-                    # Update progress
-                    if self.total_chunks > 0:
-                        progress = (self.received_chunks / self.total_chunks) * 100
-                    else:
-                        progress = 0
-                        
-                    self.root.after(0, self.update_progress, progress)
-                    
-                    self.root.after(0, self.update_stats, 
-                                  f"Status: Received {self.received_chunks}/{self.total_chunks} chunks\n"
-                                  f"Images received: {self.images_received}\n"
-                                  f"Last received: {self.last_received_time}\n"
-                                  f"Chunk {chunk_index}: {len(chunk_data)} chars")
-                    
-            elif payload == "IMG_END" and self.is_receiving:
-                # Image complete - assemble all chunks
-                self.is_receiving = False
-                
-                # Assemble chunks in order
-                self.image_data = ""
-                for i in range(self.total_chunks):
-                    if i in self.chunks_received:
-                        self.image_data += self.chunks_received[i]
-                    else:
-                        print(f"⚠️ Missing chunk {i}")
-                
-                print(f"📨 Image complete. Base64 length: {len(self.image_data)}")
-                
-                if len(self.image_data) > 0:
-                    # Process image in a separate thread
-                    threading.Thread(target=self.process_image, 
-                                   args=(self.image_data,), 
-                                   daemon=True).start()
-                    
-                    self.root.after(0, self.update_progress, 100)
-                    self.root.after(0, self.update_status, "Processing image...", "blue")
-                else:
-                    print("❌ No image data received")
-                    self.root.after(0, self.update_status, "No image data", "red")
-                
-        except Exception as e:
-            print(f"❌ Error processing MQTT message: {e}")
-            
-    def process_image(self, base64_data):
+    def process_image(self, image_bytes, device="default", complete_at=None):
+        # Runs on the core's worker pool
         try:
-            # Clean base64 data (remove any whitespace or newlines)
-            clean_data = base64_data.replace('\n', '').replace('\r', '').replace(' ', '')
+            # image_bytes is a memoryview over the assembler buffer, already
+            # base64-decoded chunk by chunk while the frame was arriving
+            print(f"✅ Decoded image size: {len(image_bytes)} bytes")
             
-            # Check if we have enough data
-            if len(clean_data) < 100:
-                print(f"❌ Base64 data too short: {len(clean_data)} chars")
-                self.root.after(0, self.update_status, "Image data too short", "red")
+            if len(image_bytes) < 100:
+                print(f"❌ Decoded image too small: {len(image_bytes)} bytes")
+                self.ui.set("status", ("Image too small", "red"))
                 return
             
-            print(f"🔍 Processing {len(clean_data)} chars of base64 data")
+            if self.video:
+                self.video.add(image_bytes, device)
             
-            # Add padding if needed
-            missing_padding = len(clean_data) % 4
-            if missing_padding:
-                clean_data += '=' * (4 - missing_padding)
+            if self.dedup:
+                if self.dedup.is_duplicate(device, image_bytes):
+                    return
+                cpu_start = time.thread_time()
             
-            # Decode base64 to bytes
-            try:
-                image_bytes = base64.b64decode(clean_data, validate=True)
-            except Exception as e:
-                print(f"❌ Base64 decode error: {e}")
-                # Try alternative approach - decode ignoring errors
-                image_bytes = base64.b64decode(clean_data, validate=False)
+            # Keep every frame in the archive (written on its own thread)
+            if self.archive:
+                self.archive.add(image_bytes, device)
             
-            print(f"✅ Decoded image size: {len(image_bytes)} bytes")
+            if self.host_classifier:
+                self.host_classifier.submit(device, None, image_bytes)
             
-            if len(image_bytes) < 100:
-                print(f"❌ Decoded image too small: {len(image_bytes)} bytes")
-                self.root.after(0, self.update_status, "Image too small", "red")
+            if self.headless:
+                self.frame_done(complete_at)
+                if self.dedup:
+                    self.dedup.kept(time.thread_time() - cpu_start)
                 return
             
-            # Save raw bytes to file for debugging
-            with open("debug_image.jpg", "wb") as f:
-                f.write(image_bytes)
-            print("💾 Saved debug image to debug_image.jpg")
-            
-            # Try to open as image
+            # Decode once, already scaled for the canvas (still on this worker thread)
             try:
-                image = Image.open(io.BytesIO(image_bytes))
-                print(f"✅ Image opened successfully: {image.format}, Size: {image.size}")
-                
-                # Verify it's a valid image
-                image.verify()  # Verify integrity
-                image = Image.open(io.BytesIO(image_bytes))  # Re-open after verify
-                
-                # Put image in queue for main thread
-                self.image_queue.put(image)
+                image, original_size = prepare_for_canvas(image_bytes, self.canvas_width,
+                                                          self.canvas_height,
+                                                          quality=self.resample_quality)
+                print(f"✅ Image decoded: {original_size[0]}x{original_size[1]} -> "
+                      f"{image.size[0]}x{image.size[1]}")
                 
                 # Update statistics
-                self.images_received += 1
-                self.last_received_time = time.strftime("%H:%M:%S")
+                self.frame_done(complete_at)
+                if self.dedup:
+                    self.dedup.kept(time.thread_time() - cpu_start)
                 
-                # Schedule UI update in main thread
-                self.root.after(0, self.display_image_from_queue)
+                # Newest frame wins, the next tick shows it
+                self.ui.set("frame", (image, original_size, complete_at))
                 
             except Exception as e:
                 print(f"❌ Error opening image: {e}")
-                self.root.after(0, self.update_status, f"Image error: {str(e)[:30]}", "red")
+                self.ui.set("status", (f"Image error: {str(e)[:30]}", "red"))
                 
         except Exception as e:
             print(f"❌ Error in process_image: {e}")
-            self.root.after(0, self.update_status, f"Processing error", "red")
+            self.ui.set("status", ("Processing error", "red"))
+    
+    def frame_done(self, complete_at=None):
+        self.images_received += 1
+        self.last_received_time = time.strftime("%H:%M:%S")
+        if self.count_frame:
+            self.count_frame()
+        if self.frame_histogram and complete_at is not None:
+            self.frame_histogram.observe(time.perf_counter() - complete_at)
     
-    def display_image_from_queue(self):
+    def display_image(self, frame):
+        # Bridge tick on the Tk thread, frames replaced before it were skipped
         try:
-            # Get image from queue
-            image = self.image_queue.get_nowait()
+            image, original_size, complete_at = frame
             
-            # Calculate display size
-            canvas_width = 600
-            canvas_height = 400
+            # Reuse the PhotoImage while the size stays the same, otherwise
+            # make a new one (only a pixel copy happens on the Tk thread)
+            photo = self.current_image
+            if (photo is None or photo.width() != image.size[0]
+                    or photo.height() != image.size[1]):
+                photo = ImageTk.PhotoImage(image)
+            else:
+                photo.paste(image)
             
-            # Calculate new size maintaining aspect ratio
-            original_width, original_height = image.size
-            ratio = min((canvas_width - 20) / original_width, (canvas_height - 20) / original_height)
-            new_size = (int(original_width * ratio), int(original_height * ratio))
-            
-            # Resize if needed
-            if new_size != image.size:
-                image = image.resize(new_size, Image.Resampling.LANCZOS)
-            
-            # Convert to PhotoImage for Tkinter
-            photo = ImageTk.PhotoImage(image)
-            
-            # Clear canvas and display new image
-            self.canvas.delete("all")
-            self.canvas.create_image(canvas_width // 2, canvas_height // 2, 
-                                    image=photo, anchor=tk.CENTER)
+            # Show it in the single canvas image item
+            if self.canvas_image_item is None:
+                self.canvas.delete("all")
+                self.canvas_image_item = self.canvas.create_image(
+                    self.canvas_width // 2, self.canvas_height // 2,
+                    image=photo, anchor=tk.CENTER)
+            else:
+                self.canvas.itemconfig(self.canvas_image_item, image=photo)
             
             # Keep reference to prevent garbage collection
             self.current_image = photo
             
+            # Frame-complete (IMG_END) to displayed latency
+            if complete_at is not None:
+                latency_ms = (time.perf_counter() - complete_at) * 1000
+                self.display_latency_ms = latency_ms
+                print(f"⏱️ IMG_END to display: {latency_ms:.1f} ms")
+            
             # Update status and stats
-            self.root.after(0, self.update_status, f"Image {self.images_received} received!", "green")
-            self.root.after(0, self.update_stats, 
-                          f"Status: Image {self.images_received} displayed\n"
-                          f"Images received: {self.images_received}\n"
-                          f"Last received: {self.last_received_time}\n"
-                          f"Image size: {image.size[0]}x{image.size[1]}")
+            self.update_status(f"Image {self.images_received} received!", "green")
+            self.update_stats(f"Status: Image {self.images_received} displayed\n"
+                              f"Images received: {self.images_received} | Skipped: {self.ui.frames_skipped}\n"
+                              f"Last received: {self.last_received_time}\n"
+                              f"Image size: {original_size[0]}x{original_size[1]} | "
+                              f"End-to-display: {self.display_latency_ms:.1f} ms")
             
-            print(f"✅ Image {self.images_received} displayed: {image.size}")
+            print(f"✅ Image {self.images_received} displayed: {original_size}")
             
-        except queue.Empty:
-            pass
         except Exception as e:
             print(f"❌ Error displaying image: {e}")
     
     def update_status(self, text, color="black"):
         self.status_label.config(text=text, foreground=color)
     
+    def apply_status(self, status):
+        self.update_status(*status)
+    
+    def apply_chunk(self, chunk):
+        # Latest chunk only, built here rather than for every chunk received
+        device, received, total_chunks, chunk_index, size = chunk
+        sessions = self.core.sessions
+        self.update_stats(f"Status: [{device}] Received {received}/{total_chunks} chunks\n"
+                          f"Images received: {self.images_received} | In flight: {len(sessions.sessions)} | "
+                          f"Dropped: {sessions.replaced + sessions.timed_out} | Evicted: {sessions.evicted}\n"
+                          f"Last received: {self.last_received_time}\n"
+                          f"Chunk {chunk_index}: {size} chars")
+    
     def update_progress(self, value):
         self.progress_var.set(value)
     
@@ -315,47 +329,227 @@ class MQTTImageReceiver:
         self.stats_text.config(state="disabled")
     
     def toggle_connection(self):
-        if not self.client.is_connected():
-            # Connect in separate thread
-            threading.Thread(target=self.connect_mqtt, daemon=True).start()
+        if self.replay_args:
+            if self.replayer is None:
+                self.connect_replay()
+                self.connect_button.config(text="Disconnect")
+            else:
+                self.replayer.stop()
+                self.replayer = None
+                self.connect_button.config(text="Connect")
+                self.update_status("Replay stopped", "red")
+            return
+        if self.use_daemon:
+            if self.ingest_client is None:
+                self.connect_daemon()
+                self.connect_button.config(text="Disconnect")
+            else:
+                self.ingest_client.stop()
+                self.ingest_client = None
+                self.connect_button.config(text="Connect")
+                self.update_status("Detached from ingest daemon", "red")
+            return
+        if self.receiver is None:
+            self.connect_mqtt()
             self.connect_button.config(text="Disconnect")
         else:
-            self.client.disconnect()
+            self.receiver.stop()
+            self.receiver = None
             self.connect_button.config(text="Connect")
             self.update_status("Disconnected", "red")
             self.update_progress(0)
     
     def connect_mqtt(self):
+        # Connects (and reconnects) on its own asyncio loop thread
+        print("🚀 Starting MQTT loop...")
+        self.receiver = AsyncReceiver(self.broker, self.port, self.core, self.command_topic,
+                                      binary_frames=self.binary_frames)
+        if self.recorder:
+            self.receiver.client.on_message = self.recorder.wrap(self.core.on_message)
+        self.receiver.start()
+    
+    def connect_replay(self):
+        # Same protocol core as the broker connection, fed from the log
+        self.replayer = open_replay(self.replay_args, self.core.on_message, topics=(self.topic + "/#",),
+                                    on_done=lambda: self.ui.set("status", ("Replay finished", "blue")))
+        self.ui.set("status", ("Replaying traffic log", "green"))
+        self.replayer.start()
+    
+    def connect_daemon(self):
+        from ingest_client import IngestClient
+        print("🔗 Attaching to the ingest daemon...")
+        self.ingest_client = IngestClient("pythonCatch", on_frame=self.on_daemon_frame,
+                                          on_status=self.on_daemon_status)
+        self.ingest_client.start()
+    
+    def on_daemon_status(self, connected):
+        if connected:
+            self.ui.set("status", ("Attached to ingest daemon", "green"))
+        else:
+            self.ui.set("status", ("Ingest daemon not running, retrying...", "red"))
+    
+    def on_daemon_frame(self, meta, image):
+        # Already decoded (and archived, with --archive) by the daemon: only
+        # the fit to the canvas is left, on the ingest client thread
+        if self.headless:
+            self.frame_done()
+            return
         try:
-            self.update_status("Connecting...", "orange")
-            print(f"🔗 Connecting to {self.broker}:{self.port}...")
-            self.client.connect(self.broker, self.port, 60)
-            print("🚀 Starting MQTT loop...")
-            self.client.loop_forever()
+            image = fit_to_canvas(image, self.canvas_width, self.canvas_height,
+                                  quality=self.resample_quality)
         except Exception as e:
-            print(f"❌ Connection error: {e}")
-            self.root.after(0, self.update_status, f"Error: {str(e)}", "red")
-            self.root.after(0, lambda: self.connect_button.config(text="Connect"))
+            print(f"❌ Error scaling daemon frame: {e}")
+            return
+        original_size = (meta["original_width"], meta["original_height"])
+        self.frame_done()
+        self.ui.set("frame", (image, original_size, None))
     
     def clear_image(self):
         self.canvas.delete("all")
+        self.canvas_image_item = None
         self.canvas.create_text(300, 200, text="No image received", font=("Arial", 12))
         self.current_image = None
         self.update_status("Image cleared", "black")
         self.update_progress(0)
     
+    def setup_metrics(self, port):
+        from metrics import MetricsRegistry, MetricsServer, add_process_metrics
+        registry = MetricsRegistry()
+        core = self.core
+        sessions = core.sessions
+        registry.counter("receiver_messages_total", "MQTT messages handled",
+                         function=lambda: core.messages)
+        registry.counter("receiver_frames_total", "Frames completed by the protocol and processed",
+                         label="stage", function=lambda: {"completed": core.frames_completed,
+                                                          "processed": self.images_received})
+        self.count_frame = registry.rate("receiver_frames_per_second",
+                                         "Processed frames per second over the last 10 s")
+        core.decode_histogram = registry.histogram("receiver_decode_seconds",
+                                                   "Decode left after the last chunk of a frame")
+        self.frame_histogram = registry.histogram("receiver_frame_seconds",
+                                                  "Last chunk to frame processed (pool, archive, display prep)")
+        registry.gauge("receiver_queue_depth", "Items waiting per queue", label="queue",
+                       function=lambda: {"frames": core.pending,
+                                         "archive": self.archive.pending.qsize() if self.archive else 0,
+                                         "video": self.video.pending.qsize() if self.video else 0,
+                                         "classifier": (self.host_classifier.input_queue.qsize()
+                                                        if self.host_classifier else 0)})
+        registry.gauge("receiver_sessions_in_flight", "Frames still being received",
+                       function=lambda: len(sessions.sessions))
+        registry.counter("receiver_dropped_total", "Frames or chunks lost, by reason", label="reason",
+                         function=lambda: {"replaced": sessions.replaced, "timeout": sessions.timed_out,
+                                           "evicted": sessions.evicted, "orphan_chunk": sessions.orphan_chunks,
+                                           "late_chunk": sessions.late_chunks,
+                                           "crc": core.crc_errors,
+                                           "archive": self.archive.dropped if self.archive else 0,
+                                           "archive_error": self.archive.failed if self.archive else 0,
+                                           "video": self.video.dropped if self.video else 0,
+                                           "video_error": self.video.failed if self.video else 0,
+                                           "display_skipped": self.ui.frames_skipped})
+        if self.retransmit:
+            retransmit = self.retransmit
+            registry.counter("receiver_retransmit_total", "Selective retransmission, by event", label="event",
+                             function=lambda: {"nack": retransmit.nacks_sent,
+                                               "recovered": retransmit.recovered,
+                                               "gave_up": retransmit.gave_up,
+                                               "resent_chunk": retransmit.resent_chunks})
+            registry.counter("receiver_resent_bytes_total", "Chunk bytes received again after a NACK",
+                             function=lambda: retransmit.resent_bytes)
+        if self.dedup:
+            self.dedup.register(registry)
+        if self.video:
+            video = self.video
+            registry.counter("receiver_video_bytes_total", "Bytes appended to the MJPEG recording",
+                             function=lambda: video.bytes_written)
+            registry.counter("receiver_video_segments_total", "MJPEG segments started",
+                             function=lambda: video.segments_started)
+        add_process_metrics(registry)
+        self.metrics_server = MetricsServer(registry, port).start()
+    
+    def report(self):
+        sessions = self.core.sessions
+        line = (f"📊 {self.images_received} frames | in flight {len(sessions.sessions)} | "
+                f"dropped {sessions.replaced + sessions.timed_out + sessions.evicted} | "
+                f"queued {self.core.pending}")
+        if self.retransmit:
+            retransmit = self.retransmit
+            line += (f" | NACKs {retransmit.nacks_sent}, recovered {retransmit.recovered}, "
+                     f"gave up {retransmit.gave_up}")
+        if self.dedup:
+            line += f" | {self.dedup.report()}"
+        if self.video:
+            line += f" | video {self.video.frames} frames in {self.video.segments_started} segments"
+        return line
+    
     def run(self):
-        # Start MQTT connection automatically
-        threading.Thread(target=self.connect_mqtt, daemon=True).start()
+        # Start MQTT connection (or attach to the daemon) automatically
+        if self.use_daemon:
+            self.connect_daemon()
+        elif self.replay_args:
+            self.connect_replay()
+        else:
+            self.connect_mqtt()
         
-        # Start the Tkinter main loop
-        self.root.mainloop()
+        if self.headless:
+            from headless import wait_for_shutdown
+            # A headless replay ends with the log
+            wait_for_shutdown(self.report, stop=self.replayer.done if self.replayer else None)
+        else:
+            # Start the Tkinter main loop
+            self.root.mainloop()
+        
+        # Window closed, flush frames still waiting to be archived
+        if self.metrics_server:
+            self.metrics_server.stop()
+        if self.ingest_client:
+            self.ingest_client.stop()
+        if self.receiver:
+            self.receiver.stop()
+        if self.replayer:
+            self.replayer.stop()
+        if self.recorder:
+            self.recorder.close()
+        self.core.close()
+        if self.host_classifier:
+            self.host_classifier.stop()
+        if self.archive:
+            self.archive.close()
+        if self.video:
+            self.video.close()
+        if self.headless:
+            print(self.report())
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ESP32-CAM image receiver")
+    parser.add_argument("--daemon", action="store_true",
+                        help="show frames from ingestDaemon/ingest_daemon.py instead of the broker")
+    parser.add_argument("--headless", action="store_true",
+                        help="no window: archive/record (and classify) frames only, Tk and PIL display are not loaded")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus-style metrics on http://127.0.0.1:<port>/metrics")
+    parser.add_argument("--nack-retries", type=int, default=3,
+                        help="NACKs per frame with missing chunks before giving up on it, 0 = never ask")
+    parser.add_argument("--archive", default=None, metavar="DIR",
+                        help="keep every frame in an image archive (pythonCommon/image_archive.py)")
+    parser.add_argument("--record-video", default=None, metavar="DIR",
+                        help="also append every frame to per-camera MJPEG AVI segments with a seek index")
+    add_dedup_arguments(parser)
+    add_replay_arguments(parser)
+    args = parser.parse_args()
+    
     print("🚀 Starting ESP32-CAM Image Receiver...")
-    print("📡 Subscribed to: test/esp32_to_python")
+    if args.daemon:
+        print("📡 Reading frames from the ingest daemon")
+    elif args.replay:
+        print(f"📼 Reading messages from {args.replay}")
+    else:
+        print("📡 Subscribed to: test/esp32_to_python/#")
     print("🎯 Waiting for images...")
     print("Press Ctrl+C to exit")
     
-    app = MQTTImageReceiver()
+    app = MQTTImageReceiver(use_daemon=args.daemon, headless=args.headless,
+                            metrics_port=args.metrics_port, nack_retries=args.nack_retries,
+                            record_path=args.record, replay_args=args if args.replay else None,
+                            video_root=args.record_video, dedup_bits=args.dedup,
+                            dedup_refresh=args.dedup_refresh, archive_root=args.archive)
     app.run()
\ No newline at end of file
@@ -0,0 +1,136 @@
+"""
+Selective retransmission: when chunks of a frame are missing, ask the
+camera for just those instead of decoding a corrupt image or waiting for
+the next whole frame.
+
+    PC -> test/python_to_esp32   NACK:<device>:<seq>:<bitmap>
+
+<bitmap> is hex, one bit per chunk, set for every chunk still missing
+(byte i holds chunks 8i..8i+7, lowest bit first, like ChunkAssembler's
+bitmap), so a 40-chunk frame with two holes costs a ~35-byte message.
+The camera (sketch.ino) keeps its last frame and republishes the marked
+chunks in the format it sent them in; they fill the open session like any
+other chunk.
+
+A frame is NACKed when
+- its IMG_END arrives with chunks missing (text chunks), or
+- it got no chunk for idle_s (binary chunks have no end marker, and an
+  IMG_END can be lost too)
+
+and NACKed again, with what is still missing, every retry_s * backoff**n
+until max_retries; then it is given up on the way the receiver did before
+(text frames decoded as they are, frames without an end dropped). A camera
+that ignores NACKs (older firmware) is left alone for deaf_s after two
+frames in a row got nothing back, so it costs the old behaviour plus one
+retry round, not a delay on every frame.
+"""
+
+
+def missing_bitmap(assembler):
+    """Hex bitmap of the chunks that have not arrived"""
+    total = assembler.total_chunks
+    bitmap = bytearray(~byte & 0xFF for byte in assembler.bitmap)
+    if total % 8:
+        bitmap[-1] &= (1 << (total % 8)) - 1
+    return bitmap.hex()
+
+
+def parse_nack(payload):
+    """NACK:<device>:<seq>:<bitmap> -> (device, seq, [chunk indexes]); used by the simulators"""
+    if isinstance(payload, bytes):
+        payload = payload.decode('ascii')
+    _, device, seq, bitmap = payload.split(":")
+    indexes = [byte_index * 8 + bit
+               for byte_index, byte in enumerate(bytes.fromhex(bitmap))
+               for bit in range(8) if byte & (1 << bit)]
+    return device, int(seq), indexes
+
+
+class Retransmitter:
+    """NACK bookkeeping for ReceiverCore; all calls on the receiver's loop thread"""
+
+    def __init__(self, publish, command_topic, retry_s=0.3, backoff=2.0, max_retries=3,
+                 idle_s=0.3, deaf_s=60.0):
+        self.publish = publish
+        self.command_topic = command_topic
+        self.retry_s = retry_s
+        self.backoff = backoff
+        self.max_retries = max_retries
+        self.idle_s = idle_s
+        self.deaf_s = deaf_s
+
+        # device -> frames in a row whose NACKs got no chunk back / ignored until
+        self.unanswered = {}
+        self.deaf_until = {}
+
+        # Counters
+        self.nacks_sent = 0
+        self.nack_bytes = 0
+        self.recovered = 0
+        self.gave_up = 0
+        self.resent_chunks = 0
+        self.resent_bytes = 0
+        self.recovery_seconds = []
+
+    def wanted(self, session, now):
+        """Should this incomplete session be NACKed (again) now?"""
+        if session.seq is None or self.max_retries <= 0:
+            # Legacy senders without a seq cannot be asked for a frame
+            return False
+        if session.nacks == 0:
+            if now < self.deaf_until.get(session.device, 0.0):
+                return False
+            return session.ended or now - session.last_seen >= self.idle_s
+        return now >= session.retry_at
+
+    def exhausted(self, session):
+        return session.nacks >= self.max_retries
+
+    def request(self, session, now):
+        """Publish a NACK for what the session still misses"""
+        payload = f"NACK:{session.device}:{session.seq}:{missing_bitmap(session.assembler)}"
+        self.publish(self.command_topic, payload)
+        if session.nacks == 0:
+            session.first_nack = now
+        session.nacks += 1
+        session.retry_at = now + self.retry_s * self.backoff ** (session.nacks - 1)
+        self.nacks_sent += 1
+        self.nack_bytes += len(payload)
+
+    def chunk_arrived(self, session, size, added):
+        """A chunk for a session that was NACKed"""
+        if not added:
+            return
+        self.resent_chunks += 1
+        self.resent_bytes += size
+        if not session.answered:
+            session.answered = True
+            self.unanswered.pop(session.device, None)
+            self.deaf_until.pop(session.device, None)
+
+    def recovered_frame(self, session, now):
+        self.recovered += 1
+        self.recovery_seconds.append(now - session.first_nack)
+        del self.recovery_seconds[:-1000]
+
+    def gave_up_on(self, session, now):
+        self.gave_up += 1
+        if session.answered:
+            return
+        misses = self.unanswered.get(session.device, 0) + 1
+        self.unanswered[session.device] = misses
+        if misses >= 2:
+            print(f"⚠️ [{session.device}] No chunks resent for 2 frames, not NACKing it for {self.deaf_s:.0f}s")
+            self.deaf_until[session.device] = now + self.deaf_s
+            self.unanswered[session.device] = 0
+
+    def stats(self):
+        recovery = sorted(self.recovery_seconds)
+        return {
+            "nacks_sent": self.nacks_sent,
+            "recovered": self.recovered,
+            "gave_up": self.gave_up,
+            "resent_chunks": self.resent_chunks,
+            "resent_bytes": self.resent_bytes,
+            "recovery_p50_ms": recovery[len(recovery) // 2] * 1000 if recovery else None,
+        }
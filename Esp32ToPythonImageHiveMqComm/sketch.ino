@@ -1,6 +1,7 @@
 #include "esp_camera.h"
 #include <WiFi.h>
 #include <PubSubClient.h>
+#include "rom/crc.h"
 
 // WiFi Settings
 const char* ssid = "Aryahiro";
@@ -36,6 +37,36 @@ const char* topic_python_sends = "test/python_to_esp32";
 WiFiClient espClient;
 PubSubClient client(espClient);
 
+// Each camera publishes on test/esp32_to_python/<deviceId> and numbers its
+// frames, so the Python receiver can reassemble several cameras at once
+String deviceId;
+String frameTopic;
+uint32_t frameSeq = 0;
+
+// The Python receiver announces "PROTO:BIN1" on test/python_to_esp32 when it
+// understands binary chunks (see binary_frames.py), "PROTO:TEXT" switches back
+bool useBinary = false;
+const uint8_t BIN_MAGIC0 = 0xE5;
+const uint8_t BIN_MAGIC1 = 0x32;
+const uint8_t BIN_VERSION = 1;
+const size_t BIN_HEADER_SIZE = 24;
+const size_t BIN_CHUNK_SIZE = 1000;
+uint8_t binChunk[BIN_HEADER_SIZE + BIN_CHUNK_SIZE];
+
+// The last frame is kept so chunks the receiver missed can be sent again:
+// "NACK:<deviceId>:<seq>:<hex bitmap>" marks them (bit i of byte i/8 = chunk
+// i, see retransmit.py) and loop() republishes just those
+const size_t TEXT_CHUNK_RAW = 750;  // 1000 base64 chars per IMG_CHUNK
+const int MAX_NACK_CHUNKS = 256;
+uint8_t* lastFrame = NULL;
+size_t lastFrameCapacity = 0;
+size_t lastFrameLen = 0;
+uint32_t lastFrameSeq = 0;
+bool lastFrameBinary = false;
+int lastTotalChunks = 0;
+uint8_t nackBitmap[MAX_NACK_CHUNKS / 8];
+bool nackPending = false;
+
 // Base64 encoding function
 String base64_encode(uint8_t* data, size_t length) {
   const char* base64_chars = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/";
@@ -115,6 +146,129 @@ void callback(char* topic, byte* message, unsigned int length) {
   Serial.print(topic);
   Serial.print("]: ");
   Serial.println(messageTemp);
+  
+  if (messageTemp == "PROTO:BIN1") {
+    useBinary = true;
+    Serial.println("Switching to binary frames");
+  } else if (messageTemp == "PROTO:TEXT") {
+    useBinary = false;
+    Serial.println("Switching to base64 text frames");
+  } else if (messageTemp.startsWith("NACK:")) {
+    parseNack(messageTemp);
+  }
+}
+
+// NACK:<deviceId>:<seq>:<hex bitmap>, only for this camera's last frame
+void parseNack(String nack) {
+  int deviceEnd = nack.indexOf(':', 5);
+  int seqEnd = nack.indexOf(':', deviceEnd + 1);
+  if (deviceEnd < 0 || seqEnd < 0) {
+    return;
+  }
+  if (nack.substring(5, deviceEnd) != deviceId) {
+    return;
+  }
+  uint32_t seq = strtoul(nack.substring(deviceEnd + 1, seqEnd).c_str(), NULL, 10);
+  if (seq != lastFrameSeq || lastFrameLen == 0) {
+    Serial.println("NACK for a frame that is no longer kept");
+    return;
+  }
+  
+  memset(nackBitmap, 0, sizeof(nackBitmap));
+  String hex = nack.substring(seqEnd + 1);
+  for (int i = 0; i + 1 < hex.length() && i / 2 < (int)sizeof(nackBitmap); i += 2) {
+    nackBitmap[i / 2] = strtoul(hex.substring(i, i + 2).c_str(), NULL, 16);
+  }
+  nackPending = true;
+}
+
+// Copy of the frame for retransmission, the camera gets its buffer back
+void keepFrame(camera_fb_t *fb, bool binary, int totalChunks) {
+  if (fb->len > lastFrameCapacity) {
+    uint8_t* grown = (uint8_t*)(psramFound() ? ps_realloc(lastFrame, fb->len) : realloc(lastFrame, fb->len));
+    if (!grown) {
+      lastFrameLen = 0;
+      return;
+    }
+    lastFrame = grown;
+    lastFrameCapacity = fb->len;
+  }
+  memcpy(lastFrame, fb->buf, fb->len);
+  lastFrameLen = fb->len;
+  lastFrameSeq = frameSeq;
+  lastFrameBinary = binary;
+  lastTotalChunks = totalChunks;
+  nackPending = false;
+}
+
+void putLE(uint8_t* p, uint32_t value, int bytes) {
+  for (int i = 0; i < bytes; i++) {
+    p[i] = (value >> (8 * i)) & 0xFF;
+  }
+}
+
+// One message per chunk: 24-byte header + raw JPEG bytes, no START/END markers
+bool publishBinaryChunk(uint8_t* frame, size_t frameLen, uint32_t seq, int i, int totalChunks) {
+  size_t offset = i * BIN_CHUNK_SIZE;
+  size_t length = min(BIN_CHUNK_SIZE, frameLen - offset);
+  
+  binChunk[0] = BIN_MAGIC0;
+  binChunk[1] = BIN_MAGIC1;
+  binChunk[2] = BIN_VERSION;
+  binChunk[3] = 0;  // flags
+  putLE(binChunk + 4, (uint32_t)ESP.getEfuseMac(), 4);
+  putLE(binChunk + 8, seq, 4);
+  putLE(binChunk + 12, i, 2);
+  putLE(binChunk + 14, totalChunks, 2);
+  putLE(binChunk + 16, frameLen, 4);
+  putLE(binChunk + 20, crc32_le(0, frame + offset, length), 4);
+  memcpy(binChunk + BIN_HEADER_SIZE, frame + offset, length);
+  
+  return client.publish(frameTopic.c_str(), binChunk, BIN_HEADER_SIZE + length);
+}
+
+void publishBinaryFrame(camera_fb_t *fb) {
+  int totalChunks = (fb->len + BIN_CHUNK_SIZE - 1) / BIN_CHUNK_SIZE;
+  frameSeq++;
+  
+  for (int i = 0; i < totalChunks; i++) {
+    if (!publishBinaryChunk(fb->buf, fb->len, frameSeq, i, totalChunks)) {
+      Serial.println("Failed to send chunk!");
+    }
+    client.loop();
+    delay(5);
+  }
+  Serial.printf("✅ Binary image sent: %d bytes in %d chunks\n", fb->len, totalChunks);
+  keepFrame(fb, true, totalChunks);
+}
+
+// Republish the chunks of the last frame a NACK asked for, in the format
+// the frame was sent in
+void resendChunks() {
+  nackPending = false;
+  int resent = 0;
+  
+  for (int i = 0; i < lastTotalChunks && i < MAX_NACK_CHUNKS; i++) {
+    if (!(nackBitmap[i / 8] & (1 << (i % 8)))) {
+      continue;
+    }
+    bool sent;
+    if (lastFrameBinary) {
+      sent = publishBinaryChunk(lastFrame, lastFrameLen, lastFrameSeq, i, lastTotalChunks);
+    } else {
+      size_t offset = i * TEXT_CHUNK_RAW;
+      String chunk = base64_encode(lastFrame + offset, min(TEXT_CHUNK_RAW, lastFrameLen - offset));
+      String chunkMsg = "IMG_CHUNK:" + String(lastFrameSeq) + ":" + String(i) + ":" + chunk;
+      sent = client.publish(frameTopic.c_str(), chunkMsg.c_str());
+    }
+    if (!sent) {
+      Serial.println("Failed to resend chunk!");
+    }
+    resent++;
+    client.loop();
+    delay(5);
+  }
+  Serial.printf("🔁 Resent %d chunks of image %u\n", resent, lastFrameSeq);
 }
 
 void reconnect() {
@@ -148,6 +302,8 @@ void setup() {
   Serial.println("LED ON (GPIO4)");
   
   setup_wifi();
+  deviceId = "cam-" + String((uint32_t)ESP.getEfuseMac(), HEX);
+  frameTopic = String(topic_esp32_sends) + "/" + deviceId;
   client.setServer(mqtt_server, mqtt_port);
   client.setCallback(callback);
   
@@ -204,6 +360,11 @@ void loop() {
   }
   client.loop();
   
+  // Chunks the receiver asked for again (set by callback)
+  if (nackPending && client.connected()) {
+    resendChunks();
+  }
+  
   static unsigned long lastCaptureTime = 0;
   unsigned long currentTime = millis();
   
@@ -223,7 +384,10 @@ void loop() {
     
     Serial.printf("✅ Captured %d bytes JPEG image\n", fb->len);
     
-    if (client.connected()) {
+    if (client.connected() && useBinary) {
+      publishBinaryFrame(fb);
+      
+    } else if (client.connected()) {
       Serial.println("📤 Encoding image to base64...");
       
       // Encode to base64
@@ -236,8 +400,9 @@ void loop() {
       Serial.printf("Base64 length: %d, Chunks: %d\n", base64Image.length(), totalChunks);
       
       // Send start marker
-      String startMsg = "IMG_START:" + String(fb->len) + ":" + String(totalChunks);
-      client.publish(topic_esp32_sends, startMsg.c_str());
+      frameSeq++;
+      String startMsg = "IMG_START:" + String(fb->len) + ":" + String(totalChunks) + ":" + String(frameSeq);
+      client.publish(frameTopic.c_str(), startMsg.c_str());
       delay(10);
       
       // Send chunks
@@ -245,9 +410,9 @@ void loop() {
         int startIdx = i * chunkSize;
         int endIdx = min((i + 1) * chunkSize, base64Image.length());
         String chunk = base64Image.substring(startIdx, endIdx);
-        String chunkMsg = "IMG_CHUNK:" + String(i) + ":" + chunk;
+        String chunkMsg = "IMG_CHUNK:" + String(frameSeq) + ":" + String(i) + ":" + chunk;
         
-        if (client.publish(topic_esp32_sends, chunkMsg.c_str())) {
+        if (client.publish(frameTopic.c_str(), chunkMsg.c_str())) {
           Serial.printf("Sent chunk %d/%d (%d bytes)\n", i + 1, totalChunks, chunk.length());
         } else {
           Serial.println("Failed to send chunk!");
@@ -258,8 +423,10 @@ void loop() {
       }
       
       // Send end marker
-      client.publish(topic_esp32_sends, "IMG_END");
+      String endMsg = "IMG_END:" + String(frameSeq);
+      client.publish(frameTopic.c_str(), endMsg.c_str());
       Serial.println("✅ Image sent successfully!");
+      keepFrame(fb, false, totalChunks);
       
     } else {
       Serial.println("❌ MQTT not connected");
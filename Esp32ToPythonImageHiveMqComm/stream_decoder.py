@@ -0,0 +1,93 @@
+"""
+Incremental helpers for frames that arrive as base64 chunks.
+
+Base64StreamDecoder decodes each chunk as soon as it is next in line and
+carries the 0-3 characters that don't fill a 4-char group over to the next
+chunk, so only the tail is left to decode when IMG_END arrives.
+
+JpegProbe looks at the decoded prefix as it grows and reports SOI validity
+and the image dimensions long before the frame is complete.
+"""
+
+import binascii
+
+# SOFn markers that carry the frame size (not DHT/JPG/DAC, which share the range)
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+               0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+class Base64StreamDecoder:
+    """Decodes base64 text chunk by chunk into a preallocated buffer"""
+
+    def __init__(self, out):
+        self.out = out
+        self.pos = 0
+        self.carry = b""
+
+    def write(self, decoded, pos=None):
+        pos = self.pos if pos is None else pos
+        # Never run past the size announced in IMG_START
+        end = min(pos + len(decoded), len(self.out))
+        self.out[pos:end] = decoded[:end - pos]
+        return end
+
+    def feed(self, chunk):
+        """Decode every complete 4-char group, keep the rest for the next chunk"""
+        data = self.carry + bytes(chunk) if self.carry else chunk
+        usable = len(data) - len(data) % 4
+        if usable:
+            self.pos = self.write(binascii.a2b_base64(data[:usable]))
+        self.carry = bytes(data[usable:])
+
+    def finish(self):
+        """Decode what is left after the last chunk, fixing missing padding"""
+        if self.carry:
+            tail = self.carry + b"=" * (-len(self.carry) % 4)
+            self.pos = self.write(binascii.a2b_base64(tail))
+            self.carry = b""
+        return self.pos
+
+
+class JpegProbe:
+    """Walks the JPEG marker segments of a growing buffer"""
+
+    def __init__(self):
+        self.soi_ok = None
+        self.width = None
+        self.height = None
+        self.pos = 2
+
+    def feed(self, data, available):
+        """Look at data[:available], returns True once the size is known"""
+        if self.width is not None:
+            return True
+        if self.soi_ok is None:
+            if available < 2:
+                return False
+            self.soi_ok = data[0] == 0xFF and data[1] == 0xD8
+        if not self.soi_ok:
+            return False
+
+        while self.pos + 4 <= available:
+            if data[self.pos] != 0xFF:
+                # Lost sync with the marker structure, give up quietly
+                self.pos = available + 1
+                return False
+            marker = data[self.pos + 1]
+            if marker in SOF_MARKERS:
+                if self.pos + 9 > available:
+                    return False
+                self.height = (data[self.pos + 5] << 8) | data[self.pos + 6]
+                self.width = (data[self.pos + 7] << 8) | data[self.pos + 8]
+                return True
+            if marker == 0xFF:
+                # Fill byte
+                self.pos += 1
+                continue
+            length = (data[self.pos + 2] << 8) | data[self.pos + 3]
+            self.pos += 2 + length
+        return False
+
+    @staticmethod
+    def eoi_ok(data, length):
+        return length >= 2 and data[length - 2] == 0xFF and data[length - 1] == 0xD9
@@ -0,0 +1,126 @@
+"""
+Serial video benchmark on a pty pair instead of an ESP32 (Linux/macOS).
+
+A writer thread plays clipBoxBottlerecog_ver2.ino: log lines, RESULT: lines
+and COBS JPEG frames (Trial1/images) interleaved on one port, optionally
+paced to a real baud rate. SerialIngest + FrameDecodeWorker read it the
+way ESP32CameraGUI does.
+
+    python Trial2/bench_serial_frames.py --frames 300 --baud 921600
+    python Trial2/bench_serial_frames.py --frames 1000 --baud 0 --corrupt 50
+"""
+
+import argparse
+import glob
+import os
+import queue
+import threading
+import time
+
+from serial_frames import FrameDecodeWorker, pack_frame
+from serial_ingest import SerialIngest
+from serial_loopback import PtyLoopback
+
+IMAGES_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Trial1", "images")
+
+RESULT_LINE = (b'RESULT:{"label":"bottle","confidence":0.9312,"anomaly":0.0000,'
+               b'"timing":{"dsp":12,"classification":143},"probabilities":[0.9312,0.0688]}\r\n')
+LOG_LINES = b"Predictions (DSP: 12 ms., Classification: 143 ms.): \r\n  bottle: 0.93120\r\n  clipBox: 0.06880\r\n"
+
+
+def load_jpegs():
+    paths = sorted(glob.glob(os.path.join(IMAGES_FOLDER, "**", "*.jpg"), recursive=True))
+    if not paths:
+        raise FileNotFoundError(f"No JPEGs found under {IMAGES_FOLDER}")
+    jpegs = []
+    for path in paths:
+        with open(path, "rb") as f:
+            jpegs.append(f.read())
+    return jpegs
+
+
+def build_stream(jpegs, frames, corrupt_every):
+    """[(bytes, is_frame)] in the order the sketch would write them"""
+    parts = []
+    for seq in range(frames):
+        frame = bytearray(pack_frame(seq, jpegs[seq % len(jpegs)]))
+        if corrupt_every and seq % corrupt_every == corrupt_every - 1:
+            frame[len(frame) // 2] ^= 0x5A
+        parts.append(bytes(frame))
+        if seq % 2 == 0:
+            parts.append(RESULT_LINE + LOG_LINES)
+    return parts
+
+
+def write_paced(loopback, parts, baud):
+    # 10 bits per byte on a UART (start + 8 data + stop)
+    seconds_per_byte = 10.0 / baud if baud else 0.0
+    start = time.perf_counter()
+    sent = 0
+    for part in parts:
+        loopback.write(part)
+        sent += len(part)
+        if seconds_per_byte:
+            wait = start + sent * seconds_per_byte - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="COBS serial video benchmark over a pty pair")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--baud", type=int, default=921600, help="pace the writer like a UART (0 = as fast as possible)")
+    parser.add_argument("--corrupt", type=int, default=0, help="damage every Nth frame (0 = none)")
+    args = parser.parse_args(argv)
+
+    jpegs = load_jpegs()
+    parts = build_stream(jpegs, args.frames, args.corrupt)
+    total_bytes = sum(map(len, parts))
+    expected_bad = args.frames // args.corrupt if args.corrupt else 0
+    print(f"📦 {args.frames} frames (mean {sum(map(len, jpegs)) / len(jpegs) / 1024:.1f} KB JPEG), "
+          f"{total_bytes / 1024:.0f} KB on the wire, baud {args.baud or 'unpaced'}")
+
+    loopback = PtyLoopback()
+    data_queue = queue.Queue()
+    frame_queue = queue.Queue()
+    worker = FrameDecodeWorker(frame_queue, 640, 480)
+    ingest = SerialIngest(loopback.port, args.baud or 921600, data_queue, on_frame=worker.submit)
+    ingest.start()
+
+    writer = threading.Thread(target=write_paced, args=(loopback, parts, args.baud), daemon=True)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    writer.start()
+
+    latencies = []
+    shown = 0
+    deadline = wall_start + 120
+    while time.perf_counter() < deadline:
+        try:
+            seq, image, original_size, received_at = frame_queue.get(timeout=0.2)
+        except queue.Empty:
+            if not writer.is_alive() and ingest.stats.frames + ingest.stats.frame_errors >= args.frames:
+                break
+            continue
+        shown += 1
+        latencies.append(time.perf_counter() - received_at)
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    ingest.stop()
+    worker.stop()
+    loopback.close()
+
+    stats = ingest.stats.snapshot()
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+    print(f"frames ok {stats['frames']}/{args.frames} | bad {stats['frame_errors']} (expected {expected_bad}) | "
+          f"lines {stats['lines']} | results {stats['results']}")
+    print(f"decoded {worker.decoded} | dropped (display behind) {worker.dropped} | shown {shown}")
+    print(f"{stats['frames'] / wall:.1f} fps received | {total_bytes / wall / 1024:.0f} KB/s | "
+          f"decode {worker.decode_seconds / max(worker.decoded, 1) * 1000:.2f} ms/frame | "
+          f"receive->decoded p50 {p50:.2f} ms | CPU {cpu / wall * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Serial ingest benchmark on a pty pair instead of an ESP32 (Linux/macOS).
+
+Compares the old read_serial loop (in_waiting spin + readline) with
+SerialIngest: CPU while idle, and lines/s + CPU under a burst of
+RESULT:/log lines like clipBoxBottlerecog_ver2.ino prints.
+
+    python Trial2/bench_serial_ingest.py --lines 50000 --idle 2
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+
+import serial
+
+from serial_ingest import SerialIngest
+from serial_loopback import PtyLoopback
+
+
+def sample_lines(count):
+    result = json.dumps({"label": "bottle", "confidence": 0.9312, "anomaly": 0.0,
+                         "timing": {"dsp": 12, "classification": 143},
+                         "probabilities": [0.9312, 0.0688]})
+    lines = []
+    for i in range(count):
+        if i % 4 == 0:
+            lines.append(b"RESULT:" + result.encode('utf-8') + b"\r\n")
+        else:
+            lines.append(b"Predictions (DSP: 12 ms., Classification: 143 ms.): \r\n")
+    return b"".join(lines)
+
+
+class LegacyReader:
+    """The old ESP32CameraGUI.read_serial, minus Tk"""
+
+    def __init__(self, port, baud, output_queue):
+        self.serial_port = serial.Serial(port, baud, timeout=1)
+        self.output_queue = output_queue
+        self.lines = 0
+        self.running = False
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.read_loop, daemon=True)
+        self.thread.start()
+
+    def read_loop(self):
+        while self.running:
+            try:
+                if self.serial_port.in_waiting:
+                    line = self.serial_port.readline().decode('utf-8', errors='ignore').strip()
+                    if line:
+                        self.lines += 1
+                        if line.startswith("RESULT:"):
+                            try:
+                                self.output_queue.put(('result', json.loads(line[7:])))
+                            except json.JSONDecodeError:
+                                pass
+                        else:
+                            self.output_queue.put(('log', line))
+            except (serial.SerialException, OSError):
+                break
+
+    def stop(self):
+        self.running = False
+        self.thread.join(timeout=2.0)
+        self.serial_port.close()
+
+
+def line_count(reader):
+    return reader.stats.lines if hasattr(reader, "stats") else reader.lines
+
+
+def run(name, factory, payload, expected, idle_seconds):
+    loopback = PtyLoopback()
+    output_queue = queue.Queue()
+    reader = factory(loopback.port, 921600, output_queue)
+    reader.start()
+
+    # Idle: nothing on the wire
+    cpu_start = time.process_time()
+    time.sleep(idle_seconds)
+    idle_cpu = (time.process_time() - cpu_start) / idle_seconds * 100
+
+    # Burst: write everything, wait until the reader has seen every line
+    writer = threading.Thread(target=loopback.write, args=(payload,), daemon=True)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    writer.start()
+    deadline = wall_start + 60
+    while line_count(reader) < expected and time.perf_counter() < deadline:
+        time.sleep(0.005)
+    wall = time.perf_counter() - wall_start
+    busy_cpu = (time.process_time() - cpu_start) / wall * 100
+
+    reader.stop()
+    loopback.close()
+    return {
+        "reader": name,
+        "idle_cpu": idle_cpu,
+        "lines": line_count(reader),
+        "lines_per_sec": line_count(reader) / wall,
+        "mb_per_sec": len(payload) / wall / (1024 * 1024),
+        "busy_cpu": busy_cpu,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serial ingest benchmark over a pty pair")
+    parser.add_argument("--lines", type=int, default=50000)
+    parser.add_argument("--idle", type=float, default=2.0, help="idle seconds measured before the burst")
+    args = parser.parse_args(argv)
+
+    payload = sample_lines(args.lines)
+    print(f"📦 {args.lines} lines, {len(payload) / 1024:.0f} KB per run")
+
+    results = [
+        run("legacy readline", LegacyReader, payload, args.lines, args.idle),
+        run("SerialIngest", SerialIngest, payload, args.lines, args.idle),
+    ]
+    print(f"{'reader':<16} {'idle cpu %':>10} {'lines':>7} {'lines/s':>9} {'MB/s':>6} {'busy cpu %':>10}")
+    for r in results:
+        print(f"{r['reader']:<16} {r['idle_cpu']:>10.1f} {r['lines']:>7} {r['lines_per_sec']:>9.0f} "
+              f"{r['mb_per_sec']:>6.1f} {r['busy_cpu']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -28,6 +28,7 @@
 #include "edge-impulse-sdk/dsp/image/image.hpp"
 
 #include "esp_camera.h"
+#include "rom/crc.h"
 
 // Select camera model - find more camera models in camera_pins.h file here
 // https://github.com/espressif/arduino-esp32/blob/master/libraries/ESP32/examples/Camera/CameraWebServer/camera_pins.h
@@ -92,6 +93,15 @@ String last_label = "N/A";
 float last_confidence = 0.0f;
 bool send_to_serial = true;  // Set to true to enable data output for Python GUI
 
+// JPEG frames for the GUI camera canvas, on the same port as the text log.
+// Frame on the wire: 0x00, COBS(type | seq | jpeg | crc32), 0x00 (see serial_frames.py)
+bool send_frames_to_serial = true;
+#define VIDEO_FRAMES_PER_INFERENCE  2   // extra frames are streamed without classifying them
+const uint8_t FRAME_JPEG = 1;
+uint16_t frame_seq = 0;
+static uint8_t cobs_block[255];
+static size_t cobs_len = 1;
+
 static camera_config_t camera_config = {
     .pin_pwdn = PWDN_GPIO_NUM,
     .pin_reset = RESET_GPIO_NUM,
@@ -137,7 +147,8 @@ static int ei_camera_get_data(size_t offset, size_t length, float *out_ptr);
 void setup()
 {
     // put your setup code here, to run once:
-    Serial.begin(115200);
+    // 921600 matches the GUI default, the CH340/CP2102 bridges handle it fine
+    Serial.begin(921600);
     Serial.println("Edge Impulse Inferencing Demo - Local GUI Version");
     
     if (ei_camera_init() == false) {
@@ -155,6 +166,55 @@ void setup()
     delay(2000);
 }
 
+// Streaming COBS encoder: never more than one 255-byte block in RAM
+static void cobs_put(uint8_t b) {
+    if (b == 0) {
+        cobs_block[0] = cobs_len;
+        Serial.write(cobs_block, cobs_len);
+        cobs_len = 1;
+        return;
+    }
+    cobs_block[cobs_len++] = b;
+    if (cobs_len == 255) {
+        cobs_block[0] = 255;
+        Serial.write(cobs_block, 255);
+        cobs_len = 1;
+    }
+}
+
+static void cobs_put_bytes(const uint8_t *data, size_t len) {
+    for (size_t i = 0; i < len; i++) {
+        cobs_put(data[i]);
+    }
+}
+
+static void send_jpeg_frame(const uint8_t *jpeg, size_t len) {
+    uint8_t header[3] = { FRAME_JPEG, (uint8_t)(frame_seq & 0xFF), (uint8_t)(frame_seq >> 8) };
+    frame_seq++;
+    uint32_t crc = crc32_le(0, header, sizeof(header));
+    crc = crc32_le(crc, jpeg, len);
+    uint8_t crc_bytes[4] = { (uint8_t)crc, (uint8_t)(crc >> 8), (uint8_t)(crc >> 16), (uint8_t)(crc >> 24) };
+
+    Serial.write((uint8_t)0x00);
+    cobs_len = 1;
+    cobs_put_bytes(header, sizeof(header));
+    cobs_put_bytes(jpeg, len);
+    cobs_put_bytes(crc_bytes, sizeof(crc_bytes));
+    cobs_block[0] = cobs_len;
+    Serial.write(cobs_block, cobs_len);
+    Serial.write((uint8_t)0x00);
+}
+
+// Capture and stream one frame without running the classifier
+static void stream_video_frame() {
+    camera_fb_t *fb = esp_camera_fb_get();
+    if (!fb) {
+        return;
+    }
+    send_jpeg_frame(fb->buf, fb->len);
+    esp_camera_fb_return(fb);
+}
+
 /**
 * @brief      Get data and run inferencing
 *
@@ -285,6 +345,13 @@ void loop()
 #endif
 
     free(snapshot_buf);
+
+    // Keep the video smooth between (slower) inferences
+    if (send_frames_to_serial) {
+        for (int i = 1; i < VIDEO_FRAMES_PER_INFERENCE; i++) {
+            stream_video_frame();
+        }
+    }
 }
 
 /**
@@ -349,6 +416,10 @@ bool ei_camera_capture(uint32_t img_width, uint32_t img_height, uint8_t *out_buf
         return false;
     }
 
+    if (send_frames_to_serial) {
+        send_jpeg_frame(fb->buf, fb->len);
+    }
+
     bool converted = fmt2rgb888(fb->buf, fb->len, PIXFORMAT_JPEG, out_buf);
     esp_camera_fb_return(fb);
 
@@ -1,14 +1,26 @@
-import tkinter as tk
-from tkinter import ttk, scrolledtext
-import serial
-import serial.tools.list_ports
-import threading
-import json
+import argparse
 import time
-from PIL import Image, ImageTk
-import io
+import os
 import queue
-import re
+import sys
+
+# Shared helpers live in pythonCommon/ at the repo root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pythonCommon"))
+
+# Window, serial and image modules, imported by load_display() when the GUI
+# starts (not on import or for --help)
+tk = ttk = serial = ImageTk = SerialIngest = FrameDecodeWorker = LogView = None
+
+def load_display():
+    global tk, ttk, serial, ImageTk, SerialIngest, FrameDecodeWorker, LogView
+    import tkinter as tk
+    from tkinter import ttk
+    import serial
+    import serial.tools.list_ports
+    from PIL import ImageTk
+    from serial_ingest import SerialIngest
+    from serial_frames import FrameDecodeWorker
+    from log_view import LogView
 
 class ESP32CameraGUI:
     def __init__(self, root):
@@ -17,9 +29,10 @@ class ESP32CameraGUI:
         self.root.geometry("1200x800")
         
         # Serial connection
-        self.serial_port = None
+        self.serial_ingest = None
         self.serial_connected = False
         self.data_queue = queue.Queue()
+        self.last_stats_time = 0.0
         
         # Current data
         self.current_label = "N/A"
@@ -28,9 +41,13 @@ class ESP32CameraGUI:
         self.current_timing = {"dsp": 0, "classification": 0}
         self.probabilities = []
         
-        # Camera feed placeholder
+        # Camera feed: JPEG frames from the serial port, decoded on a worker thread
         self.camera_image = None
         self.image_label = None
+        self.camera_image_item = None
+        self.frame_queue = queue.Queue()
+        self.frame_worker = None
+        self.frames_shown = 0
         
         self.setup_ui()
         
@@ -63,9 +80,10 @@ class ESP32CameraGUI:
         
         # Baud rate
         ttk.Label(control_frame, text="Baud Rate:").grid(row=2, column=0, sticky=tk.W, pady=5)
-        self.baud_var = tk.StringVar(value="115200")
+        self.baud_var = tk.StringVar(value="921600")
         self.baud_combo = ttk.Combobox(control_frame, textvariable=self.baud_var, 
-                                       values=["9600", "19200", "38400", "57600", "115200"], width=25)
+                                       values=["9600", "19200", "38400", "57600", "115200",
+                                               "230400", "460800", "921600", "1500000", "2000000"], width=25)
         self.baud_combo.grid(row=2, column=1, pady=5)
         
         # Connect button
@@ -107,6 +125,11 @@ class ESP32CameraGUI:
         self.timing_label = ttk.Label(control_frame, text="DSP: 0ms | Classification: 0ms")
         self.timing_label.grid(row=11, column=0, columnspan=2)
         
+        # Serial throughput (bytes/s, lines/s, parse errors)
+        ttk.Label(control_frame, text="Serial Throughput:", font=("Arial", 10)).grid(row=12, column=0, columnspan=2, pady=(10, 0))
+        self.serial_stats_label = ttk.Label(control_frame, text="0.0 KB/s | 0 lines/s | parse errors: 0")
+        self.serial_stats_label.grid(row=13, column=0, columnspan=2)
+        
         # Display Panel (Camera Feed)
         ttk.Label(display_frame, text="Camera Feed", font=("Arial", 12, "bold")).grid(row=0, column=0, pady=5)
         
@@ -115,8 +138,8 @@ class ESP32CameraGUI:
         self.image_canvas.grid(row=1, column=0, pady=10)
         
         # Placeholder text on canvas
-        self.image_canvas.create_text(320, 240, text="Camera feed will appear here", 
-                                      fill="white", font=("Arial", 14))
+        self.placeholder_text = self.image_canvas.create_text(320, 240, text="Camera feed will appear here", 
+                                                              fill="white", font=("Arial", 14))
         
         # Probability bars
         ttk.Label(display_frame, text="Class Probabilities", font=("Arial", 12, "bold")).grid(row=2, column=0, pady=(20, 5))
@@ -130,13 +153,14 @@ class ESP32CameraGUI:
         # Clear log button
         ttk.Button(log_frame, text="Clear Log", command=self.clear_log).grid(row=0, column=1, sticky=tk.E, pady=5)
         
-        # Log text area
-        self.log_text = scrolledtext.ScrolledText(log_frame, width=100, height=15, font=("Courier", 10))
-        self.log_text.grid(row=1, column=0, columnspan=2, pady=10)
-        self.log_text.configure(state='disabled')
+        # Log text area: the last 2000 lines, the whole session is in serial_log.txt
+        self.log_view = LogView(log_frame, max_lines=2000, history_path="serial_log.txt",
+                                width=100, height=15, font=("Courier", 10))
+        self.log_view.frame.grid(row=1, column=0, columnspan=2, pady=10)
         
-        # Start update loop
+        # Start update loops (video runs faster than the result/log loop)
         self.update_gui()
+        self.update_video()
         
     def refresh_ports(self):
         ports = [port.device for port in serial.tools.list_ports.comports()]
@@ -155,63 +179,46 @@ class ESP32CameraGUI:
         baud = int(self.baud_var.get())
         
         try:
-            self.serial_port = serial.Serial(port, baud, timeout=1)
+            # Reading, line splitting and RESULT: parsing run on the ingest thread,
+            # JPEG frames go on to the decode worker
+            self.frame_worker = FrameDecodeWorker(self.frame_queue, 640, 480)
+            self.serial_ingest = SerialIngest(port, baud, self.data_queue,
+                                              on_frame=self.frame_worker.submit)
             self.serial_connected = True
             self.connect_btn.config(text="Disconnect")
             self.status_label.config(text="Status: Connected", foreground="green")
             
-            # Start serial reading thread
-            self.serial_thread = threading.Thread(target=self.read_serial, daemon=True)
-            self.serial_thread.start()
+            self.serial_ingest.start()
             
             self.log_message(f"Connected to {port} at {baud} baud")
             
         except Exception as e:
+            if self.frame_worker:
+                self.frame_worker.stop()
+                self.frame_worker = None
             self.log_message(f"Connection failed: {str(e)}")
             
     def disconnect_serial(self):
-        if self.serial_port:
-            self.serial_port.close()
         self.serial_connected = False
+        if self.serial_ingest:
+            self.serial_ingest.stop()
+            self.serial_ingest = None
+        if self.frame_worker:
+            self.frame_worker.stop()
+            self.frame_worker = None
         self.connect_btn.config(text="Connect")
         self.status_label.config(text="Status: Disconnected", foreground="red")
         self.log_message("Disconnected")
         
-    def read_serial(self):
-        buffer = ""
-        while self.serial_connected:
-            try:
-                if self.serial_port.in_waiting:
-                    line = self.serial_port.readline().decode('utf-8', errors='ignore').strip()
-                    if line:
-                        # Check for JSON result
-                        if line.startswith("RESULT:"):
-                            json_str = line[7:]  # Remove "RESULT:" prefix
-                            try:
-                                data = json.loads(json_str)
-                                self.data_queue.put(('result', data))
-                                self.log_message(f"Result: {data['label']} ({data['confidence']:.2%})")
-                            except json.JSONDecodeError:
-                                self.log_message(f"Failed to parse JSON: {json_str}")
-                        else:
-                            # Regular log message
-                            self.data_queue.put(('log', line))
-                            
-            except Exception as e:
-                if self.serial_connected:  # Only log if we're supposed to be connected
-                    self.log_message(f"Serial read error: {str(e)}")
-                break
-                
-    def log_message(self, message):
+    def format_log(self, message):
         timestamp = time.strftime("%H:%M:%S")
-        formatted_message = f"[{timestamp}] {message}"
+        return f"[{timestamp}] {message}"
         
-        self.data_queue.put(('ui_log', formatted_message))
+    def log_message(self, message):
+        self.data_queue.put(('ui_log', self.format_log(message)))
         
     def clear_log(self):
-        self.log_text.configure(state='normal')
-        self.log_text.delete(1.0, tk.END)
-        self.log_text.configure(state='disabled')
+        self.log_view.clear()
         
     def update_gui(self):
         # Process queued data
@@ -220,10 +227,19 @@ class ESP32CameraGUI:
             
             if data_type == 'result':
                 self.process_result(data)
+                self.display_log(self.format_log(
+                    f"Result: {data.get('label', 'N/A')} ({data.get('confidence', 0.0):.2%})"))
+            elif data_type == 'error':
+                self.display_log(self.format_log(f"Serial read error: {data}"))
+                if self.serial_connected:
+                    self.disconnect_serial()
             elif data_type == 'log':
                 self.display_log(data)
             elif data_type == 'ui_log':
                 self.display_log(data)
+        
+        # All log lines of this tick in one insert
+        self.log_view.flush()
                 
         # Update UI elements
         self.confidence_bar['value'] = self.current_confidence
@@ -243,9 +259,44 @@ class ESP32CameraGUI:
         # Update probability bars
         self.draw_probability_bars()
         
+        # Serial throughput, once per second
+        now = time.monotonic()
+        if self.serial_ingest and now - self.last_stats_time >= 1.0:
+            self.last_stats_time = now
+            stats = self.serial_ingest.stats.snapshot()
+            self.serial_stats_label.config(
+                text=f"{stats['bytes_per_sec'] / 1024:.1f} KB/s | {stats['lines_per_sec']:.0f} lines/s | "
+                     f"{stats['frames_per_sec']:.1f} fps\n"
+                     f"parse errors: {stats['parse_errors']} | bad frames: {stats['frame_errors']}")
+        
         # Schedule next update
         self.root.after(100, self.update_gui)
         
+    def update_video(self):
+        # Only the newest decoded frame is worth drawing
+        latest = None
+        while True:
+            try:
+                latest = self.frame_queue.get_nowait()
+            except queue.Empty:
+                break
+        if latest is not None:
+            self.show_frame(latest[1])
+        self.root.after(15, self.update_video)
+        
+    def show_frame(self, image):
+        # Reuse the PhotoImage and the canvas item while the size stays the same
+        if self.camera_image is not None and (self.camera_image.width(), self.camera_image.height()) == image.size:
+            self.camera_image.paste(image)
+        else:
+            self.camera_image = ImageTk.PhotoImage(image)
+            if self.camera_image_item is None:
+                self.image_canvas.delete(self.placeholder_text)
+                self.camera_image_item = self.image_canvas.create_image(320, 240, image=self.camera_image)
+            else:
+                self.image_canvas.itemconfig(self.camera_image_item, image=self.camera_image)
+        self.frames_shown += 1
+        
     def process_result(self, data):
         self.current_label = data.get('label', 'N/A')
         self.current_confidence = data.get('confidence', 0.0)
@@ -254,10 +305,7 @@ class ESP32CameraGUI:
         self.probabilities = data.get('probabilities', [])
         
     def display_log(self, message):
-        self.log_text.configure(state='normal')
-        self.log_text.insert(tk.END, message + "\n")
-        self.log_text.see(tk.END)
-        self.log_text.configure(state='disabled')
+        self.log_view.append(message)
         
     def draw_probability_bars(self):
         self.probability_canvas.delete("all")
@@ -284,9 +332,12 @@ class ESP32CameraGUI:
                                                font=("Arial", 8))
 
 def main():
+    argparse.ArgumentParser(description="Trial2 serial classification monitor (pick the port in the window)").parse_args()
+    load_display()
     root = tk.Tk()
     app = ESP32CameraGUI(root)
     root.mainloop()
+    app.log_view.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+Binary JPEG frames on the same serial port as the text log.
+
+On the wire a frame is
+
+    0x00  COBS( type:u8 | seq:u16 | jpeg ... | crc32:u32 )  0x00
+
+all little-endian, CRC-32 over everything before it. COBS removes every
+0x00 from the frame body, and the text log never contains 0x00, so a zero
+byte always means "frame boundary" and a damaged frame costs at most that
+frame: the reader is back in sync at the next 0x00.
+
+FrameDecodeWorker turns the JPEGs into canvas-sized images off the Tk
+thread, keeping only the newest frames when the display can't keep up.
+"""
+
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+import zlib
+
+# Shared helpers live in pythonCommon/ at the repo root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pythonCommon"))
+from image_prep import prepare_for_canvas
+
+FRAME_JPEG = 1
+HEADER = struct.Struct("<BH")
+CRC = struct.Struct("<I")
+
+
+class FrameError(ValueError):
+    pass
+
+
+def cobs_encode(data):
+    """Encode data so it contains no 0x00 (used by the loopback bench)"""
+    out = bytearray()
+    block = bytearray()
+    for byte in data:
+        if byte == 0:
+            out.append(len(block) + 1)
+            out += block
+            block.clear()
+        else:
+            block.append(byte)
+            if len(block) == 254:
+                out.append(0xFF)
+                out += block
+                block.clear()
+    out.append(len(block) + 1)
+    out += block
+    return bytes(out)
+
+
+def cobs_decode(data):
+    """Undo cobs_encode, one slice per block rather than per byte"""
+    out = bytearray()
+    pos = 0
+    size = len(data)
+    while pos < size:
+        code = data[pos]
+        if code == 0:
+            raise FrameError("zero byte inside a COBS frame")
+        end = pos + code
+        if end > size:
+            raise FrameError("COBS block runs past the end of the frame")
+        out += data[pos + 1:end]
+        pos = end
+        if code < 0xFF and pos < size:
+            out.append(0)
+    return out
+
+
+def pack_frame(seq, jpeg, frame_type=FRAME_JPEG):
+    """The bytes the ESP32 writes for one frame, delimiters included"""
+    body = HEADER.pack(frame_type, seq & 0xFFFF) + bytes(jpeg)
+    body += CRC.pack(zlib.crc32(body))
+    return b"\x00" + cobs_encode(body) + b"\x00"
+
+
+def parse_frame(encoded):
+    """(type, seq, jpeg memoryview) from the bytes between two 0x00"""
+    body = cobs_decode(encoded)
+    if len(body) < HEADER.size + CRC.size:
+        raise FrameError("frame too short")
+    view = memoryview(body)
+    (crc,) = CRC.unpack_from(view, len(body) - CRC.size)
+    if zlib.crc32(view[:-CRC.size]) != crc:
+        raise FrameError("CRC mismatch")
+    frame_type, seq = HEADER.unpack_from(view)
+    return frame_type, seq, view[HEADER.size:-CRC.size]
+
+
+class FrameDecodeWorker:
+    """JPEG -> canvas-sized PIL image on its own thread, newest frames win"""
+
+    def __init__(self, output_queue, box_width=640, box_height=480, backlog=2):
+        self.output_queue = output_queue
+        self.box_width = box_width
+        self.box_height = box_height
+        self.input_queue = queue.Queue(maxsize=backlog)
+
+        self.decoded = 0
+        self.dropped = 0
+        self.errors = 0
+        self.decode_seconds = 0.0
+
+        self.thread = threading.Thread(target=self.decode_loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, seq, jpeg):
+        while True:
+            try:
+                self.input_queue.put_nowait((seq, jpeg, time.perf_counter()))
+                return
+            except queue.Full:
+                # A newer frame makes the oldest waiting one pointless
+                try:
+                    self.input_queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def decode_loop(self):
+        while True:
+            item = self.input_queue.get()
+            if item is None:
+                break
+            seq, jpeg, received_at = item
+            start = time.perf_counter()
+            try:
+                image, original_size = prepare_for_canvas(jpeg, self.box_width, self.box_height,
+                                                          margin=0)
+            except (OSError, ValueError):
+                self.errors += 1
+                continue
+            self.decode_seconds += time.perf_counter() - start
+            self.decoded += 1
+            self.output_queue.put((seq, image, original_size, received_at))
+
+    def stop(self):
+        while True:
+            try:
+                self.input_queue.put_nowait(None)
+                break
+            except queue.Full:
+                try:
+                    self.input_queue.get_nowait()
+                except queue.Empty:
+                    pass
+        self.thread.join(timeout=1.0)
@@ -0,0 +1,199 @@
+"""
+Serial reader thread for ESP32CameraGUI.
+
+Blocks in the OS until bytes arrive (no polling of in_waiting), then takes
+everything that is waiting in one read. Lines are split out of one growing
+bytearray that is trimmed once per read, and RESULT: JSON is parsed here,
+so the Tk thread only gets ready-made ('result', dict) / ('log', str) items.
+
+Binary JPEG frames (serial_frames.py) share the port with the text: a 0x00
+byte opens and closes a frame, everything else is log text. A "frame" that
+fails COBS or the CRC means the reader is out of phase (it started inside a
+frame, or a damaged frame shifted it): its closing 0x00 is taken as the
+opener of the next frame, so the next good frame puts it back in step.
+"""
+
+import json
+import threading
+import time
+
+import serial
+
+from serial_frames import FrameError, parse_frame
+
+
+class SerialStats:
+    """Counters plus rates since the previous snapshot()"""
+
+    def __init__(self):
+        self.bytes = 0
+        self.lines = 0
+        self.results = 0
+        self.parse_errors = 0
+        self.overflows = 0
+        self.frames = 0
+        self.frame_errors = 0
+        self.last_time = time.monotonic()
+        self.last_bytes = 0
+        self.last_lines = 0
+        self.last_frames = 0
+
+    def snapshot(self):
+        now = time.monotonic()
+        elapsed = max(now - self.last_time, 1e-6)
+        snap = {
+            "bytes": self.bytes,
+            "lines": self.lines,
+            "results": self.results,
+            "parse_errors": self.parse_errors,
+            "overflows": self.overflows,
+            "frames": self.frames,
+            "frame_errors": self.frame_errors,
+            "bytes_per_sec": (self.bytes - self.last_bytes) / elapsed,
+            "lines_per_sec": (self.lines - self.last_lines) / elapsed,
+            "frames_per_sec": (self.frames - self.last_frames) / elapsed,
+        }
+        self.last_time = now
+        self.last_bytes = self.bytes
+        self.last_lines = self.lines
+        self.last_frames = self.frames
+        return snap
+
+
+class SerialIngest:
+    def __init__(self, port, baud, output_queue, read_size=16384,
+                 max_line=65536, max_frame=512 * 1024, timeout=0.2, on_frame=None):
+        # A short timeout only bounds how long a disconnect takes,
+        # reads return as soon as data is there
+        self.serial_port = serial.Serial(port, baud, timeout=timeout)
+        self.output_queue = output_queue
+        self.read_size = read_size
+        self.max_line = max_line
+        self.max_frame = max_frame
+        # on_frame(seq, jpeg) is called on this thread for every good frame
+        self.on_frame = on_frame
+        self.pending = bytearray()
+        self.in_frame = False
+        self.stats = SerialStats()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.read_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        try:
+            # Wakes a read that is blocked in select()
+            self.serial_port.cancel_read()
+        except (AttributeError, serial.SerialException):
+            pass
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+        self.serial_port.close()
+
+    def read_loop(self):
+        while self.running:
+            try:
+                # Blocks until at least one byte is there, then takes the burst
+                waiting = self.serial_port.in_waiting
+                data = self.serial_port.read(min(max(waiting, 1), self.read_size))
+            except (serial.SerialException, OSError, TypeError) as e:
+                if self.running:
+                    self.output_queue.put(('error', str(e)))
+                break
+            if data:
+                self.feed(data)
+
+    def feed(self, data):
+        """Split lines and frames out of data, keep the unfinished tail"""
+        self.stats.bytes += len(data)
+        pending = self.pending
+        # Bytes before this were already searched and hold no boundary
+        scan = len(pending)
+        pending += data
+
+        start = 0
+        next_zero = pending.find(b"\x00", scan)
+        while True:
+            if self.in_frame:
+                if next_zero == -1:
+                    break
+                # An empty or bad frame means this zero opens the next one
+                # (resync)
+                if next_zero > start and self.handle_frame(pending[start:next_zero]):
+                    self.in_frame = False
+                start = next_zero + 1
+                next_zero = pending.find(b"\x00", start)
+                continue
+
+            limit = next_zero if next_zero != -1 else len(pending)
+            end = pending.find(b"\n", max(start, scan), limit)
+            if end != -1:
+                self.handle_line(pending[start:end])
+                start = end + 1
+                continue
+            if next_zero == -1:
+                break
+            if next_zero > start:
+                # Text cut off by a frame
+                self.handle_line(pending[start:next_zero])
+            self.in_frame = True
+            start = next_zero + 1
+            next_zero = pending.find(b"\x00", start)
+
+        if start:
+            # One trim per read instead of one per line
+            del pending[:start]
+
+        if len(pending) > (self.max_frame if self.in_frame else self.max_line):
+            # Noise without boundaries, don't let it grow forever
+            self.stats.overflows += 1
+            self.in_frame = False
+            del pending[:]
+
+    def handle_frame(self, encoded):
+        """True for a good frame"""
+        try:
+            frame_type, seq, jpeg = parse_frame(encoded)
+        except FrameError:
+            # Out of phase, this was the log text between two frames
+            if not self.handle_text(encoded):
+                self.stats.frame_errors += 1
+            return False
+        self.stats.frames += 1
+        if self.on_frame is not None:
+            self.on_frame(seq, jpeg)
+        return True
+
+    def handle_text(self, raw):
+        """Log lines, if raw is UTF-8 (a damaged JPEG practically never is)"""
+        try:
+            raw.decode('utf-8')
+        except UnicodeDecodeError:
+            return False
+        for line in raw.split(b"\n"):
+            self.handle_line(line)
+        return True
+
+    def handle_line(self, raw):
+        line = raw.decode('utf-8', errors='ignore').strip()
+        if not line:
+            return
+        self.stats.lines += 1
+
+        if line.startswith("RESULT:"):
+            json_str = line[7:]  # Remove "RESULT:" prefix
+            try:
+                data = json.loads(json_str)
+            except json.JSONDecodeError:
+                self.stats.parse_errors += 1
+                self.output_queue.put(('ui_log', f"Failed to parse JSON: {json_str}"))
+                return
+            self.stats.results += 1
+            self.output_queue.put(('result', data))
+        else:
+            # Regular log message
+            self.output_queue.put(('log', line))
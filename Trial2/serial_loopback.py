@@ -0,0 +1,29 @@
+"""
+Pseudo-terminal pair that stands in for the ESP32 on a USB serial port
+(Linux/macOS only). Whatever is written to the master side shows up on
+the slave side, which pyserial opens like a real /dev/ttyUSB0.
+"""
+
+import os
+import tty
+
+
+class PtyLoopback:
+    def __init__(self):
+        self.master, self.slave = os.openpty()
+        # Raw mode: no echo, no newline translation, bytes go through as-is
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            written = os.write(self.master, view)
+            view = view[written:]
+
+    def close(self):
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
@@ -33,6 +33,9 @@ const char* MQTT_BROKER = "broker.hivemq.com";
 const int MQTT_PORT = 1883;
 const char* TOPIC_CLASSIFICATION = "esp32/cam/classification";
 const char* TOPIC_STATUS = "esp32/cam/status";
+// Commands from the PC; TSYNC:<id> is answered on TOPIC_STATUS with millis()
+// so the PC can map capture_ms/publish_ms to its own clock (latency_trace.py)
+const char* TOPIC_COMMAND = "test/python_to_esp32";
 
 /* Camera Settings */
 #define FRAME_SIZE FRAMESIZE_QVGA  // 320x240 for Edge Impulse
@@ -45,6 +48,7 @@ PubSubClient mqttClient(wifiClient);
 uint8_t* inferenceBuffer = NULL;
 unsigned long lastInferenceTime = 0;
 String clientID;
+unsigned long frameSeq = 0;
 
 /* Generate unique client ID from MAC address */
 String generateClientID() {
@@ -126,12 +130,41 @@ void connectWiFi() {
   }
 }
 
+/* Answer a time sync request from the PC */
+void answerTimeSync(String requestId) {
+  StaticJsonDocument<160> doc;
+  doc["type"] = "time_sync";
+  doc["client_id"] = clientID;
+  doc["id"] = requestId;
+  doc["device_ms"] = millis();
+  
+  String jsonString;
+  serializeJson(doc, jsonString);
+  mqttClient.publish(TOPIC_STATUS, jsonString.c_str());
+}
+
+/* Incoming MQTT messages (only TOPIC_COMMAND is subscribed) */
+void mqttCallback(char* topic, byte* message, unsigned int length) {
+  String command;
+  for (unsigned int i = 0; i < length; i++) {
+    command += (char)message[i];
+  }
+  
+  // Other commands (e.g. the retained PROTO:... of pythonCatch) are not for this sketch
+  if (command.startsWith("TSYNC:")) {
+    answerTimeSync(command.substring(6));
+  }
+}
+
 /* Connect to MQTT */
 void connectMQTT() {
   Serial.print("Connecting to MQTT broker...");
   
   clientID = generateClientID();
   mqttClient.setServer(MQTT_BROKER, MQTT_PORT);
+  mqttClient.setCallback(mqttCallback);
+  // The classification JSON with capture_ms/publish_ms is over the 256-byte default
+  mqttClient.setBufferSize(512);
   
   int attempts = 0;
   while (!mqttClient.connected() && attempts < 10) {
@@ -141,6 +174,7 @@ void connectMQTT() {
       // Send connection status
       String statusMsg = "{\"status\":\"connected\",\"client_id\":\"" + clientID + "\"}";
       mqttClient.publish(TOPIC_STATUS, statusMsg.c_str());
+      mqttClient.subscribe(TOPIC_COMMAND);
       
     } else {
       Serial.print("failed, rc=");
@@ -176,6 +210,8 @@ void runInference() {
     Serial.println("Camera capture failed");
     return;
   }
+  unsigned long captureTime = millis();
+  frameSeq++;
   
   // Convert JPEG to RGB888
   if (!fmt2rgb888(fb->buf, fb->len, PIXFORMAT_JPEG, inferenceBuffer)) {
@@ -229,6 +265,8 @@ void runInference() {
   StaticJsonDocument<512> doc;
   doc["client_id"] = clientID;
   doc["timestamp"] = now;
+  doc["seq"] = frameSeq;
+  doc["capture_ms"] = captureTime;
   doc["label"] = bestLabel;
   doc["confidence"] = bestConfidence;
   doc["inference_time"] = result.timing.classification;
@@ -239,6 +277,8 @@ void runInference() {
     prob["label"] = String(ei_classifier_inferencing_categories[i]);
     prob["value"] = result.classification[i].value;
   }
+  // Last thing before the publish, serializing takes well under a millisecond
+  doc["publish_ms"] = millis();
   
   String jsonString;
   serializeJson(doc, jsonString);
@@ -280,7 +320,7 @@ void setup() {
   if (WiFi.status() == WL_CONNECTED) {
     connectMQTT();
   }
-
+  
   pinMode(4, OUTPUT);
   digitalWrite(4, HIGH);
   
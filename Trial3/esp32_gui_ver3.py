@@ -1,23 +1,45 @@
-import tkinter as tk
-from tkinter import ttk, scrolledtext
-import paho.mqtt.client as mqtt
+import argparse
 import json
-import threading
+import os
+import sys
 import time
+from collections import deque
 from datetime import datetime
 import queue
 
+# Shared helpers live in pythonCommon/ at the repo root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pythonCommon"))
+from detection_store import DetectionStore
+from rolling_stats import RollingStats
+from latency_trace import ClockSync, Tracer, now_ms
+from traffic_log import TrafficRecorder, add_replay_arguments, open_replay
+
+# Display modules, imported by load_display() only when a window is wanted
+tk = ttk = scrolledtext = LogView = None
+
+def load_display():
+    global tk, ttk, scrolledtext, LogView
+    import tkinter as tk
+    from tkinter import ttk, scrolledtext
+    from log_view import LogView
+
 class ClassificationGUI:
-    def __init__(self, root):
+    def __init__(self, root, use_daemon=False, metrics_port=None, trace_path=None,
+                 record_path=None, replay_args=None, max_fps=10):
+        # root=None runs headless: no widgets, messages still go to the
+        # detection store and the statistics, the log goes to stdout
         self.root = root
-        self.root.title("ESP32-CAM Classification Monitor")
-        self.root.geometry("1000x700")
+        self.headless = root is None
+        if not self.headless:
+            self.root.title("ESP32-CAM Classification Monitor")
+            self.root.geometry("1000x700")
         
         # MQTT Configuration
         self.broker = "broker.hivemq.com"
         self.port = 1883
         self.classification_topic = "esp32/cam/classification"
         self.status_topic = "esp32/cam/status"
+        self.command_topic = "test/python_to_esp32"
         
         # Data storage
         self.current_classification = {
@@ -28,25 +50,77 @@ class ClassificationGUI:
             "probabilities": []
         }
         self.message_count = 0
-        self.connected_devices = {}
+        self.invalid_messages = 0
+        
+        # Rates, quantiles and gaps per device and per label over the last
+        # minute, fed from on_message and read once a second by the GUI
+        self.stats = RollingStats(window_s=60)
+        self.last_stats_time = 0.0
+        
+        # Persistent detection history (written on a background thread)
+        self.store = DetectionStore("detections.db")
         
-        # Queues for thread-safe communication
+        # Queues for thread-safe communication. on_message runs on paho's
+        # network thread and never waits on the GUI: a full queue drops its
+        # oldest item (see offer)
         self.classification_queue = queue.Queue(maxsize=10)
         self.status_queue = queue.Queue(maxsize=10)
-        self.log_queue = queue.Queue(maxsize=50)
         
-        # MQTT client
+        # MQTT client, or a thin client of ingestDaemon/ingest_daemon.py
+        # when use_daemon is set (one broker connection for all viewers)
         self.mqtt_client = None
+        self.use_daemon = use_daemon
+        self.ingest_client = None
         self.connected = False
         
+        # --record appends the raw broker traffic to a traffic log, --replay
+        # reads one instead of the broker (pythonCommon/traffic_log.py)
+        self.recorder = TrafficRecorder(record_path) if record_path else None
+        self.replay_args = replay_args
+        self.replayer = None
+        
+        # Rendering: redraws are capped at max_fps and only the newest
+        # classification of each queue drain is drawn
+        if max_fps <= 0:
+            raise ValueError("max_fps must be > 0")
+        self.max_fps = max_fps
+        self.widget_state = {}
+        self.bar_items = []
+        self.bar_labels = None
+        self.raw_dirty = False
+        self.render_count = 0
+        self.coalesced_count = 0
+        # Traces of classifications evicted on the paho thread; the Tracer
+        # is only fed from the Tk thread, update_gui finishes them
+        self.evicted_traces = deque()
+        self.status_dropped = 0
+        self.render_time_avg = 0.0
+        self.render_time_max = 0.0
+        
+        # Capture -> screen latency per message (pythonCommon/latency_trace.py).
+        # The device clocks are synced over the broker connection, so with
+        # the ingest daemon (or from a replay) only the PC-side spans are traced
+        self.clock = None if use_daemon or replay_args else ClockSync(self.publish_command)
+        self.tracer = Tracer(self.clock)
+        self.trace_path = trace_path
+        
+        # Prometheus-style /metrics endpoint (pythonCommon/metrics.py)
+        self.parse_histogram = None
+        self.count_message = None
+        self.metrics_server = None
+        if metrics_port is not None:
+            self.setup_metrics(metrics_port)
+        
         # Setup UI
-        self.setup_ui()
+        if not self.headless:
+            self.setup_ui()
         
         # Connect to MQTT
         self.connect_mqtt()
         
         # Start GUI update loop
-        self.update_gui()
+        if not self.headless:
+            self.update_gui()
         
     def setup_ui(self):
         # Configure grid weights
@@ -78,6 +152,8 @@ class ClassificationGUI:
         # Main content (notebook for tabs)
         notebook = ttk.Notebook(main_frame)
         notebook.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
+        notebook.bind("<<NotebookTabChanged>>", lambda event: self.on_tab_changed())
+        self.notebook = notebook
         
         # Tab 1: Classification Results
         classification_frame = ttk.Frame(notebook)
@@ -149,18 +225,30 @@ class ClassificationGUI:
         self.count_label = ttk.Label(stats_grid, text="0", font=("Arial", 10, "bold"))
         self.count_label.grid(row=0, column=1, sticky=tk.W, pady=5, padx=20)
         
-        # Connected devices
-        ttk.Label(stats_grid, text="Connected Devices:", font=("Arial", 10)).grid(
+        # Devices heard from in the last minute
+        ttk.Label(stats_grid, text="Active Devices:", font=("Arial", 10)).grid(
             row=1, column=0, sticky=tk.W, pady=5, padx=5)
         self.devices_label = ttk.Label(stats_grid, text="0", font=("Arial", 10, "bold"))
         self.devices_label.grid(row=1, column=1, sticky=tk.W, pady=5, padx=20)
         
-        # Update frequency
-        ttk.Label(stats_grid, text="Update Frequency:", font=("Arial", 10)).grid(
+        # Message rate over the last minute
+        ttk.Label(stats_grid, text="Message Rate:", font=("Arial", 10)).grid(
             row=2, column=0, sticky=tk.W, pady=5, padx=5)
-        self.freq_label = ttk.Label(stats_grid, text="0 Hz", font=("Arial", 10))
+        self.freq_label = ttk.Label(stats_grid, text="0.0 msg/s", font=("Arial", 10))
         self.freq_label.grid(row=2, column=1, sticky=tk.W, pady=5, padx=20)
         
+        # Render time
+        ttk.Label(stats_grid, text="Render Time:", font=("Arial", 10)).grid(
+            row=3, column=0, sticky=tk.W, pady=5, padx=5)
+        self.render_label = ttk.Label(stats_grid, text="0.0 ms", font=("Arial", 10))
+        self.render_label.grid(row=3, column=1, sticky=tk.W, pady=5, padx=20)
+        
+        # Device capture -> result on screen
+        ttk.Label(stats_grid, text="Capture to Screen:", font=("Arial", 10)).grid(
+            row=4, column=0, sticky=tk.W, pady=5, padx=5)
+        self.latency_label = ttk.Label(stats_grid, text="-", font=("Arial", 10))
+        self.latency_label.grid(row=4, column=1, sticky=tk.W, pady=5, padx=20)
+        
         # Controls
         btn_frame = ttk.Frame(stats_frame)
         btn_frame.pack(fill=tk.X, pady=(10, 0))
@@ -172,17 +260,37 @@ class ClassificationGUI:
         raw_frame = ttk.Frame(notebook)
         notebook.add(raw_frame, text="Raw Data")
         
+        self.raw_frame = raw_frame
         self.raw_text = scrolledtext.ScrolledText(raw_frame, font=("Courier", 10))
         self.raw_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         self.raw_text.configure(state='disabled')
         
-        # Tab 3: Log
+        # Tab 3: Per-device / per-label statistics (refreshed while shown)
+        series_frame = ttk.Frame(notebook)
+        notebook.add(series_frame, text="Statistics")
+        self.series_frame = series_frame
+        
+        columns = ("rate", "count", "inf_p50", "inf_p95", "inf_p99", "inf_ewma",
+                   "conf_p50", "conf_p95", "gap_p95", "long_gaps")
+        headings = ("msg/s", "last 60 s", "inference p50", "p95", "p99", "EWMA",
+                    "confidence p50", "p95", "gap p95", "gaps > 5 s")
+        self.series_tree = ttk.Treeview(series_frame, columns=columns, height=15)
+        self.series_tree.heading("#0", text="Series")
+        self.series_tree.column("#0", width=160)
+        for column, heading in zip(columns, headings):
+            self.series_tree.heading(column, text=heading)
+            self.series_tree.column(column, width=80, anchor=tk.E)
+        self.series_tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.series_rows = {}
+        
+        # Tab 4: Log
         log_frame = ttk.Frame(notebook)
         notebook.add(log_frame, text="Event Log")
         
-        self.log_text = scrolledtext.ScrolledText(log_frame, font=("Courier", 9))
-        self.log_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        self.log_text.configure(state='disabled')
+        # Bounded: the last 2000 events, older ones are paged in from disk
+        self.log_view = LogView(log_frame, max_lines=2000, history_path="trial3_events.log",
+                                font=("Courier", 9))
+        self.log_view.frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
         # Footer
         footer_frame = ttk.Frame(main_frame)
@@ -191,75 +299,179 @@ class ClassificationGUI:
         ttk.Label(footer_frame, text=f"Broker: {self.broker}:{self.port} | Topic: {self.classification_topic}", 
                  font=("Arial", 9)).pack(side=tk.LEFT)
         
-        # Frequency calculation
-        self.last_update_time = time.time()
-        self.update_count = 0
-        
     # MQTT Callbacks
     def on_connect(self, client, userdata, flags, rc, properties=None):
         if rc == 0:
             self.connected = True
-            self.status_indicator.itemconfig(1, fill="green")
-            self.status_label.config(text="Connected", foreground="green")
+            self.show_connection("Connected", "green")
             self.log_message("Connected to MQTT broker")
             
             # Subscribe to topics
             client.subscribe(self.classification_topic)
             client.subscribe(self.status_topic)
+            # Our own TSYNC requests come back too: PC <-> broker round trip
+            client.subscribe(self.command_topic)
             self.log_message(f"Subscribed to {self.classification_topic}")
             
         else:
             self.connected = False
-            self.status_indicator.itemconfig(1, fill="red")
-            self.status_label.config(text=f"Failed (rc={rc})", foreground="red")
+            self.show_connection(f"Failed (rc={rc})", "red")
             self.log_message(f"Connection failed with code: {rc}")
     
+    def show_connection(self, text, color):
+        # Called on the MQTT thread, the widgets are changed on the Tk thread
+        if self.headless:
+            return
+        self.root.after(0, self.set_connection_widgets, text, color)
+    
+    def set_connection_widgets(self, text, color):
+        self.status_indicator.itemconfig(1, fill=color)
+        self.status_label.config(text=text, foreground=color)
+    
     def on_message(self, client, userdata, msg):
         try:
+            received = now_ms()
+            if msg.topic == self.command_topic:
+                if self.clock:
+                    self.clock.on_echo(msg.payload, received)
+                return
+            
+            start = time.perf_counter()
             payload = msg.payload.decode('utf-8')
             data = json.loads(payload)
+            if self.parse_histogram:
+                self.parse_histogram.observe(time.perf_counter() - start)
             
             if msg.topic == self.classification_topic:
-                self.classification_queue.put(data)
+                trace = self.tracer.begin(data, received)
+                trace.mark("parsed")
+                self.store.add(data)
+                if self.headless:
+                    self.tracer.finish(trace)
+                else:
+                    trace.mark("render_scheduled")
+                    oldest = self.offer(self.classification_queue, (data, trace))
+                    if oldest is not None:
+                        # Overwritten before the GUI got to it, like a
+                        # coalesced redraw
+                        self.coalesced_count += 1
+                        self.evicted_traces.append(oldest[1])
                 self.message_count += 1
-                
-                # Update device connection time
-                client_id = data.get('client_id', 'unknown')
-                self.connected_devices[client_id] = time.time()
+                self.stats.add_message(data)
+                if self.count_message:
+                    self.count_message()
                 
             elif msg.topic == self.status_topic:
-                self.status_queue.put(data)
+                if data.get('type') == 'time_sync':
+                    if self.clock:
+                        self.clock.on_reply(data, received)
+                elif self.headless:
+                    self.handle_status(data)
+                elif self.offer(self.status_queue, data) is not None:
+                    self.status_dropped += 1
                 
         except json.JSONDecodeError:
+            self.invalid_messages += 1
             self.log_message("Invalid JSON received")
         except Exception as e:
             self.log_message(f"Error processing message: {e}")
     
-    def on_disconnect(self, client, userdata, rc, properties=None):
+    def offer(self, q, item):
+        """Put without blocking, dropping the oldest item when the queue is
+        full. Returns the dropped item or None"""
+        dropped = None
+        while True:
+            try:
+                q.put_nowait(item)
+                return dropped
+            except queue.Full:
+                try:
+                    dropped = q.get_nowait()
+                except queue.Empty:
+                    pass
+    
+    def on_disconnect(self, client, userdata, flags, rc, properties=None):
         self.connected = False
-        self.status_indicator.itemconfig(1, fill="red")
-        self.status_label.config(text="Disconnected", foreground="red")
+        self.show_connection("Disconnected", "red")
         self.log_message("Disconnected from MQTT broker")
     
     def connect_mqtt(self):
         """Connect to MQTT broker"""
+        if self.use_daemon:
+            self.connect_daemon()
+            return
+        if self.replay_args:
+            self.connect_replay()
+            return
         self.log_message(f"Connecting to {self.broker}:{self.port}...")
         
         try:
+            # paho is only loaded for a broker connection (not --daemon or --replay)
+            import paho.mqtt.client as mqtt
             self.mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, 
                                           client_id=f"gui-{int(time.time())}")
             self.mqtt_client.on_connect = self.on_connect
-            self.mqtt_client.on_message = self.on_message
+            self.mqtt_client.on_message = (self.recorder.wrap(self.on_message) if self.recorder
+                                           else self.on_message)
             self.mqtt_client.on_disconnect = self.on_disconnect
             
             self.mqtt_client.connect(self.broker, self.port, keepalive=60)
             self.mqtt_client.loop_start()
+            if self.clock.thread is None:
+                self.clock.start()
             
         except Exception as e:
             self.log_message(f"Connection error: {e}")
     
+    def connect_daemon(self):
+        """Read classifications from the local ingest daemon's shared memory"""
+        from ingest_client import IngestClient
+        self.log_message("Attaching to the ingest daemon...")
+        self.ingest_client = IngestClient("trial3-gui", on_message=self.on_message,
+                                          on_status=self.on_daemon_status,
+                                          topics=(self.classification_topic, self.status_topic))
+        self.ingest_client.start()
+    
+    def connect_replay(self):
+        """Read classifications from a traffic log instead of the broker"""
+        self.replayer = open_replay(self.replay_args, self.on_message,
+                                    topics=(self.classification_topic, self.status_topic),
+                                    on_done=lambda: self.log_message("Replay finished"))
+        self.connected = True
+        self.show_connection("Replaying", "green")
+        self.log_message(f"Replaying {self.replay_args.replay}")
+        self.replayer.start()
+    
+    def on_daemon_status(self, connected):
+        # Called on the ingest client thread
+        if self.headless:
+            self.connected = connected
+            self.log_message("Attached to the ingest daemon" if connected
+                             else "Ingest daemon not running, retrying...")
+            return
+        self.root.after(0, self.show_daemon_status, connected)
+    
+    def show_daemon_status(self, connected):
+        self.connected = connected
+        color = "green" if connected else "red"
+        self.status_indicator.itemconfig(1, fill=color)
+        self.status_label.config(text="Ingest daemon" if connected else "Daemon not running",
+                                 foreground=color)
+        self.log_message("Attached to the ingest daemon" if connected
+                         else "Ingest daemon not running, retrying...")
+    
     def reconnect_mqtt(self):
         """Reconnect to MQTT broker"""
+        if self.use_daemon:
+            # The ingest client reattaches by itself
+            self.log_message("Using the ingest daemon, nothing to reconnect")
+            return
+        if self.replay_args:
+            # Play the log again from the start (or --seek)
+            if self.replayer:
+                self.replayer.stop()
+            self.connect_replay()
+            return
         self.log_message("Reconnecting to MQTT...")
         
         if self.mqtt_client:
@@ -269,29 +481,44 @@ class ClassificationGUI:
         
         self.connect_mqtt()
     
+    def publish_command(self, topic, payload):
+        # Called by the clock sync thread; requests while offline are skipped
+        if self.mqtt_client and self.connected:
+            self.mqtt_client.publish(topic, payload)
+    
     def log_message(self, message):
         """Add message to log"""
         timestamp = datetime.now().strftime("%H:%M:%S")
         formatted = f"[{timestamp}] {message}"
-        self.log_queue.put(formatted)
+        if self.headless:
+            print(formatted)
+            return
+        # Safe from any thread, shown on the next GUI tick
+        self.log_view.append(formatted)
     
     def clear_stats(self):
         """Clear statistics"""
         self.message_count = 0
-        self.connected_devices = {}
+        self.stats.clear()
         self.log_message("Statistics cleared")
     
+    def set_widget(self, widget, **options):
+        """Configure a widget only if the options differ from the last call"""
+        if self.widget_state.get(widget) != options:
+            widget.config(**options)
+            self.widget_state[widget] = options
+    
     def update_probability_bars(self, probabilities):
-        """Update probability bars on canvas"""
-        self.prob_canvas.delete("all")
-        
-        if not probabilities:
-            return
-        
+        """Update probability bars on canvas, moving existing items in place"""
         # Get canvas dimensions
         canvas_width = self.prob_canvas.winfo_width()
         canvas_height = self.prob_canvas.winfo_height()
         
+        if not probabilities:
+            self.prob_canvas.delete("all")
+            self.bar_labels = None
+            return
+        
         if canvas_width < 10:
             return
         
@@ -306,139 +533,299 @@ class ClassificationGUI:
                 labels.append(f"Class {len(labels)}")
                 values.append(float(prob))
         
+        # Only rebuild the items when the set of classes changes
+        if labels != self.bar_labels:
+            self.prob_canvas.delete("all")
+            self.bar_items = []
+            for label in labels:
+                if len(label) > 8:
+                    label = label[:6] + "..."
+                bar = self.prob_canvas.create_rectangle(0, 0, 0, 0, outline="black")
+                value_text = self.prob_canvas.create_text(0, 0, font=("Arial", 8))
+                label_text = self.prob_canvas.create_text(0, 0, text=label,
+                                                          font=("Arial", 8), angle=45)
+                self.bar_items.append((bar, value_text, label_text))
+            self.bar_labels = labels
+        
         num_bars = len(values)
         bar_width = (canvas_width - 40) / num_bars
         max_val = max(values) if values else 1.0
         
-        # Draw bars
-        for i, (label, value) in enumerate(zip(labels, values)):
+        for i, value in enumerate(values):
+            bar, value_text, label_text = self.bar_items[i]
             x0 = i * bar_width + 20
             x1 = (i + 1) * bar_width + 15
             height = (value / max_val) * (canvas_height - 80) if max_val > 0 else 0
             
             # Bar color
-            color = "#4CAF50" if value == max(values) else "#2196F3"
+            color = "#4CAF50" if value == max_val else "#2196F3"
             
-            # Draw bar
-            self.prob_canvas.create_rectangle(x0, canvas_height - 60 - height,
-                                               x1, canvas_height - 60,
-                                               fill=color, outline="black")
-            
-            # Draw value
-            self.prob_canvas.create_text((x0 + x1) / 2, canvas_height - 65 - height,
-                                          text=f"{value:.2f}", font=("Arial", 8))
-            
-            # Draw label (rotated for readability)
-            if len(label) > 8:
-                label = label[:6] + "..."
-            self.prob_canvas.create_text((x0 + x1) / 2, canvas_height - 40,
-                                          text=label, font=("Arial", 8), angle=45)
+            self.prob_canvas.coords(bar, x0, canvas_height - 60 - height,
+                                    x1, canvas_height - 60)
+            self.prob_canvas.itemconfig(bar, fill=color)
+            self.prob_canvas.coords(value_text, (x0 + x1) / 2, canvas_height - 65 - height)
+            self.prob_canvas.itemconfig(value_text, text=f"{value:.2f}")
+            self.prob_canvas.coords(label_text, (x0 + x1) / 2, canvas_height - 40)
+    
+    def on_tab_changed(self):
+        self.render_raw_data()
+        # Fill the statistics table right away instead of on the next second
+        self.last_stats_time = 0.0
+    
+    def render_raw_data(self):
+        """Serialise the raw JSON only when the Raw Data tab is actually shown"""
+        if not self.raw_dirty or self.notebook.select() != str(self.raw_frame):
+            return
+        self.raw_text.configure(state='normal')
+        self.raw_text.delete(1.0, tk.END)
+        self.raw_text.insert(tk.END, json.dumps(self.current_classification, indent=2))
+        self.raw_text.configure(state='disabled')
+        self.raw_dirty = False
+    
+    def render_stats(self, snapshot):
+        overall = snapshot["all"]
+        active = sum(1 for series in snapshot["devices"].values()
+                     if series["age_s"] is not None and series["age_s"] < self.stats.window_s)
+        self.set_widget(self.count_label,
+                        text=f"{self.message_count} ({overall['window_count']} in the last minute)")
+        self.set_widget(self.devices_label, text=str(active))
+        self.set_widget(self.freq_label,
+                        text=f"{overall['rate']:.1f} msg/s (gaps > {self.stats.gap_threshold_s:.0f} s: "
+                             f"{overall['long_gaps']})")
+        end_to_end = self.tracer.quantiles().get("end_to_end")
+        if end_to_end:
+            self.set_widget(self.latency_label,
+                            text=f"p50 {end_to_end[0.5]:.0f} ms, p95 {end_to_end[0.95]:.0f} ms")
+        
+        # The table is only filled while its tab is shown
+        if self.notebook.select() != str(self.series_frame):
+            return
+        rows = [("all", "All messages", overall)]
+        rows += [(f"device:{key}", f"device {key}", series) for key, series in snapshot["devices"].items()]
+        rows += [(f"label:{key}", f"label {key}", series) for key, series in snapshot["labels"].items()]
+        
+        def ms(value):
+            return "-" if value is None else f"{value:.0f} ms"
+        
+        def pct(value):
+            return "-" if value is None else f"{value:.0%}"
+        
+        def seconds(value):
+            return "-" if value is None else f"{value:.2f} s"
+        
+        seen = set()
+        for iid, name, series in rows:
+            seen.add(iid)
+            values = (f"{series['rate']:.2f}", series["window_count"],
+                      ms(series["inference_p50"]), ms(series["inference_p95"]),
+                      ms(series["inference_p99"]), ms(series["inference_ewma"]),
+                      pct(series["confidence_p50"]), pct(series["confidence_p95"]),
+                      seconds(series["gap_p95"]), series["long_gaps"])
+            if iid not in self.series_rows:
+                self.series_tree.insert("", tk.END, iid=iid, text=name, values=values)
+            elif self.series_rows[iid] != values:
+                self.series_tree.item(iid, values=values)
+            self.series_rows[iid] = values
+        for iid in list(self.series_rows):
+            if iid not in seen:
+                self.series_tree.delete(iid)
+                del self.series_rows[iid]
+    
+    def render_classification(self, data):
+        """Draw one classification, skipping widgets whose value did not change"""
+        start = time.perf_counter()
+        
+        label = data.get('label', 'N/A')
+        confidence = data.get('confidence', 0.0)
+        inference_time = data.get('inference_time', 0)
+        client_id = data.get('client_id', 'N/A')
+        timestamp = data.get('timestamp', 0)
+        probabilities = data.get('probabilities', [])
+        
+        # Color code based on confidence
+        if confidence > 0.7:
+            color = "green"
+        elif confidence > 0.4:
+            color = "orange"
+        else:
+            color = "red"
+        
+        self.set_widget(self.prediction_label, text=label, foreground=color)
+        if self.confidence_var.get() != confidence:
+            self.confidence_var.set(confidence)
+        self.set_widget(self.confidence_text, text=f"{confidence*100:.1f}%")
+        self.set_widget(self.inference_label, text=f"{inference_time} ms")
+        self.set_widget(self.device_label, text=client_id)
+        
+        if timestamp:
+            dt = datetime.fromtimestamp(timestamp/1000)
+            self.set_widget(self.timestamp_label, text=dt.strftime("%Y-%m-%d %H:%M:%S"))
+        
+        self.update_probability_bars(probabilities)
+        
+        self.raw_dirty = True
+        self.render_raw_data()
+        
+        # Render-time metrics (moving average and worst case)
+        elapsed = (time.perf_counter() - start) * 1000
+        self.render_count += 1
+        self.render_time_avg += (elapsed - self.render_time_avg) * 0.1
+        self.render_time_max = max(self.render_time_max, elapsed)
+        self.set_widget(self.render_label,
+                        text=f"{self.render_time_avg:.1f} ms (max {self.render_time_max:.1f}, "
+                             f"skipped {self.coalesced_count})")
     
     def update_gui(self):
         """Update GUI elements"""
-        # Update statistics
-        self.count_label.config(text=str(self.message_count))
-        self.devices_label.config(text=str(len(self.connected_devices)))
-        
-        # Calculate update frequency
-        current_time = time.time()
-        self.update_count += 1
-        
-        if current_time - self.last_update_time >= 1.0:
-            freq = self.update_count / (current_time - self.last_update_time)
-            self.freq_label.config(text=f"{freq:.1f} Hz")
-            self.last_update_time = current_time
-            self.update_count = 0
-        
-        # Process classification queue
+        # Statistics, once a second from a snapshot (never blocks on_message)
+        now = time.monotonic()
+        if now - self.last_stats_time >= 1.0:
+            self.last_stats_time = now
+            self.render_stats(self.stats.snapshot())
+        
+        # Never drawn: traced up to render_scheduled only
+        while self.evicted_traces:
+            self.tracer.finish(self.evicted_traces.popleft())
+        
+        # Process classification queue - only the newest message is drawn
+        latest = None
         try:
             while not self.classification_queue.empty():
-                data = self.classification_queue.get_nowait()
-                self.current_classification = data
-                
-                # Update UI
-                label = data.get('label', 'N/A')
-                confidence = data.get('confidence', 0.0)
-                inference_time = data.get('inference_time', 0)
-                client_id = data.get('client_id', 'N/A')
-                timestamp = data.get('timestamp', 0)
-                probabilities = data.get('probabilities', [])
-                
-                # Update prediction
-                self.prediction_label.config(text=label)
-                
-                # Update confidence
-                self.confidence_var.set(confidence)
-                self.confidence_text.config(text=f"{confidence*100:.1f}%")
-                
-                # Color code based on confidence
-                if confidence > 0.7:
-                    self.prediction_label.config(foreground="green")
-                elif confidence > 0.4:
-                    self.prediction_label.config(foreground="orange")
-                else:
-                    self.prediction_label.config(foreground="red")
-                
-                # Update other info
-                self.inference_label.config(text=f"{inference_time} ms")
-                self.device_label.config(text=client_id)
-                
-                if timestamp:
-                    dt = datetime.fromtimestamp(timestamp/1000)
-                    self.timestamp_label.config(text=dt.strftime("%Y-%m-%d %H:%M:%S"))
-                
-                # Update probability bars
-                self.update_probability_bars(probabilities)
-                
-                # Update raw data view
-                self.raw_text.configure(state='normal')
-                self.raw_text.delete(1.0, tk.END)
-                self.raw_text.insert(tk.END, json.dumps(data, indent=2))
-                self.raw_text.configure(state='disabled')
-                
+                if latest is not None:
+                    self.coalesced_count += 1
+                    # Never drawn: traced up to render_scheduled only
+                    self.tracer.finish(latest[1])
+                latest = self.classification_queue.get_nowait()
         except queue.Empty:
             pass
         
+        if latest is not None:
+            data, trace = latest
+            self.current_classification = data
+            self.render_classification(data)
+            # Idle callbacks run in order, so this one runs after the redraw
+            # the widget changes above queued
+            self.root.after_idle(self.finish_trace, trace)
+        
         # Process status queue
         try:
             while not self.status_queue.empty():
-                data = self.status_queue.get_nowait()
-                status = data.get('status', '')
-                client_id = data.get('client_id', 'unknown')
-                
-                if status == 'connected':
-                    self.log_message(f"Device connected: {client_id}")
-                elif status == 'disconnected':
-                    self.log_message(f"Device disconnected: {client_id}")
-                    
+                self.handle_status(self.status_queue.get_nowait())
         except queue.Empty:
             pass
         
-        # Process log queue
-        try:
-            while not self.log_queue.empty():
-                log_msg = self.log_queue.get_nowait()
-                self.log_text.configure(state='normal')
-                self.log_text.insert(tk.END, log_msg + "\n")
-                self.log_text.see(tk.END)
-                self.log_text.configure(state='disabled')
-                
-        except queue.Empty:
-            pass
+        # New log lines, one insert per tick
+        self.log_view.flush()
         
-        # Schedule next update
-        self.root.after(100, self.update_gui)
+        # Schedule next update (this also caps the redraw rate)
+        self.root.after(int(1000 / self.max_fps), self.update_gui)
+    
+    def finish_trace(self, trace):
+        trace.mark("rendered")
+        self.tracer.finish(trace)
+    
+    def handle_status(self, data):
+        status = data.get('status', '')
+        client_id = data.get('client_id', 'unknown')
+        
+        if status == 'connected':
+            self.log_message(f"Device connected: {client_id}")
+            # millis() restarted on a reboot, sync the new device clock now
+            if self.clock:
+                self.clock.resync()
+        elif status == 'disconnected':
+            self.log_message(f"Device disconnected: {client_id}")
+    
+    def setup_metrics(self, port):
+        from metrics import MetricsRegistry, MetricsServer, add_process_metrics
+        registry = MetricsRegistry()
+        registry.counter("receiver_messages_total", "Classification messages received",
+                         function=lambda: self.message_count)
+        self.count_message = registry.rate("receiver_messages_per_second",
+                                           "Classification messages per second over the last 10 s")
+        registry.gauge("receiver_device_messages_per_second", "Messages per second per device (last minute)",
+                       label="device", function=lambda: {device: series["rate"] for device, series
+                                                         in self.stats.snapshot()["devices"].items()})
+        self.parse_histogram = registry.histogram("receiver_decode_seconds", "UTF-8 + JSON decode per message")
+        registry.gauge("receiver_queue_depth", "Items waiting per queue", label="queue",
+                       function=lambda: {"classification": self.classification_queue.qsize(),
+                                         "status": self.status_queue.qsize(),
+                                         "store": self.store.pending.qsize()})
+        registry.counter("receiver_dropped_total", "Messages lost, by reason", label="reason",
+                         function=lambda: {"invalid_json": self.invalid_messages,
+                                           "store": self.store.dropped,
+                                           "store_error": self.store.failed,
+                                           "store_bad_row": self.store.bad_rows,
+                                           "render_skipped": self.coalesced_count,
+                                           "status_overflow": self.status_dropped})
+        registry.gauge("receiver_connected", "1 while connected to the broker or the ingest daemon",
+                       function=lambda: int(self.connected))
+        self.tracer.register(registry)
+        add_process_metrics(registry)
+        self.metrics_server = MetricsServer(registry, port).start()
+    
+    def report(self):
+        snapshot = self.stats.snapshot()
+        return (f"📊 {self.message_count} messages | {snapshot['all']['rate']:.1f} msg/s | "
+                f"{len(snapshot['devices'])} devices | invalid {self.invalid_messages} | "
+                f"store dropped {self.store.dropped} failed {self.store.failed}\n{self.tracer.report()}")
     
     def on_closing(self):
         """Clean shutdown"""
+        if self.metrics_server:
+            self.metrics_server.stop()
+        if self.clock:
+            self.clock.stop()
+        if self.trace_path:
+            self.tracer.export_chrome(self.trace_path)
+        if self.ingest_client:
+            self.ingest_client.stop()
+        if self.replayer:
+            self.replayer.stop()
         if self.mqtt_client:
             self.mqtt_client.disconnect()
             self.mqtt_client.loop_stop()
+        if self.recorder:
+            self.recorder.close()
+        self.store.close()
+        if self.headless:
+            return
+        self.log_view.close()
         self.root.destroy()
 
 def main():
+    parser = argparse.ArgumentParser(description="ESP32-CAM classification monitor")
+    parser.add_argument("--daemon", action="store_true",
+                        help="read from ingestDaemon/ingest_daemon.py instead of the broker")
+    parser.add_argument("--headless", action="store_true",
+                        help="no window: store and count classifications only, Tk is not loaded")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus-style metrics on http://127.0.0.1:<port>/metrics")
+    parser.add_argument("--trace", default=None, metavar="PATH",
+                        help="on exit, write the latency traces as a Chrome trace (open in ui.perfetto.dev)")
+    parser.add_argument("--max-fps", type=float, default=10.0,
+                        help="redraws per second at most, newer classifications replace older ones (default 10)")
+    add_replay_arguments(parser)
+    args = parser.parse_args()
+    if args.max_fps <= 0:
+        parser.error("--max-fps must be > 0")
+    replay_args = args if args.replay else None
+    
+    if args.headless:
+        from headless import wait_for_shutdown
+        app = ClassificationGUI(None, use_daemon=args.daemon, metrics_port=args.metrics_port,
+                                trace_path=args.trace, record_path=args.record, replay_args=replay_args)
+        # A headless replay ends with the log
+        wait_for_shutdown(app.report, stop=app.replayer.done if app.replayer else None)
+        app.on_closing()
+        print(app.report())
+        return
+    
+    load_display()
     root = tk.Tk()
-    app = ClassificationGUI(root)
+    app = ClassificationGUI(root, use_daemon=args.daemon, metrics_port=args.metrics_port,
+                            trace_path=args.trace, record_path=args.record, replay_args=replay_args,
+                            max_fps=args.max_fps)
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
     root.mainloop()
 
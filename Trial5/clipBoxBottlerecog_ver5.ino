@@ -33,6 +33,9 @@ const char* MQTT_BROKER = "broker.hivemq.com";
 const int MQTT_PORT = 1883;
 const char* TOPIC_CLASSIFICATION = "esp32/cam/classification";
 const char* TOPIC_STATUS = "esp32/cam/status";
+// Commands from the PC; TSYNC:<id> is answered on TOPIC_STATUS with millis()
+// so the PC can map capture_ms/publish_ms to its own clock (latency_trace.py)
+const char* TOPIC_COMMAND = "test/python_to_esp32";
 
 /* Camera Settings */
 #define FRAME_SIZE FRAMESIZE_QVGA  // 320x240
@@ -47,6 +50,8 @@ uint8_t* inferenceBuffer = NULL;
 unsigned long lastInferenceTime = 0;
 unsigned long lastStatusTime = 0;
 String clientID;
+unsigned long frameSeq = 0;
+String pendingCommand;  // set by mqttCallback, handled in processMQTTCommands()
 
 /* Function Declarations (Forward Declarations) */
 String generateClientID();
@@ -57,6 +62,7 @@ void sendStatusMessage(String status, String ip = "");
 void runInference();
 void publishStatus();
 void processMQTTCommands();
+void mqttCallback(char* topic, byte* message, unsigned int length);
 
 /* Generate unique client ID from MAC address */
 String generateClientID() {
@@ -162,6 +168,9 @@ void connectMQTT() {
   
   clientID = generateClientID(); // create a unique name for this specific board (e.g., esp32-D1A5)
   mqttClient.setServer(MQTT_BROKER, MQTT_PORT);
+  mqttClient.setCallback(mqttCallback);
+  // The classification JSON with capture_ms/publish_ms is over the 256-byte default
+  mqttClient.setBufferSize(512);
   
   int attempts = 0;
   while (!mqttClient.connected() && attempts < 10) {
@@ -170,6 +179,7 @@ void connectMQTT() {
       
       // Send connection status
       sendStatusMessage("connected", WiFi.localIP().toString());
+      mqttClient.subscribe(TOPIC_COMMAND);
       
     } else {
       Serial.print("failed, rc=");
@@ -181,10 +191,36 @@ void connectMQTT() {
   }
 }
 
+/* Keep the last command from TOPIC_COMMAND (mqttClient.loop() delivers at most one per call) */
+void mqttCallback(char* topic, byte* message, unsigned int length) {
+  pendingCommand = "";
+  for (unsigned int i = 0; i < length; i++) {
+    pendingCommand += (char)message[i];
+  }
+}
+
 /* Process MQTT commands */
 void processMQTTCommands() {
-  // Example: You can add command processing here
-  // if you want to control the ESP32 via MQTT
+  if (pendingCommand.length() == 0) {
+    return;
+  }
+  String command = pendingCommand;
+  pendingCommand = "";
+  
+  // TSYNC:<id> - answer with millis() so the PC can map capture_ms/publish_ms
+  // to its own clock (pythonCommon/latency_trace.py)
+  if (command.startsWith("TSYNC:")) {
+    StaticJsonDocument<160> doc;
+    doc["type"] = "time_sync";
+    doc["client_id"] = clientID;
+    doc["id"] = command.substring(6);
+    doc["device_ms"] = millis();
+    
+    String jsonString;
+    serializeJson(doc, jsonString);
+    mqttClient.publish(TOPIC_STATUS, jsonString.c_str());
+  }
+  // Other commands (e.g. the retained PROTO:... of pythonCatch) are ignored
 }
 
 /* Run Edge Impulse Inference */
@@ -212,6 +248,8 @@ void runInference() {
     Serial.println("Camera capture failed");
     return;
   }
+  unsigned long captureTime = millis();
+  frameSeq++;
   
   // Convert JPEG to RGB888
   if (!fmt2rgb888(fb->buf, fb->len, PIXFORMAT_JPEG, inferenceBuffer)) {
@@ -265,6 +303,8 @@ void runInference() {
   StaticJsonDocument<512> doc;
   doc["client_id"] = clientID;
   doc["timestamp"] = now;
+  doc["seq"] = frameSeq;
+  doc["capture_ms"] = captureTime;
   doc["label"] = bestLabel;
   doc["confidence"] = bestConfidence;
   doc["inference_time"] = result.timing.classification;
@@ -275,6 +315,8 @@ void runInference() {
     prob["label"] = String(ei_classifier_inferencing_categories[i]);
     prob["value"] = result.classification[i].value;
   }
+  // Last thing before the publish, serializing takes well under a millisecond
+  doc["publish_ms"] = millis();
   
   String jsonString;
   serializeJson(doc, jsonString);
@@ -2,15 +2,30 @@
 Simple ESP32-CAM Viewer (No matplotlib required)
 """
 
-import tkinter as tk
-from tkinter import ttk, scrolledtext
-import paho.mqtt.client as mqtt
+import argparse
 import json
+import os
+import sys
 from datetime import datetime
 import threading
 
+# Shared helpers live in pythonCommon/ at the repo root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pythonCommon"))
+from detection_store import DetectionStore
+from latency_trace import ClockSync, Tracer, now_ms
+from traffic_log import TrafficRecorder, add_replay_arguments, open_replay
+
+# Display modules, imported by load_display() when the window opens (not for --help)
+tk = ttk = scrolledtext = LogView = None
+
+def load_display():
+    global tk, ttk, scrolledtext, LogView
+    import tkinter as tk
+    from tkinter import ttk, scrolledtext
+    from log_view import LogView
+
 class SimpleViewer:
-    def __init__(self, root):
+    def __init__(self, root, use_daemon=False, trace_path=None, record_path=None, replay_args=None):
         self.root = root
         self.root.title("ESP32-CAM Viewer")
         self.root.geometry("900x700")
@@ -26,6 +41,29 @@ class SimpleViewer:
         self.mqtt_broker = "broker.hivemq.com"
         self.mqtt_port = 1883
         self.topic = "esp32/cam/classification"
+        self.status_topic = "esp32/cam/status"
+        self.command_topic = "test/python_to_esp32"
+        self.mqtt_client = None
+        
+        # Read from ingestDaemon/ingest_daemon.py instead of the broker
+        self.use_daemon = use_daemon
+        self.ingest_client = None
+        
+        # --record appends the raw broker traffic to a traffic log, --replay
+        # reads one instead of the broker (pythonCommon/traffic_log.py)
+        self.recorder = TrafficRecorder(record_path) if record_path else None
+        self.replay_args = replay_args
+        self.replayer = None
+        
+        # Every detection is kept on disk, the Treeview only shows the last 10
+        self.store = DetectionStore("detections.db")
+        
+        # Capture -> screen latency (pythonCommon/latency_trace.py); device
+        # clocks are synced over the broker, not through the ingest daemon
+        # or in a replay
+        self.clock = None if use_daemon or replay_args else ClockSync(self.publish_command)
+        self.tracer = Tracer(self.clock)
+        self.trace_path = trace_path
         
         # Setup UI
         self.setup_ui()
@@ -135,15 +173,35 @@ class SimpleViewer:
         log_card = ttk.LabelFrame(main_container, text="System Log", padding="10")
         log_card.pack(fill=tk.X, pady=(20, 0))
         
-        self.log_text = scrolledtext.ScrolledText(log_card, height=4, state='disabled')
-        self.log_text.pack(fill=tk.BOTH)
+        # Bounded log, flushed every 100 ms; the session history is in trial5_events.log
+        self.log_view = LogView(log_card, max_lines=1000, history_path="trial5_events.log",
+                                auto_flush_ms=100, height=4)
+        self.log_view.frame.pack(fill=tk.BOTH)
         
     def connect_mqtt(self):
+        if self.use_daemon:
+            from ingest_client import IngestClient
+            self.log("Attaching to the ingest daemon...")
+            self.ingest_client = IngestClient("trial5-viewer", on_message=self.on_message,
+                                              on_status=self.on_daemon_status,
+                                              topics=(self.topic,))
+            self.ingest_client.start()
+            return
+        if self.replay_args:
+            self.replayer = open_replay(self.replay_args, self.on_message, topics=(self.topic,),
+                                        on_done=lambda: self.root.after(0, self.log, "Replay finished"))
+            self.update_status(True)
+            self.log(f"Replaying {self.replay_args.replay}")
+            self.replayer.start()
+            return
+        
         self.log("Connecting to MQTT broker...")
         
-        self.mqtt_client = mqtt.Client()
+        # paho is only loaded for a broker connection (not --daemon or --replay)
+        import paho.mqtt.client as mqtt
+        self.mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
         self.mqtt_client.on_connect = self.on_connect
-        self.mqtt_client.on_message = self.on_message
+        self.mqtt_client.on_message = self.recorder.wrap(self.on_message) if self.recorder else self.on_message
         
         # Start in background thread
         thread = threading.Thread(target=self.mqtt_thread, daemon=True)
@@ -156,19 +214,49 @@ class SimpleViewer:
         except Exception as e:
             self.root.after(0, self.log, f"MQTT error: {str(e)}")
             
-    def on_connect(self, client, userdata, flags, rc):
+    def on_connect(self, client, userdata, flags, rc, properties=None):
         if rc == 0:
             self.root.after(0, self.update_status, True)
             client.subscribe(self.topic)
+            # Time sync replies, and our own requests back (PC <-> broker round trip)
+            client.subscribe(self.status_topic)
+            client.subscribe(self.command_topic)
+            if self.clock.thread is None:
+                self.clock.start()
             self.root.after(0, self.log, "Connected to MQTT broker")
         else:
             self.root.after(0, self.update_status, False)
             self.root.after(0, self.log, f"Connection failed with code {rc}")
             
+    def on_daemon_status(self, connected):
+        self.root.after(0, self.update_status, connected)
+        self.root.after(0, self.log, "Attached to the ingest daemon" if connected
+                        else "Ingest daemon not running, retrying...")
+            
+    def publish_command(self, topic, payload):
+        # Called by the clock sync thread
+        if self.mqtt_client and self.mqtt_client.is_connected():
+            self.mqtt_client.publish(topic, payload)
+            
     def on_message(self, client, userdata, msg):
         try:
+            received = now_ms()
+            if msg.topic == self.command_topic:
+                self.clock.on_echo(msg.payload, received)
+                return
             data = json.loads(msg.payload.decode())
-            self.root.after(0, self.update_display, data)
+            if msg.topic == self.status_topic:
+                if data.get('type') == 'time_sync':
+                    self.clock.on_reply(data, received)
+                elif data.get('status') == 'connected':
+                    # A (re)booted device restarts millis(), sync it now
+                    self.clock.resync()
+                return
+            trace = self.tracer.begin(data, received)
+            trace.mark("parsed")
+            self.store.add(data)
+            trace.mark("render_scheduled")
+            self.root.after(0, self.update_display, data, trace)
         except Exception as e:
             self.root.after(0, self.log, f"Error processing message: {str(e)}")
             
@@ -178,7 +266,7 @@ class SimpleViewer:
         else:
             self.status_label.config(text="● Disconnected", foreground="red")
             
-    def update_display(self, data):
+    def update_display(self, data, trace=None):
         # Extract data
         label = data.get('label', 'Unknown')
         confidence = data.get('confidence', 0) * 100
@@ -201,13 +289,18 @@ class SimpleViewer:
             color = self.colors['low']
         
         # Update inference info
-        self.time_label.config(text=f"Inference time: {inference_time:.0f} ms")
-        
-        # Convert timestamp to readable time
-        if timestamp:
-            dt = datetime.fromtimestamp(timestamp / 1000)
-            time_str = dt.strftime("%H:%M:%S")
+        latency = self.tracer.quantiles().get("end_to_end")
+        latency_text = f" | capture to screen p50 {latency[0.5]:.0f} ms" if latency else ""
+        self.time_label.config(text=f"Inference time: {inference_time:.0f} ms{latency_text}")
+        
+        # The timestamp is the device's millis(), readable only once the
+        # device clock is synced; until then show when it arrived
+        capture = trace.marks.get("capture") if trace else None
+        if capture:
+            time_str = datetime.fromtimestamp(capture / 1000).strftime("%H:%M:%S")
             self.timestamp_label.config(text=f"Last update: {time_str}")
+        elif timestamp:
+            self.timestamp_label.config(text=f"Last update: {datetime.now().strftime('%H:%M:%S')}")
         
         # Add to history
         current_time = datetime.now().strftime("%H:%M:%S")
@@ -233,17 +326,51 @@ class SimpleViewer:
         # Log
         self.log(f"Detected: {label} ({confidence:.1f}%)")
         
+        # Idle callbacks run in order: this one runs after the redraw
+        if trace:
+            self.root.after_idle(self.finish_trace, trace)
+            
+    def finish_trace(self, trace):
+        trace.mark("rendered")
+        self.tracer.finish(trace)
+        
     def log(self, message):
         timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.configure(state='normal')
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.log_text.see(tk.END)
-        self.log_text.configure(state='disabled')
+        self.log_view.append(f"[{timestamp}] {message}")
+        
+    def on_closing(self):
+        """Flush the detection history before exiting"""
+        if self.clock:
+            self.clock.stop()
+        if self.trace_path:
+            self.tracer.export_chrome(self.trace_path)
+        if self.ingest_client:
+            self.ingest_client.stop()
+        if self.replayer:
+            self.replayer.stop()
+        if self.mqtt_client:
+            self.mqtt_client.disconnect()
+        if self.recorder:
+            self.recorder.close()
+        self.store.close()
+        self.log_view.close()
+        self.root.destroy()
         
     def run(self):
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.root.mainloop()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ESP32-CAM viewer")
+    parser.add_argument("--daemon", action="store_true",
+                        help="read from ingestDaemon/ingest_daemon.py instead of the broker")
+    parser.add_argument("--trace", default=None, metavar="PATH",
+                        help="on exit, write the latency traces as a Chrome trace (open in ui.perfetto.dev)")
+    add_replay_arguments(parser)
+    args = parser.parse_args()
+    
+    load_display()
     root = tk.Tk()
-    app = SimpleViewer(root)
+    app = SimpleViewer(root, use_daemon=args.daemon, trace_path=args.trace,
+                       record_path=args.record, replay_args=args if args.replay else None)
     app.run()
\ No newline at end of file
@@ -0,0 +1,227 @@
+"""
+Decode/decrypt pipeline for the AES-CBC image receivers (trial1, trial2).
+
+    paho callback -> ingest queue -> decode pool (base64 + AES + unpad) -> write queue -> writer thread
+
+The write queue holds the pool's futures in arrival order and the writer
+waits on them, so nothing on the pool's result thread ever blocks.
+
+The MQTT callback only enqueues the raw payload, so the broker connection
+never waits on crypto or disk. Both queues are bounded: when they are full
+the callback either blocks or drops the frame (counted), depending on
+block_when_full.
+"""
+
+import base64
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import unpad
+
+import binary_frames
+
+
+# --- DECODERS (module level so they can run in a process pool) ---
+def decrypt_payload(payload, key, iv):
+    """trial1 format: the payload is the base64 of the AES-CBC ciphertext"""
+    start = time.perf_counter()
+    encrypted_data = base64.b64decode(payload)
+    cipher = AES.new(key, AES.MODE_CBC, iv)
+    decrypted_data = unpad(cipher.decrypt(encrypted_data), AES.block_size)
+    return {}, decrypted_data, time.perf_counter() - start
+
+
+def decrypt_json_payload(payload, key, iv):
+    """trial2 format: JSON with label, confidence and the base64 ciphertext in image_aes"""
+    start = time.perf_counter()
+    data = json.loads(payload)
+    base64_str = data.pop("image_aes", "")
+    if not base64_str:
+        raise ValueError("'image_aes' field is empty")
+    encrypted_data = base64.b64decode(base64_str)
+    cipher = AES.new(key, AES.MODE_CBC, iv)
+    decrypted_data = unpad(cipher.decrypt(encrypted_data), AES.block_size)
+    return data, decrypted_data, time.perf_counter() - start
+
+
+def decrypt_any_payload(payload, key, iv):
+    """trial2 JSON envelope or a single binary chunk (see binary_frames.py),
+    detected per message. The binary form carries the ciphertext raw"""
+    if not binary_frames.is_binary(payload):
+        return decrypt_json_payload(payload, key, iv)
+
+    start = time.perf_counter()
+    chunk = binary_frames.parse(payload)
+    if chunk.total != 1:
+        raise ValueError(f"expected one chunk per frame, got {chunk.total}")
+    meta, image = {}, chunk.payload
+    if chunk.flags & binary_frames.FLAG_META:
+        meta, image = binary_frames.split_meta(image)
+    meta.setdefault("client_id", chunk.device)
+    if chunk.flags & binary_frames.FLAG_AES:
+        cipher = AES.new(key, AES.MODE_CBC, iv)
+        image = unpad(cipher.decrypt(image), AES.block_size)
+    return meta, bytes(image), time.perf_counter() - start
+
+
+class StageTimer:
+    """Count, mean and max of one pipeline stage in seconds, optionally
+    also observed into a histogram (pythonCommon/metrics.py)"""
+
+    def __init__(self, histogram=None):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = histogram
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if self.histogram:
+            self.histogram.observe(seconds)
+
+    def mean_ms(self):
+        return (self.total / self.count) * 1000 if self.count else 0.0
+
+
+class DecryptPipeline:
+    def __init__(self, decoder, key, iv, save, decode_workers=4,
+                 use_processes=True, queue_size=32, block_when_full=False,
+                 on_saved=None, report_every=5.0, histograms=None):
+        self.decoder = decoder
+        self.key = key
+        self.iv = iv
+        # save(frame_count, meta, data) -> filename, called on the writer thread
+        self.save = save
+        self.block_when_full = block_when_full
+        self.on_saved = on_saved
+        self.report_every = report_every
+        # histograms: optional {"queue"|"decode"|"write"|"total": Histogram}
+        histograms = histograms or {}
+
+        # Bounded queues on both sides of the decode pool
+        self.ingest_queue = queue.Queue(maxsize=queue_size)
+        self.write_queue = queue.Queue(maxsize=queue_size)
+        self.in_flight = threading.BoundedSemaphore(decode_workers * 2)
+
+        pool = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        self.executor = pool(max_workers=decode_workers)
+
+        # Statistics
+        self.frame_count = 0
+        self.received = 0
+        self.dropped = 0
+        self.errors = 0
+        self.queue_wait = StageTimer(histograms.get("queue"))
+        self.decode_time = StageTimer(histograms.get("decode"))
+        self.write_time = StageTimer(histograms.get("write"))
+        self.end_to_end = StageTimer(histograms.get("total"))
+        self.started = time.perf_counter()
+        self.last_report = self.started
+
+        self.dispatcher = threading.Thread(target=self.dispatch_loop, daemon=True)
+        self.writer = threading.Thread(target=self.write_loop, daemon=True)
+        self.dispatcher.start()
+        self.writer.start()
+
+    # --- STAGE 1: ingest (runs on the paho thread, keep it thin) ---
+    def submit(self, payload):
+        """Queue a raw MQTT payload. Returns False if it was dropped"""
+        self.received += 1
+        item = (payload, time.perf_counter())
+        try:
+            self.ingest_queue.put(item, block=self.block_when_full)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    # --- STAGE 2: decode pool ---
+    def dispatch_loop(self):
+        while True:
+            item = self.ingest_queue.get()
+            if item is None:
+                break
+            payload, received_at = item
+
+            # Only hand the pool as many frames as it can work on, the rest
+            # waits in the bounded ingest queue (backpressure)
+            self.in_flight.acquire()
+            self.queue_wait.add(time.perf_counter() - received_at)
+            try:
+                future = self.executor.submit(self.decoder, payload, self.key, self.iv)
+            except Exception as e:
+                # Broken or shut down pool: count the frame and keep going
+                self.in_flight.release()
+                self.errors += 1
+                print(f"Failed to submit image: {e}")
+                continue
+            # The done callback runs on the pool's result thread: only free
+            # the slot there, the writer waits on the future itself
+            future.add_done_callback(lambda f: self.in_flight.release())
+            # Frames reach the writer in arrival order; a slow writer blocks
+            # this thread, not the pool
+            self.write_queue.put((future, received_at))
+
+    # --- STAGE 3: writer ---
+    def write_loop(self):
+        while True:
+            item = self.write_queue.get()
+            if item is None:
+                break
+            future, received_at = item
+            try:
+                meta, data, seconds = future.result()
+            except Exception as e:
+                self.errors += 1
+                print(f"Failed to process image: {e}")
+                continue
+            self.decode_time.add(seconds)
+
+            start = time.perf_counter()
+            self.frame_count += 1
+            try:
+                filename = self.save(self.frame_count, meta, data)
+            except Exception as e:
+                # Disk full, archive locked: count it and keep writing
+                self.errors += 1
+                print(f"Failed to save image: {e}")
+                continue
+            now = time.perf_counter()
+            self.write_time.add(now - start)
+            self.end_to_end.add(now - received_at)
+
+            if self.on_saved:
+                self.on_saved(self.frame_count, meta, filename, data)
+
+            if now - self.last_report >= self.report_every:
+                print(self.report())
+                self.last_report = now
+
+    def fps(self):
+        elapsed = time.perf_counter() - self.started
+        return self.frame_count / elapsed if elapsed > 0 else 0.0
+
+    def report(self):
+        return (f"[pipeline] {self.fps():.1f} fps | saved {self.frame_count} "
+                f"dropped {self.dropped} errors {self.errors} | "
+                f"queue {self.queue_wait.mean_ms():.1f} ms, "
+                f"decode {self.decode_time.mean_ms():.1f} ms, "
+                f"write {self.write_time.mean_ms():.1f} ms, "
+                f"total {self.end_to_end.mean_ms():.1f} ms "
+                f"(max {self.end_to_end.max * 1000:.1f} ms)")
+
+    def stop(self):
+        """Finish queued frames and shut the stages down"""
+        self.ingest_queue.put(None)
+        self.dispatcher.join()
+        self.write_queue.put(None)
+        self.writer.join()
+        self.executor.shutdown(wait=True)
+        print(self.report())
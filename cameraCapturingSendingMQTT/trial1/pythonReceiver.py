@@ -1,61 +1,75 @@
 # run using python f:/github/Arduino_Projects/cameraCapturingSendingMQTT/trial1/pythonReceiver.py
 
-import base64
-import io
 import os
-import shutil
-from PIL import Image
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import unpad
+import sys
 import paho.mqtt.client as mqtt
 
+# aes_pipeline.py lives one folder up (shared with trial2), image_archive.py in pythonCommon/
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, os.path.join(HERE, "..", "..", "pythonCommon"))
+from aes_pipeline import DecryptPipeline, decrypt_payload
+from image_archive import ImageArchive
+
 # --- CONFIGURATION ---
 MQTT_BROKER = "broker.hivemq.com"
 MQTT_TOPIC = "esp32/camera/images"
 KEY = b'mysupersecretkey' 
 IV = b'1234567890123456'  
-SAVE_FOLDER = "trial1/received_images"
+SAVE_FOLDER = "trial1/received_images"   # kept between runs, see pythonCommon/image_archive.py
+FSYNC_POLICY = "batch"                   # "always", "batch" or "never"
+
+# --- PIPELINE CONFIGURATION ---
+DECODE_WORKERS = 4        # base64 + AES + unpad workers
+USE_PROCESSES = True      # False = thread pool instead of process pool
+QUEUE_SIZE = 32           # frames buffered in front of each stage
+BLOCK_WHEN_FULL = False   # False = drop frames instead of stalling the MQTT thread
+
+
+def on_saved(image_count, meta, filename, data):
+    print(f"Success! Saved: {filename}")
+
 
-# --- 1. CLEANUP/FOLDER SETUP ---
-if os.path.exists(SAVE_FOLDER):
-    print(f"Cleaning up old folder: {SAVE_FOLDER}")
-    shutil.rmtree(SAVE_FOLDER)  # Deletes the folder and everything inside
+def main():
+    # --- 1. ARCHIVE SETUP (earlier captures are kept) ---
+    archive = ImageArchive(SAVE_FOLDER, fsync_policy=FSYNC_POLICY)
+    print(f"Archive '{SAVE_FOLDER}' is ready.")
 
-os.makedirs(SAVE_FOLDER) # Creates a fresh, empty folder
-print(f"Folder '{SAVE_FOLDER}' is ready.")
+    def save_frame(image_count, meta, data):
+        sha, path, duplicate = archive.save(data, "default", meta)
+        return path + (" (duplicate)" if duplicate else "")
 
-image_count = 0
+    pipeline = DecryptPipeline(decrypt_payload, KEY, IV, save_frame,
+                               decode_workers=DECODE_WORKERS,
+                               use_processes=USE_PROCESSES,
+                               queue_size=QUEUE_SIZE,
+                               block_when_full=BLOCK_WHEN_FULL,
+                               on_saved=on_saved)
+
+    def on_message(client, userdata, msg):
+        # Decoding, decryption and saving happen in the pipeline stages
+        if not pipeline.submit(msg.payload):
+            print("Pipeline full, frame dropped")
+
+    # --- MQTT SETUP ---
+    client = mqtt.Client()
+    client.on_message = on_message
+    client.username_pw_set("Aryahiro", "angga1407")
+    client.tls_set() 
+
+    print("Connecting to HiveMQ...")
+    client.connect(MQTT_BROKER, 8883)
+    client.subscribe(MQTT_TOPIC)
 
-def on_message(client, userdata, msg):
-    global image_count
     try:
-        # 1. Base64 Decode
-        encrypted_data = base64.b64decode(msg.payload)
-        
-        # 2. AES Decrypt
-        cipher = AES.new(KEY, AES.MODE_CBC, IV)
-        decrypted_data = unpad(cipher.decrypt(encrypted_data), AES.block_size)
-        
-        # 3. Save to Folder
-        image_count += 1
-        filename = f"{SAVE_FOLDER}/capture_{image_count}.jpg"
-        
-        with open(filename, "wb") as f:
-            f.write(decrypted_data)
-            
-        print(f"Success! Saved: {filename}")
-        
-    except Exception as e:
-        print(f"Failed to process image: {e}")
-
-# --- MQTT SETUP ---
-client = mqtt.Client()
-client.on_message = on_message
-client.username_pw_set("Aryahiro", "angga1407")
-client.tls_set() 
-
-print("Connecting to HiveMQ...")
-client.connect(MQTT_BROKER, 8883)
-client.subscribe(MQTT_TOPIC)
-
-client.loop_forever()
\ No newline at end of file
+        client.loop_forever()
+    except KeyboardInterrupt:
+        print("Receiver stopped.")
+    finally:
+        pipeline.stop()
+        archive.close()
+
+
+# The guard matters here: the process pool re-imports this file in each worker
+if __name__ == "__main__":
+    main()
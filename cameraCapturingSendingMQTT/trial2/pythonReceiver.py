@@ -1,12 +1,20 @@
 # use python f:/github/Arduino_Projects/cameraCapturingSendingMQTT/trial2/pythonReceiver.py
 
-import base64
-import json
+import argparse
 import os
-import shutil
-import paho.mqtt.client as mqtt
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import unpad
+import sys
+import time
+
+# aes_pipeline.py lives one folder up (shared with trial1), image_archive.py,
+# frame_dedup.py, mjpeg_recorder.py and traffic_log.py in pythonCommon/
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, os.path.join(HERE, "..", "..", "pythonCommon"))
+from aes_pipeline import DecryptPipeline, decrypt_any_payload
+from frame_dedup import add_dedup_arguments, open_dedup
+from image_archive import ImageArchive
+from mjpeg_recorder import MjpegRecorder
+from traffic_log import TrafficRecorder, add_replay_arguments, open_replay
 
 # --- CONFIGURATION ---
 MQTT_BROKER = "broker.hivemq.com"
@@ -14,15 +22,24 @@ MQTT_BROKER = "broker.hivemq.com"
 MQTT_TOPIC = "esp32/cam/classification" 
 KEY = b'mysupersecretkey' 
 IV = b'1234567890123456'  
-SAVE_FOLDER = "received_images"
+SAVE_FOLDER = "received_images"   # kept between runs, see pythonCommon/image_archive.py
+FSYNC_POLICY = "batch"            # "always", "batch" or "never"
+
+# --- PIPELINE CONFIGURATION ---
+DECODE_WORKERS = 4        # JSON + base64 + AES + unpad workers
+USE_PROCESSES = True      # False = thread pool instead of process pool
+QUEUE_SIZE = 32           # frames buffered in front of each stage
+BLOCK_WHEN_FULL = False   # False = drop frames instead of stalling the MQTT thread
+
 
-# --- FOLDER SETUP ---
-if os.path.exists(SAVE_FOLDER):
-    shutil.rmtree(SAVE_FOLDER)
-os.makedirs(SAVE_FOLDER)
-print(f"Directory '{SAVE_FOLDER}' is ready.")
+def on_saved(image_count, meta, filename, data):
+    label = meta.get("label", "unknown")
+    confidence = meta.get("confidence", 0)
+    if filename is None:
+        print(f"[{image_count}] Detected: {label} ({confidence*100:.1f}%) -> near-duplicate, not saved")
+        return
+    print(f"[{image_count}] Detected: {label} ({confidence*100:.1f}%) -> Saved to {filename}")
 
-image_count = 0
 
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
@@ -31,60 +48,147 @@ def on_connect(client, userdata, flags, rc):
     else:
         print(f"Connection failed with code {rc}")
 
-def on_message(client, userdata, msg):
-    global image_count
+
+def setup_metrics():
+    """Registry with the stage histograms, returns (registry, histograms, count_frame)"""
+    from metrics import MetricsRegistry, add_process_metrics
+    registry = MetricsRegistry()
+    histograms = {
+        "queue": registry.histogram("receiver_queue_wait_seconds", "Time in the ingest queue"),
+        "decode": registry.histogram("receiver_decode_seconds", "JSON/binary parse + base64 + AES + unpad"),
+        "write": registry.histogram("receiver_write_seconds", "Archive write per frame"),
+        "total": registry.histogram("receiver_frame_seconds", "MQTT message to frame saved"),
+    }
+    count_frame = registry.rate("receiver_frames_per_second", "Saved frames per second over the last 10 s")
+    add_process_metrics(registry)
+    return registry, histograms, count_frame
+
+
+def add_pipeline_metrics(registry, pipeline, archive):
+    registry.counter("receiver_frames_total", "Frames by outcome", label="stage",
+                     function=lambda: {"received": pipeline.received, "saved": pipeline.frame_count})
+    registry.gauge("receiver_queue_depth", "Items waiting per queue", label="queue",
+                   function=lambda: {"ingest": pipeline.ingest_queue.qsize(),
+                                     "write": pipeline.write_queue.qsize()})
+    registry.counter("receiver_dropped_total", "Frames lost, by reason", label="reason",
+                     function=lambda: {"pipeline_full": pipeline.dropped, "decode_error": pipeline.errors})
+    registry.counter("receiver_duplicates_total", "Frames already in the archive",
+                     function=lambda: archive.duplicates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="trial2 AES image receiver (no window)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus-style metrics on http://127.0.0.1:<port>/metrics")
+    parser.add_argument("--record-video", default=None, metavar="DIR",
+                        help="also append every frame to per-camera MJPEG AVI segments with a seek index")
+    add_dedup_arguments(parser)
+    add_replay_arguments(parser)
+    args = parser.parse_args()
+
+    # --- ARCHIVE SETUP (earlier captures are kept) ---
+    archive = ImageArchive(SAVE_FOLDER, fsync_policy=FSYNC_POLICY)
+    print(f"Archive '{SAVE_FOLDER}' is ready.")
+    video = MjpegRecorder(args.record_video) if args.record_video else None
+    # --dedup: frames that look like the last one kept from their camera are not archived
+    dedup = open_dedup(args)
+
+    def save_frame(image_count, meta, data):
+        # The classification JSON stays with the frame in the manifest
+        device = meta.get("client_id", "default")
+        if video:
+            video.add(data, device)
+        if dedup:
+            if dedup.is_duplicate(device, data):
+                return None
+            cpu_start = time.thread_time()
+        sha, path, duplicate = archive.save(data, device, meta)
+        if dedup:
+            dedup.kept(time.thread_time() - cpu_start)
+        return path + (" (duplicate)" if duplicate else "")
+
+    # --- METRICS (optional) ---
+    registry = None
+    metrics_server = None
+    histograms = None
+    saved_callback = on_saved
+    if args.metrics_port is not None:
+        registry, histograms, count_frame = setup_metrics()
+
+        def saved_callback(image_count, meta, filename, data):
+            count_frame()
+            on_saved(image_count, meta, filename, data)
+
+    pipeline = DecryptPipeline(decrypt_any_payload, KEY, IV, save_frame,
+                               decode_workers=DECODE_WORKERS,
+                               use_processes=USE_PROCESSES,
+                               queue_size=QUEUE_SIZE,
+                               block_when_full=BLOCK_WHEN_FULL,
+                               on_saved=saved_callback,
+                               histograms=histograms)
+    if registry:
+        from metrics import MetricsServer
+        add_pipeline_metrics(registry, pipeline, archive)
+        if dedup:
+            dedup.register(registry)
+        metrics_server = MetricsServer(registry, args.metrics_port).start()
+
+    def on_message(client, userdata, msg):
+        # JSON or binary parsing, decryption and saving happen in the pipeline stages
+        if not pipeline.submit(msg.payload):
+            print("Pipeline full, frame dropped")
+
+    # --- REPLAY (instead of the broker) ---
+    if args.replay:
+        from headless import wait_for_shutdown
+        replayer = open_replay(args, on_message, topics=(MQTT_TOPIC,))
+        replayer.start()
+        wait_for_shutdown(stop=replayer.done)
+        replayer.stop()
+        if metrics_server:
+            metrics_server.stop()
+        pipeline.stop()
+        if dedup:
+            print(f"🧹 {dedup.report()}")
+        archive.close()
+        if video:
+            video.close()
+        return
+
+    # --- MQTT SETUP ---
+    # paho is only loaded here, not by --replay or the pool workers that re-import this file
+    import paho.mqtt.client as mqtt
+    # Callback for newer paho-mqtt versions might need CallbackAPIVersion
+    client = mqtt.Client()
+    client.on_connect = on_connect
+    recorder = TrafficRecorder(args.record) if args.record else None
+    client.on_message = recorder.wrap(on_message) if recorder else on_message
+
+    # Note: HiveMQ Public doesn't strictly require username/pw on 1883
+    # If you didn't set them up in Arduino, you don't need them here.
+    # client.username_pw_set("Aryahiro", "angga1407")
+
+    print(f"Connecting to {MQTT_BROKER}...")
+    client.connect(MQTT_BROKER, 1883, 60)
+
+    # Start the loop
     try:
-        # 1. Parse the JSON wrapper
-        payload = json.loads(msg.payload.decode('utf-8'))
-        
-        # Get data from JSON
-        label = payload.get("label", "unknown")
-        confidence = payload.get("confidence", 0)
-        base64_str = payload.get("image_aes", "")
-
-        if not base64_str:
-            print("Received JSON but 'image_aes' field is empty.")
-            return
-
-        # 2. Base64 Decode
-        encrypted_data = base64.b64decode(base64_str)
-        
-        # 3. AES Decrypt (CBC Mode)
-        cipher = AES.new(KEY, AES.MODE_CBC, IV)
-        # Decrypt and remove PKCS7 padding
-        decrypted_data = unpad(cipher.decrypt(encrypted_data), AES.block_size)
-        
-        # 4. Save to Folder
-        image_count += 1
-        filename = f"{SAVE_FOLDER}/img_{image_count}_{label}.jpg"
-        
-        with open(filename, "wb") as f:
-            f.write(decrypted_data)
-            
-        print(f"[{image_count}] Detected: {label} ({confidence*100:.1f}%) -> Saved to {filename}")
-        
-    except json.JSONDecodeError:
-        print("Error: Received message was not valid JSON.")
-    except ValueError as ve:
-        print(f"Decryption/Padding Error: {ve}. Check if KEY and IV match ESP32.")
-    except Exception as e:
-        print(f"Unexpected error: {e}")
-
-# --- MQTT SETUP ---
-# Callback for newer paho-mqtt versions might need CallbackAPIVersion
-client = mqtt.Client()
-client.on_connect = on_connect
-client.on_message = on_message
-
-# Note: HiveMQ Public doesn't strictly require username/pw on 1883
-# If you didn't set them up in Arduino, you don't need them here.
-# client.username_pw_set("Aryahiro", "angga1407")
-
-print(f"Connecting to {MQTT_BROKER}...")
-client.connect(MQTT_BROKER, 1883, 60)
-
-# Start the loop
-try:
-    client.loop_forever()
-except KeyboardInterrupt:
-    print("Receiver stopped.")
\ No newline at end of file
+        client.loop_forever()
+    except KeyboardInterrupt:
+        print("Receiver stopped.")
+    finally:
+        if metrics_server:
+            metrics_server.stop()
+        if recorder:
+            recorder.close()
+        pipeline.stop()
+        if dedup:
+            print(f"🧹 {dedup.report()}")
+        archive.close()
+        if video:
+            video.close()
+
+
+# The guard matters here: the process pool re-imports this file in each worker
+if __name__ == "__main__":
+    main()
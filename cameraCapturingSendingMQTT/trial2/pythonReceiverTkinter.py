@@ -1,40 +1,62 @@
-
 # use python f:/github/Arduino_Projects/cameraCapturingSendingMQTT/trial2/pythonReceiverTkinter.py
+# add --headless to run without a window, --metrics-port 9102 for /metrics,
+# --trace trace.json for a Chrome trace of receive -> decrypt -> on screen,
+# --record capture.mqlog / --replay capture.mqlog --speed 4 to record or replay the traffic,
+# --dedup 5 to skip frames that look like the last one shown from that camera
 
-import base64
+import argparse
 import json
 import os
-import shutil
-import paho.mqtt.client as mqtt
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import unpad
-
-import tkinter as tk
-from tkinter import ttk
-from PIL import Image, ImageTk
+import sys
+import time
+
 import threading
 import io
 
+# aes_pipeline.py lives one folder up (shared with pythonReceiver.py), metrics.py, headless.py,
+# latency_trace.py, frame_dedup.py and traffic_log.py in pythonCommon/ at the repo root
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, os.path.join(HERE, "..", "..", "pythonCommon"))
+from aes_pipeline import decrypt_any_payload
+from frame_dedup import add_dedup_arguments, open_dedup
+from latency_trace import Tracer, now_ms
+from traffic_log import TrafficRecorder, add_replay_arguments, open_replay
+
+# Display modules, imported by load_display() only when a window is wanted
+tk = ttk = Image = ImageTk = None
+
+def load_display():
+    global tk, ttk, Image, ImageTk
+    import tkinter as tk
+    from tkinter import ttk
+    from PIL import Image, ImageTk
+
 # Global variable for the UI label
 panel = None
 info_label = None
+root = None
 
 
 # --- CONFIGURATION ---
 MQTT_BROKER = "broker.hivemq.com"
 # Make sure this matches TOPIC_CLASSIFICATION in your Arduino code!
-MQTT_TOPIC = "esp32/cam/classification" 
-KEY = b'mysupersecretkey' 
-IV = b'1234567890123456'  
-SAVE_FOLDER = "received_images"
-
-# --- FOLDER SETUP ---
-if os.path.exists(SAVE_FOLDER):
-    shutil.rmtree(SAVE_FOLDER)
-os.makedirs(SAVE_FOLDER)
-print(f"Directory '{SAVE_FOLDER}' is ready.")
+MQTT_TOPIC = "esp32/cam/classification"
+KEY = b'mysupersecretkey'
+IV = b'1234567890123456'
 
 image_count = 0
+errors = 0
+
+# Set by setup_metrics() when --metrics-port is given
+decode_histogram = None
+count_frame = None
+
+# PC-side spans only: this sketch does not answer the TSYNC clock sync
+tracer = Tracer()
+
+# Set by main() with --dedup
+dedup = None
 
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
@@ -44,43 +66,76 @@ def on_connect(client, userdata, flags, rc):
         print(f"Connection failed with code {rc}")
 
 def on_message(client, userdata, msg):
-    global image_count, panel, info_label
+    global image_count, errors
     try:
-        # 1. Parse the JSON wrapper
-        payload = json.loads(msg.payload.decode('utf-8'))
-        
-        # Get data from JSON
-        label = payload.get("label", "unknown")
-        confidence = payload.get("confidence", 0)
-        base64_str = payload.get("image_aes", "")
-
-        if not base64_str:
-            print("Received JSON but 'image_aes' field is empty.")
+        received = now_ms()
+        start = time.perf_counter()
+        # JSON envelope or binary frame, detected per message: parse,
+        # base64 (JSON only) and AES-CBC decrypt + unpad
+        meta, decrypted_data, _ = decrypt_any_payload(msg.payload, KEY, IV)
+        trace = tracer.begin(meta, received)
+        label = meta.get("label", "unknown")
+        confidence = meta.get("confidence", 0)
+        trace.mark("decoded")
+        if dedup and dedup.is_duplicate(meta.get("client_id", "default"), decrypted_data):
+            # Looks like the frame on screen: no PIL decode, resize or redraw
+            return
+        cpu_start = time.thread_time()
+        image_count += 1
+        if decode_histogram:
+            decode_histogram.observe(time.perf_counter() - start)
+        if count_frame:
+            count_frame()
+
+        if root is None:
+            # Headless: nothing to show, a kept frame only costs this much
+            tracer.finish(trace)
+            if dedup:
+                dedup.kept(time.thread_time() - cpu_start)
             return
 
-        # 2. Base64 Decode
-        encrypted_data = base64.b64decode(base64_str)
-        
-        # 3. AES Decrypt (CBC Mode)
-        cipher = AES.new(KEY, AES.MODE_CBC, IV)
-        # Decrypt and remove PKCS7 padding
-        decrypted_data = unpad(cipher.decrypt(encrypted_data), AES.block_size)
-        
-        # UPDATE UI: Process Image for Tkinter
-        img = Image.open(io.BytesIO(decrypted_data))
-        img = img.resize((320, 240)) # Resize for window
-        img_tk = ImageTk.PhotoImage(img)
+        # UPDATE UI: widgets only change on the Tk thread
+        trace.mark("render_scheduled")
+        root.after(0, show_image, decrypted_data, label, confidence, trace)
 
-        panel.config(image=img_tk)
-        panel.image = img_tk # Keep a reference!
-        
     except json.JSONDecodeError:
+        errors += 1
         print("Error: Received message was not valid JSON.")
     except ValueError as ve:
+        errors += 1
         print(f"Decryption/Padding Error: {ve}. Check if KEY and IV match ESP32.")
     except Exception as e:
+        errors += 1
         print(f"Unexpected error: {e}")
 
+def show_image(decrypted_data, label, confidence, trace):
+    global errors
+    cpu_start = time.thread_time()
+    # Process Image for Tkinter
+    try:
+        img = Image.open(io.BytesIO(decrypted_data))
+        img = img.resize((320, 240)) # Resize for window
+        img_tk = ImageTk.PhotoImage(img)
+    except Exception as e:
+        # Decrypted fine but not a readable JPEG (truncated, corrupt)
+        errors += 1
+        print(f"Image decode error: {e}")
+        # Never drawn: traced up to render_scheduled only
+        tracer.finish(trace)
+        return
+
+    panel.config(image=img_tk)
+    panel.image = img_tk # Keep a reference!
+    info_label.config(text=f"{label} ({confidence*100:.1f}%)")
+    if dedup:
+        dedup.kept(time.thread_time() - cpu_start)
+    # Idle callbacks run in order: this one runs once the new image is drawn
+    root.after_idle(finish_trace, trace)
+
+def finish_trace(trace):
+    trace.mark("rendered")
+    tracer.finish(trace)
+
 #tkinter GUI
 def setup_gui():
     global panel, info_label, root
@@ -98,30 +153,97 @@ def setup_gui():
 
     return root
 
-# --- MQTT SETUP ---
-# Callback for newer paho-mqtt versions might need CallbackAPIVersion
-client = mqtt.Client()
-client.on_connect = on_connect
-client.on_message = on_message
-
-# Note: HiveMQ Public doesn't strictly require username/pw on 1883
-# If you didn't set them up in Arduino, you don't need them here.
-# client.username_pw_set("Aryahiro", "angga1407")
-
-print(f"Connecting to {MQTT_BROKER}...")
-client.connect(MQTT_BROKER, 1883, 60)
-
-# Start the loop
-try:
-    # Create the GUI
-    root = setup_gui()
-
-    # Start MQTT in a background thread
-    mqtt_thread = threading.Thread(target=client.loop_forever)
-    mqtt_thread.daemon = True # Closes thread when window is closed
-    mqtt_thread.start()
-
-    # Run the Tkinter main loop (this blocks the main script)
-    root.mainloop()
-except KeyboardInterrupt:
-    print("Receiver stopped.")
\ No newline at end of file
+def setup_metrics(port):
+    global decode_histogram, count_frame
+    from metrics import MetricsRegistry, MetricsServer, add_process_metrics
+    registry = MetricsRegistry()
+    registry.counter("receiver_frames_total", "Frames decrypted", function=lambda: image_count)
+    count_frame = registry.rate("receiver_frames_per_second", "Decrypted frames per second over the last 10 s")
+    decode_histogram = registry.histogram("receiver_decode_seconds", "JSON + base64 + AES + unpad per frame")
+    registry.counter("receiver_dropped_total", "Messages that could not be decoded", label="reason",
+                     function=lambda: {"decode_error": errors})
+    tracer.register(registry)
+    if dedup:
+        dedup.register(registry)
+    add_process_metrics(registry)
+    return MetricsServer(registry, port).start()
+
+def main():
+    global dedup
+    parser = argparse.ArgumentParser(description="trial2 AES receiver with a Tk preview")
+    parser.add_argument("--headless", action="store_true",
+                        help="no window: decrypt and count only, Tk and PIL are not loaded")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus-style metrics on http://127.0.0.1:<port>/metrics")
+    parser.add_argument("--trace", default=None, metavar="PATH",
+                        help="on exit, write the latency traces as a Chrome trace (open in ui.perfetto.dev)")
+    add_dedup_arguments(parser)
+    add_replay_arguments(parser)
+    args = parser.parse_args()
+    dedup = open_dedup(args)
+
+    metrics_server = setup_metrics(args.metrics_port) if args.metrics_port is not None else None
+
+    # --- MQTT SETUP (or a replay of recorded traffic) ---
+    client = replayer = recorder = None
+    if args.replay:
+        replayer = open_replay(args, on_message, topics=(MQTT_TOPIC,))
+    else:
+        # paho is only loaded for a broker connection (not --replay)
+        import paho.mqtt.client as mqtt
+        # Callback for newer paho-mqtt versions might need CallbackAPIVersion
+        client = mqtt.Client()
+        client.on_connect = on_connect
+        recorder = TrafficRecorder(args.record) if args.record else None
+        client.on_message = recorder.wrap(on_message) if recorder else on_message
+
+        # Note: HiveMQ Public doesn't strictly require username/pw on 1883
+        # If you didn't set them up in Arduino, you don't need them here.
+        # client.username_pw_set("Aryahiro", "angga1407")
+
+        print(f"Connecting to {MQTT_BROKER}...")
+        client.connect(MQTT_BROKER, 1883, 60)
+
+    # Start the loop
+    try:
+        if args.headless:
+            from headless import wait_for_shutdown
+            if replayer:
+                # A headless replay ends with the log
+                replayer.start()
+            else:
+                client.loop_start()
+            wait_for_shutdown(lambda: f"📊 {image_count} frames decrypted, {errors} errors" +
+                              (f", {dedup.report()}" if dedup else "") + f"\n{tracer.report()}",
+                              stop=replayer.done if replayer else None)
+            if client:
+                client.loop_stop()
+        else:
+            # Create the GUI
+            load_display()
+            setup_gui()
+
+            if replayer:
+                replayer.start()
+            else:
+                # Start MQTT in a background thread
+                mqtt_thread = threading.Thread(target=client.loop_forever)
+                mqtt_thread.daemon = True # Closes thread when window is closed
+                mqtt_thread.start()
+
+            # Run the Tkinter main loop (this blocks the main script)
+            root.mainloop()
+    except KeyboardInterrupt:
+        print("Receiver stopped.")
+    finally:
+        if replayer:
+            replayer.stop()
+        if recorder:
+            recorder.close()
+        if metrics_server:
+            metrics_server.stop()
+        if args.trace:
+            tracer.export_chrome(args.trace)
+
+if __name__ == "__main__":
+    main()
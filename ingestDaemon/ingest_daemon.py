@@ -0,0 +1,324 @@
+"""
+Headless ingest daemon: one broker connection for every viewer on this PC.
+
+It subscribes once, parses each message once and decodes each JPEG once,
+then fans the results out to local viewers through shared-memory rings
+(pythonCommon/shm_ring.py, formats in pythonCommon/ingest_client.py):
+
+    test/esp32_to_python/#      text or binary chunks  -> frame
+    esp32/cam/classification    JSON (+ image_aes)     -> detection (+ frame)
+    esp32/cam/status            JSON                   -> detection ring as is
+    esp32/camera/images         base64 AES (trial1)    -> frame
+
+Viewers start with --daemon and attach as thin clients. Every few seconds
+the daemon prints each consumer's lag and drops (also: --status).
+--record keeps the raw broker traffic in a traffic log, --replay feeds one
+to every viewer instead of the broker (pythonCommon/traffic_log.py).
+
+    python ingestDaemon/ingest_daemon.py --archive received_frames
+    python Trial3/esp32_gui_ver3.py --daemon
+    python ingestDaemon/ingest_daemon.py --status
+"""
+
+import argparse
+import base64
+import io
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+from PIL import Image
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(REPO_ROOT, "Esp32ToPythonImageHiveMqComm"))
+sys.path.insert(0, os.path.join(REPO_ROOT, "pythonCommon"))
+import binary_frames
+from chunk_assembler import parse_chunk
+from frame_sessions import FrameSessions
+from ingest_client import (DETECTIONS_RING, FRAMES_RING, KIND_FRAME, KIND_MESSAGE,
+                           pack_frame, pack_message)
+from shm_ring import RingWriter, ring_status
+from traffic_log import TrafficRecorder, add_replay_arguments, open_replay
+
+CHUNK_TOPIC = "test/esp32_to_python"
+COMMAND_TOPIC = "test/python_to_esp32"
+CLASSIFICATION_TOPIC = "esp32/cam/classification"
+STATUS_TOPIC = "esp32/cam/status"
+TRIAL1_TOPIC = "esp32/camera/images"
+
+# Same key/IV as the cameraCapturingSendingMQTT sketches and receivers
+AES_KEY = b'mysupersecretkey'
+AES_IV = b'1234567890123456'
+
+
+class IngestDaemon:
+    def __init__(self, broker="broker.hivemq.com", port=1883, binary_frames=True,
+                 max_width=800, max_height=600, frame_slots=16, detection_slots=1024,
+                 archive_root=None, report_every=10.0, record_path=None, replay_args=None):
+        self.broker = broker
+        self.port = port
+        self.binary_frames = binary_frames
+        self.max_size = (max_width, max_height)
+        self.report_every = report_every
+
+        # Everything the MQTT thread writes goes to the detection ring and
+        # everything the decode thread writes to the frame ring: one producer each
+        self.detections = RingWriter(DETECTIONS_RING, slot_count=detection_slots, slot_size=4096)
+        self.frames = RingWriter(FRAMES_RING, slot_count=frame_slots,
+                                 slot_size=max_width * max_height * 3 + 1024)
+
+        self.sessions = FrameSessions()
+        self.decode_queue = queue.Queue(maxsize=32)
+        self.archive = None
+        if archive_root:
+            from image_archive import ImageArchive
+            self.archive = ImageArchive(archive_root)
+        self.aes = None
+
+        # Counters
+        self.messages = 0
+        self.frames_decoded = 0
+        self.decode_seconds = 0.0
+        self.decode_errors = 0
+        self.decode_dropped = 0
+        self.bad_messages = 0
+
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2,
+                                  client_id=f"ingest-{int(time.time())}")
+        self.client.on_connect = self.on_connect
+        self.recorder = TrafficRecorder(record_path) if record_path else None
+        self.client.on_message = self.recorder.wrap(self.on_message) if self.recorder else self.on_message
+        self.replay_args = replay_args
+        self.replayer = None
+        self.decoder = threading.Thread(target=self.decode_loop, daemon=True)
+
+    # --- MQTT THREAD ---
+    def on_connect(self, client, userdata, flags, reason_code, properties):
+        if reason_code == 0:
+            print(f"✅ Connected to {self.broker}:{self.port}")
+            for topic in (CHUNK_TOPIC + "/#", CLASSIFICATION_TOPIC, STATUS_TOPIC, TRIAL1_TOPIC):
+                client.subscribe(topic)
+            client.publish(COMMAND_TOPIC, "PROTO:BIN1" if self.binary_frames else "PROTO:TEXT", retain=True)
+        else:
+            print(f"❌ Failed to connect, return code {reason_code}")
+
+    def on_message(self, client, userdata, message):
+        self.messages += 1
+        topic = message.topic
+        payload = message.payload
+        try:
+            if topic == CLASSIFICATION_TOPIC:
+                self.handle_classification(payload)
+            elif topic == STATUS_TOPIC:
+                self.publish_detection(topic, payload)
+            elif topic == TRIAL1_TOPIC:
+                self.queue_frame("trial1", {"client_id": "trial1"}, payload, "aes-base64")
+            elif topic == CHUNK_TOPIC or topic.startswith(CHUNK_TOPIC + "/"):
+                self.handle_chunk(topic[len(CHUNK_TOPIC) + 1:] or "default", payload)
+        except Exception as e:
+            self.bad_messages += 1
+            print(f"❌ Bad message on {topic}: {e}")
+
+    def publish_detection(self, topic, payload):
+        try:
+            self.detections.publish(pack_message(topic, payload), KIND_MESSAGE)
+        except ValueError as e:
+            print(f"⚠️ Detection not forwarded: {e}")
+
+    def handle_classification(self, payload):
+        if binary_frames.is_binary(payload):
+            # trial2 binary envelope: metadata is readable, the image is encrypted
+            chunk = binary_frames.parse(payload)
+            meta, image = {}, chunk.payload
+            if chunk.flags & binary_frames.FLAG_META:
+                meta, image = binary_frames.split_meta(image)
+            meta.setdefault("client_id", chunk.device)
+            self.publish_detection(CLASSIFICATION_TOPIC, json.dumps(meta).encode("utf-8"))
+            mode = "aes" if chunk.flags & binary_frames.FLAG_AES else "jpeg"
+            self.queue_frame(chunk.device, meta, bytes(image), mode)
+            return
+
+        if b'"image_aes"' not in payload:
+            # Trial3/Trial5 style: forwarded untouched, the viewers parse it
+            self.publish_detection(CLASSIFICATION_TOPIC, payload)
+            return
+        data = json.loads(payload)
+        image_aes = data.pop("image_aes", None)
+        self.publish_detection(CLASSIFICATION_TOPIC, json.dumps(data).encode("utf-8"))
+        if image_aes:
+            self.queue_frame(data.get("client_id", "trial2"), data, image_aes, "aes-base64")
+
+    def handle_chunk(self, device, payload):
+        if binary_frames.is_binary(payload):
+            chunk = binary_frames.parse(payload)
+            session = self.sessions.add_binary_chunk(chunk)
+            if session is not None and session.assembler.is_complete():
+                self.sessions.finish(chunk.device, chunk.seq)
+                self.complete_frame(session.assembler, chunk.device, chunk.seq)
+        elif payload.startswith(b"IMG_START:"):
+            parts = payload.split(b":")
+            seq = int(parts[3]) if len(parts) > 3 else None
+            self.sessions.start(device, seq, int(parts[1]), int(parts[2]))
+        elif payload.startswith(b"IMG_CHUNK:"):
+            seq, index, data = parse_chunk(payload)
+            self.sessions.add_chunk(device, seq, index, data)
+        elif payload.startswith(b"IMG_END"):
+            seq = int(payload[8:]) if len(payload) > 8 else None
+            session = self.sessions.finish(device, seq)
+            if session is not None:
+                self.complete_frame(session.assembler, device, seq)
+
+    def complete_frame(self, assembler, device, seq):
+        if assembler.received == 0 or assembler.missing_chunks():
+            self.decode_errors += 1
+            return
+        # Every session has its own buffer, the view stays valid after finish()
+        meta = {"client_id": device, "seq": seq}
+        self.queue_frame(device, meta, assembler.finish(), "jpeg")
+
+    def queue_frame(self, device, meta, data, mode):
+        try:
+            self.decode_queue.put_nowait((device, meta, data, mode, time.time()))
+        except queue.Full:
+            self.decode_dropped += 1
+
+    # --- DECODE THREAD ---
+    def decrypt(self, data, mode):
+        if self.aes is None:
+            # Only needed for the AES cameras, so pycryptodome stays optional
+            from Crypto.Cipher import AES
+            from Crypto.Util.Padding import unpad
+            self.aes = (AES, unpad)
+        AES, unpad = self.aes
+        if mode == "aes-base64":
+            data = base64.b64decode(data)
+        return unpad(AES.new(AES_KEY, AES.MODE_CBC, AES_IV).decrypt(data), AES.block_size)
+
+    def decode_loop(self):
+        while True:
+            item = self.decode_queue.get()
+            if item is None:
+                break
+            device, meta, data, mode, received_at = item
+            start = time.perf_counter()
+            try:
+                jpeg = data if mode == "jpeg" else self.decrypt(data, mode)
+                if self.archive:
+                    self.archive.add(jpeg, device, meta)
+
+                image = Image.open(io.BytesIO(jpeg))
+                original_size = image.size
+                if image.format == "JPEG":
+                    image.draft("RGB", self.max_size)
+                image = image.convert("RGB")
+                if image.width > self.max_size[0] or image.height > self.max_size[1]:
+                    image.thumbnail(self.max_size, Image.Resampling.BILINEAR)
+
+                frame_meta = dict(meta, device=device, width=image.width, height=image.height,
+                                  mode="RGB", original_width=original_size[0],
+                                  original_height=original_size[1], received_at=received_at)
+                self.frames.publish(pack_frame(frame_meta, image.tobytes()), KIND_FRAME)
+                self.frames_decoded += 1
+                self.decode_seconds += time.perf_counter() - start
+            except Exception as e:
+                self.decode_errors += 1
+                print(f"❌ [{device}] Frame not decoded: {e}")
+
+    # --- MAIN THREAD ---
+    def report(self):
+        print(f"📊 messages {self.messages} | frames {self.frames_decoded} | "
+              f"decode errors {self.decode_errors} | decode queue full {self.decode_dropped} | "
+              f"in flight {len(self.sessions.sessions)}")
+        for ring in (self.detections, self.frames):
+            for consumer in ring.consumer_table():
+                if consumer["stale"]:
+                    continue
+                print(f"   {ring.name:<17} {consumer['name']:<24} lag {consumer['lag']:>5} | "
+                      f"received {consumer['received']:>7} | dropped {consumer['dropped']:>6}")
+
+    def start(self):
+        self.decoder.start()
+        if self.replay_args:
+            self.replayer = open_replay(self.replay_args, self.on_message)
+            self.replayer.start()
+            return
+        self.client.connect(self.broker, self.port, 60)
+        self.client.loop_start()
+
+    def stop(self):
+        if self.replayer:
+            self.replayer.stop()
+        else:
+            self.client.loop_stop()
+            self.client.disconnect()
+        if self.recorder:
+            self.recorder.close()
+        self.decode_queue.put(None)
+        self.decoder.join(timeout=2.0)
+        if self.archive:
+            self.archive.close()
+        self.detections.close()
+        self.frames.close()
+
+    def run(self):
+        self.start()
+        print(f"🚀 Ingest daemon running, rings {DETECTIONS_RING} and {FRAMES_RING}")
+        next_report = time.monotonic() + self.report_every
+        try:
+            while True:
+                time.sleep(1.0)
+                # Lets the clients tell a quiet daemon from a dead one
+                self.detections.heartbeat()
+                self.frames.heartbeat()
+                if time.monotonic() >= next_report:
+                    next_report += self.report_every
+                    self.report()
+        except KeyboardInterrupt:
+            print("\n🛑 Stopping ingest daemon...")
+        finally:
+            self.stop()
+
+
+def print_status():
+    for name in (DETECTIONS_RING, FRAMES_RING):
+        try:
+            status = ring_status(name)
+        except FileNotFoundError:
+            print(f"❌ {name}: not running")
+            continue
+        print(f"📦 {name}: {status['write_seq']} messages, {status['slot_count']} slots of "
+              f"{status['slot_size'] // 1024} KB, producer seen {status['producer_age_s']:.1f}s ago")
+        for consumer in status["consumers"]:
+            state = "stale" if consumer["stale"] else f"idle {consumer['idle_s']:.1f}s"
+            print(f"   {consumer['name']:<24} lag {consumer['lag']:>5} | received {consumer['received']:>7} | "
+                  f"dropped {consumer['dropped']:>6} | {state}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Single MQTT ingest with shared-memory fan-out")
+    parser.add_argument("--broker", default="broker.hivemq.com")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--text-frames", action="store_true", help="ask cameras for base64 text chunks")
+    parser.add_argument("--max-width", type=int, default=800, help="frames are scaled down to fit")
+    parser.add_argument("--max-height", type=int, default=600)
+    parser.add_argument("--frame-slots", type=int, default=16)
+    parser.add_argument("--archive", default=None, help="also archive every frame (image_archive.py)")
+    parser.add_argument("--report-every", type=float, default=10.0)
+    parser.add_argument("--status", action="store_true", help="print the rings of a running daemon and exit")
+    add_replay_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.status:
+        print_status()
+        return
+    IngestDaemon(args.broker, args.port, not args.text_frames, args.max_width, args.max_height,
+                 args.frame_slots, archive_root=args.archive, report_every=args.report_every,
+                 record_path=args.record, replay_args=args if args.replay else None).run()
+
+
+if __name__ == "__main__":
+    main()
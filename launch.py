@@ -0,0 +1,112 @@
+"""
+One entry point for the PC-side programs of this repo.
+
+    python launch.py catch --headless --dedup 5          Esp32ToPythonImageHiveMqComm/pythonCatch.py
+    python launch.py classify-gui --replay capture.mqlog Trial3/esp32_gui_ver3.py
+    python launch.py viewer --daemon                     Trial5/esp32_gui_ver5.py
+    python launch.py serial-gui                          Trial2/esp32_gui_ver2.py
+    python launch.py aes-receiver --headless             cameraCapturingSendingMQTT/trial2/pythonReceiverTkinter.py
+    python launch.py bench                               list the benchmarks
+    python launch.py bench replay --duration 5           receiverBench/bench_replay.py
+
+Everything after the subcommand goes to the program, which runs as if it
+had been started directly: same arguments and --help, its own folder first
+on sys.path. This file only uses the standard library; the programs import
+Tk, PIL, paho, pycryptodome, pyserial or NumPy on the code path that needs
+them, so --help, a replay or a --daemon viewer starts without the rest
+(python receiverBench/bench_startup.py measures it).
+"""
+
+import builtins
+import os
+import sys
+import types
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# subcommand -> (script, description)
+PROGRAMS = {
+    "catch": ("Esp32ToPythonImageHiveMqComm/pythonCatch.py",
+              "chunked image receiver: preview, archive, NACKs, host classifier"),
+    "classify-gui": ("Trial3/esp32_gui_ver3.py",
+                     "classification monitor with statistics and detection history"),
+    "viewer": ("Trial5/esp32_gui_ver5.py", "simple classification viewer"),
+    "serial-gui": ("Trial2/esp32_gui_ver2.py", "classification monitor and camera feed over USB serial"),
+    "aes-receiver": ("cameraCapturingSendingMQTT/trial2/pythonReceiverTkinter.py",
+                     "AES-encrypted image receiver with a Tk preview"),
+}
+
+# Folders searched for bench_<name>.py
+BENCH_FOLDERS = ("receiverBench", "Trial2", "Esp32ToPythonImageHiveMqComm")
+
+
+def benchmarks():
+    """name -> script path of every bench_*.py"""
+    found = {}
+    for folder in BENCH_FOLDERS:
+        for file_name in sorted(os.listdir(os.path.join(REPO_ROOT, folder))):
+            if file_name.startswith("bench_") and file_name.endswith(".py"):
+                found[file_name[len("bench_"):-len(".py")]] = f"{folder}/{file_name}"
+    return found
+
+
+def usage():
+    lines = ["usage: python launch.py <command> [arguments of the program]", "", "commands:"]
+    for name, (script, description) in PROGRAMS.items():
+        lines.append(f"  {name:<14}{description} ({script})")
+    lines.append(f"  {'bench':<14}run receiverBench/... benchmarks, 'bench' alone lists them")
+    lines.append("")
+    lines.append("'python launch.py <command> --help' shows the program's own options")
+    return "\n".join(lines)
+
+
+def run_script(script, args):
+    """Run a repo script as __main__, the way 'python <script> <args>' would"""
+    path = os.path.join(REPO_ROOT, *script.split("/"))
+    sys.argv = [path] + list(args)
+    sys.path.insert(0, os.path.dirname(path))
+    with open(path, "rb") as f:
+        code = compile(f.read(), path, "exec")
+    # The program becomes __main__ (pickle and multiprocessing look it up
+    # there); runpy would do the same but costs ~15 ms of imports
+    module = types.ModuleType("__main__")
+    module.__file__ = path
+    module.__builtins__ = builtins
+    sys.modules["__main__"] = module
+    exec(code, module.__dict__)
+
+
+def run_bench(args):
+    found = benchmarks()
+    if not args or args[0] in ("-h", "--help"):
+        print("usage: python launch.py bench <name> [arguments], names:")
+        for name, script in found.items():
+            print(f"  {name.replace('_', '-'):<18}{script}")
+        return 0
+    name = args[0].replace("-", "_")
+    if name.startswith("bench_"):
+        name = name[len("bench_"):]
+    if name not in found:
+        print(f"unknown benchmark '{args[0]}', 'python launch.py bench' lists them", file=sys.stderr)
+        return 2
+    run_script(found[name], args[1:])
+    return 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+    command, args = argv[0], argv[1:]
+    if command == "bench":
+        return run_bench(args)
+    if command not in PROGRAMS:
+        print(f"unknown command '{command}'\n\n{usage()}", file=sys.stderr)
+        return 2
+    run_script(PROGRAMS[command][0], args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
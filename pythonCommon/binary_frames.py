@@ -0,0 +1,112 @@
+"""
+Compact binary framing, accepted next to the legacy IMG_* text protocol.
+
+Every MQTT message is one chunk with a fixed 24-byte little-endian header
+followed by the raw (not base64) payload:
+
+    offset  size  field
+    0       2     magic b"\\xE5\\x32"  (never valid UTF-8 text, so detection is exact)
+    2       1     version (1)
+    3       1     flags   (FLAG_AES, FLAG_META)
+    4       4     device id   (uint32, e.g. low 32 bits of the ESP32 efuse MAC)
+    8       4     frame seq   (uint32)
+    12      2     chunk index (uint16)
+    14      2     total chunks (uint16)
+    16      4     image size  (uint32, bytes of the whole reassembled payload)
+    20      4     CRC-32 of this chunk's payload
+    24      ...   payload
+
+Every chunk carries the frame size and chunk count, so there is no separate
+start/end message: a frame is complete when all of its chunks are in.
+
+FLAG_META: the reassembled payload starts with a uint16 length and that many
+bytes of JSON metadata (label, confidence, ...), followed by the image.
+FLAG_AES:  the image part is AES-CBC ciphertext (trial2).
+
+pythonCatch.py reassembles multi-chunk frames; the trial2 receiver expects
+each frame in a single chunk, like its JSON messages.
+"""
+
+import json
+import struct
+import zlib
+
+MAGIC = b"\xE5\x32"
+VERSION = 1
+HEADER = struct.Struct("<2sBBIIHHII")
+HEADER_SIZE = HEADER.size
+
+FLAG_AES = 0x01
+FLAG_META = 0x02
+
+
+class FrameError(ValueError):
+    pass
+
+
+class BinaryChunk:
+    __slots__ = ("flags", "device_id", "seq", "index", "total", "image_size", "payload")
+
+    def __init__(self, flags, device_id, seq, index, total, image_size, payload):
+        self.flags = flags
+        self.device_id = device_id
+        self.seq = seq
+        self.index = index
+        self.total = total
+        self.image_size = image_size
+        self.payload = payload
+
+    @property
+    def device(self):
+        # Same naming as deviceId in sketch.ino
+        return f"cam-{self.device_id:x}"
+
+
+def is_binary(payload):
+    return payload[:2] == MAGIC
+
+
+def parse(payload):
+    """Parse and CRC-check one binary chunk. payload stays a zero-copy memoryview"""
+    if len(payload) < HEADER_SIZE:
+        raise FrameError("binary chunk shorter than its header")
+    magic, version, flags, device_id, seq, index, total, image_size, crc = \
+        HEADER.unpack_from(payload)
+    if magic != MAGIC:
+        raise FrameError("bad magic")
+    if version != VERSION:
+        raise FrameError(f"unsupported binary frame version {version}")
+    if index >= total:
+        raise FrameError(f"chunk index {index} >= total {total}")
+    data = memoryview(payload)[HEADER_SIZE:]
+    if zlib.crc32(data) != crc:
+        raise FrameError(f"CRC mismatch in chunk {index}")
+    return BinaryChunk(flags, device_id, seq, index, total, image_size, data)
+
+
+def pack(device_id, seq, index, total, image_size, data, flags=0):
+    """Build one binary chunk (used by the simulators and benchmarks)"""
+    return HEADER.pack(MAGIC, VERSION, flags, device_id, seq, index, total,
+                       image_size, zlib.crc32(data)) + bytes(data)
+
+
+def pack_frame(device_id, seq, image, chunk_size=1000, flags=0, meta=None):
+    """Split a whole payload into binary chunk messages"""
+    if meta is not None:
+        meta_bytes = json.dumps(meta).encode('utf-8')
+        image = struct.pack("<H", len(meta_bytes)) + meta_bytes + bytes(image)
+        flags |= FLAG_META
+    total = max(1, (len(image) + chunk_size - 1) // chunk_size)
+    return [pack(device_id, seq, i, total, len(image),
+                 image[i * chunk_size:(i + 1) * chunk_size], flags)
+            for i in range(total)]
+
+
+def split_meta(frame):
+    """(meta dict, image memoryview) of a reassembled FLAG_META payload"""
+    frame = memoryview(frame)
+    if len(frame) < 2:
+        raise FrameError("frame too short for metadata")
+    (meta_len,) = struct.unpack_from("<H", frame)
+    meta = json.loads(bytes(frame[2:2 + meta_len]))
+    return meta, frame[2 + meta_len:]
@@ -0,0 +1,306 @@
+"""
+Append-only detection history in SQLite (WAL mode).
+
+Detections from on_message are queued and written by one background thread
+in batched transactions, so neither the MQTT thread nor the Tk loop ever
+waits on disk. A per-minute rollup table is kept in the same transaction so
+per-label counts stay fast no matter how many rows are stored.
+
+query from a terminal:
+    python pythonCommon/detection_store.py detections.db --client cam-3 --label bottle --minutes 60
+    python pythonCommon/detection_store.py detections.db --counts --minutes 60
+"""
+
+import argparse
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY,
+    ts INTEGER NOT NULL,            -- host receive time, ms since epoch
+    device_ts INTEGER,              -- 'timestamp' field sent by the ESP32
+    client_id TEXT NOT NULL,
+    label TEXT NOT NULL,
+    confidence REAL,
+    inference_time REAL,
+    raw TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_detections_ts ON detections (ts);
+CREATE INDEX IF NOT EXISTS idx_detections_client ON detections (client_id, label, ts);
+CREATE INDEX IF NOT EXISTS idx_detections_label ON detections (label, ts);
+CREATE INDEX IF NOT EXISTS idx_detections_client_ts ON detections (client_id, ts);
+
+CREATE TABLE IF NOT EXISTS label_counts (
+    minute INTEGER NOT NULL,        -- ts // 60000
+    client_id TEXT NOT NULL,
+    label TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (minute, client_id, label)
+) WITHOUT ROWID;
+"""
+
+MINUTE_MS = 60 * 1000
+
+# Raised while binding one row's values, not by the database itself
+BAD_VALUE_ERRORS = (OverflowError, ValueError, TypeError, sqlite3.InterfaceError,
+                    sqlite3.ProgrammingError)
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+class DetectionStore:
+    def __init__(self, path="detections.db", batch_size=500, flush_interval=0.5,
+                 max_pending=100000, keep_raw=True, read_only=False):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.keep_raw = keep_raw
+
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.readers = threading.local()
+        self.written = 0
+        self.dropped = 0
+        # Rows of batches SQLite refused (locked database, disk full, ...)
+        self.failed = 0
+        self.failed_batches = 0
+        # Rows with a value SQLite cannot bind (an integer >= 2**63, a list...)
+        self.bad_rows = 0
+        self.stopping = False
+        self.writer = None
+        if read_only:
+            return
+
+        # Create the schema before the writer starts
+        conn = self.connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+
+        self.writer = threading.Thread(target=self.write_loop, daemon=True)
+        self.writer.start()
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # --- WRITING ---
+    def add(self, data, received_ms=None):
+        """Queue one classification message (dict). Never blocks"""
+        received_ms = now_ms() if received_ms is None else received_ms
+        row = (
+            received_ms,
+            data.get('timestamp'),
+            str(data.get('client_id', 'unknown')),
+            str(data.get('label', 'unknown')),
+            data.get('confidence'),
+            data.get('inference_time'),
+            json.dumps(data) if self.keep_raw else None,
+        )
+        try:
+            self.pending.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def write_loop(self):
+        conn = self.connect()
+        running = True
+        while running:
+            batch = []
+            try:
+                item = self.pending.get(timeout=self.flush_interval)
+                if item is None:
+                    running = False
+                else:
+                    batch.append(item)
+            except queue.Empty:
+                # close() could not queue its sentinel: stop once drained
+                if self.stopping:
+                    break
+                continue
+
+            # Collect whatever else is waiting, up to one batch
+            while running and len(batch) < self.batch_size:
+                try:
+                    item = self.pending.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                else:
+                    batch.append(item)
+
+            if batch:
+                try:
+                    self.write_batch(conn, batch)
+                except (sqlite3.Error, OverflowError, ValueError, TypeError) as e:
+                    # Keep the writer alive, the next batch may go through
+                    self.failed += len(batch)
+                    self.failed_batches += 1
+                    print(f"⚠️ Detection batch of {len(batch)} not stored: {e}")
+        conn.close()
+
+    def write_batch(self, conn, batch):
+        try:
+            self.insert_batch(conn, batch)
+        except BAD_VALUE_ERRORS:
+            # The values come off the network: find the rows that cannot be
+            # bound and store the others
+            good = []
+            for row in batch:
+                try:
+                    conn.execute("SELECT ?, ?, ?, ?, ?, ?, ?", row)
+                except BAD_VALUE_ERRORS:
+                    self.bad_rows += 1
+                else:
+                    good.append(row)
+            if good:
+                self.insert_batch(conn, good)
+
+    def insert_batch(self, conn, batch):
+        counts = {}
+        for row in batch:
+            key = (row[0] // MINUTE_MS, row[2], row[3])
+            counts[key] = counts.get(key, 0) + 1
+
+        with conn:
+            conn.executemany(
+                "INSERT INTO detections (ts, device_ts, client_id, label, confidence, "
+                "inference_time, raw) VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+            conn.executemany(
+                "INSERT INTO label_counts (minute, client_id, label, count) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (minute, client_id, label) DO UPDATE SET count = count + excluded.count",
+                [key + (count,) for key, count in counts.items()])
+        self.written += len(batch)
+
+    def close(self, timeout=10.0):
+        """Flush everything still queued and stop the writer, waiting at most
+        about timeout seconds for each"""
+        if self.writer:
+            self.stopping = True
+            try:
+                self.pending.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self.writer.join(timeout)
+            if self.writer.is_alive():
+                print(f"⚠️ Detection store still writing, {self.pending.qsize()} detections not flushed")
+
+    # --- READING (safe from any thread, WAL readers don't block the writer) ---
+    def reader(self):
+        conn = getattr(self.readers, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            self.readers.conn = conn
+        return conn
+
+    def query(self, client_id=None, label=None, since_ms=None, until_ms=None, limit=None):
+        """Detections matching the filters, newest first"""
+        sql = "SELECT ts, device_ts, client_id, label, confidence, inference_time FROM detections"
+        where, params = self.filters(client_id, label, since_ms, until_ms)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self.reader().execute(sql, params).fetchall()
+
+    def label_counts(self, client_id=None, since_ms=None, until_ms=None):
+        """{label: count} over a time range, using the minute rollup for whole minutes"""
+        counts = {}
+        conn = self.reader()
+
+        def count_raw(start, end):
+            if start >= end:
+                return
+            where, params = self.filters(client_id, None, start, end)
+            rows = conn.execute("SELECT label, COUNT(*) FROM detections WHERE "
+                                + " AND ".join(where) + " GROUP BY label", params)
+            for label, count in rows:
+                counts[label] = counts.get(label, 0) + count
+
+        first_minute = None if since_ms is None else -(-since_ms // MINUTE_MS)
+        last_minute = None if until_ms is None else until_ms // MINUTE_MS
+
+        # A range inside a single minute has no whole minutes to roll up
+        if first_minute is not None and last_minute is not None and first_minute >= last_minute:
+            count_raw(since_ms, until_ms)
+            return counts
+
+        # Whole minutes come from the rollup table
+        where, params = [], []
+        if client_id is not None:
+            where.append("client_id = ?")
+            params.append(client_id)
+        if first_minute is not None:
+            where.append("minute >= ?")
+            params.append(first_minute)
+        if last_minute is not None:
+            where.append("minute < ?")
+            params.append(last_minute)
+        sql = "SELECT label, SUM(count) FROM label_counts"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        for label, count in conn.execute(sql + " GROUP BY label", params):
+            counts[label] = counts.get(label, 0) + count
+
+        # The partial minutes at either edge are counted from the raw rows
+        if since_ms is not None:
+            count_raw(since_ms, first_minute * MINUTE_MS)
+        if until_ms is not None:
+            count_raw(last_minute * MINUTE_MS, until_ms)
+        return counts
+
+    @staticmethod
+    def filters(client_id, label, since_ms, until_ms):
+        where, params = [], []
+        if client_id is not None:
+            where.append("client_id = ?")
+            params.append(client_id)
+        if label is not None:
+            where.append("label = ?")
+            params.append(label)
+        if since_ms is not None:
+            where.append("ts >= ?")
+            params.append(since_ms)
+        if until_ms is not None:
+            where.append("ts < ?")
+            params.append(until_ms)
+        return where, params
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the detection history")
+    parser.add_argument("db", nargs="?", default="detections.db")
+    parser.add_argument("--client", help="client_id, e.g. cam-3")
+    parser.add_argument("--label", help="e.g. bottle")
+    parser.add_argument("--minutes", type=float, help="only the last N minutes")
+    parser.add_argument("--counts", action="store_true", help="per-label counts instead of rows")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    since_ms = now_ms() - int(args.minutes * MINUTE_MS) if args.minutes else None
+    store = DetectionStore(args.db, read_only=True)
+
+    start = time.perf_counter()
+    if args.counts:
+        result = store.label_counts(args.client, since_ms)
+        for label, count in sorted(result.items()):
+            print(f"{label:<15} {count}")
+    else:
+        for ts, device_ts, client_id, label, confidence, inference_time in \
+                store.query(args.client, args.label, since_ms, limit=args.limit):
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts / 1000))
+            print(f"{when}  {client_id:<12} {label:<10} {confidence or 0:.2f}")
+    print(f"({(time.perf_counter() - start) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Training images decoded once into a memory-mapped NumPy file.
+
+    frame_dataset/
+        images.npy    uint8 (count, size, size, 3), np.load(..., mmap_mode="r")
+        index.db      row -> sha256, label, source, ts
+
+JPEGs are decoded, turned 180 degrees (the camera is mounted upside down)
+and resized in a process pool, once. Training and evaluation then index
+straight into the memmap: a row is a view into the page cache, no JPEG is
+ever decoded again.
+
+New frames are appended in place. The .npy header is written with a fixed
+length, so only the row count in it changes; nothing is rebuilt. Frames are
+keyed by the SHA-256 of their JPEG bytes (same as image_archive.py), so
+appending the same archive twice adds nothing.
+
+    python pythonCommon/frame_dataset.py build Trial1/images --out frame_dataset
+    python pythonCommon/frame_dataset.py append-archive received_images --out frame_dataset
+    python pythonCommon/frame_dataset.py info frame_dataset
+"""
+
+import argparse
+import glob
+import hashlib
+import io
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rows (
+    row INTEGER PRIMARY KEY,        -- index into images.npy
+    sha256 TEXT NOT NULL UNIQUE,    -- of the source JPEG
+    label TEXT NOT NULL,
+    source TEXT NOT NULL,
+    ts INTEGER NOT NULL             -- capture/receive time, ms since epoch
+);
+CREATE INDEX IF NOT EXISTS idx_rows_label ON rows (label);
+CREATE TABLE IF NOT EXISTS info (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Fixed .npy header length, so the shape can be rewritten in place
+HEADER_SIZE = 128
+
+
+def prepare_image(jpeg, size=96, flip=True):
+    """JPEG bytes -> (size, size, 3) uint8 bytes, upright"""
+    image = Image.open(io.BytesIO(jpeg))
+    if image.format == "JPEG":
+        image.draft("RGB", (size, size))
+    image = image.convert("RGB")
+    if flip:
+        image = image.transpose(Image.Transpose.ROTATE_180)
+    if image.size != (size, size):
+        image = image.resize((size, size), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    return image.tobytes()
+
+
+def _prepare_job(job):
+    # Module level so the process pool can pickle it
+    jpeg, size, flip = job
+    try:
+        return prepare_image(jpeg, size, flip)
+    except (OSError, ValueError):
+        return None
+
+
+def write_npy_header(f, count, size):
+    header = {"descr": "|u1", "fortran_order": False, "shape": (count, size, size, 3)}
+    text = repr(header).encode("latin1")
+    # magic + version (1.0) + uint16 length + dict, space padded, ends in \n
+    length = HEADER_SIZE - 10
+    if len(text) + 1 > length:
+        raise ValueError("dataset too large for the fixed header")
+    f.seek(0)
+    f.write(b"\x93NUMPY\x01\x00" + length.to_bytes(2, "little")
+            + text + b" " * (length - len(text) - 1) + b"\n")
+
+
+class FrameDataset:
+    def __init__(self, root="frame_dataset", size=96, flip=True):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.images_path = os.path.join(root, "images.npy")
+        self.conn = sqlite3.connect(os.path.join(root, "index.db"))
+        self.conn.executescript(SCHEMA)
+
+        stored = dict(self.conn.execute("SELECT key, value FROM info"))
+        # The image geometry is fixed by the first build
+        self.size = int(stored.get("size", size))
+        self.flip = stored.get("flip", str(int(flip))) == "1"
+        self.conn.execute("INSERT OR IGNORE INTO info VALUES ('size', ?)", (str(self.size),))
+        self.conn.execute("INSERT OR IGNORE INTO info VALUES ('flip', ?)", (str(int(self.flip)),))
+        self.conn.commit()
+
+        if not os.path.exists(self.images_path):
+            with open(self.images_path, "wb") as f:
+                write_npy_header(f, 0, self.size)
+        self.count = self.read_count()
+
+        # Rows past the header count were never finished (crash during append)
+        self.conn.execute("DELETE FROM rows WHERE row >= ?", (self.count,))
+        self.conn.commit()
+        self.images = None
+        self.labels = None
+        self.label_names = None
+
+    @property
+    def row_bytes(self):
+        return self.size * self.size * 3
+
+    def read_count(self):
+        with open(self.images_path, "rb") as f:
+            np.lib.format.read_magic(f)
+            shape, _, _ = np.lib.format.read_array_header_1_0(f)
+        return shape[0]
+
+    # --- WRITING ---
+    def append_files(self, items, workers=None, chunk=256):
+        """Decode [(label, path, ts_ms)] in parallel and append the new ones.
+        Returns (added, skipped, failed)"""
+        known = {sha for (sha,) in self.conn.execute("SELECT sha256 FROM rows")}
+        added = skipped = failed = 0
+
+        with ProcessPoolExecutor(max_workers=workers) as pool, \
+                open(self.images_path, "r+b") as f:
+            f.seek(HEADER_SIZE + self.count * self.row_bytes)
+            new_rows = []
+            for start in range(0, len(items), chunk):
+                # Hash here so frames already in the dataset are never decoded
+                fresh, jobs = [], []
+                for label, path, item_ts in items[start:start + chunk]:
+                    with open(path, "rb") as src:
+                        jpeg = src.read()
+                    sha = hashlib.sha256(jpeg).hexdigest()
+                    if sha in known:
+                        skipped += 1
+                        continue
+                    known.add(sha)
+                    fresh.append((sha, label, path, item_ts))
+                    jobs.append((jpeg, self.size, self.flip))
+
+                for (sha, label, path, item_ts), pixels in zip(
+                        fresh, pool.map(_prepare_job, jobs, chunksize=8)):
+                    if pixels is None:
+                        failed += 1
+                        continue
+                    f.write(pixels)
+                    new_rows.append((self.count + len(new_rows), sha, label, path, item_ts))
+            if not new_rows:
+                return added, skipped, failed
+
+            # Pixels first, then the index, then the count that makes them visible
+            f.flush()
+            os.fsync(f.fileno())
+            self.conn.executemany("INSERT INTO rows VALUES (?, ?, ?, ?, ?)", new_rows)
+            self.conn.commit()
+            self.count += len(new_rows)
+            write_npy_header(f, self.count, self.size)
+            f.flush()
+            os.fsync(f.fileno())
+            added = len(new_rows)
+
+        # Readers reopen the memmap with the new length
+        self.images = None
+        return added, skipped, failed
+
+    def append_folder(self, folder, workers=None):
+        """images_of_<label>/*.jpg, the Trial1 layout"""
+        items = []
+        for path in sorted(glob.glob(os.path.join(folder, "images_of_*", "*.jpg"))):
+            label = os.path.basename(os.path.dirname(path))[len("images_of_"):]
+            items.append((label, path, int(os.path.getmtime(path) * 1000)))
+        return self.append_files(items, workers)
+
+    def append_archive(self, archive_root, min_confidence=0.0, workers=None):
+        """Labelled frames from an image_archive.py manifest (trial2 receivers)"""
+        manifest = os.path.join(archive_root, "manifest.db")
+        conn = sqlite3.connect(f"file:{manifest}?mode=ro", uri=True)
+        rows = conn.execute(
+            "SELECT MIN(frames.ts), frames.label, blobs.path FROM frames "
+            "JOIN blobs ON blobs.sha256 = frames.sha256 "
+            "WHERE frames.label IS NOT NULL AND frames.confidence >= ? "
+            "GROUP BY frames.sha256 ORDER BY MIN(frames.ts)",
+            (min_confidence,)).fetchall()
+        conn.close()
+        items = [(label, os.path.join(archive_root, path), ts) for ts, label, path in rows]
+        return self.append_files(items, workers)
+
+    # --- READING ---
+    def open(self):
+        """Memory-map images and load the label index (cheap, call again after appends)"""
+        if self.count:
+            self.images = np.load(self.images_path, mmap_mode="r")
+        else:
+            self.images = np.empty((0, self.size, self.size, 3), dtype=np.uint8)
+        names = [label for (label,) in self.conn.execute(
+            "SELECT DISTINCT label FROM rows ORDER BY label")]
+        lookup = {name: i for i, name in enumerate(names)}
+        labels = np.empty(self.count, dtype=np.int16)
+        for row, label in self.conn.execute("SELECT row, label FROM rows"):
+            labels[row] = lookup[label]
+        self.labels = labels
+        self.label_names = names
+        return self
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, row):
+        """(image view, label index), no copy for a single row"""
+        if self.images is None:
+            self.open()
+        return self.images[row], self.labels[row]
+
+    def batches(self, batch_size=32, shuffle=True, seed=None, rows=None):
+        """(images, labels) batches; sorting each batch's rows keeps the
+        page reads mostly sequential"""
+        if self.images is None:
+            self.open()
+        rows = np.arange(self.count) if rows is None else np.asarray(rows)
+        if shuffle:
+            rows = np.random.default_rng(seed).permutation(rows)
+        for start in range(0, len(rows), batch_size):
+            batch = np.sort(rows[start:start + batch_size])
+            yield self.images[batch], self.labels[batch]
+
+    def label_counts(self):
+        return dict(self.conn.execute("SELECT label, COUNT(*) FROM rows GROUP BY label ORDER BY label"))
+
+    def close(self):
+        self.images = None
+        self.conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory-mapped training dataset")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="add an images_of_<label>/ folder (Trial1 layout)")
+    build.add_argument("folder")
+    build.add_argument("--out", default="frame_dataset")
+    build.add_argument("--size", type=int, default=96)
+    build.add_argument("--no-flip", action="store_true", help="images are already upright")
+    build.add_argument("--workers", type=int, default=None)
+
+    archive = sub.add_parser("append-archive", help="add labelled frames from an image archive")
+    archive.add_argument("archive")
+    archive.add_argument("--out", default="frame_dataset")
+    archive.add_argument("--min-confidence", type=float, default=0.0)
+    archive.add_argument("--workers", type=int, default=None)
+
+    info = sub.add_parser("info", help="row and label counts")
+    info.add_argument("dataset")
+
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    if args.command == "build":
+        dataset = FrameDataset(args.out, size=args.size, flip=not args.no_flip)
+        added, skipped, failed = dataset.append_folder(args.folder, args.workers)
+    elif args.command == "append-archive":
+        dataset = FrameDataset(args.out)
+        added, skipped, failed = dataset.append_archive(args.archive, args.min_confidence, args.workers)
+    else:
+        dataset = FrameDataset(args.dataset)
+        print(f"📦 {len(dataset)} images {dataset.size}x{dataset.size} (flip {dataset.flip}) "
+              f"{dataset.label_counts()}")
+        dataset.close()
+        return
+
+    print(f"✅ added {added}, already there {skipped}, unreadable {failed} in "
+          f"{time.perf_counter() - start:.2f}s -> {len(dataset)} images {dataset.label_counts()}")
+    dataset.close()
+
+
+if __name__ == "__main__":
+    main()
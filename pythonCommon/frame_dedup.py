@@ -0,0 +1,172 @@
+"""
+Near-duplicate frame suppression: a camera looking at an empty conveyor
+sends the same picture over and over, and every copy used to be decoded at
+full size, resized, shown, written to the archive and classified.
+
+Each frame gets a 64-bit perceptual hash from a heavily downscaled decode:
+Pillow's draft() lets the JPEG decoder work at 1/8 scale (only the DC
+coefficients), so a 240x240 frame costs a 30x30 decode instead of a full
+one. A frame whose hash is within `threshold` bits of the last frame kept
+for the same device is skipped. The comparison is against the last *kept*
+frame, not the previous one, so a slow drift (light changing over minutes)
+still produces a new frame once it adds up; refresh_s keeps one frame per
+interval anyway, so the display and the archive never look stale.
+
+    dhash  brightness gradient between neighbouring pixels of a 9x8 thumbnail
+           (default: ignores overall exposure changes, sensitive to shapes)
+    ahash  pixels of an 8x8 thumbnail above / below its mean
+
+CPU saved is an estimate: the receiver reports what a kept frame cost it
+(kept(), thread CPU time), a skipped frame is counted at the running
+average of that, and the time spent hashing every frame is reported next
+to it.
+
+    python Esp32ToPythonImageHiveMqComm/pythonCatch.py --dedup 5
+    python receiverBench/bench_frame_dedup.py
+"""
+
+import io
+import threading
+import time
+
+HASH_SIZE = 8
+
+
+def thumbnail(data, width, height):
+    """Grayscale width x height of a JPEG, decoded at the smallest scale that covers it"""
+    from PIL import Image
+    image = Image.open(io.BytesIO(data))
+    if image.format == "JPEG":
+        image.draft("L", (width * 2, height * 2))
+    return image.convert("L").resize((width, height), Image.BILINEAR)
+
+
+def dhash(data):
+    pixels = thumbnail(data, HASH_SIZE + 1, HASH_SIZE).tobytes()
+    value = 0
+    for row in range(HASH_SIZE):
+        line = pixels[row * (HASH_SIZE + 1):(row + 1) * (HASH_SIZE + 1)]
+        for x in range(HASH_SIZE):
+            value = (value << 1) | (line[x] > line[x + 1])
+    return value
+
+
+def ahash(data):
+    pixels = thumbnail(data, HASH_SIZE, HASH_SIZE).tobytes()
+    mean = sum(pixels) / len(pixels)
+    value = 0
+    for pixel in pixels:
+        value = (value << 1) | (pixel > mean)
+    return value
+
+
+HASHES = {"dhash": dhash, "ahash": ahash}
+
+
+def distance(a, b):
+    """Hamming distance between two hashes"""
+    return bin(a ^ b).count("1")
+
+
+class DuplicateFilter:
+    """Per-device near-duplicate check, callable from several threads"""
+
+    def __init__(self, threshold=5, refresh_s=10.0, method="dhash"):
+        if method not in HASHES:
+            raise ValueError(f"method must be one of {tuple(HASHES)}")
+        self.threshold = threshold
+        self.refresh_s = refresh_s
+        self.method = method
+        self.hash = HASHES[method]
+        self.lock = threading.Lock()
+
+        # device -> (hash, monotonic time) of the last kept frame
+        self.last = {}
+
+        # Statistics
+        self.frames = 0
+        self.skipped = 0
+        self.errors = 0
+        self.hash_seconds = 0.0
+        self.saved_seconds = 0.0
+        self.frame_cost = None
+
+    def is_duplicate(self, device, data):
+        """True if the frame should be skipped; a kept frame becomes the
+        device's new reference"""
+        start = time.thread_time()
+        try:
+            value = self.hash(data)
+        except Exception:
+            # Broken frame: let the normal path report it
+            self.errors += 1
+            return False
+        spent = time.thread_time() - start
+        now = time.monotonic()
+        with self.lock:
+            self.frames += 1
+            self.hash_seconds += spent
+            last = self.last.get(device)
+            if (last is not None and now - last[1] < self.refresh_s and
+                    distance(value, last[0]) <= self.threshold):
+                self.skipped += 1
+                self.saved_seconds += self.frame_cost or 0.0
+                return True
+            self.last[device] = (value, now)
+            return False
+
+    def kept(self, seconds):
+        """CPU the receiver spent on a frame it did not skip"""
+        with self.lock:
+            if self.frame_cost is None:
+                self.frame_cost = seconds
+            else:
+                self.frame_cost += 0.1 * (seconds - self.frame_cost)
+
+    def skip_ratio(self):
+        return self.skipped / self.frames if self.frames else 0.0
+
+    def register(self, registry):
+        """Export the counters on a metrics.MetricsRegistry"""
+        registry.counter("receiver_dedup_frames_total", "Frames checked for near-duplicates, by outcome",
+                         label="outcome", function=lambda: {"kept": self.frames - self.skipped,
+                                                            "skipped": self.skipped,
+                                                            "unreadable": self.errors})
+        registry.gauge("receiver_dedup_skip_ratio", "Share of checked frames skipped as near-duplicates",
+                       function=self.skip_ratio)
+        registry.counter("receiver_dedup_cpu_saved_seconds_total",
+                         "Estimated CPU not spent on skipped frames (average cost of a kept frame)",
+                         function=lambda: self.saved_seconds)
+        registry.counter("receiver_dedup_hash_seconds_total", "CPU spent hashing frames",
+                         function=lambda: self.hash_seconds)
+
+    def report(self):
+        return (f"skipped {self.skipped}/{self.frames} near-duplicates ({self.skip_ratio():.0%}), "
+                f"~{self.saved_seconds:.1f}s CPU saved for {self.hash_seconds:.1f}s hashing")
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "skip_ratio": self.skip_ratio(),
+            "hash_seconds": self.hash_seconds,
+            "saved_seconds": self.saved_seconds,
+            "frame_cost_ms": self.frame_cost * 1000 if self.frame_cost is not None else None,
+        }
+
+
+def add_dedup_arguments(parser):
+    """--dedup / --dedup-refresh for the receivers"""
+    parser.add_argument("--dedup", type=int, default=None, metavar="BITS",
+                        help="skip frames whose perceptual hash is within BITS (of 64) of the last "
+                             "kept frame from the same camera, e.g. 5")
+    parser.add_argument("--dedup-refresh", type=float, default=10.0, metavar="S",
+                        help="keep one frame per camera every S seconds even if nothing changed")
+
+
+def open_dedup(args):
+    """DuplicateFilter for the parsed arguments, None without --dedup"""
+    if args.dedup is None:
+        return None
+    return DuplicateFilter(args.dedup, refresh_s=args.dedup_refresh)
@@ -0,0 +1,24 @@
+"""
+Helpers for running a receiver without a window (--headless): the main
+thread just waits for Ctrl+C or SIGTERM (systemd stop, docker stop) while
+the MQTT and worker threads do the work, printing a status line now and then.
+"""
+
+import signal
+import threading
+
+
+def wait_for_shutdown(report=None, every=30.0, stop=None):
+    """Block until Ctrl+C, SIGTERM or stop (a threading.Event, e.g. the end
+    of a --replay) is set; print report() every `every` seconds"""
+    stop = threading.Event() if stop is None else stop
+    previous = signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    try:
+        while not stop.wait(every):
+            if report:
+                print(report())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+    print("🛑 Shutting down...")
@@ -0,0 +1,278 @@
+"""
+Bottle vs clipBox on the PC, as a second opinion next to the Edge Impulse
+result the ESP32 sends.
+
+The model is softmax regression on a 24x24 RGB thumbnail, all in NumPy:
+one matrix multiply classifies a whole batch. BatchClassifier collects
+frames from every camera and runs them together, flushing early enough
+that the oldest frame is answered within deadline_ms.
+
+    python pythonCommon/host_classifier.py train --out host_model.npz
+    python pythonCommon/host_classifier.py predict host_model.npz some.jpg
+"""
+
+import argparse
+import glob
+import io
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+IMAGES_FOLDER = os.path.join(REPO_ROOT, "Trial1", "images")
+THUMB_SIZE = 24
+
+
+def extract_features(image_bytes, size=THUMB_SIZE, out=None):
+    """JPEG -> flat float32 RGB thumbnail in [0, 1], written into out if given"""
+    image = Image.open(io.BytesIO(image_bytes))
+    if image.format == "JPEG":
+        # libjpeg does the coarse downscale while decoding
+        image.draft("RGB", (size, size))
+    image = image.convert("RGB").resize((size, size), Image.Resampling.BILINEAR)
+    pixels = np.frombuffer(image.tobytes(), dtype=np.uint8)
+    if out is None:
+        out = np.empty(pixels.size, dtype=np.float32)
+    np.multiply(pixels, 1.0 / 255, out=out, casting="unsafe")
+    return out
+
+
+def load_labelled_images(folder=IMAGES_FOLDER):
+    """[(label, path)] from images_of_<label>/<label>_<ms>.jpg"""
+    items = []
+    for path in sorted(glob.glob(os.path.join(folder, "images_of_*", "*.jpg"))):
+        label = os.path.basename(os.path.dirname(path))[len("images_of_"):]
+        items.append((label, path))
+    if not items:
+        raise FileNotFoundError(f"No labelled JPEGs under {folder}")
+    return items
+
+
+class LinearClassifier:
+    """Softmax regression on standardized thumbnail pixels"""
+
+    def __init__(self, weights, bias, mean, scale, labels, size=THUMB_SIZE):
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.mean = mean.astype(np.float32)
+        self.scale = scale.astype(np.float32)
+        self.labels = list(labels)
+        self.size = size
+
+        # Fold the standardization into the weights: one matmul per batch
+        self.folded_weights = self.weights / self.scale[:, None]
+        self.folded_bias = self.bias - self.mean / self.scale @ self.weights
+
+    @classmethod
+    def train(cls, features, targets, labels, epochs=400, learning_rate=0.5,
+              l2=1e-3, size=THUMB_SIZE):
+        """Full-batch gradient descent, targets are indexes into labels"""
+        mean = features.mean(axis=0)
+        scale = features.std(axis=0) + 1e-3
+        x = (features - mean) / scale
+        n, d = x.shape
+        k = len(labels)
+        onehot = np.eye(k, dtype=np.float32)[targets]
+
+        weights = np.zeros((d, k), dtype=np.float32)
+        bias = np.zeros(k, dtype=np.float32)
+        for _ in range(epochs):
+            probs = softmax(x @ weights + bias)
+            error = (probs - onehot) / n
+            weights -= learning_rate * (x.T @ error + l2 * weights)
+            bias -= learning_rate * error.sum(axis=0)
+        return cls(weights, bias, mean, scale, labels, size)
+
+    def predict_proba(self, features):
+        """(n, d) features -> (n, classes) probabilities"""
+        return softmax(features @ self.folded_weights + self.folded_bias)
+
+    def predict(self, features):
+        probs = self.predict_proba(features)
+        best = probs.argmax(axis=1)
+        return [(self.labels[i], float(probs[row, i])) for row, i in enumerate(best)]
+
+    def save(self, path):
+        np.savez(path, weights=self.weights, bias=self.bias, mean=self.mean,
+                 scale=self.scale, labels=np.array(self.labels), size=self.size)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["weights"], data["bias"], data["mean"], data["scale"],
+                       [str(label) for label in data["labels"]], int(data["size"]))
+
+
+def softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    np.exp(logits, out=logits)
+    logits /= logits.sum(axis=1, keepdims=True)
+    return logits
+
+
+def build_training_set(items, size=THUMB_SIZE, mirror=True):
+    """Features and label indexes for [(label, path)], mirrored copies added
+    when mirror is set (the objects look the same left-right)"""
+    labels = sorted({label for label, _ in items})
+    rows, targets = [], []
+    for label, path in items:
+        with open(path, "rb") as f:
+            row = extract_features(f.read(), size)
+        rows.append(row)
+        targets.append(labels.index(label))
+        if mirror:
+            rows.append(row.reshape(size, size, 3)[:, ::-1].ravel())
+            targets.append(labels.index(label))
+    return np.stack(rows), np.array(targets), labels
+
+
+class BatchClassifier:
+    """Classifies frames from many cameras in shared forward passes.
+
+    A batch runs as soon as max_batch frames are waiting, or just before the
+    oldest waiting frame reaches deadline_ms, whichever is first (frames
+    answered after the deadline are counted as late).
+    on_result(device, seq, label, confidence, latency_ms) is called on the
+    classifier thread.
+    """
+
+    def __init__(self, model, on_result, max_batch=32, deadline_ms=30.0, queue_size=256):
+        self.model = model
+        self.on_result = on_result
+        self.max_batch = max_batch
+        self.deadline = deadline_ms / 1000.0
+        self.input_queue = queue.Queue(maxsize=queue_size)
+
+        dims = model.size * model.size * 3
+        self.batch = np.empty((max_batch, dims), dtype=np.float32)
+
+        # Flush this much before the deadline: running average of how long
+        # one frame's decode + a forward pass take
+        self.margin = 0.001
+
+        # Counters
+        self.classified = 0
+        self.batches = 0
+        self.dropped = 0
+        self.errors = 0
+        self.late = 0
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, device, seq, image_bytes):
+        """Queue a frame, returns False (and counts a drop) when full"""
+        try:
+            self.input_queue.put_nowait((device, seq, image_bytes, time.perf_counter()))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def run(self):
+        while True:
+            item = self.input_queue.get()
+            if item is None:
+                break
+            pending = []
+            oldest = item[3]
+            stop = False
+            while True:
+                if item is not None:
+                    if self.add_to_batch(item, len(pending)):
+                        pending.append(item)
+                if len(pending) >= self.max_batch:
+                    break
+                remaining = oldest + self.deadline - self.margin - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.input_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+            self.run_batch(pending)
+            if stop:
+                break
+
+    def add_to_batch(self, item, row):
+        # Decoding happens here so the MQTT/processing threads never wait on it
+        start = time.perf_counter()
+        try:
+            extract_features(item[2], self.model.size, out=self.batch[row])
+        except (OSError, ValueError):
+            self.errors += 1
+            return False
+        self.update_margin(time.perf_counter() - start)
+        return True
+
+    def update_margin(self, seconds):
+        self.margin += 0.1 * (2 * seconds - self.margin)
+
+    def run_batch(self, pending):
+        if not pending:
+            return
+        start = time.perf_counter()
+        results = self.model.predict(self.batch[:len(pending)])
+        now = time.perf_counter()
+        self.update_margin(now - start)
+        self.batches += 1
+        for (device, seq, _, received_at), (label, confidence) in zip(pending, results):
+            latency = now - received_at
+            if latency > self.deadline:
+                self.late += 1
+            self.classified += 1
+            self.on_result(device, seq, label, confidence, latency * 1000)
+
+    def stats(self):
+        return {
+            "classified": self.classified,
+            "batches": self.batches,
+            "mean_batch": self.classified / self.batches if self.batches else 0.0,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "late": self.late,
+        }
+
+    def stop(self):
+        self.input_queue.put(None)
+        self.thread.join(timeout=2.0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host-side bottle/clipBox classifier")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    train = sub.add_parser("train", help="train on Trial1/images")
+    train.add_argument("--images", default=IMAGES_FOLDER)
+    train.add_argument("--out", default="host_model.npz")
+    train.add_argument("--epochs", type=int, default=400)
+
+    predict = sub.add_parser("predict", help="classify JPEG files")
+    predict.add_argument("model")
+    predict.add_argument("files", nargs="+")
+
+    args = parser.parse_args(argv)
+    if args.command == "train":
+        items = load_labelled_images(args.images)
+        features, targets, labels = build_training_set(items)
+        model = LinearClassifier.train(features, targets, labels, epochs=args.epochs)
+        accuracy = (model.predict_proba(features).argmax(axis=1) == targets).mean()
+        model.save(args.out)
+        print(f"✅ Trained on {len(items)} images {labels}, training accuracy {accuracy:.1%} -> {args.out}")
+    else:
+        model = LinearClassifier.load(args.model)
+        for path in args.files:
+            with open(path, "rb") as f:
+                label, confidence = model.predict(extract_features(f.read(), model.size)[None, :])[0]
+            print(f"{path}: {label} ({confidence:.1%})")
+
+
+if __name__ == "__main__":
+    main()
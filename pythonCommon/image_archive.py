@@ -0,0 +1,267 @@
+"""
+Persistent, content-addressed archive for received frames.
+
+    image_archive/
+        manifest.db                          frame -> file + classification metadata
+        2026-02-08/<device>/<sha256>.jpg     sharded by date and device
+
+Files are named by the SHA-256 of their bytes, so a frame identical to one
+already stored (static scene, repeated publish) is only recorded in the
+manifest and never written twice. Nothing is ever deleted on startup.
+
+fsync_policy:
+    "always" - fsync every file as it is written (safest, slowest)
+    "batch"  - fsync the files of a batch together when it is committed
+    "never"  - leave it to the OS
+"""
+
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS frames (
+    id INTEGER PRIMARY KEY,
+    ts INTEGER NOT NULL,            -- host receive time, ms since epoch
+    device TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    duplicate INTEGER NOT NULL,     -- 1 if the bytes were already archived
+    label TEXT,
+    confidence REAL,
+    meta TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_frames_ts ON frames (ts);
+CREATE INDEX IF NOT EXISTS idx_frames_device ON frames (device, ts);
+CREATE INDEX IF NOT EXISTS idx_frames_sha ON frames (sha256);
+"""
+
+FSYNC_POLICIES = ("always", "batch", "never")
+
+
+def safe_name(text):
+    """Device ids come off the network, keep them usable as folder names"""
+    cleaned = "".join(c if c.isalnum() or c in "-_." else "_" for c in str(text))
+    return cleaned.strip(".") or "unknown"
+
+
+class ImageArchive:
+    def __init__(self, root="image_archive", fsync_policy="batch", batch_size=32,
+                 flush_interval=1.0, max_pending=256):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"fsync_policy must be one of {FSYNC_POLICIES}")
+        self.root = root
+        self.fsync_policy = fsync_policy
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        os.makedirs(root, exist_ok=True)
+        self.lock = threading.Lock()
+        self.uncommitted = 0
+        self.last_commit = time.monotonic()
+        self.conn = sqlite3.connect(os.path.join(root, "manifest.db"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.unsynced = []
+
+        # Statistics
+        self.frames = 0
+        self.written = 0
+        self.duplicates = 0
+        self.bytes_written = 0
+        self.dropped = 0
+        # Frames the writer could not store (disk full, manifest locked, ...)
+        self.failed = 0
+
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.stopping = False
+        self.writer = None
+
+    # --- ASYNC: for callers that must not touch the disk (MQTT / Tk threads) ---
+    def add(self, data, device="default", meta=None, received_ms=None):
+        """Queue a frame for the background writer. Never blocks"""
+        if self.writer is None:
+            self.writer = threading.Thread(target=self.write_loop, daemon=True)
+            self.writer.start()
+        received_ms = int(time.time() * 1000) if received_ms is None else received_ms
+        try:
+            self.pending.put_nowait((bytes(data), device, meta, received_ms))
+        except queue.Full:
+            self.dropped += 1
+
+    def write_loop(self):
+        running = True
+        while running:
+            try:
+                item = self.pending.get(timeout=self.flush_interval)
+            except queue.Empty:
+                # close() could not queue its sentinel: stop once drained
+                if self.stopping:
+                    break
+                continue
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                running = False
+                batch = [item for item in batch if item is not None]
+
+            # One bad frame or commit must not stop the writer
+            for data, device, meta, received_ms in batch:
+                try:
+                    self.save(data, device, meta, received_ms, commit=False)
+                except (OSError, sqlite3.Error) as e:
+                    self.write_failed(f"{device} frame not archived", e)
+            try:
+                self.commit()
+            except (OSError, sqlite3.Error) as e:
+                self.write_failed("manifest commit failed", e, frames=0)
+
+    def write_failed(self, what, error, frames=1):
+        self.failed += frames
+        # A full disk fails every frame, report the first and then every 100th
+        if self.failed <= 1 or self.failed % 100 == 0:
+            print(f"⚠️ Archive: {what}: {error} ({self.failed} failed so far)")
+
+    # --- SYNC: for callers that already run on a writer thread ---
+    def save(self, data, device="default", meta=None, received_ms=None, commit=None):
+        """Archive one frame now. Returns (sha256, path, duplicate)
+
+        commit=None commits once batch_size frames or flush_interval seconds
+        have built up, True/False force or skip it.
+        """
+        received_ms = int(time.time() * 1000) if received_ms is None else received_ms
+        meta = meta or {}
+        sha = hashlib.sha256(data).hexdigest()
+
+        with self.lock:
+            row = self.conn.execute("SELECT path FROM blobs WHERE sha256 = ?", (sha,)).fetchone()
+            duplicate = row is not None
+            if duplicate:
+                path = row[0]
+                self.duplicates += 1
+            else:
+                path = self.write_file(sha, data, device, received_ms)
+                self.conn.execute("INSERT INTO blobs (sha256, path, size) VALUES (?, ?, ?)",
+                                  (sha, path, len(data)))
+
+            self.conn.execute(
+                "INSERT INTO frames (ts, device, sha256, duplicate, label, confidence, meta) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (received_ms, str(device), sha, int(duplicate), meta.get("label"),
+                 meta.get("confidence"), json.dumps(meta)))
+            self.frames += 1
+            self.uncommitted += 1
+
+            if commit is None:
+                commit = (self.uncommitted >= self.batch_size or
+                          time.monotonic() - self.last_commit >= self.flush_interval)
+            if commit:
+                self.commit_locked()
+        return sha, os.path.join(self.root, path), duplicate
+
+    def write_file(self, sha, data, device, received_ms):
+        day = time.strftime("%Y-%m-%d", time.localtime(received_ms / 1000))
+        relative = os.path.join(day, safe_name(device), sha + ".jpg")
+        path = os.path.join(self.root, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temp name and rename, so a crash never leaves half a JPEG
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            if self.fsync_policy == "always":
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        if self.fsync_policy == "batch":
+            self.unsynced.append(path)
+        self.written += 1
+        self.bytes_written += len(data)
+        return relative
+
+    def commit(self):
+        with self.lock:
+            self.commit_locked()
+
+    def commit_locked(self):
+        # Files first, so the manifest never points at data that isn't on disk.
+        # The list is taken up front: a file that fails to sync is not retried
+        unsynced, self.unsynced = self.unsynced, []
+        for path in unsynced:
+            fd = os.open(path, os.O_RDWR)  # Windows needs a writable handle to fsync
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        self.conn.commit()
+        self.uncommitted = 0
+        self.last_commit = time.monotonic()
+
+    def close(self, timeout=10.0):
+        """Flush queued frames and the manifest, waiting at most about
+        timeout seconds for each step of the writer"""
+        if self.writer is not None:
+            self.stopping = True
+            try:
+                self.pending.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self.writer.join(timeout)
+            if self.writer.is_alive():
+                # Still stuck on the disk: leave the manifest to it
+                print(f"⚠️ Archive still writing, {self.pending.qsize()} frames not flushed")
+                return
+            self.writer = None
+        try:
+            self.commit()
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️ Archive: manifest commit failed: {e}")
+        self.conn.close()
+
+    # --- LOOKUPS ---
+    def frames_for(self, device=None, since_ms=None, label=None, limit=100):
+        """[(ts, device, path, label, confidence)] newest first"""
+        sql = ("SELECT frames.ts, frames.device, blobs.path, frames.label, frames.confidence "
+               "FROM frames JOIN blobs ON blobs.sha256 = frames.sha256")
+        where, params = [], []
+        if device is not None:
+            where.append("frames.device = ?")
+            params.append(device)
+        if since_ms is not None:
+            where.append("frames.ts >= ?")
+            params.append(since_ms)
+        if label is not None:
+            where.append("frames.label = ?")
+            params.append(label)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY frames.ts DESC LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [(ts, dev, os.path.join(self.root, path), lbl, conf)
+                for ts, dev, path, lbl, conf in rows]
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "written": self.written,
+            "duplicates": self.duplicates,
+            "bytes_written": self.bytes_written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "pending": self.pending.qsize(),
+        }
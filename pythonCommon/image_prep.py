@@ -0,0 +1,63 @@
+"""
+Turn received JPEG bytes into an image that is ready to show, off the Tk thread.
+
+The JPEG is decoded exactly once, and with draft() libjpeg scales it down by
+1/2, 1/4 or 1/8 while decoding, so a large sensor frame costs about the
+same as a small one. Only the last small step to the exact box size is a
+real resize.
+"""
+
+import io
+
+from PIL import Image
+
+# "fast" is fine for a live view, "best" matches the old LANCZOS output
+RESAMPLE = {
+    "fast": Image.Resampling.BILINEAR,
+    "best": Image.Resampling.LANCZOS,
+}
+
+
+def check_jpeg_markers(image_bytes):
+    """Cheap structural check: SOI at the start, EOI at the end"""
+    if len(image_bytes) < 4 or image_bytes[0] != 0xFF or image_bytes[1] != 0xD8:
+        raise ValueError("missing JPEG SOI marker")
+    # The camera may leave zero padding after EOI
+    end = len(image_bytes)
+    while end > 2 and image_bytes[end - 1] == 0x00:
+        end -= 1
+    if image_bytes[end - 2] != 0xFF or image_bytes[end - 1] != 0xD9:
+        raise ValueError("missing JPEG EOI marker (truncated frame?)")
+
+
+def prepare_for_canvas(image_bytes, box_width, box_height, margin=20, quality="fast"):
+    """Decode once at reduced scale and fit into the box.
+    Returns (image, original_size)"""
+    check_jpeg_markers(image_bytes)
+
+    image = Image.open(io.BytesIO(image_bytes))
+    original_size = image.size
+
+    target_width = max(1, box_width - margin)
+    target_height = max(1, box_height - margin)
+    if image.format == "JPEG":
+        # Let the decoder do most of the downscaling (never below the target)
+        image.draft("RGB", (target_width, target_height))
+
+    # The single decode, truncated or corrupt data raises here
+    image.load()
+    return fit_to_canvas(image, box_width, box_height, margin, quality), original_size
+
+
+def fit_to_canvas(image, box_width, box_height, margin=20, quality="fast"):
+    """Scale an already decoded image to fit the box (frames from the ingest daemon)"""
+    target_width = max(1, box_width - margin)
+    target_height = max(1, box_height - margin)
+    width, height = image.size
+    ratio = min(target_width / width, target_height / height)
+    new_size = (max(1, int(width * ratio)), max(1, int(height * ratio)))
+    if new_size != image.size:
+        image = image.resize(new_size, RESAMPLE[quality], reducing_gap=2.0)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    return image
@@ -0,0 +1,194 @@
+"""
+Thin client side of the ingest daemon (ingestDaemon/ingest_daemon.py).
+
+The daemon is the only process talking to the broker. It publishes into two
+shared-memory rings (shm_ring.py):
+
+    esp32_detections   classification/status messages: topic + JSON payload
+                       (image_aes removed, the frame goes to the other ring)
+    esp32_frames       decoded RGB frames: JSON metadata + raw pixels
+
+IngestClient reads both rings on a background thread and calls the same
+on_message(client, userdata, msg) the GUIs already give paho, with a
+paho-like message, so a GUI switches over without touching its parser.
+"""
+
+import json
+import threading
+import time
+
+from PIL import Image
+
+from shm_ring import RingError, RingReader
+
+DETECTIONS_RING = "esp32_detections"
+FRAMES_RING = "esp32_frames"
+KIND_MESSAGE = 1
+KIND_FRAME = 2
+
+
+# --- MESSAGE FORMATS ---
+def pack_message(topic, payload):
+    topic = topic.encode("utf-8")
+    return [len(topic).to_bytes(2, "little"), topic, payload]
+
+
+def unpack_message(data):
+    """-> (topic, payload bytes)"""
+    length = int.from_bytes(data[:2], "little")
+    return data[2:2 + length].decode("utf-8"), data[2 + length:]
+
+
+def pack_frame(meta, pixels):
+    """meta must have width, height and mode; pixels are the raw image bytes"""
+    header = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+    return [len(header).to_bytes(2, "little"), header, pixels]
+
+
+def unpack_frame(data):
+    """-> (meta dict, PIL image sharing the message bytes)"""
+    length = int.from_bytes(data[:2], "little")
+    meta = json.loads(data[2:2 + length])
+    pixels = memoryview(data)[2 + length:]
+    image = Image.frombuffer(meta["mode"], (meta["width"], meta["height"]), pixels, "raw", meta["mode"], 0, 1)
+    return meta, image
+
+
+def topic_matches(pattern, topic):
+    """MQTT filter matching with + and #"""
+    pattern_parts = pattern.split("/")
+    topic_parts = topic.split("/")
+    for i, part in enumerate(pattern_parts):
+        if part == "#":
+            return True
+        if i >= len(topic_parts) or (part != "+" and part != topic_parts[i]):
+            return False
+    return len(pattern_parts) == len(topic_parts)
+
+
+class RingMessage:
+    """The attributes of a paho MQTTMessage the GUIs use"""
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+        self.qos = 0
+        self.retain = False
+
+
+class IngestClient:
+    """Attach to the ingest daemon instead of the broker.
+
+    on_message(client, userdata, msg) gets detection/status messages whose
+    topic matches one of topics; on_frame(meta, image) gets decoded frames.
+    Leave a callback out to skip that ring entirely. on_status(connected) is
+    called when the daemon appears or goes away. All callbacks run on the
+    client thread, a viewer that falls a ring behind loses the oldest frames.
+    """
+
+    def __init__(self, name, on_message=None, on_frame=None, on_status=None,
+                 topics=("#",), idle_sleep=0.02):
+        self.name = name
+        self.on_message = on_message
+        self.on_frame = on_frame
+        self.on_status = on_status
+        self.topics = list(topics)
+        self.idle_sleep = idle_sleep
+        self.readers = {}
+        self.connected = False
+        self.running = False
+        self.thread = None
+        self.frames = 0
+        self.messages = 0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def wanted_rings(self):
+        rings = []
+        if self.on_message:
+            rings.append(DETECTIONS_RING)
+        if self.on_frame:
+            rings.append(FRAMES_RING)
+        return rings
+
+    def attach(self):
+        """(Re)open the rings; True when all of them are there"""
+        for ring in self.wanted_rings():
+            reader = self.readers.get(ring)
+            if reader is not None:
+                continue
+            try:
+                self.readers[ring] = RingReader(ring, self.name)
+            except (FileNotFoundError, RingError):
+                return False
+        return True
+
+    def detach(self):
+        for reader in self.readers.values():
+            reader.close()
+        self.readers = {}
+
+    def set_connected(self, connected):
+        if connected != self.connected:
+            self.connected = connected
+            if self.on_status:
+                self.on_status(connected)
+
+    def run(self):
+        sleep = 0.001
+        while self.running:
+            if not self.connected:
+                self.set_connected(self.attach())
+                if not self.connected:
+                    time.sleep(1.0)
+                    continue
+
+            got = 0
+            for ring, reader in list(self.readers.items()):
+                # Small messages are drained in bursts, frames one at a time,
+                # so a slow on_frame cannot hold the detections back
+                for _ in range(1 if ring == FRAMES_RING else 64):
+                    item = reader.read()
+                    if item is None:
+                        break
+                    got += 1
+                    self.dispatch(*item)
+
+            if got:
+                sleep = 0.001
+                continue
+            if any(reader.producer_age() > 5.0 for reader in self.readers.values()):
+                # Daemon stopped (or restarted with a new segment): reattach
+                self.detach()
+                self.set_connected(False)
+                continue
+            time.sleep(sleep)
+            sleep = min(sleep * 2, self.idle_sleep)
+        self.detach()
+
+    def dispatch(self, kind, data):
+        try:
+            if kind == KIND_MESSAGE:
+                topic, payload = unpack_message(data)
+                if any(topic_matches(pattern, topic) for pattern in self.topics):
+                    self.messages += 1
+                    self.on_message(self, None, RingMessage(topic, payload))
+            elif kind == KIND_FRAME:
+                meta, image = unpack_frame(data)
+                self.frames += 1
+                self.on_frame(meta, image)
+        except Exception as e:
+            print(f"❌ Ingest client callback failed: {e}")
+
+    def stats(self):
+        """Own view of the rings: lag, drops, received"""
+        return {ring: {"lag": reader.lag, "dropped": reader.dropped, "received": reader.received}
+                for ring, reader in self.readers.items()}
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2.0)
@@ -0,0 +1,345 @@
+"""
+End-to-end latency of the classification stream, from the moment the
+ESP32 took the picture to the moment the result is on the screen.
+
+Every message becomes a FrameTrace with one timestamp (PC clock, epoch ms)
+per stage it went through:
+
+    capture           device, right after esp_camera_fb_get()   (capture_ms)
+    publish           device, just before mqttClient.publish()  (publish_ms)
+    broker            estimated: received - half the PC <-> broker round trip
+    received          on_message entered
+    parsed            UTF-8 + JSON done
+    decoded           image decoded (image receivers only)
+    render_scheduled  handed to the Tk thread
+    rendered          the Tk idle callback after the widgets changed ran,
+                      i.e. the redraw is done
+
+A span is named after the stage it ends in (the "uplink" from publish to
+broker arrival is the "broker" span) and only exists when both ends were
+marked, so a device without the new firmware still gets the PC-side spans.
+
+The device stamps are millis() of the ESP32. ClockSync maps them to the PC
+clock with an NTP-style exchange on the existing command topic:
+
+    PC     -> test/python_to_esp32   TSYNC:<id>                        (t0)
+    device -> esp32/cam/status       {"type":"time_sync","id":..,"device_ms":..}
+    PC receives the reply                                              (t3)
+
+    offset = device_ms - (t0 + t3) / 2,   error <= round trip / 2
+
+Of the last few samples of a device the one with the smallest round trip
+wins (queueing only ever adds delay). The PC also receives its own TSYNC
+back from the broker, which gives the PC <-> broker round trip used for
+the broker arrival estimate.
+
+Tracer keeps per-span p50/p95/p99 over a sliding window (rolling_stats),
+optional Prometheus histograms (metrics.py) and the last N traces for
+export_chrome(), a JSON file chrome://tracing and ui.perfetto.dev open:
+one process per device, one row per span.
+"""
+
+import itertools
+import json
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+
+from rolling_stats import QUANTILES, log_histogram
+
+COMMAND_TOPIC = "test/python_to_esp32"
+STATUS_TOPIC = "esp32/cam/status"
+
+STAGES = ("capture", "publish", "broker", "received", "parsed", "decoded",
+          "render_scheduled", "rendered")
+
+# Seconds, 1 ms to 10 s: end to end includes the inference on the device
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def now_ms():
+    return time.time() * 1000
+
+
+class ClockSync:
+    """Offset of each device's millis() to this PC's clock.
+
+    publish(topic, payload) sends on the broker connection; replies go to
+    on_reply(), this PC's own requests echoed by the broker to on_echo()
+    """
+
+    def __init__(self, publish, topic=COMMAND_TOPIC, interval_s=30.0, samples=8, timeout_s=5.0):
+        self.publish = publish
+        self.topic = topic
+        self.interval_s = interval_s
+        self.samples = samples
+        self.timeout_s = timeout_s
+        # Several viewers may sync against the same devices, the prefix
+        # tells our requests from theirs
+        self.prefix = "%04x" % random.getrandbits(16)
+        self.ids = itertools.count(1)
+        self.sent = OrderedDict()
+        self.device_samples = {}
+        self.offsets = {}
+        self.broker_samples = deque(maxlen=samples)
+        self.broker_rtt_ms = None
+        self.replies = 0
+        self.resets = 0
+        self.lock = threading.Lock()
+        self.burst = samples
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def request(self):
+        request_id = f"{self.prefix}-{next(self.ids)}"
+        with self.lock:
+            self.sent[request_id] = now_ms()
+            # Unanswered requests (no device online) are forgotten
+            while len(self.sent) > 64:
+                self.sent.popitem(last=False)
+        self.publish(self.topic, f"TSYNC:{request_id}")
+
+    def sent_at(self, request_id):
+        with self.lock:
+            t0 = self.sent.get(request_id)
+        return t0
+
+    def on_echo(self, payload, received_ms=None):
+        """Our own TSYNC:<id> back from the broker; payload is bytes or str"""
+        received_ms = now_ms() if received_ms is None else received_ms
+        if isinstance(payload, bytes):
+            payload = payload.decode('utf-8', 'replace')
+        if not payload.startswith("TSYNC:"):
+            return
+        t0 = self.sent_at(payload[6:])
+        if t0 is None:
+            return
+        with self.lock:
+            self.broker_samples.append(received_ms - t0)
+            self.broker_rtt_ms = min(self.broker_samples)
+
+    def on_reply(self, data, received_ms=None):
+        """A {"type":"time_sync"} status message; False if it was not ours"""
+        received_ms = now_ms() if received_ms is None else received_ms
+        t0 = self.sent_at(str(data.get('id', '')))
+        device_ms = data.get('device_ms')
+        if t0 is None or device_ms is None or received_ms - t0 > self.timeout_s * 1000:
+            return False
+        device = str(data.get('client_id', 'unknown'))
+        rtt = received_ms - t0
+        offset = device_ms - (t0 + received_ms) / 2
+        with self.lock:
+            samples = self.device_samples.setdefault(device, deque(maxlen=self.samples))
+            best = self.offsets.get(device)
+            # Two honest samples differ by at most half their round trips
+            # (plus crystal drift); more means millis() restarted (reboot)
+            if best is not None and abs(offset - best[0]) > (rtt + best[1]) / 2 + 50:
+                samples.clear()
+                self.resets += 1
+            samples.append((rtt, offset))
+            rtt_best, offset_best = min(samples)
+            self.offsets[device] = (offset_best, rtt_best)
+            self.replies += 1
+        return True
+
+    def to_local(self, device, device_ms):
+        """device millis() -> PC epoch ms, None until the device answered"""
+        best = self.offsets.get(device)
+        if best is None or device_ms is None:
+            return None
+        return device_ms - best[0]
+
+    def broker_arrival(self, received_ms):
+        if self.broker_rtt_ms is None:
+            return None
+        return received_ms - self.broker_rtt_ms / 2
+
+    def snapshot(self):
+        """{device: {"offset_ms", "error_ms"}}, error is half the best round trip"""
+        with self.lock:
+            return {device: {"offset_ms": offset, "error_ms": rtt / 2}
+                    for device, (offset, rtt) in self.offsets.items()}
+
+    def start(self):
+        """Request every interval_s from a daemon thread, a quick burst first"""
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def resync(self):
+        """A quick burst now, e.g. when a device (re)connects"""
+        self.burst = self.samples
+        self.wake.set()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.request()
+            except Exception as e:
+                print(f"⚠️ Time sync request failed: {e}")
+            if self.burst > 0:
+                self.burst -= 1
+                wait = 0.25
+            else:
+                wait = self.interval_s
+            self.wake.wait(wait)
+            self.wake.clear()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake.set()
+        if self.thread:
+            self.thread.join()
+
+
+class FrameTrace:
+    __slots__ = ("device", "seq", "label", "marks")
+
+    def __init__(self, device, seq=None, label=None):
+        self.device = device
+        self.seq = seq
+        self.label = label
+        self.marks = {}
+
+    def mark(self, stage, at=None):
+        self.marks[stage] = now_ms() if at is None else at
+
+    def spans(self):
+        """[(stage, start_ms, end_ms)] between consecutive marked stages"""
+        spans = []
+        previous = None
+        for stage in STAGES:
+            at = self.marks.get(stage)
+            if at is None:
+                continue
+            if previous is not None:
+                spans.append((stage, previous, at))
+            previous = at
+        return spans
+
+
+class Tracer:
+    """FrameTraces in, latency quantiles / histograms / Chrome trace out"""
+
+    def __init__(self, clock=None, keep=5000, window_s=60, registry=None):
+        self.clock = clock
+        self.finished = deque(maxlen=keep)
+        self.window_s = window_s
+        self.names = list(STAGES[1:]) + ["end_to_end"]
+        # 0.1 ms to 100 s
+        self.windows = {name: log_histogram(window_s, low=0.1, high=1e5) for name in self.names}
+        self.histograms = {}
+        self.traced = 0
+        self.not_rendered = 0
+        if registry is not None:
+            self.register(registry)
+
+    def register(self, registry):
+        """Export every span as a histogram on a metrics.MetricsRegistry"""
+        for name in self.names:
+            self.histograms[name] = registry.histogram(
+                f"receiver_latency_{name}_seconds",
+                "Capture to screen, end to end" if name == "end_to_end"
+                else f"Latency of the span ending in {name}",
+                buckets=LATENCY_BUCKETS)
+        registry.counter("receiver_traced_total", "Messages traced, by outcome", label="outcome",
+                         function=lambda: {"rendered": self.traced - self.not_rendered,
+                                           "not_rendered": self.not_rendered})
+
+    def begin(self, data, received_ms=None):
+        """Trace for one classification dict; device stamps are converted
+        when the clock knows the device"""
+        received_ms = now_ms() if received_ms is None else received_ms
+        device = str(data.get('client_id', 'unknown'))
+        trace = FrameTrace(device, data.get('seq'), data.get('label'))
+        if self.clock is not None:
+            for stage, key in (("capture", "capture_ms"), ("publish", "publish_ms")):
+                local = self.clock.to_local(device, data.get(key))
+                if local is not None:
+                    trace.mark(stage, local)
+            broker = self.clock.broker_arrival(received_ms)
+            if broker is not None:
+                # Sync error must not put the broker before the publish
+                trace.mark("broker", max(broker, trace.marks.get("publish", broker)))
+        trace.mark("received", received_ms)
+        return trace
+
+    def finish(self, trace):
+        """Record the spans of a trace; call once, from one thread"""
+        now = time.time()
+        spans = trace.spans()
+        if "rendered" not in trace.marks:
+            self.not_rendered += 1
+        for stage, start, end in spans:
+            self.observe(stage, end - start, now)
+        if spans:
+            self.observe("end_to_end", spans[-1][2] - spans[0][1], now)
+        self.finished.append(trace)
+        self.traced += 1
+
+    def observe(self, name, duration_ms, now):
+        # Clock sync error can make a short span come out negative
+        duration_ms = max(0.0, duration_ms)
+        self.windows[name].add(duration_ms, now)
+        histogram = self.histograms.get(name)
+        if histogram is not None:
+            histogram.observe(duration_ms / 1000)
+
+    def quantiles(self, now=None):
+        """{span: {q: ms}} for the spans seen in the window"""
+        now = time.time() if now is None else now
+        result = {}
+        for name, window in self.windows.items():
+            values = window.quantiles(now, QUANTILES)
+            if values[QUANTILES[0]] is not None:
+                result[name] = values
+        return result
+
+    def report(self):
+        spans = self.quantiles()
+        if not spans:
+            return "⏱ no traced messages yet"
+        def ms(value):
+            return f"{value:.1f}" if value < 10 else f"{value:.0f}"
+
+        parts = [f"{name} p50 {ms(values[0.5])}/p95 {ms(values[0.95])} ms"
+                 for name, values in spans.items()]
+        return "⏱ " + " | ".join(parts)
+
+    def chrome_events(self):
+        """Trace Event Format: one complete ("X") event per span"""
+        pids = {}
+        tids = {stage: index + 1 for index, stage in enumerate(STAGES)}
+        events = []
+        for trace in list(self.finished):
+            if trace.device not in pids:
+                pid = len(pids) + 1
+                pids[trace.device] = pid
+                events.append({"name": "process_name", "ph": "M", "pid": pid,
+                               "args": {"name": trace.device}})
+                for stage, tid in tids.items():
+                    events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                                   "args": {"name": stage}})
+            for stage, start, end in trace.spans():
+                events.append({
+                    "name": stage, "cat": "frame", "ph": "X",
+                    "pid": pids[trace.device], "tid": tids[stage],
+                    "ts": round(start * 1000, 1), "dur": round(max(0.0, end - start) * 1000, 1),
+                    "args": {"seq": trace.seq, "label": trace.label},
+                })
+        return events
+
+    def export_chrome(self, path):
+        """Write the kept traces to path; returns the number of spans"""
+        events = self.chrome_events()
+        document = {"traceEvents": events, "displayTimeUnit": "ms"}
+        if self.clock is not None:
+            document["otherData"] = {"clock_sync": self.clock.snapshot(),
+                                     "broker_rtt_ms": self.clock.broker_rtt_ms}
+        with open(path, "w") as f:
+            json.dump(document, f)
+        spans = sum(1 for event in events if event["ph"] == "X")
+        print(f"🧭 {spans} spans of {len(self.finished)} messages written to {path}")
+        return spans
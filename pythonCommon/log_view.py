@@ -0,0 +1,230 @@
+"""
+Bounded log view for the Tk dashboards.
+
+A plain ScrolledText that gets one insert per message keeps every line
+forever: memory grows for as long as the GUI runs and each insert (with its
+state toggles and see(END)) gets slower. LogView instead
+
+- queues lines from any thread (append() is a deque append),
+- inserts everything that queued up in one insert per GUI tick (flush()),
+- keeps at most max_lines in the widget and trims the oldest in bulk,
+- only follows the end when the user is already at the bottom,
+- spools every line to a history file, so "Load older" can page earlier
+  lines back in from disk without keeping them in memory.
+"""
+
+import os
+import tkinter as tk
+from collections import deque
+from tkinter import scrolledtext, ttk
+
+
+class LogHistory:
+    """Append-only spool file plus backwards paging from a byte offset.
+
+    first_offset is where the oldest line shown in the widget starts; the
+    byte length of every shown line is kept (bounded by the widget size) so
+    trimming the widget moves it forward without reading the file.
+    """
+
+    def __init__(self, path, max_bytes=20 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        # One history per session, the previous one is kept as .1
+        if os.path.exists(path):
+            os.replace(path, path + ".1")
+        self.file = open(path, "wb")
+        self.size = 0
+        self.first_offset = 0
+        self.shown_lengths = deque()
+
+    def write(self, lines):
+        """Spool a batch of new (shown) lines"""
+        data = [line.encode("utf-8", "replace") + b"\n" for line in lines]
+        self.file.write(b"".join(data))
+        self.file.flush()
+        self.size += sum(map(len, data))
+        self.shown_lengths.extend(map(len, data))
+
+    def skip(self, count):
+        """The widget dropped its count oldest lines"""
+        for _ in range(min(count, len(self.shown_lengths))):
+            self.first_offset += self.shown_lengths.popleft()
+
+    def clear(self):
+        """Nothing is shown any more; all of it stays pageable"""
+        self.first_offset = self.size
+        self.shown_lengths.clear()
+
+    def older(self, count, chunk_size=64 * 1024):
+        """Up to count lines just before the oldest shown one"""
+        if self.first_offset == 0 or count <= 0:
+            return []
+        with open(self.path, "rb") as f:
+            pos = self.first_offset
+            data = b""
+            # first_offset is a line start, so data always ends with \n
+            while pos > 0 and data.count(b"\n") <= count:
+                step = min(chunk_size, pos)
+                pos -= step
+                f.seek(pos)
+                data = f.read(step) + data
+        lines = data.split(b"\n")[:-1]
+        if pos > 0:
+            # The first piece is the tail of a line we did not read whole
+            lines = lines[1:]
+        lines = lines[-count:]
+        lengths = [len(line) + 1 for line in lines]
+        self.first_offset -= sum(lengths)
+        self.shown_lengths.extendleft(reversed(lengths))
+        return [line.decode("utf-8", "replace") for line in lines]
+
+    def needs_rotation(self):
+        return self.size > self.max_bytes
+
+    def rotate(self, shown_lines):
+        """Start a new file holding only the lines still shown"""
+        self.file.close()
+        os.replace(self.path, self.path + ".1")
+        self.file = open(self.path, "wb")
+        self.size = 0
+        self.first_offset = 0
+        self.shown_lengths.clear()
+        self.write(shown_lines)
+
+    def close(self):
+        self.file.close()
+
+
+class LogView:
+    """ScrolledText log holding at most max_lines; grid/pack .frame.
+
+    append() may be called from any thread; flush() must run on the Tk
+    thread, once per GUI tick (or pass auto_flush_ms to let the view
+    schedule itself). With history_path set, every line also goes to disk
+    and a "Load older" button pages earlier lines back in.
+    """
+
+    def __init__(self, parent, max_lines=2000, history_path=None, page_lines=500,
+                 auto_flush_ms=None, **text_options):
+        self.max_lines = max_lines
+        self.page_lines = page_lines
+        self.pending = deque()
+        self.line_count = 0
+        self.dropped = 0
+        self.history = LogHistory(history_path) if history_path else None
+        self.auto_flush_ms = auto_flush_ms
+
+        self.frame = ttk.Frame(parent)
+        self.frame.columnconfigure(0, weight=1)
+        self.frame.rowconfigure(1, weight=1)
+        if self.history:
+            toolbar = ttk.Frame(self.frame)
+            toolbar.grid(row=0, column=0, sticky=(tk.W, tk.E))
+            ttk.Button(toolbar, text="Load older", command=self.load_older).pack(side=tk.LEFT)
+            self.info_label = ttk.Label(toolbar, text="", font=("Arial", 8))
+            self.info_label.pack(side=tk.LEFT, padx=10)
+        else:
+            self.info_label = None
+        self.text = scrolledtext.ScrolledText(self.frame, **text_options)
+        self.text.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.text.configure(state='disabled')
+
+        if auto_flush_ms:
+            self.text.after(auto_flush_ms, self.auto_flush)
+
+    def append(self, message):
+        """Queue a message (multi-line messages become several lines)"""
+        self.pending.extend(message.splitlines() or [""])
+
+    def at_bottom(self):
+        return self.text.yview()[1] >= 0.999
+
+    def flush(self):
+        """Insert everything queued since the last tick in one go"""
+        if not self.pending:
+            return
+        lines = []
+        while self.pending:
+            lines.append(self.pending.popleft())
+        if self.history and self.history.needs_rotation():
+            self.history.rotate(self.shown_lines())
+
+        follow = self.at_bottom()
+        self.text.configure(state='normal')
+        if len(lines) > self.max_lines:
+            # A burst larger than the whole view replaces it, the older part
+            # of the burst only goes to disk
+            if self.line_count:
+                self.trim(self.line_count)
+            hidden, lines = lines[:-self.max_lines], lines[-self.max_lines:]
+            self.dropped += len(hidden)
+            if self.history:
+                self.history.write(hidden)
+                self.history.skip(len(hidden))
+        if self.history:
+            self.history.write(lines)
+
+        self.text.insert(tk.END, "\n".join(lines) + "\n")
+        self.line_count += len(lines)
+
+        # Trim in bulk (10% slack) and only while following the end, so a
+        # user reading older lines is not yanked around
+        limit = self.max_lines if follow else self.max_lines * 3
+        if self.line_count > limit + self.max_lines // 10:
+            self.trim(self.line_count - self.max_lines)
+        self.text.configure(state='disabled')
+        if follow:
+            self.text.see(tk.END)
+        self.update_info()
+
+    def trim(self, count):
+        self.text.delete("1.0", f"{count + 1}.0")
+        self.line_count -= count
+        if self.history:
+            self.history.skip(count)
+
+    def shown_lines(self):
+        return self.text.get("1.0", "end-1c").splitlines()
+
+    def load_older(self):
+        """Page the previous page_lines lines in from the history file"""
+        if not self.history:
+            return
+        lines = self.history.older(self.page_lines)
+        if not lines:
+            self.update_info()
+            return
+        self.text.configure(state='normal')
+        self.text.insert("1.0", "\n".join(lines) + "\n")
+        self.text.configure(state='disabled')
+        self.line_count += len(lines)
+        self.text.yview("1.0")
+        self.update_info()
+
+    def update_info(self):
+        if self.info_label is None:
+            return
+        older = "older lines on disk" if self.history.first_offset else "start of session"
+        self.info_label.config(text=f"{self.line_count} lines shown | {older}")
+
+    def clear(self):
+        self.pending.clear()
+        self.text.configure(state='normal')
+        self.text.delete("1.0", tk.END)
+        self.text.configure(state='disabled')
+        self.line_count = 0
+        if self.history:
+            self.history.clear()
+        self.update_info()
+
+    def auto_flush(self):
+        self.flush()
+        self.text.after(self.auto_flush_ms, self.auto_flush)
+
+    def close(self):
+        if self.history:
+            self.history.close()
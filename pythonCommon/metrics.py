@@ -0,0 +1,221 @@
+"""
+Prometheus-style metrics over a small local HTTP endpoint, standard library
+only, for receivers running without a window (--headless).
+
+    registry = MetricsRegistry()
+    frames = registry.counter("receiver_frames_total", "Frames received")
+    registry.gauge("receiver_queue_depth", "Frames waiting", function=lambda: q.qsize())
+    decode = registry.histogram("receiver_decode_seconds", "Decode time")
+    add_process_metrics(registry)
+    MetricsServer(registry, port=9100).start()
+
+    frames.inc(); decode.observe(0.004)
+
+curl http://127.0.0.1:9100/metrics gives the text exposition format.
+Counters and gauges can also read a value the receiver already keeps
+(function=...), a function may return {label_value: number} for a labelled
+family (label=...). Values follow Prometheus units: seconds and bytes.
+"""
+
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rolling_stats import RateWindow
+
+# Seconds, 0.5 ms to 2.5 s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric:
+    def __init__(self, name, help_text, kind, function=None, label=None):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.function = function
+        self.label = label
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def samples(self):
+        """[(suffix, labels dict, value)]"""
+        value = self.function() if self.function else self.value
+        if isinstance(value, dict):
+            return [("", {self.label or "label": key}, item) for key, item in value.items()]
+        return [("", {}, value)]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples():
+            if value is None:
+                continue
+            label_text = ""
+            if labels:
+                label_text = "{" + ",".join(f'{key}="{escape_label(item)}"'
+                                            for key, item in labels.items()) + "}"
+            lines.append(f"{self.name}{suffix}{label_text} {format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    def __init__(self, name, help_text, function=None, label=None):
+        super().__init__(name, help_text, "counter", function, label)
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+class Gauge(Metric):
+    def __init__(self, name, help_text, function=None, label=None):
+        super().__init__(name, help_text, "gauge", function, label)
+
+    def set(self, value):
+        self.value = value
+
+
+class Histogram(Metric):
+    """Cumulative buckets, sum and count; observe() from any thread"""
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, "histogram")
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = 0
+        while value > self.buckets[index]:
+            index += 1
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def samples(self):
+        with self.lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+        samples = []
+        running = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            running += bucket_count
+            samples.append(("_bucket", {"le": format_value(bound)}, running))
+        samples.append(("_sum", {}, total))
+        samples.append(("_count", {}, count))
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, function=None, label=None):
+        return self.add(Counter(name, help_text, function, label))
+
+    def gauge(self, name, help_text, function=None, label=None):
+        return self.add(Gauge(name, help_text, function, label))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self.add(Histogram(name, help_text, buckets))
+
+    def rate(self, name, help_text, window_s=10):
+        """Gauge of events per second over the last window_s; returns the
+        function to call per event"""
+        window = RateWindow(window_s)
+        self.gauge(name, help_text, function=lambda: window.rate(time.time()))
+        return lambda: window.add(time.time())
+
+    def render(self):
+        parts = []
+        for metric in self.metrics:
+            try:
+                parts.append(metric.render())
+            except Exception as e:
+                # One broken reader must not take the whole page down
+                parts.append(f"# {metric.name} unavailable: {e}")
+        return "\n".join(parts) + "\n"
+
+
+# --- PROCESS METRICS ---
+def rss_bytes():
+    """Resident memory of this process, None if it can't be read"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+def add_process_metrics(registry):
+    started = time.time()
+    registry.gauge("process_resident_memory_bytes", "Resident memory size in bytes", function=rss_bytes)
+    registry.counter("process_cpu_seconds_total", "User and system CPU time spent in seconds",
+                     function=time.process_time)
+    registry.gauge("process_start_time_seconds", "Start time of the process since unix epoch in seconds",
+                   function=lambda: started)
+    registry.gauge("process_threads", "Number of Python threads", function=threading.active_count)
+
+
+# --- HTTP ENDPOINT ---
+class MetricsHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would flood the receiver's console
+        pass
+
+
+class MetricsServer:
+    """Serves registry on http://host:port/metrics from a daemon thread.
+    Listens on localhost only unless host is given"""
+
+    def __init__(self, registry, port=9100, host="127.0.0.1"):
+        handler = type("Handler", (MetricsHandler,), {"registry": registry})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        print(f"📈 Metrics on http://{self.server.server_address[0]}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
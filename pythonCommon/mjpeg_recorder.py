@@ -0,0 +1,552 @@
+"""
+Continuous footage of the received frames: the JPEGs are appended exactly as
+they arrived (never re-encoded) to MJPEG AVI segments that any video player
+opens, next to a sidecar index to jump to a moment without reading the video.
+
+    footage/
+        cam-1a2b/
+            20260218-140312.avi       RIFF AVI, one MJPG stream, a '00dc' chunk per frame
+            20260218-140312.avi.idx   16-byte header (magic, first frame ns), then
+                                      (t_ns u64, offset u64, size u32, pad u32) per
+                                      frame: fixed size, found by bisect
+
+One segment per device at a time, closed and a new one started after
+max_bytes or max_seconds, when the camera changes resolution (an AVI stream
+has one frame size) or when the camera has been silent for idle_s. The AVI
+header (frame count, frame rate) and its idx1 are written when a segment is
+closed; the sidecar index is flushed with the video every flush_interval,
+so a segment cut short by a crash is still readable here, only players see
+an AVI without an end.
+
+MjpegRecorder.add() only queues the frame (it is called from the receivers'
+network/worker threads), one background thread writes every device. Footage
+finds the segment of a moment by bisect over the segment start times, then
+the frame by bisect over that segment's index, and reads only that frame
+(mmap): O(log n) in hours of footage.
+
+    python pythonCommon/mjpeg_recorder.py info footage
+    python pythonCommon/mjpeg_recorder.py extract footage cam-1a2b 14:05:30 --out frame.jpg
+    python pythonCommon/mjpeg_recorder.py extract footage cam-1a2b 2026-02-18T14:05:30 --seconds 20 --out clip.avi
+"""
+
+import argparse
+import bisect
+import io
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from datetime import datetime
+
+from image_archive import safe_name
+
+INDEX_MAGIC = b"MJPGIDX1"
+INDEX_HEADER = struct.Struct("<8sQ")
+INDEX_ENTRY = struct.Struct("<QQI4x")
+
+# RIFF/AVI structures (AVI 1.0, the variant every player reads)
+CHUNK = struct.Struct("<4sI")
+AVIH = struct.Struct("<14I")
+STRH = struct.Struct("<4s4sIHHIIIIIIiI4h")
+STRF = struct.Struct("<IiiHH4sIiiII")
+IDX1_ENTRY = struct.Struct("<4sIII")
+AVIF_HASINDEX = 0x10
+AVIIF_KEYFRAME = 0x10
+
+# RIFF sizes are 32-bit and some players stop at 1 GB per file
+MAX_SEGMENT_BYTES = 1 << 30
+
+
+class AviWriter:
+    """One MJPEG AVI file: frames appended as they are, header fixed up by close()"""
+
+    def __init__(self, path, width, height, fps=5.0):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.frames = 0
+        self.largest = 0
+        self.idx1 = bytearray()
+        self.file = open(path, "wb")
+        self.file.write(self.headers(fps))
+        # idx1 offsets count from the 'movi' fourcc
+        self.movi = self.file.tell() - 4
+        self.bytes = self.file.tell()
+
+    def headers(self, fps, riff_size=0, movi_size=4):
+        us_per_frame = int(round(1e6 / fps))
+        avih = AVIH.pack(us_per_frame, 0, 0, AVIF_HASINDEX, self.frames, 0, 1, self.largest,
+                         self.width, self.height, 0, 0, 0, 0)
+        strh = STRH.pack(b"vids", b"MJPG", 0, 0, 0, 0, 1000, int(round(fps * 1000)), 0, self.frames,
+                         self.largest, -1, 0, 0, 0, self.width, self.height)
+        strf = STRF.pack(STRF.size, self.width, self.height, 1, 24, b"MJPG",
+                         self.width * self.height * 3, 0, 0, 0, 0)
+        strl = (b"strl" + CHUNK.pack(b"strh", STRH.size) + strh +
+                CHUNK.pack(b"strf", STRF.size) + strf)
+        hdrl = (b"hdrl" + CHUNK.pack(b"avih", AVIH.size) + avih +
+                CHUNK.pack(b"LIST", len(strl)) + strl)
+        return (CHUNK.pack(b"RIFF", riff_size) + b"AVI " +
+                CHUNK.pack(b"LIST", len(hdrl)) + hdrl +
+                CHUNK.pack(b"LIST", movi_size) + b"movi")
+
+    def add(self, data):
+        """Append one JPEG, returns the file offset of its bytes"""
+        offset = self.bytes
+        self.file.write(CHUNK.pack(b"00dc", len(data)))
+        self.file.write(data)
+        size = CHUNK.size + len(data)
+        if len(data) % 2:
+            # RIFF chunks start on even offsets
+            self.file.write(b"\0")
+            size += 1
+        self.idx1 += IDX1_ENTRY.pack(b"00dc", AVIIF_KEYFRAME, offset - self.movi, len(data))
+        self.frames += 1
+        self.largest = max(self.largest, len(data))
+        self.bytes += size
+        return offset + CHUNK.size
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self, fps=5.0):
+        movi_end = self.bytes
+        # Cut off a frame that failed halfway (disk full), the RIFF sizes
+        # only count the complete ones
+        self.file.seek(movi_end)
+        self.file.truncate()
+        self.file.write(CHUNK.pack(b"idx1", len(self.idx1)))
+        self.file.write(self.idx1)
+        end = self.file.tell()
+        self.file.seek(0)
+        self.file.write(self.headers(fps, riff_size=end - 8, movi_size=movi_end - self.movi))
+        self.file.close()
+
+
+class _Segment:
+    """Writer side of one segment: the AVI and its sidecar index"""
+
+    def __init__(self, path, size, start_ns):
+        self.avi = AviWriter(path, *size)
+        self.index_file = open(path + ".idx", "wb")
+        self.index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, start_ns))
+        self.size = size
+        self.start_ns = start_ns
+        self.last_ns = start_ns
+        self.last_write = time.monotonic()
+
+    def add(self, data, t_ns):
+        offset = self.avi.add(data)
+        self.index_file.write(INDEX_ENTRY.pack(t_ns, offset, len(data)))
+        self.last_ns = t_ns
+        self.last_write = time.monotonic()
+
+    def flush(self):
+        # Video first, so the index never points past what is on disk
+        self.avi.flush()
+        self.index_file.flush()
+
+    def close(self):
+        frames = self.avi.frames
+        seconds = (self.last_ns - self.start_ns) / 1e9
+        fps = (frames - 1) / seconds if frames > 1 and seconds > 0 else 5.0
+        self.avi.close(fps)
+        self.index_file.close()
+
+    def abort(self):
+        """Let go of the files after a write error, as they are"""
+        for f in (self.avi.file, self.index_file):
+            try:
+                f.close()
+            except OSError:
+                pass
+
+
+class MjpegRecorder:
+    def __init__(self, root="footage", max_bytes=256 * 1024 * 1024, max_seconds=3600,
+                 idle_s=60.0, flush_interval=1.0, max_pending=256):
+        if not 0 < max_bytes <= MAX_SEGMENT_BYTES:
+            raise ValueError(f"max_bytes must be between 1 and {MAX_SEGMENT_BYTES}")
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.idle_s = idle_s
+        self.flush_interval = flush_interval
+        os.makedirs(root, exist_ok=True)
+
+        # device -> open _Segment, only touched by the writer thread
+        self.segments = {}
+
+        # Statistics
+        self.frames = 0
+        self.bytes_written = 0
+        self.segments_started = 0
+        self.bad_frames = 0
+        self.dropped = 0
+        # Frames lost to write errors (disk full, ...)
+        self.failed = 0
+
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.stopping = False
+        self.writer = None
+
+    def add(self, data, device="default", received_ns=None):
+        """Queue a frame for the background writer. Never blocks"""
+        if self.writer is None:
+            self.writer = threading.Thread(target=self.write_loop, daemon=True)
+            self.writer.start()
+        received_ns = time.time_ns() if received_ns is None else received_ns
+        try:
+            self.pending.put_nowait((bytes(data), device, received_ns))
+        except queue.Full:
+            self.dropped += 1
+
+    def write_loop(self):
+        from PIL import Image
+        running = True
+        last_flush = time.monotonic()
+        while running:
+            try:
+                item = self.pending.get(timeout=self.flush_interval)
+            except queue.Empty:
+                # close() could not queue its sentinel: stop once drained
+                item = None if self.stopping else ()
+            if item is None:
+                running = False
+            elif item:
+                data, device, received_ns = item
+                try:
+                    # Header only, the frame is not decoded
+                    size = Image.open(io.BytesIO(data)).size
+                except Exception:
+                    self.bad_frames += 1
+                else:
+                    try:
+                        self.write(data, device, received_ns, size)
+                    except OSError as e:
+                        # Only this camera's segment is given up, the next
+                        # frame starts a new one
+                        self.write_failed(device, e)
+                        if device in self.segments:
+                            self.close_segment(device)
+            now = time.monotonic()
+            if not running or now - last_flush >= self.flush_interval:
+                self.housekeeping(now)
+                last_flush = now
+        for device in list(self.segments):
+            self.close_segment(device)
+
+    def write(self, data, device, received_ns, size):
+        segment = self.segments.get(device)
+        if segment is not None:
+            # Times only go forward inside a segment, the index is searched by time
+            received_ns = max(received_ns, segment.last_ns)
+            if (segment.size != size or segment.avi.bytes + len(data) > self.max_bytes or
+                    received_ns - segment.start_ns >= self.max_seconds * 1e9):
+                self.close_segment(device)
+                segment = None
+        if segment is None:
+            segment = self.segments[device] = _Segment(self.new_path(device, received_ns), size, received_ns)
+            self.segments_started += 1
+        before = segment.avi.bytes
+        segment.add(data, received_ns)
+        self.frames += 1
+        self.bytes_written += segment.avi.bytes - before
+
+    def new_path(self, device, received_ns):
+        folder = os.path.join(self.root, safe_name(device))
+        os.makedirs(folder, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(received_ns / 1e9))
+        path = os.path.join(folder, stamp + ".avi")
+        n = 1
+        while os.path.exists(path):
+            n += 1
+            path = os.path.join(folder, f"{stamp}-{n}.avi")
+        return path
+
+    def housekeeping(self, now):
+        for device, segment in list(self.segments.items()):
+            if now - segment.last_write >= self.idle_s:
+                # A camera that went away gets a playable file now, not at exit
+                self.close_segment(device)
+                continue
+            try:
+                segment.flush()
+            except OSError as e:
+                self.write_failed(device, e, frames=0)
+                self.close_segment(device)
+
+    def close_segment(self, device):
+        segment = self.segments.pop(device)
+        try:
+            segment.close()
+        except OSError as e:
+            # The frames already flushed stay readable through the .idx
+            self.write_failed(device, e, frames=0)
+            segment.abort()
+
+    def write_failed(self, device, error, frames=1):
+        self.failed += frames
+        # A full disk fails every frame, report the first and then every 100th
+        if self.failed <= 1 or self.failed % 100 == 0:
+            print(f"⚠️ Video of {device}: {error} ({self.failed} frames lost so far)")
+
+    def close(self, timeout=10.0):
+        """Write the queued frames and finish every open segment, waiting
+        at most about timeout seconds for each"""
+        if self.writer is not None:
+            self.stopping = True
+            try:
+                self.pending.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self.writer.join(timeout)
+            if self.writer.is_alive():
+                print(f"⚠️ Video writer still busy, {self.pending.qsize()} frames not written")
+                return
+            self.writer = None
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "bytes_written": self.bytes_written,
+            "segments": self.segments_started,
+            "bad_frames": self.bad_frames,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "pending": self.pending.qsize(),
+        }
+
+
+class FootageSegment:
+    """Read side of one segment: frame i, time -> frame"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path + ".idx", "rb") as f:
+            magic, self.start_ns = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{path}.idx is not a footage index")
+        self.index_file = self.index = self.avi_file = self.data = None
+        self.count = None
+
+    def open(self):
+        # Mapped on first use: a lookup opens one segment, not every one
+        if self.count is not None:
+            return
+        self.avi_file = open(self.path, "rb")
+        avi_size = os.fstat(self.avi_file.fileno()).st_size
+        self.index_file = open(self.path + ".idx", "rb")
+        index_size = os.fstat(self.index_file.fileno()).st_size
+        self.count = (index_size - INDEX_HEADER.size) // INDEX_ENTRY.size
+        if self.count <= 0 or avi_size == 0:
+            self.count = 0
+            return
+        self.index = mmap.mmap(self.index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.data = mmap.mmap(self.avi_file.fileno(), 0, access=mmap.ACCESS_READ)
+        # Entries past the end of the video (still being written, or a crash)
+        while self.count:
+            _, offset, size = self.entry(self.count - 1)
+            if offset + size <= avi_size:
+                break
+            self.count -= 1
+
+    def __len__(self):
+        self.open()
+        return self.count
+
+    def entry(self, i):
+        """(t_ns, offset, size) of frame i"""
+        return INDEX_ENTRY.unpack_from(self.index, INDEX_HEADER.size + i * INDEX_ENTRY.size)
+
+    def time_of(self, i):
+        return self.entry(i)[0]
+
+    def frame(self, i):
+        """(t_ns, jpeg bytes) of frame i"""
+        t_ns, offset, size = self.entry(i)
+        return t_ns, self.data[offset:offset + size]
+
+    def find(self, t_ns):
+        """Frame on screen at t_ns: the last one at or before it (0 if none)"""
+        return max(bisect.bisect_right(_Times(self), t_ns) - 1, 0)
+
+    def last_ns(self):
+        return self.time_of(len(self) - 1) if len(self) else self.start_ns
+
+    def close(self):
+        for handle in (self.index, self.index_file, self.data, self.avi_file):
+            if handle is not None:
+                handle.close()
+        self.index_file = self.index = self.avi_file = self.data = None
+        self.count = None
+
+
+class _Times:
+    """A segment's index as a sequence of times, for bisect"""
+
+    def __init__(self, segment):
+        self.segment = segment
+
+    def __len__(self):
+        return len(self.segment)
+
+    def __getitem__(self, i):
+        return self.segment.time_of(i)
+
+
+class Footage:
+    """Every device's segments under a recorder's root"""
+
+    def __init__(self, root="footage"):
+        self.root = root
+        self.segments = {}
+        self.refresh()
+
+    def refresh(self):
+        """Pick up segments started since the last look"""
+        self.close()
+        self.segments = {}
+        for device in sorted(os.listdir(self.root)):
+            folder = os.path.join(self.root, device)
+            if not os.path.isdir(folder):
+                continue
+            segments = [FootageSegment(os.path.join(folder, name[:-4]))
+                        for name in os.listdir(folder) if name.endswith(".avi.idx")]
+            if segments:
+                self.segments[device] = sorted(segments, key=lambda segment: segment.start_ns)
+
+    def devices(self):
+        return list(self.segments)
+
+    def locate(self, device, t_ns):
+        """(segment, frame position) on screen at t_ns"""
+        segments = self.segments[safe_name(device)]
+        starts = [segment.start_ns for segment in segments]
+        position = max(bisect.bisect_right(starts, t_ns) - 1, 0)
+        # An empty segment (crash before its first flush) is skipped backwards
+        while position > 0 and not len(segments[position]):
+            position -= 1
+        segment = segments[position]
+        return segment, segment.find(t_ns)
+
+    def frame_at(self, device, t_ns):
+        """(t_ns, jpeg bytes) of the frame on screen at t_ns"""
+        segment, i = self.locate(device, t_ns)
+        if not len(segment):
+            return None
+        return segment.frame(i)
+
+    def frames(self, device, start_ns, end_ns):
+        """(t_ns, jpeg bytes) from the frame on screen at start_ns up to end_ns"""
+        segments = self.segments[safe_name(device)]
+        segment, i = self.locate(device, start_ns)
+        for segment in segments[segments.index(segment):]:
+            if segment.start_ns > end_ns:
+                return
+            for j in range(i, len(segment)):
+                t_ns, data = segment.frame(j)
+                if t_ns > end_ns:
+                    return
+                yield t_ns, data
+            i = 0
+
+    def first_ns(self, device):
+        return self.segments[safe_name(device)][0].start_ns
+
+    def last_ns(self, device):
+        return self.segments[safe_name(device)][-1].last_ns()
+
+    def close(self):
+        for segments in self.segments.values():
+            for segment in segments:
+                segment.close()
+
+
+def moment_ns(first_ns, when):
+    """Command line time -> ns: seconds from the first frame, a time of day
+    (on the first frame's date) or an ISO date-time"""
+    try:
+        return first_ns + int(float(when) * 1e9)
+    except ValueError:
+        pass
+    first = datetime.fromtimestamp(first_ns / 1e9)
+    moment = datetime.fromisoformat(when) if "-" in when else \
+        datetime.combine(first.date(), datetime.strptime(when, "%H:%M:%S").time())
+    return int(moment.timestamp() * 1e9)
+
+
+# --- COMMAND LINE ---
+def print_info(args):
+    footage = Footage(args.root)
+    if not footage.devices():
+        print(f"{args.root}: no footage")
+        return
+    print(f"{'device':<20}{'segments':>9}{'frames':>9}{'MB':>9}  from -> to")
+    for device, segments in footage.segments.items():
+        frames = sum(len(segment) for segment in segments)
+        size = sum(os.path.getsize(segment.path) for segment in segments)
+        first = datetime.fromtimestamp(footage.first_ns(device) / 1e9)
+        last = datetime.fromtimestamp(footage.last_ns(device) / 1e9)
+        print(f"{device:<20}{len(segments):>9}{frames:>9}{size / 1e6:>9.1f}  "
+              f"{first:%Y-%m-%d %H:%M:%S} -> {last:%Y-%m-%d %H:%M:%S}")
+    footage.close()
+
+
+def extract(args):
+    footage = Footage(args.root)
+    start_ns = moment_ns(footage.first_ns(args.device), args.when)
+    if args.seconds is None:
+        found = footage.frame_at(args.device, start_ns)
+        if found is None:
+            print("No frames")
+            footage.close()
+            return
+        t_ns, data = found
+        with open(args.out, "wb") as f:
+            f.write(data)
+        print(f"🖼️ Frame of {datetime.fromtimestamp(t_ns / 1e9):%H:%M:%S.%f} -> {args.out}")
+    else:
+        # A clip: the frames copied into a new AVI, still not re-encoded
+        from PIL import Image
+        clip = None
+        first_ns = last_ns = start_ns
+        for t_ns, data in footage.frames(args.device, start_ns, start_ns + int(args.seconds * 1e9)):
+            if clip is None:
+                clip = AviWriter(args.out, *Image.open(io.BytesIO(data)).size)
+                first_ns = t_ns
+            clip.add(data)
+            last_ns = t_ns
+        if clip is None:
+            print("No frames in that range")
+        else:
+            seconds = (last_ns - first_ns) / 1e9
+            clip.close((clip.frames - 1) / seconds if clip.frames > 1 and seconds > 0 else 5.0)
+            print(f"🎞️ {clip.frames} frames ({seconds:.1f}s) -> {args.out}")
+    footage.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up recorded MJPEG footage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    info = commands.add_parser("info", help="segments, frames and time span per device")
+    info.add_argument("root")
+
+    grab = commands.add_parser("extract", help="the frame at a moment, or a clip from it")
+    grab.add_argument("root")
+    grab.add_argument("device")
+    grab.add_argument("when", help="seconds from the first frame, HH:MM:SS or an ISO date-time")
+    grab.add_argument("--seconds", type=float, default=None, help="write a clip this long instead of one frame")
+    grab.add_argument("--out", required=True, help=".jpg for a frame, .avi for a clip")
+
+    args = parser.parse_args()
+    if args.command == "info":
+        print_info(args)
+    else:
+        extract(args)
+
+
+if __name__ == "__main__":
+    main()
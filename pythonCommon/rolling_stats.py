@@ -0,0 +1,260 @@
+"""
+Rolling statistics of the classification stream, per device and per label.
+
+Every series (all messages, one device, one label) keeps a fixed amount of
+state whatever the message rate, and an update is O(1):
+
+- message rate over a sliding window: one counter per second, in a ring
+- EWMA of inference time and confidence
+- p50/p95/p99 of inference time, confidence and inter-arrival gap from
+  fixed-bin histograms (log-spaced bins, ~5% relative error, for times;
+  1% bins for confidence). Each histogram has two halves that take turns,
+  so a quantile covers the last half to full window
+- count of inter-arrival gaps longer than gap_threshold (camera stalls)
+
+add() is meant for the ingest (MQTT) thread and snapshot() for the GUI:
+the reader only copies lists (a single atomic step under the GIL each) and
+computes from the copies, so the ingest thread never waits on a lock.
+"""
+
+import math
+import time
+from collections import OrderedDict
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class RateWindow:
+    """Events per second over the last window_s seconds"""
+
+    def __init__(self, window_s=60):
+        self.window_s = window_s
+        self.counts = [0] * window_s
+        self.seconds = [-1] * window_s
+        self.first = None
+
+    def add(self, now):
+        second = int(now)
+        slot = second % self.window_s
+        if self.seconds[slot] != second:
+            self.seconds[slot] = second
+            self.counts[slot] = 0
+        self.counts[slot] += 1
+        if self.first is None:
+            self.first = now
+
+    def count(self, now):
+        """Events in the window (the current, partial second included)"""
+        current = int(now)
+        seconds = list(self.seconds)
+        counts = list(self.counts)
+        return sum(c for s, c in zip(seconds, counts) if current - s < self.window_s)
+
+    def rate(self, now):
+        if self.first is None:
+            return 0.0
+        # A series younger than the window is averaged over its own age
+        span = min(self.window_s, max(1.0, now - self.first))
+        return self.count(now) / span
+
+
+class WindowedHistogram:
+    """Fixed-bin histogram of the last half to full window.
+
+    bin_of maps a value to a bin index, value_of a bin back to a value
+    """
+
+    def __init__(self, bins, bin_of, value_of, window_s=60):
+        self.bins = bins
+        self.bin_of = bin_of
+        self.value_of = value_of
+        self.half = window_s / 2
+        self.halves = [[0] * bins, [0] * bins]
+        self.epochs = [-1, -1]
+
+    def add(self, value, now):
+        epoch = int(now / self.half)
+        slot = epoch % 2
+        if self.epochs[slot] != epoch:
+            # Whole new list instead of zeroing, a reader may hold the old one
+            self.halves[slot] = [0] * self.bins
+            self.epochs[slot] = epoch
+        self.halves[slot][self.bin_of(value)] += 1
+
+    def quantiles(self, now, quantiles=QUANTILES):
+        """{q: value}, None for an empty window"""
+        epoch = int(now / self.half)
+        merged = [0] * self.bins
+        total = 0
+        for slot in (0, 1):
+            if epoch - self.epochs[slot] <= 1:
+                counts = list(self.halves[slot])
+                total += sum(counts)
+                merged = [a + b for a, b in zip(merged, counts)]
+        if total == 0:
+            return {q: None for q in quantiles}
+
+        result = {}
+        targets = sorted(quantiles)
+        running = 0
+        index = 0
+        for i, count in enumerate(merged):
+            running += count
+            while index < len(targets) and running >= targets[index] * total:
+                result[targets[index]] = self.value_of(i)
+                index += 1
+            if index == len(targets):
+                break
+        return result
+
+
+def log_histogram(window_s, low=0.01, high=1e6, growth=1.1):
+    """Bins growing by growth (10% wide, values within ~5% of the bin centre)"""
+    log_growth = math.log(growth)
+    bins = int(math.log(high / low) / log_growth) + 2
+
+    def bin_of(value):
+        if value <= low:
+            return 0
+        return min(bins - 1, int(math.log(value / low) / log_growth) + 1)
+
+    def value_of(index):
+        if index == 0:
+            return low
+        return low * growth ** (index - 0.5)
+
+    return WindowedHistogram(bins, bin_of, value_of, window_s)
+
+
+def linear_histogram(window_s, low=0.0, high=1.0, bins=100):
+    width = (high - low) / bins
+
+    def bin_of(value):
+        return min(bins - 1, max(0, int((value - low) / width)))
+
+    def value_of(index):
+        return low + (index + 0.5) * width
+
+    return WindowedHistogram(bins, bin_of, value_of, window_s)
+
+
+class SeriesStats:
+    """Everything kept for one series, constant size"""
+
+    def __init__(self, window_s, gap_threshold_s, alpha):
+        self.alpha = alpha
+        self.gap_threshold_s = gap_threshold_s
+        self.total = 0
+        self.rate = RateWindow(window_s)
+        self.inference = log_histogram(window_s)
+        self.confidence = linear_histogram(window_s)
+        self.gap = log_histogram(window_s, low=0.001, high=1e5)
+        self.inference_ewma = None
+        self.confidence_ewma = None
+        self.long_gaps = 0
+        self.last_seen = None
+
+    def ewma(self, current, value):
+        return value if current is None else current + self.alpha * (value - current)
+
+    def add(self, inference_ms, confidence, now):
+        self.total += 1
+        self.rate.add(now)
+        if self.last_seen is not None:
+            gap = now - self.last_seen
+            self.gap.add(gap, now)
+            if gap > self.gap_threshold_s:
+                self.long_gaps += 1
+        self.last_seen = now
+        if inference_ms is not None:
+            self.inference.add(inference_ms, now)
+            self.inference_ewma = self.ewma(self.inference_ewma, inference_ms)
+        if confidence is not None:
+            self.confidence.add(confidence, now)
+            self.confidence_ewma = self.ewma(self.confidence_ewma, confidence)
+
+    def snapshot(self, now):
+        inference = self.inference.quantiles(now)
+        confidence = self.confidence.quantiles(now)
+        gap = self.gap.quantiles(now)
+        return {
+            "total": self.total,
+            "window_count": self.rate.count(now),
+            "rate": self.rate.rate(now),
+            "inference_ewma": self.inference_ewma,
+            "inference_p50": inference[0.5],
+            "inference_p95": inference[0.95],
+            "inference_p99": inference[0.99],
+            "confidence_ewma": self.confidence_ewma,
+            "confidence_p50": confidence[0.5],
+            "confidence_p95": confidence[0.95],
+            "confidence_p99": confidence[0.99],
+            "gap_p50": gap[0.5],
+            "gap_p95": gap[0.95],
+            "gap_p99": gap[0.99],
+            "long_gaps": self.long_gaps,
+            "age_s": None if self.last_seen is None else now - self.last_seen,
+        }
+
+
+class RollingStats:
+    """Per-device and per-label rolling statistics of classification messages.
+
+    At most max_series devices and max_series labels are tracked, the least
+    recently seen one is forgotten first.
+    """
+
+    def __init__(self, window_s=60, gap_threshold_s=5.0, alpha=0.1, max_series=256):
+        self.window_s = window_s
+        self.gap_threshold_s = gap_threshold_s
+        self.alpha = alpha
+        self.max_series = max_series
+        self.all = self.new_series()
+        self.devices = OrderedDict()
+        self.labels = OrderedDict()
+
+    def new_series(self):
+        return SeriesStats(self.window_s, self.gap_threshold_s, self.alpha)
+
+    def series(self, table, key):
+        series = table.get(key)
+        if series is None:
+            if len(table) >= self.max_series:
+                table.popitem(last=False)
+            series = table[key] = self.new_series()
+        else:
+            table.move_to_end(key)
+        return series
+
+    def add(self, device, label, inference_ms=None, confidence=None, now=None):
+        """Record one classification (ingest thread)"""
+        now = time.time() if now is None else now
+        self.all.add(inference_ms, confidence, now)
+        self.series(self.devices, device).add(inference_ms, confidence, now)
+        self.series(self.labels, label).add(inference_ms, confidence, now)
+
+    def add_message(self, data, now=None):
+        """Record a classification JSON dict as the cameras send it"""
+        inference = data.get("inference_time")
+        confidence = data.get("confidence")
+        self.add(data.get("client_id", "unknown"), data.get("label", "unknown"),
+                 float(inference) if inference is not None else None,
+                 float(confidence) if confidence is not None else None, now)
+
+    def snapshot(self, now=None):
+        """Plain dicts for the GUI, callable from any thread"""
+        now = time.time() if now is None else now
+        # list() of a dict's items is a single step under the GIL, so a
+        # series added meanwhile cannot break the iteration
+        devices = list(self.devices.items())
+        labels = list(self.labels.items())
+        return {
+            "all": self.all.snapshot(now),
+            "devices": {key: series.snapshot(now) for key, series in devices},
+            "labels": {key: series.snapshot(now) for key, series in labels},
+        }
+
+    def clear(self):
+        self.all = self.new_series()
+        self.devices = OrderedDict()
+        self.labels = OrderedDict()
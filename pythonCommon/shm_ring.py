@@ -0,0 +1,312 @@
+"""
+Single-producer, many-consumer broadcast ring in multiprocessing.shared_memory.
+
+One writer (the ingest daemon) publishes messages into fixed-size slots.
+Every consumer process keeps its own read position, so a slow viewer never
+holds back the writer or the other viewers. A consumer that falls a whole
+ring behind has lost the overwritten slots: it skips ahead and counts them
+as dropped.
+
+Layout, all fields are 8-byte words:
+
+    header      magic, generation, slot count, slot size, max consumers,
+                write seq, producer heartbeat (ms), reserved
+    consumers   token, heartbeat (ms), next seq to read, received, dropped,
+                name (3 words)
+    slots       seq, length | kind << 32, payload (slot size bytes)
+
+A slot's seq is cleared before the payload is written and set after it.
+Readers check it before and after copying (a seqlock), so a slot that was
+overwritten mid-copy is counted as a drop instead of being returned.
+"""
+
+import os
+import sys
+import time
+from multiprocessing import shared_memory
+
+MAGIC = 0x31474E4952505345  # b"ESPRING1"
+WORD = 8
+HEADER_WORDS = 8
+CONSUMER_WORDS = 8
+SLOT_HEADER_WORDS = 2
+NAME_BYTES = 3 * WORD
+
+# Header word indexes
+H_MAGIC, H_GENERATION, H_SLOTS, H_SLOT_SIZE, H_CONSUMERS, H_WRITE_SEQ, H_HEARTBEAT = range(7)
+# Consumer word indexes
+C_TOKEN, C_HEARTBEAT, C_READ_SEQ, C_RECEIVED, C_DROPPED, C_NAME = range(6)
+
+# A consumer that has not polled for this long has its slot reused
+CONSUMER_TIMEOUT_MS = 5000
+
+
+class RingError(RuntimeError):
+    pass
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def _open_shared_memory(name):
+    """Attach without registering the segment with the resource tracker,
+    which would unlink it when this process exits (only the creator owns it)"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    if os.name != "posix":
+        return shared_memory.SharedMemory(name=name)
+    # Unregistering afterwards is not enough: spawned children share the
+    # parent's tracker and would remove the creator's registration
+    from multiprocessing import resource_tracker
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: (
+        None if rtype == "shared_memory" else register(name, rtype))
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class _Ring:
+    """Offsets shared by the writer and the readers"""
+
+    def _map(self, shm):
+        self.shm = shm
+        self.buf = shm.buf
+        self.words = shm.buf.cast("Q")
+        if self.words[H_MAGIC] != MAGIC:
+            raise RingError(f"{shm.name} is not a ring buffer")
+        self.slot_count = self.words[H_SLOTS]
+        self.slot_size = self.words[H_SLOT_SIZE]
+        self.max_consumers = self.words[H_CONSUMERS]
+        self.generation = self.words[H_GENERATION]
+        self.slot_words = SLOT_HEADER_WORDS + self.slot_size // WORD
+        self.slots_word = HEADER_WORDS + self.max_consumers * CONSUMER_WORDS
+
+    def _consumer_word(self, index, field):
+        return HEADER_WORDS + index * CONSUMER_WORDS + field
+
+    def _slot_word(self, seq):
+        return self.slots_word + ((seq - 1) % self.slot_count) * self.slot_words
+
+    def consumer_table(self):
+        """[dict] of the attached consumers, as the producer sees them"""
+        write_seq = self.words[H_WRITE_SEQ]
+        now = now_ms()
+        table = []
+        for index in range(self.max_consumers):
+            base = self._consumer_word(index, 0)
+            if not self.words[base + C_TOKEN]:
+                continue
+            name_at = (base + C_NAME) * WORD
+            name = bytes(self.buf[name_at:name_at + NAME_BYTES]).rstrip(b"\0").decode("utf-8", "replace")
+            read_seq = self.words[base + C_READ_SEQ]
+            age_ms = now - self.words[base + C_HEARTBEAT]
+            table.append({
+                "slot": index,
+                "name": name,
+                "lag": max(0, write_seq - read_seq + 1),
+                "received": self.words[base + C_RECEIVED],
+                "dropped": self.words[base + C_DROPPED],
+                "idle_s": age_ms / 1000,
+                "stale": age_ms > CONSUMER_TIMEOUT_MS,
+            })
+        return table
+
+    def producer_age(self):
+        """Seconds since the writer last published or sent a heartbeat"""
+        return (now_ms() - self.words[H_HEARTBEAT]) / 1000
+
+
+class RingWriter(_Ring):
+    """The single producer. Creates (or takes over) the named segment"""
+
+    def __init__(self, name, slot_count=64, slot_size=64 * 1024, max_consumers=16):
+        slot_size = -(-slot_size // WORD) * WORD
+        size = WORD * (HEADER_WORDS + max_consumers * CONSUMER_WORDS
+                       + slot_count * (SLOT_HEADER_WORDS + slot_size // WORD))
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a daemon that did not shut down cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        words = shm.buf.cast("Q")
+        words[H_MAGIC] = MAGIC
+        # Readers reattach when the generation changes (daemon restarted)
+        words[H_GENERATION] = int.from_bytes(os.urandom(8), "little") or 1
+        words[H_SLOTS] = slot_count
+        words[H_SLOT_SIZE] = slot_size
+        words[H_CONSUMERS] = max_consumers
+        words[H_WRITE_SEQ] = 0
+        words[H_HEARTBEAT] = now_ms()
+        words.release()
+        self.name = name
+        self._map(shm)
+        self.published = 0
+        self.oversize = 0
+
+    def publish(self, parts, kind=0):
+        """Write one message (bytes-like or a list of bytes-like parts that
+        are concatenated) and return its seq. Never blocks"""
+        if not isinstance(parts, (list, tuple)):
+            parts = (parts,)
+        length = sum(len(part) for part in parts)
+        if length > self.slot_size:
+            self.oversize += 1
+            raise ValueError(f"message of {length} bytes does not fit a {self.slot_size} byte slot")
+
+        words = self.words
+        seq = words[H_WRITE_SEQ] + 1
+        slot = self._slot_word(seq)
+        words[slot] = 0
+        offset = (slot + SLOT_HEADER_WORDS) * WORD
+        for part in parts:
+            self.buf[offset:offset + len(part)] = part
+            offset += len(part)
+        words[slot + 1] = length | (kind << 32)
+        words[slot] = seq
+        words[H_WRITE_SEQ] = seq
+        words[H_HEARTBEAT] = now_ms()
+        self.published += 1
+        return seq
+
+    def heartbeat(self):
+        self.words[H_HEARTBEAT] = now_ms()
+
+    def close(self):
+        self.words.release()
+        self.buf = None
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class RingReader(_Ring):
+    """One consumer. Claims a consumer slot so the producer can report its
+    lag and drops; starts at the newest message unless from_start is set"""
+
+    def __init__(self, name, consumer_name, from_start=False):
+        self.name = name
+        self.consumer_name = consumer_name
+        self._map(_open_shared_memory(name))
+        self.token = int.from_bytes(os.urandom(8), "little") or 1
+        self.index = self._claim()
+        write_seq = self.words[H_WRITE_SEQ]
+        if from_start:
+            self.read_seq = max(1, write_seq - self.slot_count + 1)
+        else:
+            self.read_seq = write_seq + 1
+        self.received = 0
+        self.dropped = 0
+        self.last_heartbeat = 0
+        self._publish_position(force=True)
+
+    def _claim(self):
+        now = now_ms()
+        for index in range(self.max_consumers):
+            base = self._consumer_word(index, 0)
+            token = self.words[base + C_TOKEN]
+            if token and now - self.words[base + C_HEARTBEAT] <= CONSUMER_TIMEOUT_MS:
+                continue
+            # Write our token, then check that no other process raced us to it
+            self.words[base + C_HEARTBEAT] = now
+            self.words[base + C_TOKEN] = self.token
+            time.sleep(0.005)
+            if self.words[base + C_TOKEN] != self.token:
+                continue
+            for field in (C_RECEIVED, C_DROPPED):
+                self.words[base + field] = 0
+            name = self.consumer_name.encode("utf-8")[:NAME_BYTES].ljust(NAME_BYTES, b"\0")
+            name_at = (base + C_NAME) * WORD
+            self.buf[name_at:name_at + NAME_BYTES] = name
+            return index
+        raise RingError(f"all {self.max_consumers} consumer slots of {self.name} are in use")
+
+    def _publish_position(self, force=False):
+        now = now_ms()
+        base = self._consumer_word(self.index, 0)
+        self.words[base + C_READ_SEQ] = self.read_seq
+        self.words[base + C_RECEIVED] = self.received
+        self.words[base + C_DROPPED] = self.dropped
+        if force or now - self.last_heartbeat >= 250:
+            self.words[base + C_HEARTBEAT] = now
+            self.last_heartbeat = now
+
+    @property
+    def lag(self):
+        return max(0, self.words[H_WRITE_SEQ] - self.read_seq + 1)
+
+    def read(self):
+        """Next message as (kind, bytes), or None when caught up"""
+        words = self.words
+        while True:
+            write_seq = words[H_WRITE_SEQ]
+            if self.read_seq > write_seq:
+                self._publish_position()
+                return None
+
+            if write_seq - self.read_seq >= self.slot_count:
+                # Overrun: jump past the oldest slots, with some headroom so
+                # the writer does not lap us again straight away
+                oldest = write_seq - self.slot_count + 1
+                skip_to = min(write_seq, oldest + max(1, self.slot_count // 8))
+                self.dropped += skip_to - self.read_seq
+                self.read_seq = skip_to
+
+            slot = self._slot_word(self.read_seq)
+            if words[slot] != self.read_seq:
+                # Being rewritten right now
+                self.dropped += 1
+                self.read_seq += 1
+                continue
+            meta = words[slot + 1]
+            length, kind = meta & 0xFFFFFFFF, meta >> 32
+            offset = (slot + SLOT_HEADER_WORDS) * WORD
+            data = bytes(self.buf[offset:offset + length])
+            if words[slot] != self.read_seq:
+                self.dropped += 1
+                self.read_seq += 1
+                continue
+
+            self.read_seq += 1
+            self.received += 1
+            self._publish_position()
+            return kind, data
+
+    def close(self):
+        """Give the consumer slot back and detach (never unlinks)"""
+        if self.buf is None:
+            return
+        base = self._consumer_word(self.index, 0)
+        if self.words[base + C_TOKEN] == self.token:
+            self.words[base + C_TOKEN] = 0
+        self.words.release()
+        self.buf = None
+        self.shm.close()
+
+
+def ring_status(name):
+    """Writer seq, producer age and the consumer table of a running ring,
+    without claiming a consumer slot"""
+    ring = _Ring()
+    ring._map(_open_shared_memory(name))
+    try:
+        return {
+            "name": name,
+            "write_seq": ring.words[H_WRITE_SEQ],
+            "slot_count": ring.slot_count,
+            "slot_size": ring.slot_size,
+            "producer_age_s": ring.producer_age(),
+            "consumers": ring.consumer_table(),
+        }
+    finally:
+        ring.words.release()
+        ring.buf = None
+        ring.shm.close()
@@ -0,0 +1,517 @@
+"""
+Record and replay raw MQTT traffic, so an incident or a benchmark load can
+be fed to the receivers again without the broker.
+
+    capture.mqlog       16-byte header (magic, created ns), then one record
+                        per message:
+                            t_ns u64, payload length u32, topic length u16,
+                            qos u8, flags u8 (bit 0 = retain), topic, payload
+    capture.mqlog.idx   16-byte header, then (t_ns u64, offset u64) per
+                        record: fixed size, so message i and the first
+                        message at or after a time are found without a scan
+
+Both files are only ever appended to, the log before the index, and read
+through mmap: a replay touches just the pages of the part it plays. The
+recorder keeps arrival times non-decreasing (the index is searched by time)
+and a log cut short by a crash is repaired on the next open: the index is
+completed from the log, a half-written last record is ignored (and cut off
+when the recorder appends again).
+
+TrafficReplayer calls the same on_message(client, userdata, msg) the
+receivers give paho, on its own thread, at the recorded pace (speed=1),
+N times faster (speed=N) or as fast as the receiver takes it (speed=0),
+from any point of the recording.
+
+    python pythonCommon/traffic_log.py record capture.mqlog
+    python pythonCommon/traffic_log.py info capture.mqlog
+    python pythonCommon/traffic_log.py replay capture.mqlog --broker 127.0.0.1 --speed 4 --seek 30
+    python Esp32ToPythonImageHiveMqComm/pythonCatch.py --replay capture.mqlog --speed 0 --headless
+"""
+
+import argparse
+import bisect
+import io
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+LOG_MAGIC = b"MQTTLOG1"
+INDEX_MAGIC = b"MQTTIDX1"
+FILE_HEADER = struct.Struct("<8sQ")
+RECORD_HEADER = struct.Struct("<QIHBB")
+INDEX_ENTRY = struct.Struct("<QQ")
+FLAG_RETAIN = 1
+
+# Everything the sketches and the PC programs of this repo publish
+DEFAULT_TOPICS = ("test/esp32_to_python/#", "test/python_to_esp32", "esp32/cam/classification",
+                  "esp32/cam/status", "esp32/camera/images")
+
+
+def topic_matches(pattern, topic):
+    """MQTT filter matching with + and #"""
+    pattern_parts = pattern.split("/")
+    topic_parts = topic.split("/")
+    for i, part in enumerate(pattern_parts):
+        if part == "#":
+            return True
+        if i >= len(topic_parts) or (part != "+" and part != topic_parts[i]):
+            return False
+    return len(pattern_parts) == len(topic_parts)
+
+
+class TrafficLog:
+    """Read side: message i, time -> position, iteration over a range"""
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.log_file = open(path, "rb")
+        self.size = os.fstat(self.log_file.fileno()).st_size
+        self.data = None
+        self.created_ns = 0
+        if self.size >= FILE_HEADER.size:
+            self.data = mmap.mmap(self.log_file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, self.created_ns = FILE_HEADER.unpack_from(self.data)
+            if magic != LOG_MAGIC:
+                raise ValueError(f"{path} is not a traffic log")
+        self.index_file = None
+        self.index = None
+        self.count = 0
+        self.unindexed = 0
+        self.end = FILE_HEADER.size
+        self.load_index()
+
+    def record_end(self, offset):
+        """End of the record at offset, None if it runs past the log"""
+        if offset + RECORD_HEADER.size > self.size:
+            return None
+        _, length, topic_length, _, _ = RECORD_HEADER.unpack_from(self.data, offset)
+        end = offset + RECORD_HEADER.size + topic_length + length
+        return end if end <= self.size else None
+
+    def load_index(self):
+        # Entries that point into the log as it is; the rest of the log
+        # (index not flushed yet, cut short by a crash, or missing) is
+        # indexed in memory. The files are never written here, a recorder
+        # may still be appending to them
+        if self.data is None:
+            return
+        if os.path.exists(self.index_path) and os.path.getsize(self.index_path) > FILE_HEADER.size:
+            self.index_file = open(self.index_path, "rb")
+            self.index = mmap.mmap(self.index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.index[:8] != INDEX_MAGIC:
+                raise ValueError(f"{self.index_path} is not a traffic log index")
+        else:
+            self.index = FILE_HEADER.pack(INDEX_MAGIC, 0)
+        count = (len(self.index) - FILE_HEADER.size) // INDEX_ENTRY.size
+        end = FILE_HEADER.size
+        while count:
+            _, offset = INDEX_ENTRY.unpack_from(self.index, FILE_HEADER.size + (count - 1) * INDEX_ENTRY.size)
+            record_end = self.record_end(offset)
+            if record_end is not None:
+                end = record_end
+                break
+            count -= 1
+
+        missing = []
+        while True:
+            record_end = self.record_end(end)
+            if record_end is None:
+                break
+            t_ns = RECORD_HEADER.unpack_from(self.data, end)[0]
+            missing.append(INDEX_ENTRY.pack(t_ns, end))
+            end = record_end
+        if missing or len(self.index) != FILE_HEADER.size + count * INDEX_ENTRY.size:
+            self.index = self.index[:FILE_HEADER.size + count * INDEX_ENTRY.size] + b"".join(missing)
+        self.count = count + len(missing)
+        self.unindexed = len(missing)
+        self.end = end
+
+    def __len__(self):
+        return self.count
+
+    def entry(self, i):
+        """(t_ns, offset) of message i"""
+        return INDEX_ENTRY.unpack_from(self.index, FILE_HEADER.size + i * INDEX_ENTRY.size)
+
+    def time_of(self, i):
+        return self.entry(i)[0]
+
+    def message(self, i):
+        """(t_ns, topic, payload, qos, retain) of message i"""
+        _, offset = self.entry(i)
+        t_ns, length, topic_length, qos, flags = RECORD_HEADER.unpack_from(self.data, offset)
+        start = offset + RECORD_HEADER.size
+        topic = self.data[start:start + topic_length].decode("utf-8")
+        payload = self.data[start + topic_length:start + topic_length + length]
+        return t_ns, topic, payload, qos, bool(flags & FLAG_RETAIN)
+
+    def find(self, t_ns):
+        """Position of the first message at or after t_ns"""
+        return bisect.bisect_left(_Times(self), t_ns)
+
+    def first_ns(self):
+        return self.time_of(0) if self.count else None
+
+    def last_ns(self):
+        return self.time_of(self.count - 1) if self.count else None
+
+    def duration(self):
+        return (self.last_ns() - self.first_ns()) / 1e9 if self.count else 0.0
+
+    def messages(self, start=0, stop=None):
+        stop = self.count if stop is None else min(stop, self.count)
+        for i in range(start, stop):
+            yield self.message(i)
+
+    def close(self):
+        for handle in (self.index, self.index_file, self.data, self.log_file):
+            if isinstance(handle, (mmap.mmap, io.IOBase)):
+                handle.close()
+
+
+class _Times:
+    """The index as a sequence of times, for bisect"""
+
+    def __init__(self, log):
+        self.log = log
+
+    def __len__(self):
+        return len(self.log)
+
+    def __getitem__(self, i):
+        return self.log.time_of(i)
+
+
+class TrafficRecorder:
+    """Append-only writer, thread-safe; wrap() puts it in front of an on_message"""
+
+    def __init__(self, path, flush_s=1.0):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.flush_s = flush_s
+        self.lock = threading.Lock()
+        self.last_ns = 0
+        self.messages = 0
+        self.bytes = 0
+
+        if os.path.exists(path) and os.path.getsize(path) >= FILE_HEADER.size:
+            # Continue a recording: cut a half-written last record off first
+            log = TrafficLog(path)
+            end, index = log.end, bytes(log.index)
+            if len(log):
+                self.last_ns = log.last_ns()
+            if log.unindexed:
+                print(f"🔧 Indexed {log.unindexed} messages of {path} the index was missing")
+            log.close()
+            with open(path, "r+b") as f:
+                f.truncate(end)
+            with open(self.index_path, "wb") as f:
+                f.write(index)
+            self.log_file = open(path, "ab", buffering=1024 * 1024)
+            self.index_file = open(self.index_path, "ab", buffering=64 * 1024)
+            self.offset = end
+        else:
+            self.log_file = open(path, "wb", buffering=1024 * 1024)
+            self.index_file = open(self.index_path, "wb", buffering=64 * 1024)
+            self.log_file.write(FILE_HEADER.pack(LOG_MAGIC, time.time_ns()))
+            self.index_file.write(FILE_HEADER.pack(INDEX_MAGIC, 0))
+            self.offset = FILE_HEADER.size
+        self.last_flush = time.monotonic()
+
+    def record(self, topic, payload, qos=0, retain=False, t_ns=None):
+        """Append one message; t_ns defaults to now (epoch ns)"""
+        t_ns = time.time_ns() if t_ns is None else t_ns
+        topic = topic.encode("utf-8")
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        with self.lock:
+            # The wall clock can step back (NTP), the index must not
+            t_ns = max(t_ns, self.last_ns)
+            self.last_ns = t_ns
+            self.log_file.write(RECORD_HEADER.pack(t_ns, len(payload), len(topic), qos,
+                                                   FLAG_RETAIN if retain else 0))
+            self.log_file.write(topic)
+            self.log_file.write(payload)
+            self.index_file.write(INDEX_ENTRY.pack(t_ns, self.offset))
+            size = RECORD_HEADER.size + len(topic) + len(payload)
+            self.offset += size
+            self.messages += 1
+            self.bytes += size
+            now = time.monotonic()
+            if now - self.last_flush >= self.flush_s:
+                self._flush(now)
+
+    def _flush(self, now):
+        # Log first: an index entry never points at bytes not yet written
+        self.log_file.flush()
+        self.index_file.flush()
+        self.last_flush = now
+
+    def wrap(self, on_message):
+        """on_message(client, userdata, msg) that records msg first"""
+        def recording_on_message(client, userdata, msg):
+            try:
+                self.record(msg.topic, msg.payload, msg.qos, msg.retain)
+            except Exception as e:
+                print(f"⚠️ Message not recorded: {e}")
+            on_message(client, userdata, msg)
+        return recording_on_message
+
+    def close(self):
+        with self.lock:
+            self._flush(time.monotonic())
+            self.log_file.close()
+            self.index_file.close()
+        print(f"💾 {self.messages} messages ({self.bytes / 1e6:.1f} MB) recorded to {self.path}")
+
+
+class ReplayMessage:
+    """The attributes of a paho MQTTMessage the receivers use"""
+
+    def __init__(self, topic, payload, qos=0, retain=False, timestamp=0.0):
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+        self.timestamp = timestamp
+        self.mid = 0
+
+
+def seek_offset(log, when):
+    """--seek value -> seconds from the start of the recording: a number of
+    seconds, or a time of day / ISO date-time of the recording"""
+    try:
+        return float(when)
+    except ValueError:
+        pass
+    first = datetime.fromtimestamp(log.first_ns() / 1e9)
+    moment = datetime.fromisoformat(when) if "-" in when else \
+        datetime.combine(first.date(), datetime.strptime(when, "%H:%M:%S").time())
+    return moment.timestamp() - first.timestamp()
+
+
+class TrafficReplayer:
+    """Feed a recording to on_message(client, userdata, msg) on a thread.
+
+    speed 1 = as recorded, N = N times faster, 0 = no waiting at all.
+    start_s / end_s are seconds from the first message. Messages whose
+    topic matches none of topics are skipped. on_done() runs on the replay
+    thread after the last message. The replayer is passed as the client;
+    its publish() only counts, there is nobody to answer.
+    """
+
+    def __init__(self, path, on_message, speed=1.0, start_s=0.0, end_s=None,
+                 topics=("#",), on_done=None):
+        self.log = TrafficLog(path)
+        self.on_message = on_message
+        self.speed = speed
+        self.start_s = start_s
+        self.end_s = end_s
+        self.topics = list(topics)
+        self.on_done = on_done
+        self.running = False
+        self.thread = None
+        self.done = threading.Event()
+
+        # Counters
+        self.replayed = 0
+        self.skipped = 0
+        self.errors = 0
+        self.publishes = 0
+        self.max_late = 0.0
+        self.elapsed = 0.0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.publishes += 1
+
+    def subscribe(self, *args, **kwargs):
+        pass
+
+    def range(self):
+        """(first, stop) positions for start_s / end_s"""
+        log = self.log
+        if not len(log):
+            return 0, 0
+        first_ns = log.first_ns()
+        first = log.find(first_ns + int(self.start_s * 1e9)) if self.start_s else 0
+        stop = len(log) if self.end_s is None else log.find(first_ns + int(self.end_s * 1e9))
+        return first, stop
+
+    def run(self):
+        first, stop = self.range()
+        start = time.perf_counter()
+        t0 = None
+        try:
+            for position in range(first, stop):
+                if not self.running:
+                    break
+                t_ns, topic, payload, qos, retain = self.log.message(position)
+                if not any(topic_matches(pattern, topic) for pattern in self.topics):
+                    self.skipped += 1
+                    continue
+                if t0 is None:
+                    t0 = t_ns
+                if self.speed > 0:
+                    wait = start + (t_ns - t0) / 1e9 / self.speed - time.perf_counter()
+                    if wait > 0:
+                        time.sleep(wait)
+                    else:
+                        # Behind schedule: the receiver (or this thread) is
+                        # slower than the recording, no catching up in a burst
+                        self.max_late = max(self.max_late, -wait)
+                try:
+                    self.on_message(self, None, ReplayMessage(topic, payload, qos, retain, time.monotonic()))
+                except Exception as e:
+                    self.errors += 1
+                    print(f"❌ Replay callback failed: {e}")
+                self.replayed += 1
+        finally:
+            self.elapsed = time.perf_counter() - start
+            self.done.set()
+        print(f"⏹ Replay done: {self.replayed} messages in {self.elapsed:.2f}s"
+              + (f", at most {self.max_late * 1000:.0f} ms behind" if self.speed > 0 else ""))
+        if self.on_done:
+            self.on_done()
+
+    def stats(self):
+        return {"replayed": self.replayed, "skipped": self.skipped, "errors": self.errors,
+                "elapsed": self.elapsed, "max_late_ms": self.max_late * 1000}
+
+    def stop(self):
+        self.running = False
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2.0)
+        self.log.close()
+
+
+def add_replay_arguments(parser):
+    """--record / --replay / --speed / --seek, the same in every receiver"""
+    parser.add_argument("--record", default=None, metavar="PATH",
+                        help="append every MQTT message received to a traffic log (pythonCommon/traffic_log.py)")
+    parser.add_argument("--replay", default=None, metavar="PATH",
+                        help="read messages from a traffic log instead of the broker")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay speed: 1 = as recorded, 4 = four times faster, 0 = as fast as possible")
+    parser.add_argument("--seek", default=None, metavar="TIME",
+                        help="start the replay at seconds from the start, a time of day (14:03:00) or an ISO date-time")
+
+
+def open_replay(args, on_message, topics=("#",), on_done=None):
+    """TrafficReplayer for the receivers' --replay/--speed/--seek (not started)"""
+    replayer = TrafficReplayer(args.replay, on_message, speed=args.speed, topics=topics, on_done=on_done)
+    if args.seek:
+        replayer.start_s = seek_offset(replayer.log, args.seek)
+    print(f"⏯ Replaying {len(replayer.log)} messages ({replayer.log.duration():.1f}s) from {args.replay}"
+          f" at {'max' if args.speed <= 0 else f'{args.speed:g}x'} speed")
+    return replayer
+
+
+# --- COMMAND LINE ---
+def record_from_broker(args):
+    import paho.mqtt.client as mqtt
+    recorder = TrafficRecorder(args.path)
+
+    def on_connect(client, userdata, flags, reason_code, properties):
+        if reason_code == 0:
+            print(f"✅ Connected to {args.broker}:{args.port}, recording {', '.join(args.topic)}")
+            for topic in args.topic:
+                client.subscribe(topic)
+        else:
+            print(f"❌ Failed to connect, return code {reason_code}")
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=f"recorder-{int(time.time())}")
+    client.on_connect = on_connect
+    client.on_message = recorder.wrap(lambda client, userdata, msg: None)
+    client.connect(args.broker, args.port, 60)
+    client.loop_start()
+    from headless import wait_for_shutdown
+    wait_for_shutdown(lambda: f"💾 {recorder.messages} messages, {recorder.bytes / 1e6:.1f} MB", every=10.0)
+    client.loop_stop()
+    client.disconnect()
+    recorder.close()
+
+
+def print_info(args):
+    log = TrafficLog(args.path)
+    if not len(log):
+        print(f"{args.path}: no messages")
+        return
+    topics = Counter()
+    sizes = Counter()
+    for _, topic, payload, _, _ in log.messages():
+        topics[topic] += 1
+        sizes[topic] += len(payload)
+    first = datetime.fromtimestamp(log.first_ns() / 1e9)
+    last = datetime.fromtimestamp(log.last_ns() / 1e9)
+    duration = max(log.duration(), 1e-9)
+    print(f"{args.path}: {len(log)} messages, {log.size / 1e6:.1f} MB, {first:%Y-%m-%d %H:%M:%S} -> "
+          f"{last:%H:%M:%S} ({duration:.1f}s)")
+    print(f"{'topic':<40}{'messages':>10}{'per s':>8}{'MB':>8}")
+    for topic, count in topics.most_common():
+        print(f"{topic:<40}{count:>10}{count / duration:>8.1f}{sizes[topic] / 1e6:>8.2f}")
+    log.close()
+
+
+def replay_to_broker(args):
+    import paho.mqtt.client as mqtt
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=f"replayer-{int(time.time())}")
+    client.connect(args.broker, args.port, 60)
+    client.loop_start()
+    replayer = open_replay(args, lambda _, userdata, msg: client.publish(msg.topic, msg.payload,
+                                                                         msg.qos, msg.retain),
+                           topics=args.topic)
+    replayer.start()
+    try:
+        replayer.done.wait()
+    except KeyboardInterrupt:
+        pass
+    replayer.stop()
+    client.loop_stop()
+    client.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record and replay MQTT traffic")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record", help="record from a broker until Ctrl+C")
+    record.add_argument("path")
+    record.add_argument("--broker", default="broker.hivemq.com")
+    record.add_argument("--port", type=int, default=1883)
+    record.add_argument("--topic", action="append", default=None, help="repeatable, default: the repo's topics")
+
+    info = commands.add_parser("info", help="messages, duration and rate per topic")
+    info.add_argument("path")
+
+    replay = commands.add_parser("replay", help="publish a recording to a broker")
+    replay.add_argument("replay", metavar="path")
+    replay.add_argument("--broker", default="127.0.0.1")
+    replay.add_argument("--port", type=int, default=1883)
+    replay.add_argument("--topic", action="append", default=None, help="repeatable, default: everything")
+    replay.add_argument("--speed", type=float, default=1.0, help="1 = as recorded, 0 = as fast as possible")
+    replay.add_argument("--seek", default=None, help="seconds from the start, HH:MM:SS or an ISO date-time")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        args.topic = args.topic or list(DEFAULT_TOPICS)
+        record_from_broker(args)
+    elif args.command == "info":
+        print_info(args)
+    else:
+        args.topic = args.topic or ["#"]
+        replay_to_broker(args)
+
+
+if __name__ == "__main__":
+    main()
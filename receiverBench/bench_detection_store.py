@@ -0,0 +1,75 @@
+"""
+Fill a DetectionStore with synthetic detections and time the typical queries.
+
+run using python receiverBench/bench_detection_store.py --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(REPO_ROOT, "pythonCommon"))
+from detection_store import DetectionStore, now_ms
+
+LABELS = ["bottle", "clipBox"]
+
+
+def timed(name, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"  {name:<45} {(time.perf_counter() - start) * 1000:>8.2f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DetectionStore benchmark")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--cameras", type=int, default=8)
+    parser.add_argument("--hours", type=float, default=24.0, help="time span the rows cover")
+    parser.add_argument("--db", help="database file (default: a temp file)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="bench_store_"), "detections.db")
+    store = DetectionStore(path, batch_size=5000, keep_raw=False)
+
+    end = now_ms()
+    start = end - int(args.hours * 3600 * 1000)
+    step = (end - start) / args.rows
+
+    print(f"📝 Writing {args.rows} detections to {path}")
+    t0 = time.perf_counter()
+    for i in range(args.rows):
+        store.add({
+            "client_id": f"cam-{i % args.cameras}",
+            "label": random.choice(LABELS),
+            "confidence": random.random(),
+            "inference_time": 100,
+        }, received_ms=int(start + i * step))
+        # add() never blocks and drops when full, keep the bench lossless
+        while store.pending.qsize() > 50000:
+            time.sleep(0.01)
+    store.close()
+    elapsed = time.perf_counter() - t0
+    print(f"  {store.written} rows in {elapsed:.1f}s ({store.written / elapsed:.0f} rows/s), dropped {store.dropped}")
+
+    reader = DetectionStore(path, read_only=True)
+    hour_ago = end - 3600 * 1000
+    print("🔍 Queries")
+    rows = timed("bottles from cam-3 in the last hour",
+                 lambda: reader.query("cam-3", "bottle", since_ms=hour_ago))
+    print(f"    -> {len(rows)} rows")
+    timed("latest 10 detections", lambda: reader.query(limit=10))
+    counts = timed("per-label counts, last hour", lambda: reader.label_counts(since_ms=hour_ago))
+    print(f"    -> {counts}")
+    counts = timed("per-label counts, all time", lambda: reader.label_counts())
+    print(f"    -> {counts}")
+    timed("per-label counts, cam-3, last hour",
+          lambda: reader.label_counts("cam-3", since_ms=hour_ago))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Dataset build and epoch read times: decoding every JPEG per epoch vs the
+memory-mapped dataset (pythonCommon/frame_dataset.py).
+
+The Trial1 corpus is copied --copies times (each copy made unique with a few
+bytes after the JPEG EOI, so the SHA-256 dedup keeps them) into a temp folder.
+
+    python receiverBench/bench_frame_dataset.py --copies 50 --workers 4
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(REPO_ROOT, "pythonCommon"))
+from frame_dataset import FrameDataset, prepare_image
+
+IMAGES_FOLDER = os.path.join(REPO_ROOT, "Trial1", "images")
+
+
+def make_corpus(folder, copies):
+    sources = sorted(glob.glob(os.path.join(IMAGES_FOLDER, "images_of_*", "*.jpg")))
+    for source in sources:
+        label_folder = os.path.join(folder, os.path.basename(os.path.dirname(source)))
+        os.makedirs(label_folder, exist_ok=True)
+        with open(source, "rb") as f:
+            jpeg = f.read()
+        name = os.path.splitext(os.path.basename(source))[0]
+        for copy in range(copies):
+            with open(os.path.join(label_folder, f"{name}_{copy}.jpg"), "wb") as f:
+                f.write(jpeg + copy.to_bytes(4, "little"))
+    return len(sources) * copies
+
+
+def epoch_from_jpegs(folder, size, batch_size, rng):
+    """What retraining does today: read and decode every file, every epoch"""
+    paths = sorted(glob.glob(os.path.join(folder, "images_of_*", "*.jpg")))
+    order = rng.permutation(len(paths))
+    total = 0
+    for start in range(0, len(order), batch_size):
+        batch = []
+        for i in order[start:start + batch_size]:
+            with open(paths[i], "rb") as f:
+                batch.append(np.frombuffer(prepare_image(f.read(), size), dtype=np.uint8))
+        total += float(np.stack(batch).mean())
+    return total
+
+
+def epoch_from_memmap(dataset, batch_size, rng):
+    total = 0
+    for images, labels in dataset.batches(batch_size, seed=int(rng.integers(1 << 31))):
+        total += float(images.mean())
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory-mapped dataset benchmark")
+    parser.add_argument("--copies", type=int, default=50)
+    parser.add_argument("--size", type=int, default=96)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--epochs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    work = tempfile.mkdtemp(prefix="bench_dataset_")
+    try:
+        images_folder = os.path.join(work, "images")
+        count = make_corpus(images_folder, args.copies)
+        print(f"📦 {count} JPEGs ({args.copies} copies of Trial1/images), {args.size}x{args.size}")
+
+        dataset_root = os.path.join(work, "dataset")
+        start = time.perf_counter()
+        dataset = FrameDataset(dataset_root, size=args.size)
+        dataset.append_folder(images_folder, workers=1)
+        serial_build = time.perf_counter() - start
+        dataset.close()
+        shutil.rmtree(dataset_root)
+
+        start = time.perf_counter()
+        dataset = FrameDataset(dataset_root, size=args.size)
+        dataset.append_folder(images_folder, workers=args.workers)
+        parallel_build = time.perf_counter() - start
+
+        # Appending the same folder again only hashes, nothing is decoded or written
+        start = time.perf_counter()
+        added, skipped, _ = dataset.append_folder(images_folder, workers=args.workers)
+        reappend = time.perf_counter() - start
+
+        print(f"build: 1 worker {serial_build:.2f}s | {args.workers or os.cpu_count()} workers "
+              f"{parallel_build:.2f}s | re-append (all {skipped} known) {reappend:.2f}s | "
+              f"{os.path.getsize(dataset.images_path) / (1024 * 1024):.1f} MB")
+
+        rng = np.random.default_rng(0)
+        start = time.perf_counter()
+        for _ in range(args.epochs):
+            epoch_from_jpegs(images_folder, args.size, args.batch, rng)
+        jpeg_epoch = (time.perf_counter() - start) / args.epochs
+
+        dataset.open()
+        start = time.perf_counter()
+        for _ in range(args.epochs):
+            epoch_from_memmap(dataset, args.batch, rng)
+        memmap_epoch = (time.perf_counter() - start) / args.epochs
+        dataset.close()
+
+        print(f"epoch ({count} images, batch {args.batch}): decode JPEGs {jpeg_epoch:.2f}s "
+              f"({count / jpeg_epoch:.0f} img/s) | memmap {memmap_epoch:.3f}s "
+              f"({count / memmap_epoch:.0f} img/s) -> {jpeg_epoch / memmap_epoch:.0f}x")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
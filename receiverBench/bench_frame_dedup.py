@@ -0,0 +1,151 @@
+"""
+Near-duplicate suppression (pythonCommon/frame_dedup.py) on a simulated
+conveyor: how many frames it skips, whether it skips a frame with a new
+object on it, and the CPU it saves.
+
+Each camera films an "empty belt" (one corpus image) with sensor noise and
+changing JPEG quality, so no two frames are byte-identical, and every
+--object-every frames an object (another corpus image) passes for a few
+frames. A frame is a new object when the scene changes from the previous
+frame; skipping one of those is a miss.
+
+Per frame, the work the filter saves is what pythonCatch.py / trial2 do with
+a kept frame: full PIL decode, LANCZOS resize to the canvas and an archive
+write (ImageArchive.save, fsync off).
+
+    python receiverBench/bench_frame_dedup.py --cameras 2 --frames 400 --object-every 20
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+from camera_sim import load_corpus
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(REPO_ROOT, "pythonCommon"))
+from frame_dedup import HASHES, DuplicateFilter, distance
+from image_archive import ImageArchive
+
+from PIL import Image
+
+
+def noisy(jpeg, rng):
+    """The same scene again: sensor noise, a little exposure drift, another quality"""
+    image = Image.open(io.BytesIO(jpeg)).convert("RGB")
+    noise = Image.effect_noise(image.size, 12).convert("RGB")
+    image = Image.blend(image, noise, 0.04)
+    gain = rng.uniform(0.97, 1.03)
+    image = image.point(lambda value: min(255, int(value * gain)))
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=rng.choice([70, 80, 90]))
+    return out.getvalue()
+
+
+def conveyor(corpus, frames, object_every, object_frames, rng):
+    """[(jpeg, scene id, new_scene)] for one camera"""
+    belt = rng.randrange(len(corpus))
+    stream = []
+    previous = None
+    for i in range(frames):
+        if i % object_every >= object_every - object_frames:
+            if i % object_every == object_every - object_frames:
+                item = rng.choice([j for j in range(len(corpus)) if j != belt])
+            scene = item
+        else:
+            scene = belt
+        stream.append((noisy(corpus[scene], rng), scene, scene != previous))
+        previous = scene
+    return stream
+
+
+def full_processing(jpeg, device, archive):
+    image = Image.open(io.BytesIO(jpeg))
+    image.load()
+    image.resize((580, 380), Image.LANCZOS)
+    archive.save(jpeg, device, commit=False)
+
+
+def run(streams, threshold, method, archive):
+    """(skipped, frames, new scenes missed, CPU s without, CPU s with the filter)"""
+    dedup = DuplicateFilter(threshold, refresh_s=3600, method=method) if threshold is not None else None
+    skipped = missed = frames = 0
+    start = time.process_time()
+    for position in range(max(len(stream) for stream in streams.values())):
+        for device, stream in streams.items():
+            jpeg, _, new_scene = stream[position]
+            frames += 1
+            if dedup and dedup.is_duplicate(device, jpeg):
+                skipped += 1
+                missed += new_scene
+                continue
+            cpu_start = time.thread_time()
+            full_processing(jpeg, device, archive)
+            if dedup:
+                dedup.kept(time.thread_time() - cpu_start)
+    archive.commit()
+    return skipped, frames, missed, time.process_time() - start, dedup
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Skip ratio, misses and CPU saved by the near-duplicate filter")
+    parser.add_argument("--cameras", type=int, default=2)
+    parser.add_argument("--frames", type=int, default=400, help="per camera")
+    parser.add_argument("--object-every", type=int, default=20, help="an object passes every N frames")
+    parser.add_argument("--object-frames", type=int, default=3, help="frames an object stays in view")
+    parser.add_argument("--thresholds", default="0,3,5,8,12")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    corpus = [jpeg for _, jpeg in load_corpus()]
+    streams = {f"cam-{0xE000 + i:x}": conveyor(corpus, args.frames, args.object_every, args.object_frames, rng)
+               for i in range(args.cameras)}
+    frames = [jpeg for stream in streams.values() for jpeg, _, _ in stream]
+    new_scenes = sum(new for stream in streams.values() for _, _, new in stream)
+    print(f"🏭 {args.cameras} cameras x {args.frames} frames, an object for {args.object_frames} frames "
+          f"every {args.object_every}: {new_scenes} scene changes")
+
+    # Cost of the hash against the work it can save
+    for method, function in HASHES.items():
+        start = time.process_time()
+        for jpeg in frames[:300]:
+            function(jpeg)
+        print(f"#️⃣ {method}: {(time.process_time() - start) / 300 * 1e6:.0f} us per frame (1/8-scale draft decode)")
+
+    # Hamming distances between consecutive frames of the same scene vs a scene change
+    for method, function in HASHES.items():
+        same, changed = [], []
+        for stream in streams.values():
+            hashes = [function(jpeg) for jpeg, _, _ in stream]
+            for i in range(1, len(stream)):
+                (changed if stream[i][2] else same).append(distance(hashes[i], hashes[i - 1]))
+        same.sort()
+        changed.sort()
+        print(f"📏 {method}: same scene p50 {same[len(same) // 2]} / p99 {same[int(len(same) * 0.99)]} / "
+              f"max {same[-1]} bits, scene change min {changed[0]} / p50 {changed[len(changed) // 2]} bits")
+
+    print(f"{'method':<8}{'bits':>5}{'skipped':>9}{'missed':>8}{'CPU s':>8}{'saved':>8}"
+          f"{'est. saved s':>13}{'hash s':>8}")
+    with tempfile.TemporaryDirectory() as folder:
+        archive = ImageArchive(os.path.join(folder, "baseline"), fsync_policy="never")
+        _, total, _, baseline, _ = run(streams, None, None, archive)
+        archive.close()
+        print(f"{'off':<8}{'-':>5}{0:>9}{0:>8}{baseline:>8.2f}{'-':>8}{'-':>13}{'-':>8}")
+        for method in HASHES:
+            for threshold in (int(bits) for bits in args.thresholds.split(",")):
+                archive = ImageArchive(os.path.join(folder, f"{method}-{threshold}"), fsync_policy="never")
+                skipped, total, missed, cpu, dedup = run(streams, threshold, method, archive)
+                archive.close()
+                print(f"{method:<8}{threshold:>5}{skipped / total:>9.0%}{missed:>8}{cpu:>8.2f}"
+                      f"{1 - cpu / baseline:>8.0%}{dedup.saved_seconds:>13.2f}{dedup.hash_seconds:>8.2f}")
+    print("missed = scene changes skipped; saved = measured CPU drop; est. saved s = what "
+          "receiver_dedup_cpu_saved_seconds_total would report")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Bytes on the wire and receiver CPU per frame: base64 text chunks vs binary
+chunks (pythonCatch.py), and the trial2 JSON envelope vs one binary chunk.
+
+    python receiverBench/bench_framing.py --repeat 20
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from camera_sim import (load_corpus, chunked_messages, binary_messages,
+                        aes_messages, aes_binary_messages, AES_KEY, AES_IV)
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(REPO_ROOT, "Esp32ToPythonImageHiveMqComm"))
+sys.path.insert(0, os.path.join(REPO_ROOT, "cameraCapturingSendingMQTT"))
+sys.path.insert(0, os.path.join(REPO_ROOT, "pythonCommon"))
+import binary_frames
+from chunk_assembler import parse_chunk
+from frame_sessions import FrameSessions
+
+
+def receive_text(messages, sessions):
+    """pythonCatch.py text branch: START, CHUNK..., END"""
+    for topic, payload in messages:
+        device = topic.rsplit("/", 1)[1]
+        if payload.startswith(b"IMG_START:"):
+            parts = payload.split(b":")
+            sessions.start(device, int(parts[3]), int(parts[1]), int(parts[2]))
+        elif payload.startswith(b"IMG_CHUNK:"):
+            seq, index, data = parse_chunk(payload)
+            sessions.add_chunk(device, seq, index, data)
+        else:
+            return sessions.finish(device, int(payload[8:])).assembler.finish()
+
+
+def receive_binary(messages, sessions):
+    """pythonCatch.py binary branch: the last chunk completes the frame"""
+    for topic, payload in messages:
+        chunk = binary_frames.parse(payload)
+        session = sessions.add_binary_chunk(chunk)
+        if session is not None and session.assembler.is_complete():
+            sessions.finish(chunk.device, chunk.seq)
+            return session.assembler.finish()
+
+
+def time_frames(frames, receive, repeat):
+    """CPU microseconds per frame, best of repeat passes"""
+    best = float("inf")
+    for _ in range(repeat):
+        sessions = FrameSessions()
+        start = time.process_time()
+        for messages in frames:
+            receive(messages, sessions)
+        best = min(best, time.process_time() - start)
+    return best / len(frames) * 1e6
+
+
+def wire_bytes(frames):
+    # Topic and MQTT fixed header are the same for both, only payloads differ
+    return sum(len(payload) for messages in frames for _, payload in messages)
+
+
+def bench_chunked(jpegs, chunk_size, repeat):
+    text = [chunked_messages("cam-1", seq, jpeg, chunk_size) for seq, jpeg in enumerate(jpegs)]
+    # Same chunk count: a base64 chunk of N chars carries 3N/4 raw bytes
+    binary = [binary_messages("cam-1", seq, jpeg, chunk_size * 3 // 4)
+              for seq, jpeg in enumerate(jpegs)]
+
+    # Both paths must hand back the original JPEG
+    for seq, jpeg in enumerate(jpegs[:3]):
+        assert bytes(receive_text(text[seq], FrameSessions())) == jpeg
+        assert bytes(receive_binary(binary[seq], FrameSessions())) == jpeg
+
+    return [
+        ("text (base64)", wire_bytes(text), sum(map(len, text)) / len(text),
+         time_frames(text, receive_text, repeat)),
+        ("binary", wire_bytes(binary), sum(map(len, binary)) / len(binary),
+         time_frames(binary, receive_binary, repeat)),
+    ]
+
+
+def bench_aes(jpegs, repeat):
+    from aes_pipeline import decrypt_json_payload, decrypt_any_payload
+
+    json_payloads = [aes_messages("cam-1", seq, "bottle", jpeg)[0][1]
+                     for seq, jpeg in enumerate(jpegs)]
+    binary_payloads = [aes_binary_messages("cam-1", seq, "bottle", jpeg)[0][1]
+                       for seq, jpeg in enumerate(jpegs)]
+    assert decrypt_any_payload(binary_payloads[0], AES_KEY, AES_IV)[1] == jpegs[0]
+
+    results = []
+    for name, decoder, payloads in (("json + base64", decrypt_json_payload, json_payloads),
+                                    ("binary", decrypt_any_payload, binary_payloads)):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.process_time()
+            for payload in payloads:
+                decoder(payload, AES_KEY, AES_IV)
+            best = min(best, time.process_time() - start)
+        results.append((name, sum(map(len, payloads)), 1,
+                        best / len(payloads) * 1e6))
+    return results
+
+
+def print_table(title, rows, frames):
+    print(f"\n{title}")
+    print(f"{'format':<15} {'bytes/frame':>12} {'msgs/frame':>11} {'cpu us/frame':>13} {'vs first':>9}")
+    base_bytes, base_cpu = rows[0][1], rows[0][3]
+    for name, total, messages, cpu in rows:
+        print(f"{name:<15} {total / frames:>12.0f} {messages:>11.1f} {cpu:>13.1f} "
+              f"{total / base_bytes * 100:>5.0f}% B {base_cpu / cpu:>4.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Text vs binary framing benchmark")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="base64 chars per IMG_CHUNK")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--large", type=int, default=200, help="also time N KB synthetic frames (0 = off)")
+    args = parser.parse_args(argv)
+
+    jpegs = [jpeg for _, jpeg in load_corpus()]
+    print(f"📦 Corpus: {len(jpegs)} JPEGs from Trial1/images, "
+          f"mean {sum(map(len, jpegs)) / len(jpegs) / 1024:.1f} KB")
+
+    print_table("pythonCatch.py chunks (corpus)",
+                bench_chunked(jpegs, args.chunk_size, args.repeat), len(jpegs))
+    if args.large:
+        large = [b"\xff\xd8" + os.urandom(args.large * 1024) + b"\xff\xd9" for _ in range(8)]
+        print_table(f"pythonCatch.py chunks ({args.large} KB frames)",
+                    bench_chunked(large, args.chunk_size, max(1, args.repeat // 4)), len(large))
+    try:
+        print_table("trial2 envelope (AES, corpus)", bench_aes(jpegs, args.repeat), len(jpegs))
+    except ImportError as e:
+        print(f"⚠️ Skipping trial2 envelope: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Accuracy and throughput of the host classifier (pythonCommon/host_classifier.py).
+
+- accuracy: stratified k-fold cross-validation on Trial1/images, so every
+  image is scored by a model that never saw it
+- throughput: decode+features and forward pass per frame on one core,
+  batch of 1 vs batch of N
+- batching: simulated cameras submit frames to BatchClassifier, reports the
+  mean batch size and latency against the deadline
+
+    python receiverBench/bench_host_classifier.py --folds 5 --cameras 8 --fps 10
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+# Per-core numbers: keep BLAS on a single thread
+for name in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(name, "1")
+
+import numpy as np
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(REPO_ROOT, "pythonCommon"))
+from host_classifier import (BatchClassifier, LinearClassifier, build_training_set,
+                             extract_features, load_labelled_images)
+
+
+def cross_validate(items, folds):
+    """Accuracy and confusion counts over stratified folds"""
+    labels = sorted({label for label, _ in items})
+    by_label = {label: [item for item in items if item[0] == label] for label in labels}
+    fold_of = {}
+    for label in labels:
+        for i, item in enumerate(by_label[label]):
+            fold_of[item[1]] = i % folds
+
+    confusion = np.zeros((len(labels), len(labels)), dtype=int)
+    for fold in range(folds):
+        train = [item for item in items if fold_of[item[1]] != fold]
+        test = [item for item in items if fold_of[item[1]] == fold]
+        features, targets, _ = build_training_set(train)
+        model = LinearClassifier.train(features, targets, labels)
+        test_features, test_targets, _ = build_training_set(test, mirror=False)
+        predicted = model.predict_proba(test_features).argmax(axis=1)
+        for truth, guess in zip(test_targets, predicted):
+            confusion[truth, guess] += 1
+    return labels, confusion
+
+
+def per_frame_costs(model, jpegs, batch, repeat):
+    """(features us, forward us at batch 1, forward us at batch N) per frame, CPU time"""
+    start = time.process_time()
+    for _ in range(repeat):
+        features = np.stack([extract_features(jpeg, model.size) for jpeg in jpegs])
+    feature_us = (time.process_time() - start) / (repeat * len(jpegs)) * 1e6
+
+    rows = np.resize(features, (batch, features.shape[1]))
+    rounds = max(1, repeat * len(jpegs) // batch)
+
+    start = time.process_time()
+    for _ in range(rounds * batch):
+        model.predict_proba(rows[:1])
+    single_us = (time.process_time() - start) / (rounds * batch) * 1e6
+
+    start = time.process_time()
+    for _ in range(rounds):
+        model.predict_proba(rows)
+    batched_us = (time.process_time() - start) / (rounds * batch) * 1e6
+    return feature_us, single_us, batched_us
+
+
+def run_cameras(model, jpegs, cameras, fps, duration, max_batch, deadline_ms):
+    latencies = []
+    lock = threading.Lock()
+
+    def on_result(device, seq, label, confidence, latency_ms):
+        with lock:
+            latencies.append(latency_ms)
+
+    classifier = BatchClassifier(model, on_result, max_batch=max_batch, deadline_ms=deadline_ms)
+    stop_at = time.perf_counter() + duration
+
+    def camera(index):
+        seq = 0
+        next_frame = time.perf_counter() + index / (cameras * fps)
+        while next_frame < stop_at:
+            time.sleep(max(0.0, next_frame - time.perf_counter()))
+            classifier.submit(f"cam-{index}", seq, jpegs[(index + seq) % len(jpegs)])
+            seq += 1
+            next_frame += 1.0 / fps
+
+    threads = [threading.Thread(target=camera, args=(i,)) for i in range(cameras)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    time.sleep(deadline_ms / 1000 * 2)
+    classifier.stop()
+
+    latencies.sort()
+    stats = classifier.stats()
+    stats["p50_ms"] = latencies[len(latencies) // 2] if latencies else 0.0
+    stats["p99_ms"] = latencies[int(len(latencies) * 0.99)] if latencies else 0.0
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host classifier benchmark")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--cameras", type=int, default=8)
+    parser.add_argument("--fps", type=float, default=10.0, help="frames per second per camera")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--deadline-ms", type=float, default=30.0)
+    args = parser.parse_args(argv)
+
+    items = load_labelled_images()
+    print(f"📦 {len(items)} labelled images from Trial1/images")
+
+    labels, confusion = cross_validate(items, args.folds)
+    accuracy = np.trace(confusion) / confusion.sum()
+    print(f"\n{args.folds}-fold accuracy vs the capture labels: {accuracy:.1%}")
+    print(f"{'truth / predicted':<18}" + "".join(f"{label:>10}" for label in labels))
+    for label, row in zip(labels, confusion):
+        print(f"{label:<18}" + "".join(f"{count:>10}" for count in row))
+
+    features, targets, _ = build_training_set(items)
+    model = LinearClassifier.train(features, targets, labels)
+    jpegs = []
+    for _, path in items:
+        with open(path, "rb") as f:
+            jpegs.append(f.read())
+
+    feature_us, single_us, batched_us = per_frame_costs(model, jpegs, args.batch, args.repeat)
+    print(f"\nper frame, one core: decode+features {feature_us:.0f} us | forward batch 1 {single_us:.1f} us | "
+          f"forward batch {args.batch} {batched_us:.2f} us")
+    print(f"-> {1e6 / (feature_us + single_us):.0f} frames/s/core unbatched, "
+          f"{1e6 / (feature_us + batched_us):.0f} frames/s/core batched "
+          f"(forward pass alone {single_us / batched_us:.0f}x faster batched)")
+
+    stats = run_cameras(model, jpegs, args.cameras, args.fps, args.duration,
+                        args.batch, args.deadline_ms)
+    print(f"\n{args.cameras} cameras x {args.fps} fps, deadline {args.deadline_ms} ms: "
+          f"classified {stats['classified']} in {stats['batches']} batches (mean {stats['mean_batch']:.1f}) | "
+          f"p50 {stats['p50_ms']:.1f} ms p99 {stats['p99_ms']:.1f} ms | late {stats['late']} dropped {stats['dropped']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Ingest daemon fan-out, offline: simulated cameras -> LocalBroker -> one
+IngestDaemon -> shared-memory rings -> N viewer processes.
+
+One viewer can be made slow (--slow-ms per frame) to show that it only
+loses frames itself: its drops and lag show up in the consumer table while
+the other viewers keep up.
+
+    python receiverBench/bench_ingest_fanout.py --viewers 3 --cameras 4 --fps 5 --slow-ms 400
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+from local_broker import LocalBroker, LocalClient
+from camera_sim import CameraSimulator, load_corpus
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(REPO_ROOT, "ingestDaemon"))
+sys.path.insert(0, os.path.join(REPO_ROOT, "pythonCommon"))
+
+
+def viewer(name, duration, slow_ms, ready, results):
+    """One thin client process, reports what it saw"""
+    from ingest_client import IngestClient
+
+    latencies = []
+    counts = {"messages": 0}
+
+    def on_frame(meta, image):
+        latencies.append(time.time() - meta["received_at"])
+        if slow_ms:
+            time.sleep(slow_ms / 1000)
+
+    def on_message(client, userdata, msg):
+        counts["messages"] += 1
+
+    client = IngestClient(name, on_message=on_message, on_frame=on_frame)
+    client.start()
+    while not client.connected:
+        time.sleep(0.01)
+    ready.set()
+
+    cpu_start = time.process_time()
+    time.sleep(duration)
+    cpu = time.process_time() - cpu_start
+    stats = client.stats()
+    client.stop()
+
+    latencies.sort()
+    results.put({
+        "name": name,
+        "frames": len(latencies),
+        "messages": counts["messages"],
+        "dropped": stats["esp32_frames"]["dropped"],
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        "cpu_s": cpu,
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest daemon shared-memory fan-out benchmark")
+    parser.add_argument("--viewers", type=int, default=3)
+    parser.add_argument("--cameras", type=int, default=4)
+    parser.add_argument("--fps", type=float, default=5.0, help="frames per second per camera")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--slow-ms", type=float, default=400.0, help="per-frame delay of the last viewer (0 = none)")
+    parser.add_argument("--frame-slots", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    from ingest_daemon import IngestDaemon
+
+    corpus = load_corpus()
+    broker = LocalBroker()
+    daemon = IngestDaemon(broker="LocalBroker", frame_slots=args.frame_slots, report_every=float("inf"))
+    daemon.client = LocalClient(broker, client_id="bench-ingest")
+    daemon.client.on_connect = daemon.on_connect
+    daemon.client.on_message = daemon.on_message
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = []
+    for i in range(args.viewers):
+        slow = args.slow_ms if i == args.viewers - 1 else 0.0
+        name = f"viewer-{i}" + ("-slow" if slow else "")
+        ready = context.Event()
+        process = context.Process(target=viewer, args=(name, args.duration + 1.0, slow, ready, results))
+        process.start()
+        processes.append((process, ready))
+    for _, ready in processes:
+        ready.wait(timeout=30)
+
+    daemon.start()
+    cameras = []
+    for i in range(args.cameras):
+        # Half binary chunks, half text chunks, plus one classification stream
+        wire_format = "binary" if i % 2 else "chunked"
+        cameras.append(CameraSimulator(broker.publish, f"cam-{i}", corpus, wire_format, fps=args.fps))
+    cameras.append(CameraSimulator(broker.publish, "cls-0", corpus, "classification", fps=args.fps))
+
+    cpu_start = time.process_time()
+    for camera in cameras:
+        camera.start()
+    time.sleep(args.duration)
+    for camera in cameras:
+        camera.stop()
+    time.sleep(0.5)
+    daemon_cpu = time.process_time() - cpu_start
+    table = {consumer["name"]: consumer for consumer in daemon.frames.consumer_table()}
+
+    reports = sorted((results.get(timeout=30) for _ in processes), key=lambda r: r["name"])
+    for process, _ in processes:
+        process.join()
+    daemon.stop()
+
+    frames_sent = sum(camera.frames_sent for camera in cameras[:-1])
+    decode_ms = daemon.decode_seconds / max(daemon.frames_decoded, 1) * 1000
+    print(f"📦 {args.cameras} cameras x {args.fps} fps for {args.duration}s: {frames_sent} frames sent, "
+          f"{daemon.frames_decoded} decoded once by the daemon ({decode_ms:.2f} ms/frame, "
+          f"daemon CPU {daemon_cpu:.2f}s), {args.frame_slots} frame slots")
+    print(f"{'viewer':<16}{'frames':>8}{'messages':>10}{'dropped':>9}{'lag':>6}{'p50 ms':>9}{'CPU s':>8}")
+    for report in reports:
+        lag = table.get(report["name"], {}).get("lag", 0)
+        print(f"{report['name']:<16}{report['frames']:>8}{report['messages']:>10}{report['dropped']:>9}"
+              f"{lag:>6}{report['p50_ms']:>9.1f}{report['cpu_s']:>8.2f}")
+    print(f"-> {args.viewers} viewers decoding on their own would spend "
+          f"{args.viewers * daemon.decode_seconds:.2f}s on decode alone")
+
+
+if __name__ == "__main__":
+    main()
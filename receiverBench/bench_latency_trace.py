@@ -0,0 +1,212 @@
+"""
+Clock sync and span accuracy of pythonCommon/latency_trace.py against
+simulated ESP32s whose millis() started at a random moment.
+
+Each fake device is its own MQTT client on mqtt_broker.py, like the
+firmware in Trial3/Trial5: it answers TSYNC:<id> on test/python_to_esp32
+with {"type":"time_sync","device_ms":...} on esp32/cam/status and publishes
+classifications with capture_ms/publish_ms. Its link to the broker delays
+every message --link-ms plus up to --jitter-ms in each direction, and the
+"inference" between capture and publish takes --inference-ms.
+
+The receiver is what Trial3 does per message (parse, hand to the GUI
+thread, render for --render-ms). The table compares the estimated clock
+offset with the real one and the measured spans with what was simulated.
+
+    python receiverBench/bench_latency_trace.py --devices 4 --fps 2 --link-ms 20 --jitter-ms 30
+    python receiverBench/bench_latency_trace.py --trace trace.json   # open in ui.perfetto.dev
+"""
+
+import argparse
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+from camera_sim import CLASSIFICATION_TOPIC, LABELS
+from mqtt_broker import MqttBroker
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(REPO_ROOT, "pythonCommon"))
+from latency_trace import COMMAND_TOPIC, STATUS_TOPIC, ClockSync, Tracer, now_ms
+
+
+class FakeDevice:
+    """An ESP32 with its own millis() behind a slow, jittery link"""
+
+    def __init__(self, port, name, fps, link_ms, jitter_ms, inference_ms):
+        self.name = name
+        self.boot_ms = now_ms() - random.uniform(1e3, 1e7)
+        self.interval = 1.0 / fps
+        self.link_ms = link_ms
+        self.jitter_ms = jitter_ms
+        self.inference_ms = inference_ms
+        self.stop_event = threading.Event()
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=name)
+        self.client.on_message = self.on_message
+        self.client.connect("127.0.0.1", port)
+        self.client.subscribe(COMMAND_TOPIC)
+        self.client.loop_start()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def millis(self):
+        return int(now_ms() - self.boot_ms)
+
+    def true_offset(self):
+        """device_ms - PC ms, what ClockSync should find"""
+        return -self.boot_ms
+
+    def link(self, function, *args):
+        delay = (self.link_ms + random.uniform(0, self.jitter_ms)) / 1000
+        threading.Timer(delay, function, args).start()
+
+    def on_message(self, client, userdata, msg):
+        payload = msg.payload.decode()
+        if payload.startswith("TSYNC:"):
+            # The command reaches the device one link delay later
+            self.link(self.answer, payload[6:])
+
+    def answer(self, request_id):
+        reply = {"type": "time_sync", "client_id": self.name, "id": request_id,
+                 "device_ms": self.millis()}
+        self.link(self.client.publish, STATUS_TOPIC, json.dumps(reply))
+
+    def run(self):
+        seq = 0
+        while not self.stop_event.wait(self.interval):
+            seq += 1
+            capture = self.millis()
+            time.sleep(self.inference_ms / 1000)
+            data = {"client_id": self.name, "seq": seq, "timestamp": capture,
+                    "capture_ms": capture, "publish_ms": self.millis(),
+                    "label": random.choice(LABELS), "confidence": random.uniform(0.5, 0.99),
+                    "inference_time": self.inference_ms}
+            self.link(self.client.publish, CLASSIFICATION_TOPIC, json.dumps(data))
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+        self.client.loop_stop()
+        self.client.disconnect()
+
+
+class TracedReceiver:
+    """Trial3's per-message path: parse on the MQTT thread, render on a GUI thread"""
+
+    def __init__(self, port, render_ms, trace_keep):
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="bench-receiver")
+        self.clock = ClockSync(lambda topic, payload: self.client.publish(topic, payload),
+                               interval_s=2.0)
+        self.tracer = Tracer(self.clock, keep=trace_keep)
+        self.render_ms = render_ms
+        self.gui_queue = queue.Queue()
+        self.client.on_message = self.on_message
+        self.client.connect("127.0.0.1", port)
+        for topic in (CLASSIFICATION_TOPIC, STATUS_TOPIC, COMMAND_TOPIC):
+            self.client.subscribe(topic)
+        self.client.loop_start()
+        self.gui = threading.Thread(target=self.gui_loop, daemon=True)
+        self.gui.start()
+
+    def on_message(self, client, userdata, msg):
+        received = now_ms()
+        if msg.topic == COMMAND_TOPIC:
+            self.clock.on_echo(msg.payload, received)
+            return
+        data = json.loads(msg.payload.decode('utf-8'))
+        if msg.topic == STATUS_TOPIC:
+            if data.get("type") == "time_sync":
+                self.clock.on_reply(data, received)
+            return
+        trace = self.tracer.begin(data, received)
+        trace.mark("parsed")
+        trace.mark("render_scheduled")
+        self.gui_queue.put(trace)
+
+    def gui_loop(self):
+        while True:
+            trace = self.gui_queue.get()
+            if trace is None:
+                return
+            end = time.perf_counter() + self.render_ms / 1000
+            while time.perf_counter() < end:
+                pass
+            trace.mark("rendered")
+            self.tracer.finish(trace)
+
+    def stop(self):
+        self.clock.stop()
+        self.client.loop_stop()
+        self.client.disconnect()
+        self.gui_queue.put(None)
+        self.gui.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clock sync and latency spans against simulated devices")
+    parser.add_argument("--devices", type=int, default=4)
+    parser.add_argument("--fps", type=float, default=2.0, help="classifications per second per device")
+    parser.add_argument("--link-ms", type=float, default=20.0, help="device <-> broker delay, each way")
+    parser.add_argument("--jitter-ms", type=float, default=30.0, help="extra random delay, each way")
+    parser.add_argument("--inference-ms", type=float, default=120.0, help="capture -> publish on the device")
+    parser.add_argument("--render-ms", type=float, default=3.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--trace", default=None, help="write a Chrome trace JSON here")
+    args = parser.parse_args(argv)
+
+    broker = MqttBroker()
+    port = broker.start()
+    receiver = TracedReceiver(port, args.render_ms, trace_keep=100000)
+    devices = [FakeDevice(port, f"esp32-{i:08X}", args.fps, args.link_ms, args.jitter_ms, args.inference_ms)
+               for i in range(args.devices)]
+    time.sleep(0.3)
+    receiver.clock.start()
+    # Frames before the first sync reply only get the PC-side spans
+    time.sleep(0.5)
+    for device in devices:
+        device.start()
+    time.sleep(args.duration)
+    for device in devices:
+        device.stop()
+    time.sleep((args.link_ms + args.jitter_ms) / 1000 * 2 + 0.3)
+    receiver.stop()
+    broker.stop()
+
+    synced = receiver.clock.snapshot()
+    print(f"📦 {args.devices} devices x {args.fps}/s for {args.duration}s, link {args.link_ms} ms "
+          f"+ up to {args.jitter_ms} ms jitter each way, inference {args.inference_ms} ms")
+    print(f"🔁 PC <-> broker round trip {receiver.clock.broker_rtt_ms:.2f} ms, "
+          f"{receiver.clock.replies} sync replies")
+    print(f"{'device':<16}{'offset error ms':>17}{'bound ms':>10}")
+    for device in devices:
+        estimate = synced.get(device.name)
+        if estimate is None:
+            print(f"{device.name:<16}{'not synced':>17}")
+            continue
+        error = estimate["offset_ms"] - device.true_offset()
+        print(f"{device.name:<16}{error:>17.2f}{estimate['error_ms']:>10.2f}")
+
+    expected = {"publish": args.inference_ms,
+                "broker": args.link_ms + args.jitter_ms / 2,
+                "received": receiver.clock.broker_rtt_ms / 2,
+                "rendered": args.render_ms}
+    print(f"{'span':<18}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'simulated':>11}")
+    for name, values in receiver.tracer.quantiles().items():
+        simulated = f"{expected[name]:.1f}" if name in expected else "-"
+        print(f"{name:<18}{values[0.5]:>9.1f}{values[0.95]:>9.1f}{values[0.99]:>9.1f}{simulated:>11}")
+    print(f"{receiver.tracer.traced} messages traced; broker = publish -> broker arrival (link + mean jitter), "
+          "received = broker -> PC")
+    if args.trace:
+        receiver.tracer.export_chrome(args.trace)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+MJPEG footage (pythonCommon/mjpeg_recorder.py): recording cost, seek time in
+long footage and whether what comes back is the frame that went in.
+
+1. --frames corpus JPEGs from --cameras devices, --fps apart in recorded
+   time, through MjpegRecorder.add(): time per add() on the caller's thread
+   and frames/s of the background writer, with segments rotated every
+   --segment-mb.
+2. Every AVI walked chunk by chunk (RIFF sizes, idx1, frame count in the
+   header) the way a player reads it.
+3. Random moments looked up with Footage.frame_at() (bisect over segments,
+   then over the sidecar index) vs finding the same frame by walking the
+   AVI chunks from the first segment, and every frame found compared with
+   the one recorded at that time.
+
+    python receiverBench/bench_mjpeg_recorder.py --cameras 4 --frames 20000 --fps 5
+"""
+
+import argparse
+import bisect
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+from camera_sim import load_corpus
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(REPO_ROOT, "pythonCommon"))
+from mjpeg_recorder import AVIH, CHUNK, Footage, MjpegRecorder
+
+
+def walk_avi(path):
+    """(frames in the header, '00dc' chunks, has idx1), checking every RIFF size"""
+    with open(path, "rb") as f:
+        data = f.read()
+    chunks = []
+
+    def walk(offset, end):
+        while offset < end:
+            fourcc, size = CHUNK.unpack_from(data, offset)
+            if fourcc in (b"RIFF", b"LIST"):
+                walk(offset + 12, offset + 8 + size)
+            else:
+                chunks.append(fourcc)
+            offset += 8 + size + (size & 1)
+        if offset != end:
+            raise ValueError(f"{path}: chunk sizes do not add up")
+
+    walk(0, len(data))
+    # avih follows RIFF, 'AVI ', LIST, size, 'hdrl', 'avih', size
+    header_frames = AVIH.unpack_from(data, 32)[4]
+    return header_frames, chunks.count(b"00dc"), b"idx1" in chunks
+
+
+def scan_to(paths, t_ns, times):
+    """Same lookup without the index: walk the AVIs from the first segment,
+    counting frames to know their times, up to the first frame after t_ns"""
+    frame = -1
+    for path in paths:
+        with open(path, "rb") as f:
+            f.seek(12)
+            while True:
+                header = f.read(CHUNK.size)
+                if len(header) < CHUNK.size:
+                    break
+                fourcc, size = CHUNK.unpack(header)
+                if fourcc == b"LIST":
+                    f.seek(4, os.SEEK_CUR)
+                    continue
+                if fourcc == b"00dc":
+                    if times[frame + 1] > t_ns:
+                        return f.read(size)
+                    frame += 1
+                f.seek(size + (size & 1), os.SEEK_CUR)
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append, seek and playback checks of the MJPEG recorder")
+    parser.add_argument("--cameras", type=int, default=4)
+    parser.add_argument("--frames", type=int, default=20000, help="frames in total, over all cameras")
+    parser.add_argument("--fps", type=float, default=5.0, help="per camera, sets the recorded timestamps")
+    parser.add_argument("--segment-mb", type=float, default=8.0)
+    parser.add_argument("--seeks", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    corpus = [jpeg for _, jpeg in load_corpus()]
+    devices = [f"cam-{0xC000 + i:x}" for i in range(args.cameras)]
+    with tempfile.TemporaryDirectory() as folder:
+        recorder = MjpegRecorder(folder, max_bytes=int(args.segment_mb * 1024 * 1024),
+                                 max_pending=args.frames + 1)
+        t0 = time.time_ns()
+        step = int(1e9 / args.fps)
+        sent = {device: [] for device in devices}
+        start = time.perf_counter()
+        for i in range(args.frames):
+            device = devices[i % args.cameras]
+            t_ns = t0 + (i // args.cameras) * step
+            jpeg = corpus[i % len(corpus)]
+            recorder.add(jpeg, device, t_ns)
+            sent[device].append((t_ns, i % len(corpus)))
+        queued = time.perf_counter() - start
+        recorder.close()
+        written = time.perf_counter() - start
+        stats = recorder.stats()
+        hours = args.frames / args.cameras / args.fps / 3600
+        print(f"🎥 {args.frames} frames from {args.cameras} cameras ({hours:.1f} h of footage each at "
+              f"{args.fps}/s), {stats['bytes_written'] / 1e6:.1f} MB in {stats['segments']} segments")
+        print(f"✍️ add(): {queued / args.frames * 1e6:.1f} us on the caller's thread, writer "
+              f"{args.frames / written:,.0f} frames/s ({stats['bytes_written'] / written / 1e6:.0f} MB/s), "
+              f"dropped {stats['dropped']}, unreadable {stats['bad_frames']}")
+
+        footage = Footage(folder)
+        problems = 0
+        segments = 0
+        for device in devices:
+            for segment in footage.segments[device]:
+                header_frames, chunks, has_idx1 = walk_avi(segment.path)
+                segments += 1
+                if not (header_frames == chunks == len(segment) and has_idx1):
+                    problems += 1
+        print(("✅" if not problems else "❌") + f" {segments} AVI segments walked like a player: "
+              f"{problems} with a bad header frame count, missing idx1 or chunk sizes")
+
+        device = devices[0]
+        times = [t_ns for t_ns, _ in sent[device]]
+        paths = [segment.path for segment in footage.segments[device]]
+        targets = [random.randint(times[0], times[-1]) for _ in range(args.seeks)]
+        start = time.perf_counter()
+        found = [footage.frame_at(device, t_ns) for t_ns in targets]
+        seek = (time.perf_counter() - start) / args.seeks
+        wrong = 0
+        for t_ns, (frame_ns, data) in zip(targets, found):
+            position = max(bisect.bisect_right(times, t_ns) - 1, 0)
+            if frame_ns != times[position] or data != corpus[sent[device][position][1]]:
+                wrong += 1
+        scans = targets[:10]
+        start = time.perf_counter()
+        for t_ns in scans:
+            scan_to(paths, t_ns, times)
+        scan = (time.perf_counter() - start) / len(scans)
+        print(f"⏩ seek by time {seek * 1e6:.1f} us (bisect segments + index) vs {scan * 1000:.1f} ms "
+              f"walking the AVI chunks ({len(times)} frames, {len(paths)} segments of {device})")
+
+        from PIL import Image
+        for _, data in found[:50]:
+            Image.open(io.BytesIO(data)).load()
+        print(("✅" if not wrong else "❌") + f" {args.seeks - wrong}/{args.seeks} lookups returned the "
+              f"frame recorded at that moment, byte for byte (first 50 decoded by PIL)")
+        footage.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+End-to-end receiver benchmark, runs fully offline against LocalBroker.
+
+run using python receiverBench/bench_receivers.py --receiver all --cameras 4 --fps 5 --duration 10
+"""
+
+import argparse
+import json
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+
+from local_broker import LocalBroker, LocalClient
+from camera_sim import CameraSimulator, load_corpus, CHUNK_TOPIC, CLASSIFICATION_TOPIC, AES_KEY, AES_IV
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(REPO_ROOT, "Esp32ToPythonImageHiveMqComm"))
+sys.path.insert(0, os.path.join(REPO_ROOT, "cameraCapturingSendingMQTT"))
+sys.path.insert(0, os.path.join(REPO_ROOT, "pythonCommon"))
+
+
+def current_rss_mb():
+    """Resident memory of this process in MB, None if it can't be read"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LatencyRecorder:
+    """Matches frames sent by the simulators with frames finished by a receiver"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sent = {}
+        self.latencies = []
+
+    def frame_sent(self, device, seq, sent_at):
+        with self.lock:
+            self.sent[(device, seq)] = sent_at
+
+    def frame_done(self, device, seq):
+        now = time.perf_counter()
+        with self.lock:
+            sent_at = self.sent.pop((device, seq), None)
+            if sent_at is not None:
+                self.latencies.append(now - sent_at)
+
+
+# --- RECEIVER CORES ---
+# Each one does the same per-message work as the receiver it stands for,
+# minus the Tk widgets.
+
+class ChunkedReceiverCore:
+    """MQTTImageReceiver (Esp32ToPythonImageHiveMqComm/pythonCatch.py)"""
+    topic = CHUNK_TOPIC + "/#"
+    wire_format = "chunked"
+
+    def __init__(self, recorder, args):
+        from chunk_assembler import parse_chunk
+        from frame_sessions import FrameSessions
+        self.parse_chunk = parse_chunk
+        self.sessions = FrameSessions()
+        self.recorder = recorder
+
+    def on_message(self, client, userdata, message):
+        payload = message.payload
+        device = message.topic[len(CHUNK_TOPIC) + 1:] or "default"
+        if payload.startswith(b"IMG_START:"):
+            parts = payload.split(b":")
+            seq = int(parts[3]) if len(parts) > 3 else None
+            self.sessions.start(device, seq, int(parts[1]), int(parts[2]))
+        elif payload.startswith(b"IMG_CHUNK:"):
+            seq, index, data = self.parse_chunk(payload)
+            self.sessions.add_chunk(device, seq, index, data)
+        elif payload.startswith(b"IMG_END"):
+            seq = int(payload[8:]) if len(payload) > 8 else None
+            session = self.sessions.finish(device, seq)
+            if session is not None:
+                session.assembler.finish()
+                self.recorder.frame_done(device, seq)
+
+    def stop(self):
+        pass
+
+
+class BinaryChunkReceiverCore(ChunkedReceiverCore):
+    """MQTTImageReceiver fed binary chunks (same on_message branch as pythonCatch.py)"""
+    wire_format = "binary"
+
+    def __init__(self, recorder, args):
+        super().__init__(recorder, args)
+        import binary_frames
+        self.binary_frames = binary_frames
+
+    def on_message(self, client, userdata, message):
+        payload = message.payload
+        if not self.binary_frames.is_binary(payload):
+            return super().on_message(client, userdata, message)
+        chunk = self.binary_frames.parse(payload)
+        session = self.sessions.add_binary_chunk(chunk)
+        if session is not None and session.assembler.is_complete():
+            self.sessions.finish(chunk.device, chunk.seq)
+            session.assembler.finish()
+            self.recorder.frame_done(chunk.device, chunk.seq)
+
+
+class AESReceiverCore:
+    """trial2 pythonReceiver.py with its DecryptPipeline"""
+    topic = CLASSIFICATION_TOPIC
+    wire_format = "aes"
+
+    def __init__(self, recorder, args):
+        from aes_pipeline import DecryptPipeline, decrypt_any_payload
+        self.folder = tempfile.mkdtemp(prefix="bench_aes_")
+        self.recorder = recorder
+        self.pipeline = DecryptPipeline(
+            decrypt_any_payload, AES_KEY, AES_IV, self.save,
+            decode_workers=args.workers, use_processes=args.processes,
+            queue_size=args.queue_size, block_when_full=True,
+            on_saved=self.on_saved, report_every=float("inf"))
+
+    def save(self, image_count, meta, data):
+        filename = os.path.join(self.folder, f"img_{image_count}_{meta.get('label', 'unknown')}.jpg")
+        with open(filename, "wb") as f:
+            f.write(data)
+        return filename
+
+    def on_saved(self, image_count, meta, filename, data):
+        self.recorder.frame_done(meta.get("client_id"), meta.get("seq"))
+        os.remove(filename)
+
+    def on_message(self, client, userdata, message):
+        self.pipeline.submit(message.payload)
+
+    def stop(self):
+        self.pipeline.stop()
+        os.rmdir(self.folder)
+
+
+class AESBinaryReceiverCore(AESReceiverCore):
+    """trial2 pythonReceiver.py fed single binary chunks instead of JSON"""
+    wire_format = "aes-binary"
+
+
+class ClassificationReceiverCore:
+    """ClassificationGUI (Trial3) / SimpleViewer (Trial5): parse, queue, drain"""
+    topic = CLASSIFICATION_TOPIC
+    wire_format = "classification"
+
+    def __init__(self, recorder, args):
+        self.recorder = recorder
+        self.classification_queue = queue.Queue()
+        self.running = True
+        self.thread = threading.Thread(target=self.drain, daemon=True)
+        self.thread.start()
+
+    def on_message(self, client, userdata, message):
+        data = json.loads(message.payload.decode('utf-8'))
+        self.classification_queue.put(data)
+
+    def drain(self):
+        # Stands in for the 100 ms update_gui loop
+        while self.running:
+            time.sleep(0.1)
+            while not self.classification_queue.empty():
+                data = self.classification_queue.get_nowait()
+                self.recorder.frame_done(data.get("client_id"), data.get("seq"))
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+
+
+RECEIVERS = {
+    "catch": ChunkedReceiverCore,
+    "catch-binary": BinaryChunkReceiverCore,
+    "aes": AESReceiverCore,
+    "aes-binary": AESBinaryReceiverCore,
+    "classification": ClassificationReceiverCore,
+}
+
+
+def run_benchmark(name, args, corpus):
+    broker = LocalBroker()
+    recorder = LatencyRecorder()
+    receiver = RECEIVERS[name](recorder, args)
+
+    client = LocalClient(broker, client_id=f"bench-{name}")
+    client.on_message = receiver.on_message
+    client.connect()
+    client.subscribe(receiver.topic)
+    client.loop_start()
+
+    cameras = [CameraSimulator(broker.publish, f"cam-{i}", corpus, receiver.wire_format,
+                               fps=args.fps, chunk_size=args.chunk_size,
+                               on_frame_sent=recorder.frame_sent)
+               for i in range(args.cameras)]
+
+    max_depth = 0
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    for camera in cameras:
+        camera.start()
+
+    while time.perf_counter() - wall_start < args.duration:
+        time.sleep(0.05)
+        max_depth = max(max_depth, client.queue_depth())
+
+    for camera in cameras:
+        camera.stop()
+    # Let the receiver finish what is already queued
+    client.loop_stop()
+    receiver.stop()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    sent = sum(camera.frames_sent for camera in cameras)
+    latencies = recorder.latencies
+    rss = current_rss_mb()
+    return {
+        "receiver": name,
+        "sent": sent,
+        "done": len(latencies),
+        "fps": len(latencies) / wall,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "cpu_pct": cpu / wall * 100,
+        "rss_mb": rss,
+        "max_queue": max_depth,
+        "mb_on_wire": broker.published_bytes / (1024 * 1024),
+    }
+
+
+def print_results(results):
+    print(f"{'receiver':<15} {'sent':>6} {'done':>6} {'fps':>7} {'p50 ms':>8} "
+          f"{'p99 ms':>8} {'cpu %':>6} {'rss MB':>7} {'max q':>6} {'wire MB':>8}")
+    for r in results:
+        rss = f"{r['rss_mb']:.1f}" if r['rss_mb'] is not None else "n/a"
+        print(f"{r['receiver']:<15} {r['sent']:>6} {r['done']:>6} {r['fps']:>7.1f} "
+              f"{r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['cpu_pct']:>6.1f} {rss:>7} "
+              f"{r['max_queue']:>6} {r['mb_on_wire']:>8.2f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline receiver benchmark")
+    parser.add_argument("--receiver", choices=list(RECEIVERS) + ["all"], default="all")
+    parser.add_argument("--cameras", type=int, default=4)
+    parser.add_argument("--fps", type=float, default=5.0, help="frames per second per camera")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="base64 chars per IMG_CHUNK, raw bytes per binary chunk")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per receiver")
+    parser.add_argument("--workers", type=int, default=4, help="aes decode workers")
+    parser.add_argument("--processes", action="store_true", help="aes: process pool instead of threads")
+    parser.add_argument("--queue-size", type=int, default=32)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    corpus = load_corpus()
+    print(f"📦 Corpus: {len(corpus)} JPEGs from Trial1/images")
+
+    names = list(RECEIVERS) if args.receiver == "all" else [args.receiver]
+    results = []
+    for name in names:
+        print(f"⏱️ {name}: {args.cameras} cameras x {args.fps} fps for {args.duration}s")
+        try:
+            results.append(run_benchmark(name, args, corpus))
+        except ImportError as e:
+            print(f"⚠️ Skipping {name}: {e}")
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
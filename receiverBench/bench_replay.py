@@ -0,0 +1,167 @@
+"""
+Traffic log (pythonCommon/traffic_log.py): recording cost, seek time and
+replay into pythonCatch.py's receiver core.
+
+1. Fake cameras (chunked frames + classifications) publish through
+   mqtt_broker.py for --duration seconds; a paho subscriber records them
+   with TrafficRecorder.wrap(), as the receivers do with --record.
+2. Append cost of TrafficRecorder.record() on its own, --append messages.
+3. Opening the log and seeking to random times (index bisect) vs finding
+   the same message by reading the log from the start.
+4. The recording replayed into ReceiverCore (no broker) at 1x, to check the
+   pacing, and twice at max speed: frames/s, and whether both runs produced
+   exactly the same frames.
+
+    python receiverBench/bench_replay.py --cameras 4 --fps 5 --duration 5
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+from camera_sim import CHUNK_TOPIC, CameraSimulator, load_corpus
+from mqtt_broker import MqttBroker
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(REPO_ROOT, "Esp32ToPythonImageHiveMqComm"))
+sys.path.insert(0, os.path.join(REPO_ROOT, "pythonCommon"))
+from async_receiver import ReceiverCore, UiBridge
+from traffic_log import FILE_HEADER, RECORD_HEADER, TrafficLog, TrafficRecorder, TrafficReplayer
+
+
+def record_cameras(path, args, corpus):
+    broker = MqttBroker()
+    port = broker.start()
+    recorder = TrafficRecorder(path)
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="bench-recorder")
+    client.on_message = recorder.wrap(lambda client, userdata, msg: None)
+    client.connect("127.0.0.1", port)
+    client.subscribe("#")
+    client.loop_start()
+    time.sleep(0.3)
+    cameras = [CameraSimulator(broker.publish, f"cam-{0xB000 + i:x}", corpus,
+                               "chunked" if i % 2 == 0 else "classification", fps=args.fps)
+               for i in range(args.cameras)]
+    for camera in cameras:
+        camera.start()
+    time.sleep(args.duration)
+    for camera in cameras:
+        camera.stop()
+    time.sleep(0.3)
+    client.loop_stop()
+    client.disconnect()
+    broker.stop()
+    recorder.close()
+    return recorder
+
+
+def append_cost(path, count):
+    recorder = TrafficRecorder(path)
+    payload = os.urandom(1000)
+    start = time.perf_counter()
+    for i in range(count):
+        recorder.record(f"test/esp32_to_python/cam-{i % 4}", payload)
+    recorder.close()
+    return time.perf_counter() - start
+
+
+def scan_to(path, position):
+    """Find message `position` without the index: read records from the start"""
+    with open(path, "rb") as f:
+        f.read(FILE_HEADER.size)
+        for _ in range(position + 1):
+            t_ns, length, topic_length, _, _ = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+            f.seek(topic_length + length, os.SEEK_CUR)
+    return t_ns
+
+
+def replay_into_core(path, speed):
+    """(seconds, frames, digest of every frame, replayer stats)"""
+    frames = []
+    lock = threading.Lock()
+
+    def on_frame(image_data, device, complete_at):
+        with lock:
+            frames.append((device, hashlib.sha256(image_data).hexdigest()))
+
+    core = ReceiverCore(CHUNK_TOPIC, UiBridge(), on_frame)
+    replayer = TrafficReplayer(path, core.on_message, speed=speed, topics=(CHUNK_TOPIC + "/#",))
+    start = time.perf_counter()
+    # The core prints every frame
+    with open(os.devnull, "w") as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            replayer.start()
+            replayer.done.wait()
+            core.close()
+        finally:
+            sys.stdout = stdout
+    elapsed = time.perf_counter() - start
+    stats = replayer.stats()
+    replayer.stop()
+    digest = hashlib.sha256("".join(sorted(f"{device}:{sha}" for device, sha in frames)).encode()).hexdigest()
+    return elapsed, len(frames), digest, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record, seek and replay cost of the traffic log")
+    parser.add_argument("--cameras", type=int, default=4, help="half send chunked frames, half classifications")
+    parser.add_argument("--fps", type=float, default=5.0)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--append", type=int, default=100000, help="messages for the append benchmark")
+    parser.add_argument("--seeks", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus()
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "capture.mqlog")
+        recorder = record_cameras(path, args, corpus)
+        print(f"📼 recorded {recorder.messages} messages ({recorder.bytes / 1e6:.2f} MB) from "
+              f"{args.cameras} cameras x {args.fps}/s for {args.duration}s")
+
+        append_path = os.path.join(folder, "append.mqlog")
+        seconds = append_cost(append_path, args.append)
+        size = os.path.getsize(append_path) + os.path.getsize(append_path + ".idx")
+        print(f"✍️ append: {args.append / seconds:,.0f} messages/s ({args.append * 1000 / seconds / 1e6:.0f} MB/s "
+              f"of 1000-byte payloads), {size / args.append - 1000:.0f} bytes overhead per message incl. index")
+
+        start = time.perf_counter()
+        log = TrafficLog(append_path)
+        opened = time.perf_counter() - start
+        first, last = log.first_ns(), log.last_ns()
+        targets = [random.randint(first, last) for _ in range(args.seeks)]
+        start = time.perf_counter()
+        positions = [log.find(t) for t in targets]
+        seek = (time.perf_counter() - start) / args.seeks
+        scans = positions[:20]
+        start = time.perf_counter()
+        for position in scans:
+            scan_to(append_path, min(position, len(log) - 1))
+        scan = (time.perf_counter() - start) / len(scans)
+        log.close()
+        print(f"⏩ open {opened * 1000:.2f} ms, seek by time {seek * 1e6:.1f} us (index bisect) vs "
+              f"{scan * 1000:.1f} ms reading records from the start ({args.append} messages)")
+
+        log = TrafficLog(path)
+        recorded = log.duration()
+        log.close()
+        elapsed, frames, _, stats = replay_into_core(path, 1.0)
+        print(f"▶️ 1x: {frames} frames in {elapsed:.2f}s (recorded {recorded:.2f}s), "
+              f"at most {stats['max_late_ms']:.1f} ms behind schedule")
+        runs = [replay_into_core(path, 0) for _ in range(2)]
+        for i, (elapsed, frames, digest, stats) in enumerate(runs, 1):
+            print(f"⏭ max speed run {i}: {stats['replayed']} messages, {frames} frames in {elapsed:.3f}s "
+                  f"= {frames / elapsed:.0f} frames/s ({recorded / elapsed:.0f}x real time), frames {digest[:12]}")
+        print("✅ both runs produced the same frames" if runs[0][2] == runs[1][2]
+              else "❌ the two runs produced different frames")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Good frames per second of pythonCatch.py's receiver core on a lossy link,
+with and without selective retransmission (NACK, retransmit.py).
+
+mqtt_broker.py drops --loss of the chunk messages and of the NACKs on the
+command topic. The cameras (camera_sim.py) keep their last frames and
+answer NACKs like sketch.ino; the receiver is ReceiverCore + AsyncReceiver
+as pythonCatch.py runs them, over TCP.
+
+A frame counts as good when the bytes handed to the frame pool are exactly
+the JPEG the camera sent; a text frame decoded with holes is corrupt, a
+frame that never completed is lost.
+
+    python receiverBench/bench_retransmit.py --cameras 4 --fps 5 --loss 0.02 --duration 10
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+
+from camera_sim import CHUNK_TOPIC, COMMAND_TOPIC, CameraSimulator, load_corpus
+from mqtt_broker import MqttBroker
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(REPO_ROOT, "Esp32ToPythonImageHiveMqComm"))
+from async_receiver import AsyncReceiver, ReceiverCore, UiBridge
+from retransmit import Retransmitter
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def run_case(args, corpus, wire_format, nack_retries):
+    broker = MqttBroker(loss=args.loss, loss_topics=[CHUNK_TOPIC + "/#", COMMAND_TOPIC], seed=args.seed)
+    port = broker.start()
+
+    originals = {jpeg for _, jpeg in corpus}
+    lock = threading.Lock()
+    counts = {"good": 0, "corrupt": 0}
+
+    def on_frame(image_data, device, complete_at):
+        with lock:
+            counts["good" if bytes(image_data) in originals else "corrupt"] += 1
+
+    retransmit = Retransmitter(None, COMMAND_TOPIC, max_retries=nack_retries) if nack_retries else None
+    core = ReceiverCore(CHUNK_TOPIC, UiBridge(), on_frame, retransmit=retransmit)
+    receiver = AsyncReceiver("127.0.0.1", port, core, COMMAND_TOPIC,
+                             binary_frames=wire_format == "binary")
+    cameras = [CameraSimulator(broker.publish, f"cam-{0xA000 + i:x}", corpus, wire_format,
+                               fps=args.fps, chunk_size=args.chunk_size)
+               for i in range(args.cameras)]
+    for camera in cameras:
+        broker.add_listener(COMMAND_TOPIC, camera.on_command)
+
+    # The core prints every frame and missing chunk
+    with contextlib.redirect_stdout(io.StringIO()):
+        receiver.start()
+        time.sleep(0.5)
+        start = time.perf_counter()
+        for camera in cameras:
+            camera.start()
+        time.sleep(args.duration)
+        for camera in cameras:
+            camera.stop()
+        elapsed = time.perf_counter() - start
+        # Let the last frames run through their retries
+        time.sleep(args.settle)
+        receiver.stop()
+        core.close()
+    broker.stop()
+
+    sent = sum(camera.frames_sent for camera in cameras)
+    wire_bytes = sum(len(payload) for _, payload in
+                     (message for camera in cameras for messages in camera.recent.values()
+                      for message in messages))
+    frames_kept = sum(len(camera.recent) for camera in cameras)
+    result = {
+        "sent": sent,
+        "good": counts["good"],
+        "corrupt": counts["corrupt"],
+        "lost": sent - counts["good"] - counts["corrupt"],
+        "good_per_s": counts["good"] / elapsed,
+        "frame_bytes": wire_bytes / frames_kept if frames_kept else 0,
+        "broker_lost": broker.lost,
+    }
+    if retransmit:
+        stats = retransmit.stats()
+        recovered = stats["recovered"]
+        result.update({
+            "nacks": stats["nacks_sent"],
+            "nack_bytes": retransmit.nack_bytes,
+            "recovered": recovered,
+            "gave_up": stats["gave_up"],
+            "resent_per_recovered": stats["resent_bytes"] / recovered if recovered else 0,
+            "recovery_p50": percentile(retransmit.recovery_seconds, 50) * 1000,
+            "recovery_p99": percentile(retransmit.recovery_seconds, 99) * 1000,
+        })
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Good frames/s on a lossy broker, with and without NACKs")
+    parser.add_argument("--format", choices=["chunked", "binary", "all"], default="all")
+    parser.add_argument("--cameras", type=int, default=4)
+    parser.add_argument("--fps", type=float, default=5.0)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--loss", type=float, default=0.02, help="share of chunk and NACK messages dropped")
+    parser.add_argument("--nack-retries", type=int, default=3)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--settle", type=float, default=3.0, help="seconds for retries after the cameras stop")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus()
+    formats = ["chunked", "binary"] if args.format == "all" else [args.format]
+    print(f"📦 {args.cameras} cameras x {args.fps}/s for {args.duration}s, "
+          f"{args.loss:.1%} of chunks and NACKs lost")
+    print(f"{'format':<9}{'NACK':<6}{'sent':>6}{'good':>6}{'corrupt':>8}{'lost':>6}{'good/s':>8}"
+          f"{'NACKs':>7}{'recovered':>10}{'gave up':>8}{'resent B/rec':>13}{'frame B':>9}"
+          f"{'rec p50 ms':>11}{'rec p99 ms':>11}")
+    for wire_format in formats:
+        for nack_retries in (0, args.nack_retries):
+            r = run_case(args, corpus, wire_format, nack_retries)
+            line = (f"{wire_format:<9}{'on' if nack_retries else 'off':<6}{r['sent']:>6}{r['good']:>6}"
+                    f"{r['corrupt']:>8}{r['lost']:>6}{r['good_per_s']:>8.2f}")
+            if nack_retries:
+                line += (f"{r['nacks']:>7}{r['recovered']:>10}{r['gave_up']:>8}"
+                         f"{r['resent_per_recovered']:>13.0f}{r['frame_bytes']:>9.0f}"
+                         f"{r['recovery_p50']:>11.0f}{r['recovery_p99']:>11.0f}")
+            else:
+                line += f"{'-':>7}{'-':>10}{'-':>8}{'-':>13}{r['frame_bytes']:>9.0f}{'-':>11}{'-':>11}"
+            print(line)
+    print("resent B/rec = chunk bytes received again per recovered frame, frame B = a whole frame on the wire")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Cost, memory and accuracy of the rolling statistics (pythonCommon/rolling_stats.py).
+
+- add() cost per classification message (all + device + label series)
+- memory after N messages stays flat (constant state per series)
+- p50/p95/p99 against exact percentiles of the same window
+- a reader thread taking snapshots while the ingest thread adds
+
+    python receiverBench/bench_rolling_stats.py --messages 200000 --devices 8
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(REPO_ROOT, "pythonCommon"))
+from rolling_stats import RollingStats
+
+
+def synthetic_stream(count, devices, rate, seed=0):
+    """(now, device, label, inference_ms, confidence) at about rate msg/s"""
+    rng = random.Random(seed)
+    now = 1_700_000_000.0
+    for i in range(count):
+        now += rng.expovariate(rate)
+        if rng.random() < 0.0005:
+            now += 8.0  # a camera stall
+        confidence = rng.betavariate(8, 2)
+        label = "bottle" if confidence > 0.75 else "clipBox"
+        yield now, f"cam-{i % devices}", label, rng.lognormvariate(5.0, 0.3), confidence
+
+
+def exact_percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rolling statistics benchmark")
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--devices", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=50.0, help="messages per second (simulated clock)")
+    args = parser.parse_args(argv)
+
+    stream = list(synthetic_stream(args.messages, args.devices, args.rate))
+
+    # Memory with the first 1000 messages vs all of them
+    tracemalloc.start()
+    stats = RollingStats()
+    for now, device, label, inference, confidence in stream[:1000]:
+        stats.add(device, label, inference, confidence, now)
+    small = tracemalloc.get_traced_memory()[0]
+    for now, device, label, inference, confidence in stream[1000:]:
+        stats.add(device, label, inference, confidence, now)
+    large = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"📦 {args.messages} messages, {args.devices} devices: state {small / 1024:.0f} KB after 1000 "
+          f"messages, {large / 1024:.0f} KB after {args.messages}")
+
+    stats = RollingStats()
+    start = time.perf_counter()
+    for now, device, label, inference, confidence in stream:
+        stats.add(device, label, inference, confidence, now)
+    add_us = (time.perf_counter() - start) / len(stream) * 1e6
+    now = stream[-1][0]
+    start = time.perf_counter()
+    snapshot = stats.snapshot(now)
+    snapshot_ms = (time.perf_counter() - start) * 1000
+    print(f"add {add_us:.1f} us/message | snapshot of {1 + len(snapshot['devices']) + len(snapshot['labels'])} "
+          f"series {snapshot_ms:.2f} ms")
+
+    # The histograms cover the last half to full window: compare with the
+    # exact percentiles of the messages they actually hold
+    half = stats.window_s / 2
+    window_start = (int(now / half) - 1) * half
+    recent = [item for item in stream if item[0] >= window_start]
+    overall = snapshot["all"]
+    for name, index, key in (("inference ms", 3, "inference"), ("confidence", 4, "confidence")):
+        values = [item[index] for item in recent]
+        row = []
+        for q in (0.5, 0.95, 0.99):
+            estimate = overall[f"{key}_p{int(q * 100)}"]
+            exact = exact_percentile(values, q)
+            row.append(f"p{int(q * 100)} {estimate:.3g} vs {exact:.3g} ({(estimate - exact) / exact:+.1%})")
+        print(f"{name:<13} " + " | ".join(row))
+    print(f"rate {overall['rate']:.1f} msg/s (simulated {args.rate}) | gaps > 5 s: {overall['long_gaps']}")
+
+    # Ingest thread at full speed, GUI thread snapshotting every 10 ms
+    stats = RollingStats()
+    snapshots = 0
+    done = threading.Event()
+
+    def reader():
+        nonlocal snapshots
+        while not done.is_set():
+            stats.snapshot()
+            snapshots += 1
+            time.sleep(0.01)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    start = time.perf_counter()
+    for _, device, label, inference, confidence in stream:
+        stats.add(device, label, inference, confidence)
+    concurrent_us = (time.perf_counter() - start) / len(stream) * 1e6
+    done.set()
+    thread.join()
+    print(f"with a reader snapshotting every 10 ms: add {concurrent_us:.1f} us/message, "
+          f"{snapshots} snapshots, no lock taken")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Cold start of every launch.py subcommand, measured with python -X importtime.
+
+Each case runs in a fresh interpreter --runs times (the first run also
+compiles .pyc files and is left out): wall time of the process, total
+import time reported by -X importtime, the heaviest top-level imports and
+which of the heavy packages (Tk, PIL, paho, pycryptodome, pyserial, NumPy,
+asyncio) got loaded.
+
+    <command> --help     imports done before argparse answers: what every
+                         start of the program pays
+    <command> replay     a headless replay of an empty traffic log (catch,
+                         classify-gui, aes-receiver): a real run without a
+                         broker, which must not load paho or Tk
+    eager imports        all heavy packages imported up front, what a
+                         script that imports everything at the top pays
+
+    python receiverBench/bench_startup.py --runs 5
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+LAUNCHER = os.path.join(REPO_ROOT, "launch.py")
+sys.path.insert(0, os.path.join(REPO_ROOT, "pythonCommon"))
+from traffic_log import TrafficRecorder
+
+HEAVY = {"tkinter": "tk", "PIL": "PIL", "paho": "paho", "Crypto": "Crypto", "serial": "serial",
+         "numpy": "numpy", "asyncio": "asyncio"}
+EAGER = ("import tkinter, tkinter.ttk, PIL.Image, PIL.ImageTk, paho.mqtt.client, "
+         "Crypto.Cipher.AES, serial, numpy, asyncio")
+
+
+def parse_importtime(stderr):
+    """(total import seconds, {top-level module: seconds}, modules imported)"""
+    top = {}
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        # "import time: <self us> | <cumulative us> | <2 spaces per level><module>"
+        _, cumulative, name = line[len("import time:"):].split("|")
+        stripped = name.strip()
+        modules.add(stripped)
+        if name.startswith(" ") and not name.startswith("  "):
+            top[stripped] = int(cumulative) / 1e6
+    return sum(top.values()), top, modules
+
+
+def run_case(args_list, runs, cwd):
+    """Median wall seconds and the importtime of the median run"""
+    results = []
+    for _ in range(runs + 1):
+        start = time.perf_counter()
+        done = subprocess.run([sys.executable, "-X", "importtime"] + args_list, cwd=cwd,
+                              capture_output=True, text=True)
+        wall = time.perf_counter() - start
+        if done.returncode != 0:
+            raise RuntimeError(f"{' '.join(args_list)} failed:\n{done.stderr[-2000:]}")
+        results.append((wall, parse_importtime(done.stderr)))
+    results = sorted(results[1:], key=lambda result: result[0])
+    return results[len(results) // 2]
+
+
+def heavy_loaded(modules):
+    return ",".join(short for name, short in HEAVY.items()
+                    if any(module == name or module.startswith(name + ".") for module in modules)) or "-"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold start per launch.py subcommand (-X importtime)")
+    parser.add_argument("--runs", type=int, default=5, help="runs per case, the median is shown")
+    parser.add_argument("--top", type=int, default=3, help="heaviest top-level imports shown per case")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as folder:
+        # The programs create their archives/databases in the working directory
+        log_path = os.path.join(folder, "empty.mqlog")
+        with contextlib.redirect_stdout(io.StringIO()):
+            TrafficRecorder(log_path).close()
+        cases = [("launch.py --help", [LAUNCHER, "--help"])]
+        for command in ("catch", "classify-gui", "viewer", "serial-gui", "aes-receiver"):
+            cases.append((f"{command} --help", [LAUNCHER, command, "--help"]))
+        # The launcher's own cost: the same program started directly
+        cases.append(("pythonCatch.py --help", [os.path.join(REPO_ROOT, "Esp32ToPythonImageHiveMqComm",
+                                                             "pythonCatch.py"), "--help"]))
+        for command in ("catch", "classify-gui", "aes-receiver"):
+            cases.append((f"{command} replay", [LAUNCHER, command, "--headless", "--replay", log_path,
+                                                "--speed", "0"]))
+        cases.append(("bench --help", [LAUNCHER, "bench", "replay", "--help"]))
+        cases.append(("eager imports", ["-c", EAGER]))
+
+        print(f"{'case':<22}{'wall ms':>9}{'import ms':>11}  {'heavy modules':<36}heaviest imports")
+        for name, case_args in cases:
+            wall, (total, top, modules) = run_case(case_args, args.runs, folder)
+            heaviest = sorted(top.items(), key=lambda item: -item[1])[:args.top]
+            print(f"{name:<22}{wall * 1000:>9.0f}{total * 1000:>11.1f}  {heavy_loaded(modules):<36}"
+                  + ", ".join(f"{module} {seconds * 1000:.0f}" for module, seconds in heaviest))
+    print("import ms = -X importtime total of the top-level imports (interpreter startup included)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Tk event-queue depth and frame latency of pythonCatch.py under burst load,
+old per-chunk root.after(0, ...) vs the asyncio core with one UiBridge tick
+(Esp32ToPythonImageHiveMqComm/async_receiver.py).
+
+Both run over a real TCP connection to mqtt_broker.py:
+
+    legacy  paho loop_start() thread, every UI update is its own after(0),
+            a new thread per finished frame
+    bridge  paho on asyncio socket hooks, UI updates coalesced into one
+            after() tick every --tick-ms, frames on a 2-thread pool
+
+There is no display here, so FakeTk stands in for the Tk event queue: after()
+queues a callback from any thread and one "mainloop" thread runs them,
+spending --widget-ms per widget update and --frame-ms per PhotoImage paste.
+
+    python receiverBench/bench_ui_bridge.py --cameras 4 --fps 15 --chunk-size 200 --duration 10
+"""
+
+import argparse
+import contextlib
+import heapq
+import io
+import itertools
+import os
+import sys
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+from camera_sim import CameraSimulator, load_corpus, CHUNK_TOPIC
+from mqtt_broker import MqttBroker
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(REPO_ROOT, "Esp32ToPythonImageHiveMqComm"))
+sys.path.insert(0, os.path.join(REPO_ROOT, "pythonCommon"))
+from async_receiver import AsyncReceiver, ImmediateUi, ReceiverCore, UiBridge
+from image_prep import prepare_for_canvas
+
+COMMAND_TOPIC = "test/python_to_esp32"
+
+
+def spin(ms):
+    """Busy wait, a Tk redraw holds the interpreter like this does"""
+    end = time.perf_counter() + ms / 1000
+    while time.perf_counter() < end:
+        pass
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class FakeTk:
+    """after() from any thread, callbacks run in due order on one thread"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.queue = []
+        self.counter = itertools.count()
+        self.running = True
+        self.busy = 0.0
+        self.callbacks = 0
+        self.max_depth = 0
+        self.thread = threading.Thread(target=self.mainloop, daemon=True)
+        self.thread.start()
+
+    def after(self, ms, function, *args):
+        with self.condition:
+            heapq.heappush(self.queue, (time.perf_counter() + ms / 1000, next(self.counter), function, args))
+            depth = len(self.queue)
+            self.max_depth = max(self.max_depth, depth)
+            self.condition.notify()
+
+    def mainloop(self):
+        while True:
+            with self.condition:
+                while self.running and (not self.queue or self.queue[0][0] > time.perf_counter()):
+                    timeout = self.queue[0][0] - time.perf_counter() if self.queue else None
+                    self.condition.wait(timeout)
+                if not self.running:
+                    return
+                _, _, function, args = heapq.heappop(self.queue)
+            start = time.perf_counter()
+            function(*args)
+            self.busy += time.perf_counter() - start
+            self.callbacks += 1
+
+    def backlog(self):
+        """Callbacks already due (a tick waiting for its interval is not backlog)"""
+        now = time.perf_counter()
+        with self.condition:
+            return sum(1 for item in self.queue if item[0] <= now)
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+
+
+class FakeWidgets:
+    """The handlers of pythonCatch.py with their Tk cost simulated"""
+
+    def __init__(self, widget_ms, frame_ms):
+        self.widget_ms = widget_ms
+        self.frame_ms = frame_ms
+        self.latencies = []
+        self.displayed = 0
+        self.text = ""
+
+    def status(self, value):
+        spin(self.widget_ms)
+
+    def progress(self, value):
+        spin(self.widget_ms)
+
+    def chunk(self, value):
+        device, received, total, index, size = value
+        self.text = f"Status: [{device}] Received {received}/{total} chunks | Chunk {index}: {size} chars"
+        spin(self.widget_ms)
+
+    def frame(self, value):
+        image, original_size, complete_at = value
+        spin(self.frame_ms)
+        self.latencies.append(time.perf_counter() - complete_at)
+        self.displayed += 1
+
+    def handlers(self):
+        return [("status", self.status), ("progress", self.progress),
+                ("chunk", self.chunk), ("frame", self.frame)]
+
+
+class ThreadPerFrame:
+    """The old complete_frame: threading.Thread per frame instead of a pool"""
+
+    def submit(self, function, *args):
+        threading.Thread(target=function, args=args, daemon=True).start()
+
+    def shutdown(self, wait=True):
+        pass
+
+
+def run_mode(mode, args, corpus):
+    broker = MqttBroker()
+    port = broker.start()
+    root = FakeTk()
+    widgets = FakeWidgets(args.widget_ms, args.frame_ms)
+
+    if mode == "legacy":
+        ui = ImmediateUi(root, widgets.handlers())
+    else:
+        ui = UiBridge(widgets.handlers(), interval_ms=args.tick_ms)
+        ui.attach(root)
+
+    def on_frame(image_bytes, device, complete_at):
+        image, original_size = prepare_for_canvas(image_bytes, 600, 400)
+        ui.set("frame", (image, original_size, complete_at))
+
+    core = ReceiverCore(CHUNK_TOPIC, ui, on_frame)
+    if mode == "legacy":
+        core.executor = ThreadPerFrame()
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        client.on_message = core.on_message
+        client.connect("127.0.0.1", port)
+        client.subscribe(CHUNK_TOPIC + "/#")
+        client.loop_start()
+    else:
+        receiver = AsyncReceiver("127.0.0.1", port, core, COMMAND_TOPIC)
+        receiver.start()
+    time.sleep(0.5)
+
+    cameras = [CameraSimulator(broker.publish, f"cam-{i}", corpus, "chunked",
+                               fps=args.fps, chunk_size=args.chunk_size)
+               for i in range(args.cameras)]
+    cpu_start = time.process_time()
+    for camera in cameras:
+        camera.start()
+    backlog = []
+    end = time.perf_counter() + args.duration
+    while time.perf_counter() < end:
+        time.sleep(0.1)
+        backlog.append(root.backlog())
+    for camera in cameras:
+        camera.stop()
+
+    # Let the Tk side catch up, however long the old queue takes
+    drain_start = time.perf_counter()
+    while root.backlog() and time.perf_counter() - drain_start < 60:
+        time.sleep(0.05)
+    time.sleep(args.tick_ms / 1000 * 2 + 0.2)
+    drain_s = time.perf_counter() - drain_start
+    cpu = time.process_time() - cpu_start
+
+    if mode == "legacy":
+        client.loop_stop()
+        client.disconnect()
+    else:
+        receiver.stop()
+    core.close()
+    root.stop()
+    broker.stop()
+
+    frames_sent = sum(camera.frames_sent for camera in cameras)
+    return {
+        "mode": mode,
+        "frames_sent": frames_sent,
+        "completed": core.frames_completed,
+        "displayed": widgets.displayed,
+        "skipped": ui.frames_skipped,
+        "posted": ui.posted,
+        "callbacks": root.callbacks,
+        "max_depth": root.max_depth,
+        "mean_backlog": sum(backlog) / len(backlog),
+        "tk_busy": root.busy / (args.duration + drain_s),
+        "p50_ms": percentile(widgets.latencies, 50) * 1000,
+        "p99_ms": percentile(widgets.latencies, 99) * 1000,
+        "max_ms": max(widgets.latencies, default=0.0) * 1000,
+        "drain_s": drain_s,
+        "cpu_s": cpu,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tk event queue under burst load, per-chunk after() vs UiBridge")
+    parser.add_argument("--cameras", type=int, default=4)
+    parser.add_argument("--fps", type=float, default=15.0, help="frames per second per camera")
+    parser.add_argument("--chunk-size", type=int, default=200, help="base64 chars per IMG_CHUNK")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--widget-ms", type=float, default=0.3, help="Tk cost of one label/progress/text update")
+    parser.add_argument("--frame-ms", type=float, default=3.0, help="Tk cost of showing one frame")
+    parser.add_argument("--tick-ms", type=int, default=33, help="UiBridge interval")
+    parser.add_argument("--mode", choices=["legacy", "bridge", "both"], default="both")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus()
+    modes = ["legacy", "bridge"] if args.mode == "both" else [args.mode]
+    results = []
+    for mode in modes:
+        # The receiver prints a few lines per frame, keep them out of the table
+        with contextlib.redirect_stdout(io.StringIO()):
+            results.append(run_mode(mode, args, corpus))
+
+    print(f"📦 {args.cameras} cameras x {args.fps} fps, {args.chunk_size}-char chunks for {args.duration}s, "
+          f"Tk cost {args.widget_ms} ms/widget update, {args.frame_ms} ms/frame")
+    print(f"{'mode':<8}{'frames':>8}{'shown':>7}{'skip':>6}{'after()':>9}{'max q':>7}{'backlog':>9}"
+          f"{'Tk busy':>9}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'drain s':>9}{'CPU s':>7}")
+    for r in results:
+        print(f"{r['mode']:<8}{r['completed']:>8}{r['displayed']:>7}{r['skipped']:>6}{r['callbacks']:>9}"
+              f"{r['max_depth']:>7}{r['mean_backlog']:>9.1f}{r['tk_busy']:>9.0%}{r['p50_ms']:>9.1f}"
+              f"{r['p99_ms']:>9.1f}{r['max_ms']:>9.1f}{r['drain_s']:>9.2f}{r['cpu_s']:>7.2f}")
+    print("frames = completed by the receiver, shown = painted on the (fake) canvas, skip = frames a newer "
+          "one replaced before the tick; latency is IMG_END -> painted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Simulated ESP32-CAMs that publish the real wire formats of this repo,
+using the JPEGs in Trial1/images as payloads.
+
+    chunked        - IMG_START / IMG_CHUNK / IMG_END   (Esp32ToPythonImageHiveMqComm/sketch.ino)
+    binary         - binary chunks, header + raw JPEG  (pythonCommon/binary_frames.py)
+    aes            - JSON with base64 AES-CBC image_aes (cameraCapturingSendingMQTT/trial2)
+    aes-binary     - one binary chunk, JSON meta + raw ciphertext
+    classification - classification JSON               (Trial3 / Trial5)
+
+Like sketch.ino, a chunked or binary camera keeps its last frames and
+answers NACK:<device>:<seq>:<bitmap> on test/python_to_esp32 by publishing
+the missing chunks again (on_command, e.g. via MqttBroker.add_listener).
+"""
+
+import base64
+import glob
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(REPO_ROOT, "pythonCommon"))
+import binary_frames
+sys.path.insert(0, os.path.join(REPO_ROOT, "Esp32ToPythonImageHiveMqComm"))
+from retransmit import parse_nack
+
+IMAGES_FOLDER = os.path.join(REPO_ROOT, "Trial1", "images")
+
+CHUNK_TOPIC = "test/esp32_to_python"
+CLASSIFICATION_TOPIC = "esp32/cam/classification"
+COMMAND_TOPIC = "test/python_to_esp32"
+
+# Same key/IV as the trial2 receiver and imageRecogwSendingMQTT.ino
+AES_KEY = b'mysupersecretkey'
+AES_IV = b'1234567890123456'
+
+LABELS = ["bottle", "clipBox"]
+
+
+def load_corpus(folder=IMAGES_FOLDER):
+    """[(label, jpeg_bytes)] for every JPEG under Trial1/images"""
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(folder, "**", "*.jpg"), recursive=True)):
+        label = os.path.basename(path).split("_")[0]
+        with open(path, "rb") as f:
+            corpus.append((label, f.read()))
+    if not corpus:
+        raise FileNotFoundError(f"No JPEGs found under {folder}")
+    return corpus
+
+
+def chunked_messages(device, seq, jpeg, chunk_size=1000):
+    """The IMG_START/IMG_CHUNK/IMG_END sequence one frame produces"""
+    topic = f"{CHUNK_TOPIC}/{device}"
+    encoded = base64.b64encode(jpeg)
+    total = (len(encoded) + chunk_size - 1) // chunk_size
+    messages = [(topic, b"IMG_START:%d:%d:%d" % (len(jpeg), total, seq))]
+    for i in range(total):
+        chunk = encoded[i * chunk_size:(i + 1) * chunk_size]
+        messages.append((topic, b"IMG_CHUNK:%d:%d:" % (seq, i) + chunk))
+    messages.append((topic, b"IMG_END:%d" % seq))
+    return messages
+
+
+def device_number(device):
+    """cam-<hex> -> the uint32 the binary header carries, so chunk.device
+    round-trips to the same name"""
+    try:
+        return int(device.rsplit("-", 1)[1], 16)
+    except (IndexError, ValueError):
+        return zlib.crc32(device.encode('utf-8'))
+
+
+def binary_messages(device, seq, jpeg, chunk_size=1000):
+    """One binary chunk per chunk_size raw bytes, no start/end markers"""
+    topic = f"{CHUNK_TOPIC}/{device}"
+    return [(topic, chunk) for chunk in
+            binary_frames.pack_frame(device_number(device), seq, jpeg, chunk_size)]
+
+
+def classification_payload(device, seq, label):
+    confidence = random.uniform(0.5, 0.99)
+    other = [name for name in LABELS if name != label][0]
+    return {
+        "client_id": device,
+        "seq": seq,
+        "label": label,
+        "confidence": confidence,
+        "inference_time": random.randint(80, 160),
+        "timestamp": int(time.time() * 1000),
+        "probabilities": [
+            {"label": label, "value": confidence},
+            {"label": other, "value": 1 - confidence},
+        ],
+    }
+
+
+def classification_messages(device, seq, label):
+    data = classification_payload(device, seq, label)
+    return [(CLASSIFICATION_TOPIC, json.dumps(data).encode('utf-8'))]
+
+
+def aes_messages(device, seq, label, jpeg):
+    # Only needed for the aes format, keep the rest usable without pycryptodome
+    from Crypto.Cipher import AES
+    from Crypto.Util.Padding import pad
+
+    cipher = AES.new(AES_KEY, AES.MODE_CBC, AES_IV)
+    encrypted = cipher.encrypt(pad(jpeg, AES.block_size))
+    data = classification_payload(device, seq, label)
+    data["image_aes"] = base64.b64encode(encrypted).decode('ascii')
+    return [(CLASSIFICATION_TOPIC, json.dumps(data).encode('utf-8'))]
+
+
+def aes_binary_messages(device, seq, label, jpeg):
+    """Same content as aes_messages, as one binary chunk without base64/JSON image"""
+    from Crypto.Cipher import AES
+    from Crypto.Util.Padding import pad
+
+    cipher = AES.new(AES_KEY, AES.MODE_CBC, AES_IV)
+    encrypted = cipher.encrypt(pad(jpeg, AES.block_size))
+    meta = classification_payload(device, seq, label)
+    chunks = binary_frames.pack_frame(device_number(device), seq, encrypted,
+                                      chunk_size=len(encrypted) + 65536,
+                                      flags=binary_frames.FLAG_AES, meta=meta)
+    return [(CLASSIFICATION_TOPIC, chunk) for chunk in chunks]
+
+
+def frame_messages(wire_format, device, seq, label, jpeg, chunk_size):
+    if wire_format == "chunked":
+        return chunked_messages(device, seq, jpeg, chunk_size)
+    if wire_format == "binary":
+        return binary_messages(device, seq, jpeg, chunk_size)
+    if wire_format == "aes":
+        return aes_messages(device, seq, label, jpeg)
+    if wire_format == "aes-binary":
+        return aes_binary_messages(device, seq, label, jpeg)
+    if wire_format == "classification":
+        return classification_messages(device, seq, label)
+    raise ValueError(f"Unknown wire format: {wire_format}")
+
+
+class CameraSimulator:
+    """Publishes frames for one fake camera at a fixed rate on its own thread"""
+
+    def __init__(self, publish, device, corpus, wire_format, fps=5.0,
+                 chunk_size=1000, on_frame_sent=None, keep_frames=4):
+        self.publish = publish
+        self.device = device
+        self.corpus = corpus
+        self.wire_format = wire_format
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self.chunk_size = chunk_size
+        self.on_frame_sent = on_frame_sent
+        self.frames_sent = 0
+        # seq -> messages of the last keep_frames frames, for NACKs
+        self.keep_frames = keep_frames
+        self.recent = OrderedDict()
+        self.lock = threading.Lock()
+        self.nacks = 0
+        self.resent_chunks = 0
+        self.resent_bytes = 0
+        # Binary chunks name the camera after its header device id
+        self.names = {device, f"cam-{device_number(device):x}"}
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def on_command(self, topic, payload):
+        """Republish the chunks a NACK for one of the kept frames asks for"""
+        if not payload.startswith(b"NACK:"):
+            return
+        try:
+            device, seq, indexes = parse_nack(payload)
+        except ValueError:
+            return
+        if device not in self.names:
+            return
+        with self.lock:
+            messages = self.recent.get(seq)
+        if messages is None:
+            return
+        self.nacks += 1
+        # Text frames have IMG_START/IMG_END around their chunks
+        chunks = messages[1:-1] if self.wire_format == "chunked" else messages
+        for i in indexes:
+            if i >= len(chunks):
+                continue
+            topic, chunk = chunks[i]
+            self.publish(topic, chunk)
+            self.resent_chunks += 1
+            self.resent_bytes += len(chunk)
+
+    def run(self):
+        next_frame = time.perf_counter()
+        seq = 0
+        while not self.stop_event.is_set():
+            label, jpeg = self.corpus[seq % len(self.corpus)]
+            seq += 1
+            messages = frame_messages(self.wire_format, self.device, seq, label,
+                                      jpeg, self.chunk_size)
+            # Latency is measured from the first message of the frame
+            if self.on_frame_sent:
+                self.on_frame_sent(self.device, seq, time.perf_counter())
+            if self.keep_frames:
+                with self.lock:
+                    self.recent[seq] = messages
+                    while len(self.recent) > self.keep_frames:
+                        self.recent.popitem(last=False)
+            for topic, payload in messages:
+                self.publish(topic, payload)
+            self.frames_sent += 1
+
+            next_frame += self.interval
+            delay = next_frame - time.perf_counter()
+            if delay > 0:
+                self.stop_event.wait(delay)
+            else:
+                # Falling behind, do not try to catch up in a burst
+                next_frame = time.perf_counter()
@@ -0,0 +1,135 @@
+"""
+In-process stand-in for broker.hivemq.com so receivers can be driven offline.
+
+LocalClient mimics the parts of paho.mqtt.client.Client the receivers use
+(on_connect / on_message / subscribe / publish / loop_*), and every client
+gets its own delivery thread, like paho's network thread.
+"""
+
+import inspect
+import queue
+import threading
+import time
+
+
+def topic_matches(topic_filter, topic):
+    """MQTT topic filter matching with + and # wildcards"""
+    filter_parts = topic_filter.split("/")
+    topic_parts = topic.split("/")
+    for i, part in enumerate(filter_parts):
+        if part == "#":
+            return True
+        if i >= len(topic_parts):
+            return False
+        if part != "+" and part != topic_parts[i]:
+            return False
+    return len(filter_parts) == len(topic_parts)
+
+
+class LocalMessage:
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+        self.qos = 0
+        self.retain = False
+        self.timestamp = time.monotonic()
+
+
+class LocalBroker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = []  # (topic_filter, client)
+        self.published = 0
+        self.published_bytes = 0
+
+    def subscribe(self, client, topic_filter):
+        with self.lock:
+            self.subscriptions.append((topic_filter, client))
+
+    def unsubscribe_all(self, client):
+        with self.lock:
+            self.subscriptions = [s for s in self.subscriptions if s[1] is not client]
+
+    def publish(self, topic, payload):
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        self.published += 1
+        self.published_bytes += len(payload)
+
+        with self.lock:
+            targets = {client for topic_filter, client in self.subscriptions
+                       if topic_matches(topic_filter, topic)}
+        for client in targets:
+            client.inbox.put(LocalMessage(topic, payload))
+
+
+def call_paho_callback(callback, *args):
+    """Call an on_connect/on_disconnect written for either paho callback API"""
+    params = inspect.signature(callback).parameters.values()
+    if any(p.kind == p.VAR_POSITIONAL for p in params):
+        callback(*args)
+    else:
+        callback(*args[:len(params)])
+
+
+class LocalClient:
+    """Drop-in for the paho Client calls used in this repo"""
+
+    def __init__(self, broker, client_id=""):
+        self.broker = broker
+        self.client_id = client_id
+        self.userdata = None
+        self.on_connect = None
+        self.on_message = None
+        self.on_disconnect = None
+        self.inbox = queue.Queue()
+        self.connected = False
+        self.thread = None
+
+    def connect(self, host=None, port=None, keepalive=60):
+        self.connected = True
+        if self.on_connect:
+            # (client, userdata, flags, rc[, properties])
+            call_paho_callback(self.on_connect, self, self.userdata, {}, 0, None)
+        return 0
+
+    def is_connected(self):
+        return self.connected
+
+    def subscribe(self, topic, qos=0):
+        self.broker.subscribe(self, topic)
+        return 0, 0
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.broker.publish(topic, payload or b"")
+
+    def deliver_forever(self):
+        while True:
+            message = self.inbox.get()
+            if message is None:
+                break
+            if self.on_message:
+                self.on_message(self, self.userdata, message)
+
+    def loop_start(self):
+        self.thread = threading.Thread(target=self.deliver_forever, daemon=True)
+        self.thread.start()
+
+    def loop_forever(self):
+        self.deliver_forever()
+
+    def loop_stop(self):
+        if self.thread:
+            self.inbox.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def disconnect(self):
+        self.broker.unsubscribe_all(self)
+        self.connected = False
+        self.inbox.put(None)
+        if self.on_disconnect:
+            call_paho_callback(self.on_disconnect, self, self.userdata, 0, None)
+
+    def queue_depth(self):
+        return self.inbox.qsize()
@@ -0,0 +1,223 @@
+"""
+Minimal MQTT 3.1.1 broker on asyncio, for benchmarks that need a real TCP
+connection (paho's socket hooks, network buffering) without HiveMQ.
+
+Only what the receivers here use: CONNECT, SUBSCRIBE/UNSUBSCRIBE with + and
+#, PUBLISH (delivered at QoS 0, QoS 1/2 publishes are acknowledged),
+retained messages, PINGREQ and DISCONNECT. No auth, no wills, no sessions.
+
+    broker = MqttBroker()
+    port = broker.start()          # runs on its own thread
+    broker.publish(topic, payload) # inject from any thread (camera_sim)
+    broker.stop()
+
+For a lossy link, MqttBroker(loss=0.02, loss_topics=["test/esp32_to_python/#"])
+drops that share of the (non-retained) publishes on matching topics before
+they are routed. add_listener() subscribes in-process, e.g. a simulated
+camera listening for commands.
+"""
+
+import asyncio
+import random
+import threading
+
+from local_broker import topic_matches
+
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 10, 11, 12, 13, 14
+
+
+def encode_length(length):
+    out = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        out.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(out)
+
+
+def packet(packet_type, body, flags=0):
+    return bytes([packet_type << 4 | flags]) + encode_length(len(body)) + body
+
+
+def publish_packet(topic, payload, retain=False):
+    topic = topic.encode("utf-8")
+    return packet(PUBLISH, len(topic).to_bytes(2, "big") + topic + payload, 1 if retain else 0)
+
+
+def read_string(data, pos):
+    length = int.from_bytes(data[pos:pos + 2], "big")
+    return data[pos + 2:pos + 2 + length].decode("utf-8"), pos + 2 + length
+
+
+class BrokerClient:
+    def __init__(self, writer):
+        self.writer = writer
+        self.client_id = ""
+        self.filters = set()
+        self.dropped = 0
+
+
+class MqttBroker:
+    """Single-loop broker. A subscriber whose socket buffer holds more than
+    max_buffer bytes loses messages (QoS 0) instead of stalling the others."""
+
+    def __init__(self, host="127.0.0.1", port=0, max_buffer=8 * 1024 * 1024,
+                 loss=0.0, loss_topics=("#",), seed=None):
+        self.host = host
+        self.port = port
+        self.max_buffer = max_buffer
+        self.loss = loss
+        self.loss_topics = list(loss_topics)
+        self.random = random.Random(seed)
+        self.clients = set()
+        self.listeners = []
+        self.retained = {}
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.ready = threading.Event()
+
+        # Counters
+        self.received = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.lost = 0
+
+    # --- LIFECYCLE ---
+    def start(self):
+        """Start serving on a background thread, returns the port"""
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        return self.port
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self.handle_client, self.host, self.port))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.ready.set()
+        self.loop.run_forever()
+        self.server.close()
+        self.loop.run_until_complete(self.server.wait_closed())
+        self.loop.close()
+
+    def stop(self):
+        if self.loop is None:
+            return
+        for client in list(self.clients):
+            self.loop.call_soon_threadsafe(client.writer.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+
+    def publish(self, topic, payload, retain=False):
+        """Inject a message as if a client had published it (any thread)"""
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        self.loop.call_soon_threadsafe(self.route, topic, bytes(payload), retain)
+
+    def add_listener(self, topic_filter, function):
+        """function(topic, payload) for every routed message on topic_filter,
+        called on the broker thread (keep it short)"""
+        self.listeners.append((topic_filter, function))
+
+    # --- PROTOCOL ---
+    async def handle_client(self, reader, writer):
+        client = BrokerClient(writer)
+        try:
+            while True:
+                header = await reader.readexactly(1)
+                length = 0
+                multiplier = 1
+                while True:
+                    byte = (await reader.readexactly(1))[0]
+                    length += (byte & 0x7F) * multiplier
+                    multiplier *= 128
+                    if not byte & 0x80:
+                        break
+                body = await reader.readexactly(length) if length else b""
+                if not self.handle_packet(client, header[0] >> 4, header[0] & 0x0F, body):
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.clients.discard(client)
+            writer.close()
+
+    def handle_packet(self, client, packet_type, flags, body):
+        """Returns False when the connection should be closed"""
+        writer = client.writer
+        if packet_type == CONNECT:
+            _, pos = read_string(body, 0)
+            level = body[pos]
+            if level != 4:
+                writer.write(packet(CONNACK, b"\x00\x01"))  # unacceptable protocol version
+                return False
+            client.client_id, _ = read_string(body, pos + 4)
+            self.clients.add(client)
+            writer.write(packet(CONNACK, b"\x00\x00"))
+        elif packet_type == PUBLISH:
+            qos = (flags >> 1) & 0x03
+            topic, pos = read_string(body, 0)
+            if qos:
+                packet_id = body[pos:pos + 2]
+                pos += 2
+                writer.write(packet(PUBACK if qos == 1 else PUBREC, packet_id))
+            self.route(topic, body[pos:], bool(flags & 0x01))
+        elif packet_type == PUBREL:
+            writer.write(packet(PUBCOMP, body[:2]))
+        elif packet_type == SUBSCRIBE:
+            packet_id, pos = body[:2], 2
+            granted = bytearray()
+            new_filters = []
+            while pos < len(body):
+                topic_filter, pos = read_string(body, pos)
+                pos += 1  # requested QoS, everything is delivered at 0
+                client.filters.add(topic_filter)
+                new_filters.append(topic_filter)
+                granted.append(0)
+            writer.write(packet(SUBACK, packet_id + bytes(granted)))
+            for topic, payload in self.retained.items():
+                if any(topic_matches(f, topic) for f in new_filters):
+                    writer.write(publish_packet(topic, payload, retain=True))
+        elif packet_type == UNSUBSCRIBE:
+            packet_id, pos = body[:2], 2
+            while pos < len(body):
+                topic_filter, pos = read_string(body, pos)
+                client.filters.discard(topic_filter)
+            writer.write(packet(UNSUBACK, packet_id))
+        elif packet_type == PINGREQ:
+            writer.write(packet(PINGRESP, b""))
+        elif packet_type == DISCONNECT:
+            return False
+        return True
+
+    def route(self, topic, payload, retain=False):
+        self.received += 1
+        if (self.loss and not retain and self.random.random() < self.loss
+                and any(topic_matches(f, topic) for f in self.loss_topics)):
+            self.lost += 1
+            return
+        for topic_filter, function in self.listeners:
+            if topic_matches(topic_filter, topic):
+                function(topic, payload)
+        if retain:
+            if payload:
+                self.retained[topic] = payload
+            else:
+                self.retained.pop(topic, None)
+        data = None
+        for client in list(self.clients):
+            if not any(topic_matches(f, topic) for f in client.filters):
+                continue
+            if client.writer.transport.get_write_buffer_size() > self.max_buffer:
+                client.dropped += 1
+                self.dropped += 1
+                continue
+            if data is None:
+                data = publish_packet(topic, payload)
+            client.writer.write(data)
+            self.delivered += 1